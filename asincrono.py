@@ -0,0 +1,291 @@
+"""
+API asíncrona (asyncio) para usar el traductor desde otros servicios.
+
+Las funciones de subtitulador.py bloquean y usan el modelo global del
+módulo. MotorTraduccion tiene su propio modelo (un ModeloResidente) y hace
+todo el trabajo del modelo en un único hilo dedicado; en el bucle de eventos
+solo se reparten turnos, así que nunca se bloquea:
+
+    async with MotorTraduccion() as motor:
+        traducciones = await motor.traducir(textos, 'en', 'es')
+        await motor.traducir_archivo('ep1.srt', 'ep1.es.srt', 'en', 'es')
+        async for progreso in motor.progreso_archivo('ep2.srt', 'ep2.es.srt', 'en', 'es'):
+            print(progreso.hechos, progreso.total)
+
+Reparto justo: cada trabajo se traduce por trozos de hasta TROZO textos y
+los trabajos activos se turnan trozo a trozo, así que un archivo de 10.000
+subtítulos no hace esperar a una petición de tres. En cada turno se añaden
+al trozo textos de otros trabajos con el mismo par de idiomas y perfil hasta
+llenar TROZO: muchas peticiones pequeñas comparten la llamada a generate.
+
+Contrapresión: como mucho max_trabajos trabajos admitidos a la vez; enviar()
+espera (sin bloquear el bucle) a que uno termine. Leer y escribir archivos va
+al ejecutor por defecto de asyncio, no al hilo del modelo. Si quien espera un
+trabajo se cancela, sus trozos pendientes se descartan. Sin trabajo, el
+modelo se descarga tras inactividad_s, como en la GUI.
+
+benchmarks/bench_asincrono.py mide la latencia del bucle de eventos con
+varios clientes traduciendo a la vez.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import os
+from collections import namedtuple
+
+import torch
+
+from decodificacion import PERFIL_POR_DEFECTO
+from lotes import InformeFallos, PlanificadorLotes, traducir_lote
+from precision import PRECISION_POR_DEFECTO, resolver_precision
+from residente import INACTIVIDAD_MIN, ModeloResidente
+from subtitulos import abrir_subtitulos, formato_por_extension
+
+# Textos por turno: más pequeño, reparto más fino; más grande, lotes más llenos
+TROZO = 32
+# Trabajos admitidos a la vez (los demás esperan en enviar())
+MAX_TRABAJOS = 16
+# Cada cuánto, sin trabajo, se comprueba si hay que descargar el modelo
+INTERVALO_INACTIVIDAD_S = 30.0
+
+Progreso = namedtuple('Progreso', 'hechos total')
+
+
+class Trabajo:
+    """Textos de un llamador. Se espera con await (devuelve las traducciones) y se sigue con progreso()."""
+
+    def __init__(self, textos: list, src_lang: str, tgt_lang: str, perfil: str = PERFIL_POR_DEFECTO):
+        self.textos = list(textos)
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.perfil = perfil
+        self.clave = (src_lang, tgt_lang, perfil)
+        self.resultado = list(self.textos)
+        # Solo los textos no vacíos pasan por el modelo
+        self.pendientes = [] if src_lang == tgt_lang else [i for i, t in enumerate(self.textos) if t and t.strip()]
+        self.hechos = 0
+        self.fallos = InformeFallos()
+        self._futuro = asyncio.get_running_loop().create_future()
+        self._progreso = asyncio.Queue()
+        if not self.pendientes:
+            self._completar([], [])
+
+    @property
+    def total(self) -> int:
+        return len(self.pendientes)
+
+    @property
+    def terminado(self) -> bool:
+        """Traducido, fallido o cancelado."""
+        return self._futuro.done()
+
+    def __await__(self):
+        # Sin shield: si se cancela quien espera, se cancela el trabajo
+        return self._futuro.__await__()
+
+    def cancelar(self):
+        if not self._futuro.done():
+            self._futuro.cancel()
+            self._progreso.put_nowait(None)
+
+    async def progreso(self):
+        """Progreso(hechos, total) tras cada trozo traducido, hasta terminar (o fallar)."""
+        while True:
+            paso = await self._progreso.get()
+            if paso is None:
+                return
+            yield paso
+            if paso.hechos >= paso.total:
+                return
+
+    def _siguiente(self, n: int) -> list:
+        return self.pendientes[self.hechos:self.hechos + n]
+
+    def _completar(self, indices: list, traducciones: list):
+        for i, traduccion in zip(indices, traducciones):
+            self.resultado[i] = traduccion
+        self.hechos += len(indices)
+        self._progreso.put_nowait(Progreso(self.hechos, self.total))
+        if self.hechos >= self.total and not self._futuro.done():
+            self._futuro.set_result(self.resultado)
+
+    def _fallar(self, error: BaseException):
+        if not self._futuro.done():
+            self._futuro.set_exception(error)
+            self._progreso.put_nowait(None)
+
+
+class MotorTraduccion:
+    """Traducción para asyncio: un hilo para el modelo, turnos por trozos y un tope de trabajos admitidos."""
+
+    def __init__(self, modelo: ModeloResidente = None, device=None, precision: str = PRECISION_POR_DEFECTO,
+                 max_trabajos: int = MAX_TRABAJOS, inactividad_s: float = INACTIVIDAD_MIN * 60, log=print):
+        self.modelo = modelo or ModeloResidente(inactividad_s=inactividad_s, log=log)
+        self.device = torch.device(device if device is not None else ('cuda' if torch.cuda.is_available() else 'cpu'))
+        self.precision = resolver_precision(precision, self.device, log=log)
+        self.max_trabajos = max_trabajos
+        self.log = log
+        self.planificador = PlanificadorLotes(device=self.device, log=None)
+        self.estadisticas = {'trabajos': 0, 'textos': 0, 'turnos': 0, 'segundos_modelo': 0.0}
+        self._turno = collections.deque()
+        self._ejecutor = None
+        self._hay_trabajo = None
+        self._plazas = None
+        self._tarea = None
+
+    # --- Ciclo de vida ---
+
+    async def iniciar(self) -> 'MotorTraduccion':
+        if self._tarea is None:
+            self._ejecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='motor-modelo')
+            self._hay_trabajo = asyncio.Event()
+            self._plazas = asyncio.Semaphore(self.max_trabajos)
+            self._tarea = asyncio.get_running_loop().create_task(self._repartir())
+        return self
+
+    async def cerrar(self):
+        """Cancela lo pendiente y espera (sin bloquear el bucle) a que el hilo del modelo termine su trozo."""
+        if self._tarea is None:
+            return
+        self._tarea.cancel()
+        try:
+            await self._tarea
+        except asyncio.CancelledError:
+            pass
+        while self._turno:
+            self._turno.popleft().cancelar()
+        await asyncio.get_running_loop().run_in_executor(None, self._ejecutor.shutdown)
+        self._tarea = self._ejecutor = None
+
+    async def __aenter__(self):
+        return await self.iniciar()
+
+    async def __aexit__(self, *exc):
+        await self.cerrar()
+
+    async def calentar(self):
+        """Carga el modelo (en el hilo del modelo) antes de la primera petición."""
+        await self.iniciar()
+        await asyncio.get_running_loop().run_in_executor(self._ejecutor, self.modelo.obtener, self.device,
+                                                         self.precision)
+
+    # --- Peticiones ---
+
+    async def enviar(self, textos: list, src_lang: str, tgt_lang: str, perfil: str = PERFIL_POR_DEFECTO) -> Trabajo:
+        """Admite un trabajo en cuanto hay sitio y lo devuelve sin esperar a que se traduzca."""
+        await self.iniciar()
+        await self._plazas.acquire()
+        trabajo = Trabajo(textos, src_lang, tgt_lang, perfil)
+        trabajo._futuro.add_done_callback(lambda _: self._plazas.release())
+        self.estadisticas['trabajos'] += 1
+        self.estadisticas['textos'] += trabajo.total
+        if not trabajo.terminado:
+            self._turno.append(trabajo)
+            self._hay_trabajo.set()
+        return trabajo
+
+    async def traducir(self, textos: list, src_lang: str, tgt_lang: str, perfil: str = PERFIL_POR_DEFECTO) -> list:
+        """Traducciones de textos, en el mismo orden (los vacíos se devuelven tal cual)."""
+        return await (await self.enviar(textos, src_lang, tgt_lang, perfil))
+
+    async def progreso_archivo(self, entrada: str, salida: str, src_lang: str, tgt_lang: str,
+                               perfil: str = PERFIL_POR_DEFECTO):
+        """Traduce un .srt/.vtt a salida dando Progreso tras cada trozo; al acabar la iteración está escrito.
+
+        Para dejar de iterar antes del final, con contextlib.aclosing(): así el
+        trabajo se cancela en el momento y no cuando se recoja el generador.
+        """
+        if os.path.splitext(entrada)[1].lower() not in ('.srt', '.vtt'):
+            raise ValueError(f"solo se admiten archivos .srt o .vtt: {entrada}")
+        subs = await asyncio.to_thread(abrir_subtitulos, entrada, 'utf-8')
+        trabajo = await self.enviar(subs.textos, src_lang, tgt_lang, perfil)
+        try:
+            async for paso in trabajo.progreso():
+                yield paso
+            traducidos = await trabajo
+        finally:
+            # El llamador dejó de iterar (o se canceló) antes del final
+            trabajo.cancelar()
+        for i, texto in enumerate(traducidos):
+            subs.fijar_texto(i, texto)
+        await asyncio.to_thread(subs.guardar, salida, 'utf-8', formato_por_extension(salida, subs.formato))
+
+    async def traducir_archivo(self, entrada: str, salida: str, src_lang: str, tgt_lang: str,
+                               perfil: str = PERFIL_POR_DEFECTO) -> str:
+        """Traduce un .srt/.vtt a salida y devuelve salida."""
+        async for _ in self.progreso_archivo(entrada, salida, src_lang, tgt_lang, perfil):
+            pass
+        return salida
+
+    # --- Reparto ---
+
+    def _tomar_turno(self) -> list:
+        """(trabajo, índices) del siguiente turno: un trozo del primero y, si cabe, de otros con su misma clave."""
+        primero = self._turno.popleft()
+        tomados = [(primero, primero._siguiente(TROZO))]
+        hueco = TROZO - len(tomados[0][1])
+        for trabajo in list(self._turno):
+            if hueco <= 0:
+                break
+            if trabajo.clave == primero.clave and not trabajo.terminado:
+                self._turno.remove(trabajo)
+                indices = trabajo._siguiente(hueco)
+                tomados.append((trabajo, indices))
+                hueco -= len(indices)
+        return tomados
+
+    def _traducir_turno(self, clave: tuple, textos: list, fallos: InformeFallos) -> list:
+        """En el hilo del modelo."""
+        src_lang, tgt_lang, perfil = clave
+        with self.modelo.usar(self.device, self.precision) as (tokenizer, model):
+            return traducir_lote(textos, tokenizer, model, src_lang, tgt_lang, self.device,
+                                 planificador=self.planificador, perfil=perfil, fallos=fallos)
+
+    async def _repartir(self):
+        bucle = asyncio.get_running_loop()
+        while True:
+            while self._turno and self._turno[0].terminado:
+                self._turno.popleft()
+            if not self._turno:
+                self._hay_trabajo.clear()
+                try:
+                    await asyncio.wait_for(self._hay_trabajo.wait(), INTERVALO_INACTIVIDAD_S)
+                except asyncio.TimeoutError:
+                    await bucle.run_in_executor(self._ejecutor, self.modelo.comprobar_inactividad)
+                continue
+            tomados = self._tomar_turno()
+            textos = [t.textos[i] for t, indices in tomados for i in indices]
+            fallos = InformeFallos()
+            t0 = bucle.time()
+            try:
+                traducciones = await bucle.run_in_executor(self._ejecutor, self._traducir_turno, tomados[0][0].clave,
+                                                           textos, fallos)
+            except asyncio.CancelledError:
+                # cerrar(): los trabajos de este turno ya no están en la cola, pero hay quien los espera
+                for trabajo, _ in tomados:
+                    trabajo.cancelar()
+                raise
+            except Exception as e:
+                for trabajo, _ in tomados:
+                    trabajo._fallar(e)
+                continue
+            self.estadisticas['turnos'] += 1
+            self.estadisticas['segundos_modelo'] += bucle.time() - t0
+            pos = 0
+            for trabajo, indices in tomados:
+                parte = traducciones[pos:pos + len(indices)]
+                pos += len(indices)
+                if trabajo.terminado:
+                    continue  # Cancelado mientras se traducía
+                for texto in parte:
+                    if texto in fallos:
+                        trabajo.fallos.anotar(texto, RuntimeError('no se pudo traducir'))
+                trabajo._completar(indices, parte)
+                if not trabajo.terminado:
+                    self._turno.append(trabajo)
+
+    def resumen(self) -> str:
+        e = self.estadisticas
+        return (f"[ASINCRONO] {e['trabajos']} trabajos | {e['textos']} textos en {e['turnos']} turnos | "
+                f"{e['segundos_modelo']:.1f}s de modelo")
@@ -0,0 +1,173 @@
+"""
+Generación asistida (decodificación especulativa) para textos largos.
+
+En CPU, generate gasta casi todo su tiempo en los pasos del decodificador:
+uno por token de salida, cada uno con el modelo entero. Con generación
+asistida, un borrador barato propone varios tokens y el modelo los verifica
+todos en un solo paso; se queda con los que coinciden con lo que él habría
+elegido y añade uno suyo. Con búsqueda voraz la salida es idéntica a la de
+generate sin asistente, con menos pasos del modelo.
+
+Borradores (--asistente):
+  ngramas  sin modelo: propone lo que siguió a la última aparición del
+           n-grama final en lo ya generado (prompt lookup de transformers).
+           Gana con textos repetitivos: listas, estribillos, nombres.
+  RUTA     un M2M100 más pequeño (nombre o carpeta) con el mismo vocabulario
+           y los mismos tokens especiales que el modelo.
+
+Solo se aplica con búsqueda voraz (perfiles 'rapido' y 'urgente'; también
+cuando --plazo baja a ellos) y con el modelo completo (no con la lista
+corta), a los textos de al menos LONGITUD_MIN tokens: generate asistido va
+de uno en uno, así que los más cortos siguen en lotes. Si el borrador no se
+puede cargar o no es compatible, se genera sin asistente.
+
+Los primeros CALIBRACION textos largos se generan también sin asistente: si
+alguna salida difiere o la aceleración medida no llega a GANANCIA_MIN, el
+asistente se desactiva y el resto vuelve a los lotes normales.
+"""
+
+import time
+
+import torch
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer, PreTrainedModel
+
+from decodificacion import obtener_perfil
+
+# Tokens de entrada a partir de los cuales un texto se genera con asistente
+LONGITUD_MIN = 32
+# Tokens que propone el borrador de n-gramas en cada paso
+TOKENS_NGRAMAS = 10
+# Textos largos que se generan con y sin asistente para medir la aceleración
+CALIBRACION = 2
+# Aceleración mínima en la calibración para seguir usando el asistente
+GANANCIA_MIN = 1.1
+
+NGRAMAS = 'ngramas'
+
+
+def incompatibilidad(tokenizer, model, tokenizer_borrador, borrador):
+    """Motivo por el que borrador no puede proponer tokens a model, o None si es compatible."""
+    if not borrador.config.is_encoder_decoder:
+        return 'no es un modelo codificador-decodificador'
+    if borrador.config.vocab_size != model.config.vocab_size:
+        return f"vocabulario de {borrador.config.vocab_size} tokens en lugar de {model.config.vocab_size}"
+    for atributo in ('pad_token_id', 'eos_token_id', 'decoder_start_token_id'):
+        if getattr(borrador.config, atributo, None) != getattr(model.config, atributo, None):
+            return f"{atributo} distinto"
+    if tokenizer_borrador.get_vocab() != tokenizer.get_vocab():
+        return 'el tokenizador no coincide'
+    return None
+
+
+class Asistente:
+    """Borrador para generate asistido, con calibración y contadores de aceptación."""
+
+    def __init__(self, borrador=None, nombre: str = NGRAMAS, longitud_min: int = LONGITUD_MIN, log=print):
+        """borrador: modelo que propone tokens (None: n-gramas de lo ya generado)."""
+        self.borrador = borrador
+        self.nombre = nombre
+        self.longitud_min = longitud_min
+        self.log = log
+        self.activo = True
+        self.calibrados = 0
+        self.estadisticas = {'textos': 0, 'tokens': 0, 'pasos': 0, 'propuestos': 0,
+                             'segundos_con': 0.0, 'segundos_sin': 0.0}
+
+    @classmethod
+    def crear(cls, nombre: str, tokenizer, model, perfil: str = None, log=print):
+        """Asistente para --asistente nombre ('ngramas' o ruta de un M2M100), o None si no se puede usar."""
+        if not isinstance(model, PreTrainedModel):
+            log("[ASISTIDA] Con la lista corta de vocabulario no se usa generación asistida")
+            return None
+        if perfil is not None and obtener_perfil(perfil)['num_beams'] > 1:
+            log(f"[ASISTIDA] La generación asistida solo se aplica con búsqueda voraz: con el perfil '{perfil}', "
+                f"solo si --plazo baja a 'rapido' o 'urgente'")
+        if nombre == NGRAMAS:
+            return cls(log=log)
+        t0 = time.perf_counter()
+        try:
+            tokenizer_borrador = M2M100Tokenizer.from_pretrained(nombre)
+            borrador = M2M100ForConditionalGeneration.from_pretrained(nombre, torch_dtype=model.dtype)
+        except Exception as e:
+            log(f"[ASISTIDA] No se pudo cargar el borrador '{nombre}' ({e}); se genera sin asistente")
+            return None
+        motivo = incompatibilidad(tokenizer, model, tokenizer_borrador, borrador)
+        if motivo is not None:
+            log(f"[ASISTIDA] El borrador '{nombre}' no es compatible con el modelo ({motivo}); se genera sin asistente")
+            return None
+        borrador = borrador.to(model.device).eval()
+        parametros = sum(p.numel() for p in borrador.parameters()) / 1e6
+        log(f"[ASISTIDA] Borrador '{nombre}' ({parametros:.0f}M parámetros) cargado en "
+            f"{time.perf_counter() - t0:.1f}s")
+        return cls(borrador, nombre=nombre, log=log)
+
+    def admite(self, model, perfil: str) -> bool:
+        """Si los textos largos de model con perfil se generan con asistente."""
+        return self.activo and obtener_perfil(perfil)['num_beams'] == 1 and isinstance(model, PreTrainedModel)
+
+    def _argumentos(self) -> dict:
+        if self.borrador is None:
+            return {'prompt_lookup_num_tokens': TOKENS_NGRAMAS}
+        return {'assistant_model': self.borrador}
+
+    def _asistido(self, model, entradas: dict, args: dict):
+        """generate asistido; cuenta pasos del modelo y tokens propuestos por el borrador."""
+        pasos = []
+
+        def al_verificar(_, argumentos, kwargs):
+            # En cada paso el modelo recibe el último token aceptado y los propuestos
+            ids = kwargs.get('decoder_input_ids')
+            pasos.append(ids.shape[1] - 1 if ids is not None else 0)
+
+        gancho = model.register_forward_pre_hook(al_verificar, with_kwargs=True)
+        try:
+            salida = model.generate(**entradas, **args, **self._argumentos())
+        finally:
+            gancho.remove()
+        e = self.estadisticas
+        e['textos'] += 1
+        e['tokens'] += salida.shape[1] - 1
+        e['pasos'] += len(pasos)
+        e['propuestos'] += sum(pasos)
+        return salida
+
+    def generar(self, model, entradas: dict, **args):
+        """Como model.generate(**entradas, **args) para un solo texto, pero con asistente."""
+        if self.calibrados >= CALIBRACION:
+            return self._asistido(model, entradas, args)
+        t0 = time.perf_counter()
+        referencia = model.generate(**entradas, **args)
+        t1 = time.perf_counter()
+        salida = self._asistido(model, entradas, args)
+        self.estadisticas['segundos_sin'] += t1 - t0
+        self.estadisticas['segundos_con'] += time.perf_counter() - t1
+        self.calibrados += 1
+        if not torch.equal(salida, referencia):
+            self.activo = False
+            self.log("[ASISTIDA] La salida con asistente difiere de la salida sin él; se desactiva")
+        elif self.calibrados == CALIBRACION and self.aceleracion() < GANANCIA_MIN:
+            self.activo = False
+            self.log(f"[ASISTIDA] Sin ganancia con '{self.nombre}' (x{self.aceleracion():.2f}); se desactiva")
+        return referencia
+
+    def aceleracion(self) -> float:
+        """Tiempo sin asistente entre tiempo con asistente, medido en la calibración."""
+        e = self.estadisticas
+        return e['segundos_sin'] / e['segundos_con'] if e['segundos_con'] else 0.0
+
+    def aceptacion(self) -> float:
+        """Fracción de los tokens propuestos por el borrador que el modelo acepta."""
+        e = self.estadisticas
+        # Cada paso aporta un token propio del modelo; el resto son propuestas aceptadas
+        return (e['tokens'] - e['pasos']) / e['propuestos'] if e['propuestos'] else 0.0
+
+    def resumen(self) -> str:
+        e = self.estadisticas
+        if not e['textos']:
+            return f"[ASISTIDA] '{self.nombre}': ningún texto se generó con asistente"
+        texto = (f"[ASISTIDA] '{self.nombre}': {e['textos']} textos | aceptación {100 * self.aceptacion():.0f}% | "
+                 f"{e['tokens'] / max(1, e['pasos']):.2f} tokens por paso del modelo | "
+                 f"aceleración medida x{self.aceleracion():.2f} ({self.calibrados} textos)")
+        if not self.activo:
+            texto += " | desactivado"
+        return texto
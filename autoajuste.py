@@ -0,0 +1,253 @@
+"""
+Autoajuste por equipo: hilos de torch, trabajadores y tamaño de lote.
+
+Con los valores por defecto, torch usa un hilo intra-op por núcleo en cada
+proceso: varios trabajadores en el mismo equipo se pisan entre sí, y con los
+lotes pequeños de subtítulos muchos hilos apenas ayudan. autoajustar()
+traduce una muestra de calibración con cada configuración y guarda la mejor
+para este equipo en DIRECTORIO_DATOS/ajuste_<equipo>.json, con la curva de
+rendimiento medida. La búsqueda va por etapas:
+
+  1. hilos intra-op de un solo proceso (con los lotes por defecto);
+  2. lote máximo y tope de tokens por lote, con esos hilos;
+  3. trabajadores en paralelo, cada uno con núcleos / trabajadores hilos.
+
+Los trabajadores se simulan con hilos del mismo proceso que comparten el
+modelo: cada uno fija sus hilos de torch y lanza su propio equipo OpenMP,
+como lo haría un proceso aparte, sin cargar el modelo varias veces.
+
+La CLI, la GUI y los grupos de trabajadores (distribuido.ejecutar_procesos)
+llaman a aplicar_ajuste() al arrancar: un trabajo suelto usa los hilos de la
+etapa 1 y cada proceso de un grupo, los de la etapa 3. El perfil solo se usa
+si coincide la huella del equipo (núcleos, procesador, versión de torch y
+dispositivo); si no, se avisa y se siguen los valores por defecto.
+"""
+
+import json
+import os
+import platform
+import socket
+import statistics
+import threading
+import time
+
+import torch
+
+import lotes
+from lotes import LOTE_MAX, PlanificadorLotes
+from vocabulario import DIRECTORIO_DATOS
+
+# Candidatos de las etapas 2 y 3 (None = sin tope de tokens además del de memoria)
+LOTES_CANDIDATOS = (8, 16, 32, 64)
+TOKENS_CANDIDATOS = (None, 1000, 2000, 4000)
+# Subtítulos de la muestra de calibración
+CUES_MUESTRA = 64
+# Mejora mínima (fracción) para preferir una configuración distinta de la por defecto
+MEJORA_MIN = 0.03
+
+
+def nucleos_fisicos() -> int:
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    except Exception:
+        return os.cpu_count() or 1
+
+
+def huella_equipo(device=None) -> dict:
+    """Lo que invalida un perfil guardado si cambia."""
+    return {'nucleos': nucleos_fisicos(), 'logicos': os.cpu_count() or 1,
+            'procesador': platform.processor() or platform.machine(), 'torch': torch.__version__,
+            'dispositivo': torch.device(device).type if device is not None else 'cpu'}
+
+
+def ruta_ajuste(equipo: str = None) -> str:
+    return os.path.join(DIRECTORIO_DATOS, f"ajuste_{equipo or socket.gethostname()}.json")
+
+
+def guardar_ajuste(ajuste: dict, ruta: str = None) -> str:
+    ruta = ruta or ruta_ajuste()
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    tmp = ruta + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(ajuste, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, ruta)
+    return ruta
+
+
+def cargar_ajuste(ruta: str = None, device=None, log=print) -> dict:
+    """Perfil guardado de este equipo; None si no hay o si su huella no coincide."""
+    ruta = ruta or ruta_ajuste()
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            ajuste = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log(f"[AJUSTE] No se pudo leer {ruta}: {e}")
+        return None
+    huella = huella_equipo(device if device is not None else ajuste.get('huella', {}).get('dispositivo'))
+    if ajuste.get('huella') != huella:
+        log(f"[AJUSTE] {ruta} es de otro equipo o de otra versión de torch; "
+            f"se usan los valores por defecto (rehacer con 'subtitulador.py autoajustar')")
+        return None
+    return ajuste
+
+
+def aplicar_ajuste(ajuste: dict = None, en_grupo: bool = False, log=print) -> dict:
+    """Fija hilos de torch y valores por defecto de los lotes según el perfil (o el guardado). Lo devuelve.
+
+    en_grupo: el proceso es uno de varios trabajadores del mismo equipo.
+    """
+    if ajuste is None:
+        ajuste = cargar_ajuste(log=log)
+        if ajuste is None:
+            return None
+    hilos = ajuste['hilos_por_trabajador'] if en_grupo else ajuste['hilos']
+    torch.set_num_threads(hilos)
+    if en_grupo:
+        # generate en modo eager casi no usa el pool inter-op: con varios procesos, uno por proceso basta
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # Solo se puede fijar antes del primer trabajo en paralelo
+    lotes.LOTE_MAX = ajuste['lote_max']
+    lotes.TOKENS_MAX = ajuste['tokens_max']
+    log(f"[AJUSTE] {hilos} hilos | lote máx {ajuste['lote_max']} | tope de tokens "
+        f"{ajuste['tokens_max'] or 'solo memoria'} (perfil del {ajuste['fecha'][:10]})")
+    return ajuste
+
+
+def _candidatos_hilos(nucleos: int) -> list:
+    candidatos, n = {nucleos}, 1
+    while n < nucleos:
+        candidatos.add(n)
+        n *= 2
+    return sorted(candidatos)
+
+
+def medir(traducir, textos: list, hilos: int, trabajadores: int = 1, lote_max: int = LOTE_MAX,
+          tokens_max: int = None, device=None, repeticiones: int = 1) -> float:
+    """Subtítulos/s de 'trabajadores' hilos que traducen textos a la vez con esa configuración (mediana).
+
+    traducir(textos, planificador) -> lista traduce con el modelo ya cargado.
+    """
+    anteriores = torch.get_num_threads()
+    medidas = []
+    try:
+        for _ in range(max(1, repeticiones)):
+            barrera = threading.Barrier(trabajadores + 1)
+            errores = []
+
+            def trabajar():
+                torch.set_num_threads(hilos)
+                planificador = PlanificadorLotes(device=device, lote_max=lote_max, tokens_max=tokens_max, log=None)
+                try:
+                    traducir(textos[:2], planificador)  # Calentar: el primer generate de cada hilo es más lento
+                    barrera.wait()
+                    traducir(textos, planificador)
+                except threading.BrokenBarrierError:
+                    pass
+                except Exception as e:
+                    errores.append(e)
+                    barrera.abort()
+
+            hebras = [threading.Thread(target=trabajar, daemon=True) for _ in range(trabajadores)]
+            for h in hebras:
+                h.start()
+            try:
+                barrera.wait()
+            except threading.BrokenBarrierError:
+                pass
+            t0 = time.perf_counter()
+            for h in hebras:
+                h.join()
+            if errores:
+                raise errores[0]
+            medidas.append(trabajadores * len(textos) / (time.perf_counter() - t0))
+    finally:
+        torch.set_num_threads(anteriores)
+    return statistics.median(medidas)
+
+
+def autoajustar(traducir, textos: list, device=None, hilos: list = None, trabajadores: list = None,
+                lotes_max: list = None, tokens_max: list = None, repeticiones: int = 1, log=print) -> dict:
+    """Mide cada configuración sobre textos y devuelve el perfil con la mejor (sin guardarlo).
+
+    traducir(textos, planificador) -> lista, como en medir(). Las listas vacías
+    o None usan los candidatos por defecto. En GPU solo se ajustan los lotes.
+    """
+    nucleos = nucleos_fisicos()
+    gpu = device is not None and torch.device(device).type == 'cuda'
+    por_defecto = torch.get_num_threads()
+    if gpu:
+        hilos, trabajadores = [por_defecto], [1]
+    hilos = sorted(set(hilos or _candidatos_hilos(nucleos)))
+    trabajadores = sorted(set(trabajadores or _candidatos_hilos(nucleos)))
+    curva = []
+
+    def probar(etapa: str, t: int, w: int, lote: int, tokens) -> float:
+        valor = medir(traducir, textos, t, w, lote, tokens, device, repeticiones)
+        curva.append({'etapa': etapa, 'hilos': t, 'trabajadores': w, 'lote_max': lote, 'tokens_max': tokens,
+                      'subtitulos_s': round(valor, 3)})
+        log(f"[AJUSTE] {etapa:12s} | {w} x {t:2d} hilos | lote máx {lote:3d} | tope de tokens "
+            f"{tokens or '-':>5} | {valor:8.2f} subtítulos/s")
+        return valor
+
+    def mejor(candidatos: dict, actual):
+        # Se prefiere la configuración actual salvo mejora clara: la medida tiene ruido
+        elegido = max(candidatos, key=candidatos.get)
+        return elegido if candidatos[elegido] > candidatos[actual] * (1 + MEJORA_MIN) else actual
+
+    referencia = probar('por defecto', por_defecto, 1, LOTE_MAX, None)
+    medidas = {por_defecto: referencia}
+    for t in hilos:
+        if t not in medidas:
+            medidas[t] = probar('hilos', t, 1, LOTE_MAX, None)
+    hilos_uno = mejor(medidas, por_defecto)
+
+    medidas = {LOTE_MAX: medidas[hilos_uno]}
+    for lote in sorted(set(lotes_max or LOTES_CANDIDATOS)):
+        if lote not in medidas:
+            medidas[lote] = probar('lote', hilos_uno, 1, lote, None)
+    lote_max = mejor(medidas, LOTE_MAX)
+
+    medidas = {None: medidas[lote_max]}
+    for tokens in tokens_max or TOKENS_CANDIDATOS:
+        if tokens not in medidas:
+            medidas[tokens] = probar('tokens', hilos_uno, 1, lote_max, tokens)
+    tope = mejor(medidas, None)
+    un_proceso = medidas[tope]
+
+    medidas = {1: un_proceso}
+    for w in trabajadores:
+        if w > 1:
+            medidas[w] = probar('trabajadores', max(1, nucleos // w), w, lote_max, tope)
+    num_trabajadores = mejor(medidas, 1)
+    hilos_grupo = hilos_uno if num_trabajadores == 1 else max(1, nucleos // num_trabajadores)
+
+    ajuste = {
+        'huella': huella_equipo(device),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'hilos': hilos_uno,
+        'trabajadores': num_trabajadores,
+        'hilos_por_trabajador': hilos_grupo,
+        'lote_max': lote_max,
+        'tokens_max': tope,
+        'subtitulos_s': round(un_proceso, 3),
+        'subtitulos_s_grupo': round(medidas[num_trabajadores], 3),
+        'subtitulos_s_por_defecto': round(referencia, 3),
+        'cues_muestra': len(textos),
+        'curva': curva,
+    }
+    log(resumen_ajuste(ajuste))
+    return ajuste
+
+
+def resumen_ajuste(ajuste: dict) -> str:
+    defecto = ajuste['subtitulos_s_por_defecto'] or 1e-9
+    return (f"[AJUSTE] Un proceso: {ajuste['hilos']} hilos, lote máx {ajuste['lote_max']}, tope de tokens "
+            f"{ajuste['tokens_max'] or 'solo memoria'} -> {ajuste['subtitulos_s']:.2f} subtítulos/s "
+            f"(x{ajuste['subtitulos_s'] / defecto:.2f} frente a los valores por defecto)\n"
+            f"[AJUSTE] Grupo: {ajuste['trabajadores']} trabajadores x {ajuste['hilos_por_trabajador']} hilos -> "
+            f"{ajuste['subtitulos_s_grupo']:.2f} subtítulos/s en total")
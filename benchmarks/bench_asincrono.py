@@ -0,0 +1,135 @@
+"""
+API asíncrona: latencia del bucle de eventos con varios clientes a la vez.
+
+Simula un servicio que traduce dentro de asyncio: un cliente envía un trabajo
+grande (un archivo entero) y --clientes clientes envían peticiones pequeñas
+de 1 a 3 textos, cada una tras una pausa aleatoria. Una corrutina testigo se
+despierta cada 10 ms y anota cuánto se retrasa: es la latencia que sufriría
+cualquier otra tarea del servicio.
+
+Compara dos formas de hacerlo:
+  bloqueante  cada cliente llama a traducir_lote directamente en la corrutina
+              (el bucle queda parado mientras se traduce y el trabajo grande
+              va entero antes que las peticiones que llegan detrás);
+  motor       MotorTraduccion (asincrono.py): hilo del modelo, turnos por
+              trozos y peticiones pequeñas agrupadas.
+
+Muestra el retraso del bucle (p50/p99/máximo), la latencia de las peticiones
+pequeñas (p50/p95) y el total de textos por segundo.
+
+Funciona sin red con el modelo diminuto (--modelo mini, por defecto) o con
+--modelo mediano (aleatorio con las dimensiones de M2M100 418M).
+
+Uso:
+    python benchmarks/bench_asincrono.py [--grande 400] [--clientes 8] [--peticiones 10] [--modelo mini|mediano]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch  # noqa: E402
+
+from asincrono import MotorTraduccion  # noqa: E402
+from lotes import PlanificadorLotes, traducir_lote  # noqa: E402
+from modelo_mini import construir_modelo_mini  # noqa: E402
+from residente import ModeloResidente  # noqa: E402
+from sinteticos import frase, longitudes  # noqa: E402
+
+# Periodo de la corrutina testigo
+TIC_S = 0.01
+
+
+async def _testigo(retrasos: list, parar: asyncio.Event):
+    bucle = asyncio.get_running_loop()
+    while not parar.is_set():
+        previsto = bucle.time() + TIC_S
+        await asyncio.sleep(TIC_S)
+        retrasos.append(max(0.0, bucle.time() - previsto))
+
+
+async def _escenario(traducir, grande: list, pequenas: list, semilla: int) -> dict:
+    """traducir(textos) es una corrutina; pequenas, una lista de peticiones por cliente."""
+    retrasos, latencias = [], []
+    parar = asyncio.Event()
+    rnd = random.Random(semilla)
+
+    async def cliente(peticiones):
+        for textos in peticiones:
+            # La petición cuenta desde que toca enviarla, aunque el bucle esté parado en ese momento
+            pausa = rnd.uniform(0.0, 0.05)
+            envio = time.perf_counter() + pausa
+            await asyncio.sleep(pausa)
+            await traducir(textos)
+            latencias.append(time.perf_counter() - envio)
+
+    testigo = asyncio.create_task(_testigo(retrasos, parar))
+    t0 = time.perf_counter()
+    await asyncio.gather(traducir(grande), *(cliente(p) for p in pequenas))
+    segundos = time.perf_counter() - t0
+    parar.set()
+    await testigo
+    textos = len(grande) + sum(len(t) for p in pequenas for t in p)
+    return {'retraso': np.asarray(retrasos or [0.0]) * 1000, 'latencia': np.asarray(latencias) * 1000,
+            'textos_s': textos / segundos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--grande', type=int, default=400, help="Textos del trabajo grande.")
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--peticiones', type=int, default=10, help="Peticiones pequeñas por cliente.")
+    parser.add_argument('--modelo', default='mini', choices=['mini', 'mediano'])
+    parser.add_argument('--semilla', type=int, default=1234)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    if args.modelo == 'mini':
+        ruta_modelo = construir_modelo_mini()
+    else:
+        ruta_modelo = construir_modelo_mini(os.path.join(tempfile.gettempdir(), 'subtitulador_modelo_mediano'),
+                                            d_model=1024, capas=12, cabezas=16)
+    rnd = random.Random(args.semilla)
+    grande = [frase(rnd, n) for n in longitudes(args.grande, rnd)]
+    pequenas = [[[frase(rnd, n) for n in longitudes(rnd.randint(1, 3), rnd)] for _ in range(args.peticiones)]
+                for _ in range(args.clientes)]
+    device = torch.device('cpu')
+    modelo = ModeloResidente(ruta_modelo, copia_local=False, log=lambda m: None)
+    tokenizer, model = modelo.obtener(device)
+    print(f"{len(grande)} textos en el trabajo grande | {args.clientes} clientes x {args.peticiones} peticiones "
+          f"de 1-3 textos | modelo {args.modelo}")
+
+    async def bloqueante():
+        planificador = PlanificadorLotes(device=device, log=None)
+
+        async def traducir(textos):
+            return traducir_lote(textos, tokenizer, model, 'en', 'es', device, planificador=planificador)
+
+        return await _escenario(traducir, grande, pequenas, args.semilla)
+
+    async def motor():
+        async with MotorTraduccion(modelo, device=device, log=lambda m: None) as m:
+            await m.calentar()
+            return await _escenario(lambda textos: m.traducir(textos, 'en', 'es'), grande, pequenas, args.semilla)
+
+    for nombre, escenario in (('bloqueante', bloqueante), ('motor', motor)):
+        r = asyncio.run(escenario())
+        retraso, latencia = r['retraso'], r['latencia']
+        print(f"{nombre:10s} | bucle p50 {np.percentile(retraso, 50):7.1f} ms  p99 {np.percentile(retraso, 99):7.1f} ms  "
+              f"máx {retraso.max():7.1f} ms | peticiones p50 {np.percentile(latencia, 50):7.1f} ms  "
+              f"p95 {np.percentile(latencia, 95):7.1f} ms | {r['textos_s']:7.1f} textos/s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,102 @@
+"""
+Generación asistida: aceleración, aceptación y coincidencia con generate voraz.
+
+Genera cada línea larga de uno en uno, sin asistente y con cada borrador
+pedido (asistida.py), con el perfil voraz 'rapido'. Muestra el tiempo total,
+la aceleración, la aceptación (propuestas del borrador que el modelo acepta),
+los tokens por paso del modelo y el porcentaje de salidas idénticas (debe
+ser 100 %).
+
+Funciona sin red: --modelo mini (diminuto), --modelo mediano (aleatorio con
+las dimensiones de M2M100 418M salvo el vocabulario) o el modelo real si está
+descargado (auto, por defecto). Con los modelos aleatorios la salida repite un
+mismo token hasta el tope de longitud: 'ngramas' acierta casi siempre y un
+borrador aleatorio casi nunca, así que solo el modelo real da cifras
+representativas. 'mini' como borrador es el modelo diminuto (con el mismo
+vocabulario que mini y mediano).
+
+Uso:
+    python benchmarks/bench_asistida.py [--entrada archivo.txt] [--lineas 20] [--palabras 40]
+                                        [--modelo auto|mini|mediano|ruta] [--asistente ngramas mini RUTA]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch  # noqa: E402
+
+from asistida import NGRAMAS, Asistente  # noqa: E402
+from decodificacion import argumentos_generacion  # noqa: E402
+from sinteticos import frase, longitudes  # noqa: E402
+
+PERFIL = 'rapido'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrada', help='Archivo .txt/.srt/.vtt; por defecto, líneas sintéticas.')
+    parser.add_argument('--lineas', type=int, default=20)
+    parser.add_argument('--palabras', type=float, default=40.0, help='Palabras por línea sintética (media).')
+    parser.add_argument('--modelo', default='auto', help="'auto', 'mini', 'mediano' o nombre/ruta de un M2M100.")
+    parser.add_argument('--asistente', nargs='+', default=[NGRAMAS], help="'ngramas', 'mini' o rutas de borradores.")
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    args = parser.parse_args()
+
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from bench_precision import _ruta_modelo
+    from modelo_mini import construir_modelo_mini
+    ruta_modelo = _ruta_modelo(args.modelo)
+    if args.modelo in ('mini', 'mediano'):
+        torch.set_num_threads(1)
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo).eval()
+    if args.entrada:
+        from equivalencia import _leer_textos
+        textos = [t for t in _leer_textos(args.entrada) if t and t.strip()][:args.lineas]
+    else:
+        rnd = random.Random(1234)
+        textos = [frase(rnd, n) for n in longitudes(args.lineas, rnd, palabras_media=args.palabras,
+                                                     palabras_desv=args.palabras / 4)]
+    tokenizer.src_lang = args.src
+    forced_bos = tokenizer.get_lang_id(args.tgt)
+    entradas = [tokenizer(t, return_tensors='pt', truncation=True) for t in textos]
+    print(f"{len(textos)} líneas | {sum(e['input_ids'].shape[1] for e in entradas) / len(textos):.0f} tokens de "
+          f"media | modelo {ruta_modelo} | perfil {PERFIL}")
+
+    def generar(funcion) -> tuple:
+        salidas, t0 = [], time.perf_counter()
+        with torch.no_grad():
+            for e in entradas:
+                salidas.append(funcion(e, forced_bos_token_id=forced_bos,
+                                       **argumentos_generacion(PERFIL, e['input_ids'].shape[1])))
+        return salidas, time.perf_counter() - t0
+
+    generar(lambda e, **kw: model.generate(**e, **kw))  # Calentamiento
+    base, segundos_base = generar(lambda e, **kw: model.generate(**e, **kw))
+    tokens = sum(s.shape[1] - 1 for s in base)
+    print(f"{'sin asistente':24s} | {segundos_base:7.2f}s | {tokens / segundos_base:8.1f} tokens/s")
+    for nombre in args.asistente:
+        ruta = construir_modelo_mini() if nombre == 'mini' else nombre
+        asistente = Asistente.crear(ruta, tokenizer, model, perfil=PERFIL, log=lambda m: None)
+        if asistente is None:
+            print(f"{nombre:24s} | no compatible o no disponible")
+            continue
+        salidas, segundos = generar(lambda e, **kw: asistente._asistido(model, e, kw))
+        iguales = sum(torch.equal(a, b) for a, b in zip(salidas, base)) / len(base)
+        e = asistente.estadisticas
+        print(f"{nombre[-24:]:24s} | {segundos:7.2f}s | {tokens / segundos:8.1f} tokens/s | "
+              f"x{segundos_base / segundos:.2f} | aceptación {100 * asistente.aceptacion():5.1f}% | "
+              f"{e['tokens'] / max(1, e['pasos']):5.2f} tokens por paso | idénticas {100 * iguales:5.1f}%")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+"""
+Reconciliación del catálogo del modo demonio con muchos archivos.
+
+Crea una biblioteca de N subtítulos pequeños repartidos en subcarpetas y mide:
+la primera reconciliación (todo es nuevo), la reconciliación de un arranque
+sin cambios (el caso habitual) y la de un arranque con una parte de los
+archivos tocados (misma fecha nueva; solo esos se leen para calcular el hash)
+o modificados.
+
+Uso:
+    python benchmarks/bench_catalogo.py [--archivos 100000] [--carpetas 200] [--cambiados 1000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from daemon import TRADUCIDO, Demonio, hash_archivo  # noqa: E402
+
+
+def _reconciliar(demonio) -> tuple:
+    t0 = time.perf_counter()
+    encolados = demonio.reconciliar()
+    # Vaciar la cola: aquí solo se mide la reconciliación
+    while not demonio.cola.empty():
+        demonio.cola.get_nowait()
+    demonio._encolados.clear()
+    return time.perf_counter() - t0, encolados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--archivos', type=int, default=100000)
+    parser.add_argument('--carpetas', type=int, default=200)
+    parser.add_argument('--cambiados', type=int, default=1000, help='Archivos tocados y modificados en la última prueba.')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    tmp = tempfile.mkdtemp(prefix='subtitulador_catalogo_')
+    biblioteca = os.path.join(tmp, 'biblioteca')
+    rutas = []
+    t0 = time.perf_counter()
+    for c in range(args.carpetas):
+        os.makedirs(os.path.join(biblioteca, f"serie_{c:04d}"))
+    for i in range(args.archivos):
+        ruta = os.path.join(biblioteca, f"serie_{i % args.carpetas:04d}", f"episodio_{i:06d}.srt")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(f"1\n00:00:01,000 --> 00:00:02,000\nLine number {i}\n")
+        rutas.append(ruta)
+    print(f"Biblioteca: {args.archivos} archivos en {args.carpetas} carpetas ({time.perf_counter() - t0:.1f}s)")
+
+    try:
+        catalogo = os.path.join(tmp, 'catalogo.sqlite3')
+        demonio = Demonio([biblioteca], ['es'], catalogo=catalogo, log=lambda m: None)
+        segundos, encolados = _reconciliar(demonio)
+        print(f"Primera reconciliación:      {segundos:7.2f}s | {encolados} por traducir")
+
+        # Simular que todo se tradujo: el catálogo guarda el hash del contenido traducido
+        filas = []
+        for ruta in rutas:
+            st = os.stat(ruta)
+            filas.append((ruta, 'es', 'en', st.st_size, st.st_mtime_ns, hash_archivo(ruta), TRADUCIDO, None, None))
+        demonio.catalogo.guardar(filas)
+
+        demonio = Demonio([biblioteca], ['es'], catalogo=catalogo, log=lambda m: None)
+        segundos, encolados = _reconciliar(demonio)
+        print(f"Arranque sin cambios:        {segundos:7.2f}s | {encolados} por traducir")
+
+        cambiados = rnd.sample(rutas, min(args.cambiados, len(rutas)))
+        mitad = len(cambiados) // 2
+        ahora = time.time() + 10
+        for ruta in cambiados[:mitad]:
+            os.utime(ruta, (ahora, ahora))
+        for ruta in cambiados[mitad:]:
+            with open(ruta, 'a', encoding='utf-8') as f:
+                f.write('\n2\n00:00:03,000 --> 00:00:04,000\nNew line\n')
+        demonio = Demonio([biblioteca], ['es'], catalogo=catalogo, log=lambda m: None)
+        segundos, encolados = _reconciliar(demonio)
+        print(f"Arranque con {mitad} tocados y {len(cambiados) - mitad} modificados: {segundos:7.2f}s | "
+              f"{encolados} por traducir")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Modo distribuido con varios trabajadores locales sobre un directorio de cola.
+
+Crea una cola con archivos sintéticos (varios .srt pequeños, uno grande que se
+reparte en rangos y un .txt), lanza N procesos trabajadores con el modelo
+diminuto offline y comprueba que cada archivo tiene su salida completa. Con
+--matar, uno de los trabajadores se mata (SIGKILL) en plena tarea y se
+comprueba que otro reclama su concesión al caducar.
+
+Uso:
+    python benchmarks/bench_distribuido.py [--trabajadores 3] [--archivos 6] [--cues 200]
+                                           [--cues-grande 1500] [--matar]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from distribuido import Trabajador  # noqa: E402
+from sinteticos import generar_srt, generar_txt  # noqa: E402
+from subtitulos import abrir_subtitulos  # noqa: E402
+
+
+def _trabajador(directorio: str, ruta_modelo: str, nombre: str, args_trabajador: dict):
+    import subtitulador
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    import torch
+    torch.set_num_threads(1)
+    # Modelo diminuto precargado: cargar_modelo lo reutiliza en lugar de descargar el real
+    subtitulador._m2m_tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    subtitulador._m2m_model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo).eval()
+    Trabajador(directorio, 'es', src_lang='en', nombre=nombre, **args_trabajador).ejecutar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trabajadores', type=int, default=3)
+    parser.add_argument('--archivos', type=int, default=6, help='Archivos .srt pequeños.')
+    parser.add_argument('--cues', type=int, default=200, help='Subtítulos de cada .srt pequeño.')
+    parser.add_argument('--cues-grande', type=int, default=1500, help='Subtítulos del .srt grande.')
+    parser.add_argument('--cues-por-tarea', type=int, default=400)
+    parser.add_argument('--matar', action='store_true', help='Matar un trabajador en plena tarea.')
+    parser.add_argument('--caducidad', type=float, default=6.0)
+    parser.add_argument('--directorio', help='Directorio de la cola (por defecto, uno temporal que se borra).')
+    args = parser.parse_args()
+
+    from modelo_mini import construir_modelo_mini
+    ruta_modelo = construir_modelo_mini()
+    directorio = args.directorio or tempfile.mkdtemp(prefix='subtitulador_cola_')
+    entrada = os.path.join(directorio, 'entrada')
+    os.makedirs(entrada, exist_ok=True)
+    esperados = {}
+    for i in range(args.archivos):
+        nombre = f"episodio_{i:02d}.srt"
+        generar_srt(os.path.join(entrada, nombre), args.cues, semilla=i)
+        esperados[nombre] = args.cues
+    generar_srt(os.path.join(entrada, 'pelicula.srt'), args.cues_grande, semilla=99)
+    esperados['pelicula.srt'] = args.cues_grande
+    generar_txt(os.path.join(entrada, 'notas.txt'), 100, semilla=7)
+    esperados['notas.txt'] = None
+
+    args_trabajador = {'cues_por_tarea': args.cues_por_tarea, 'caducidad': args.caducidad,
+                       'latido': args.caducidad / 4, 'espera': 1.0, 'perfil': 'rapido'}
+    ctx = multiprocessing.get_context('spawn')
+    procesos = [ctx.Process(target=_trabajador, args=(directorio, ruta_modelo, f"local-{i}", args_trabajador))
+                for i in range(args.trabajadores)]
+    t0 = time.perf_counter()
+    for p in procesos:
+        p.start()
+    if args.matar:
+        # Esperar a que la víctima tenga una concesión y matarla sin que pueda liberarla
+        concesiones = os.path.join(directorio, 'concesiones')
+        victima = None
+        while victima is None and time.perf_counter() - t0 < 300:
+            for nombre in os.listdir(concesiones) if os.path.isdir(concesiones) else []:
+                if nombre.endswith('.lease'):
+                    with open(os.path.join(concesiones, nombre), encoding='utf-8') as f:
+                        contenido = f.read()
+                    if '"local-0"' in contenido:
+                        victima = nombre
+            time.sleep(0.05)
+        os.kill(procesos[0].pid, signal.SIGKILL)
+        print(f"Trabajador local-0 matado con la concesión {victima}")
+    for p in procesos:
+        p.join()
+    segundos = time.perf_counter() - t0
+
+    errores = 0
+    for nombre, cues in esperados.items():
+        base, ext = os.path.splitext(nombre)
+        salida = os.path.join(directorio, 'salida', f"{base}.es{ext}")
+        if not os.path.isfile(salida):
+            print(f"[ERROR] Falta la salida de {nombre}")
+            errores += 1
+        elif cues is not None and len(abrir_subtitulos(salida)) != cues:
+            print(f"[ERROR] {nombre}: {len(abrir_subtitulos(salida))} subtítulos en lugar de {cues}")
+            errores += 1
+    comprobador = Trabajador(directorio, 'es', caducidad=args.caducidad, log=lambda m: None)
+    print(comprobador.resumen_estado())
+    total = sum(c or 0 for c in esperados.values())
+    print(f"{args.trabajadores} trabajadores | {len(esperados)} archivos | {total} subtítulos en {segundos:.1f}s "
+          f"({total / segundos:.1f} subtítulos/s) | errores {errores}")
+    if not args.directorio:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,183 @@
+"""
+Identificación de idioma: detector integrado (idioma.py) frente a langdetect.
+
+Mide la precisión sobre frases cortas de subtítulos en los idiomas de IDIOMAS
+(frases completas y sus primeras palabras, como réplicas breves), la velocidad
+en subtítulos por segundo con --cues subtítulos y el tiempo de la primera
+llamada (carga de perfiles). Comprueba además que dos pasadas dan lo mismo.
+
+Uso:
+    python benchmarks/bench_idioma.py [--cues 5000] [--palabras 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import idioma  # noqa: E402
+
+FRASES = {
+    'en': ["Where have you been all night?", "I told you not to come back here.", "We need to find the keys before they arrive.",
+           "Don't worry, everything is going to be fine.", "Could you please close the door behind you?",
+           "I haven't seen him since last summer.", "What are you doing in my house?", "She said she would call me tomorrow morning."],
+    'es': ["¿Dónde has estado toda la noche?", "Te dije que no volvieras aquí.", "Tenemos que encontrar las llaves antes de que lleguen.",
+           "No te preocupes, todo va a salir bien.", "¿Puedes cerrar la puerta cuando salgas?",
+           "No lo he visto desde el verano pasado.", "¿Qué haces en mi casa?", "Dijo que me llamaría mañana por la mañana."],
+    'de': ["Wo warst du die ganze Nacht?", "Ich habe dir gesagt, du sollst nicht zurückkommen.",
+           "Wir müssen die Schlüssel finden, bevor sie ankommen.", "Keine Sorge, alles wird gut.",
+           "Kannst du bitte die Tür hinter dir schließen?", "Ich habe ihn seit letztem Sommer nicht gesehen.",
+           "Was machst du in meinem Haus?", "Sie sagte, sie würde mich morgen früh anrufen."],
+    'fr': ["Où étais-tu toute la nuit ?", "Je t'ai dit de ne pas revenir ici.", "Il faut trouver les clés avant qu'ils arrivent.",
+           "Ne t'inquiète pas, tout va bien se passer.", "Tu peux fermer la porte derrière toi, s'il te plaît ?",
+           "Je ne l'ai pas vu depuis l'été dernier.", "Qu'est-ce que tu fais chez moi ?", "Elle a dit qu'elle m'appellerait demain matin."],
+    'it': ["Dove sei stato tutta la notte?", "Ti avevo detto di non tornare qui.", "Dobbiamo trovare le chiavi prima che arrivino.",
+           "Non preoccuparti, andrà tutto bene.", "Puoi chiudere la porta dietro di te, per favore?",
+           "Non lo vedo dall'estate scorsa.", "Che cosa ci fai in casa mia?", "Ha detto che mi avrebbe chiamato domani mattina."],
+    'pt': ["Onde você esteve a noite toda?", "Eu disse para você não voltar aqui.", "Precisamos encontrar as chaves antes que eles cheguem.",
+           "Não se preocupe, vai ficar tudo bem.", "Você pode fechar a porta, por favor?",
+           "Não o vejo desde o verão passado.", "O que você está fazendo na minha casa?", "Ela disse que me ligaria amanhã de manhã."],
+    'nl': ["Waar ben je de hele nacht geweest?", "Ik zei toch dat je hier niet terug moest komen.",
+           "We moeten de sleutels vinden voordat ze aankomen.", "Maak je geen zorgen, alles komt goed.",
+           "Kun je de deur achter je dichtdoen?", "Ik heb hem sinds vorige zomer niet meer gezien.",
+           "Wat doe je in mijn huis?", "Ze zei dat ze me morgenochtend zou bellen."],
+    'pl': ["Gdzie byłeś całą noc?", "Mówiłem ci, żebyś tu nie wracał.", "Musimy znaleźć klucze, zanim przyjadą.",
+           "Nie martw się, wszystko będzie dobrze.", "Możesz zamknąć za sobą drzwi?",
+           "Nie widziałem go od zeszłego lata.", "Co robisz w moim domu?", "Powiedziała, że zadzwoni jutro rano."],
+    'sv': ["Var har du varit hela natten?", "Jag sa åt dig att inte komma tillbaka hit.", "Vi måste hitta nycklarna innan de kommer.",
+           "Oroa dig inte, allt kommer att ordna sig.", "Kan du stänga dörren efter dig?",
+           "Jag har inte sett honom sedan i somras.", "Vad gör du i mitt hus?", "Hon sa att hon skulle ringa mig i morgon bitti."],
+    'no': ["Hvor har du vært hele natten?", "Jeg sa at du ikke skulle komme tilbake hit.", "Vi må finne nøklene før de kommer.",
+           "Ikke vær redd, alt kommer til å gå bra.", "Kan du lukke døren etter deg?",
+           "Jeg har ikke sett ham siden i fjor sommer.", "Hva gjør du i huset mitt?", "Hun sa at hun skulle ringe meg i morgen tidlig."],
+    'da': ["Hvor har du været hele natten?", "Jeg sagde, at du ikke skulle komme tilbage her.", "Vi skal finde nøglerne, før de kommer.",
+           "Bare rolig, det skal nok gå.", "Kan du lukke døren efter dig?",
+           "Jeg har ikke set ham siden sidste sommer.", "Hvad laver du i mit hus?", "Hun sagde, at hun ville ringe til mig i morgen tidlig."],
+    'fi': ["Missä olit koko yön?", "Sanoin, ettet saa tulla takaisin tänne.", "Meidän täytyy löytää avaimet ennen kuin he tulevat.",
+           "Älä huoli, kaikki järjestyy.", "Voisitko sulkea oven perässäsi?",
+           "En ole nähnyt häntä viime kesän jälkeen.", "Mitä sinä teet minun talossani?", "Hän sanoi soittavansa minulle huomenna aamulla."],
+    'tr': ["Bütün gece neredeydin?", "Sana buraya geri dönmemeni söyledim.", "Onlar gelmeden anahtarları bulmalıyız.",
+           "Merak etme, her şey yoluna girecek.", "Kapıyı arkandan kapatır mısın?",
+           "Onu geçen yazdan beri görmedim.", "Benim evimde ne yapıyorsun?", "Yarın sabah beni arayacağını söyledi."],
+    'ro': ["Unde ai fost toată noaptea?", "Ți-am spus să nu te mai întorci aici.", "Trebuie să găsim cheile înainte să ajungă.",
+           "Nu-ți face griji, totul va fi bine.", "Poți să închizi ușa după tine?",
+           "Nu l-am mai văzut de vara trecută.", "Ce faci în casa mea?", "A spus că mă va suna mâine dimineață."],
+    'cs': ["Kde jsi byl celou noc?", "Říkal jsem ti, ať se sem nevracíš.", "Musíme najít klíče, než dorazí.",
+           "Neboj se, všechno bude v pořádku.", "Můžeš za sebou zavřít dveře?",
+           "Neviděl jsem ho od loňského léta.", "Co děláš v mém domě?", "Řekla, že mi zítra ráno zavolá."],
+    'hu': ["Hol voltál egész éjjel?", "Mondtam, hogy ne gyere vissza ide.", "Meg kell találnunk a kulcsokat, mielőtt megérkeznek.",
+           "Ne aggódj, minden rendben lesz.", "Becsuknád magad mögött az ajtót?",
+           "Tavaly nyár óta nem láttam.", "Mit csinálsz a házamban?", "Azt mondta, holnap reggel felhív."],
+    'id': ["Di mana kamu semalaman?", "Aku sudah bilang jangan kembali ke sini.", "Kita harus menemukan kuncinya sebelum mereka datang.",
+           "Jangan khawatir, semuanya akan baik-baik saja.", "Bisakah kamu menutup pintu di belakangmu?",
+           "Aku belum melihatnya sejak musim panas lalu.", "Apa yang kamu lakukan di rumahku?", "Dia bilang akan meneleponku besok pagi."],
+    'vi': ["Cả đêm qua anh đã ở đâu?", "Tôi đã bảo anh đừng quay lại đây.", "Chúng ta phải tìm chìa khóa trước khi họ đến.",
+           "Đừng lo, mọi chuyện sẽ ổn thôi.", "Anh có thể đóng cửa lại được không?",
+           "Tôi chưa gặp anh ấy từ mùa hè năm ngoái.", "Anh đang làm gì trong nhà tôi?", "Cô ấy nói sẽ gọi cho tôi vào sáng mai."],
+    'ru': ["Где ты был всю ночь?", "Я же сказал тебе не возвращаться сюда.", "Нам нужно найти ключи, пока они не приехали.",
+           "Не волнуйся, всё будет хорошо.", "Можешь закрыть за собой дверь?",
+           "Я не видел его с прошлого лета.", "Что ты делаешь в моём доме?", "Она сказала, что позвонит мне завтра утром."],
+    'uk': ["Де ти був усю ніч?", "Я ж казав тобі не повертатися сюди.", "Нам треба знайти ключі, поки вони не приїхали.",
+           "Не хвилюйся, все буде добре.", "Можеш зачинити за собою двері?",
+           "Я не бачив його з минулого літа.", "Що ти робиш у моєму домі?", "Вона сказала, що подзвонить мені завтра вранці."],
+    'bg': ["Къде беше цяла нощ?", "Казах ти да не се връщаш тук.", "Трябва да намерим ключовете, преди да са дошли.",
+           "Не се притеснявай, всичко ще бъде наред.", "Можеш ли да затвориш вратата след себе си?",
+           "Не съм го виждал от миналото лято.", "Какво правиш в къщата ми?", "Тя каза, че ще ми се обади утре сутринта."],
+    'el': ["Πού ήσουν όλη νύχτα;", "Σου είπα να μην ξαναγυρίσεις εδώ.", "Πρέπει να βρούμε τα κλειδιά πριν έρθουν.",
+           "Μην ανησυχείς, όλα θα πάνε καλά.", "Μπορείς να κλείσεις την πόρτα;"],
+    'he': ["איפה היית כל הלילה?", "אמרתי לך לא לחזור לכאן.", "אנחנו צריכים למצוא את המפתחות לפני שהם מגיעים.",
+           "אל תדאג, הכול יהיה בסדר.", "אתה יכול לסגור את הדלת?"],
+    'ar': ["أين كنت طوال الليل؟", "قلت لك ألا تعود إلى هنا.", "علينا أن نجد المفاتيح قبل أن يصلوا.",
+           "لا تقلق، كل شيء سيكون على ما يرام.", "هل يمكنك إغلاق الباب؟"],
+    'hi': ["तुम पूरी रात कहाँ थे?", "मैंने तुमसे कहा था कि यहाँ वापस मत आना।", "उनके आने से पहले हमें चाबियाँ ढूँढनी होंगी।",
+           "चिंता मत करो, सब ठीक हो जाएगा।", "क्या तुम दरवाज़ा बंद कर सकते हो?"],
+    'bn': ["তুমি সারা রাত কোথায় ছিলে?", "আমি তোমাকে এখানে ফিরে আসতে নিষেধ করেছিলাম।", "ওরা আসার আগে আমাদের চাবিগুলো খুঁজে পেতে হবে।",
+           "চিন্তা করো না, সব ঠিক হয়ে যাবে।", "তুমি কি দরজাটা বন্ধ করতে পারবে?"],
+    'th': ["เมื่อคืนคุณไปอยู่ที่ไหนมา", "ฉันบอกแล้วว่าอย่ากลับมาที่นี่", "เราต้องหากุญแจให้เจอก่อนที่พวกเขาจะมา",
+           "ไม่ต้องห่วง ทุกอย่างจะเรียบร้อย", "ช่วยปิดประตูได้ไหม"],
+    'zh': ["你整晚都去哪儿了？", "我告诉过你不要回来这里。", "我们必须在他们到达之前找到钥匙。", "别担心，一切都会好起来的。", "你能把门关上吗？"],
+    'ja': ["一晩中どこにいたの？", "ここには戻ってくるなと言ったはずだ。", "彼らが来る前に鍵を見つけないと。", "心配しないで、きっと大丈夫だよ。",
+           "ドアを閉めてくれる？"],
+    'ko': ["밤새 어디 있었어?", "여기 다시 오지 말라고 했잖아.", "그들이 오기 전에 열쇠를 찾아야 해.", "걱정 마, 다 잘될 거야.", "문 좀 닫아 줄래?"],
+}
+
+
+def _corto(frase: str, palabras: int) -> str:
+    partes = frase.split()
+    # Escrituras sin espacios: los primeros caracteres
+    return ' '.join(partes[:palabras]) if len(partes) > 1 else frase[:4 * palabras]
+
+
+def _langdetect():
+    """Función de detección de langdetect con semilla fija, o None si no está instalado."""
+    try:
+        from langdetect import DetectorFactory, detect
+    except ImportError:
+        return None
+    DetectorFactory.seed = 0
+
+    def detectar(texto: str):
+        try:
+            return idioma.normalizar_codigo(detect(texto))
+        except Exception:
+            return None
+    return detectar
+
+
+def _precision(detectar_lote, muestras: list) -> tuple:
+    esperados = [i for i, _ in muestras]
+    obtenidos = detectar_lote([t for _, t in muestras])
+    aciertos = sum(e == o for e, o in zip(esperados, obtenidos))
+    errores = Counter(f"{e}->{o}" for e, o in zip(esperados, obtenidos) if e != o)
+    return aciertos / len(muestras), errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cues', type=int, default=5000)
+    parser.add_argument('--palabras', type=int, default=3, help='Palabras de las réplicas breves.')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    idioma.detectar_subtitulo('hola')
+    inicio_integrado = time.perf_counter() - t0
+    integrado = lambda textos: [d[0] if d else None for d in idioma.detectar_idiomas(textos)]  # noqa: E731
+    externo = _langdetect()
+    inicio_externo = None
+    if externo is not None:
+        t0 = time.perf_counter()
+        externo('hola')
+        inicio_externo = time.perf_counter() - t0
+
+    completas = [(i, f) for i, frases in FRASES.items() for f in frases]
+    cortas = [(i, _corto(f, args.palabras)) for i, f in completas]
+    sujetos = [('integrado', integrado, inicio_integrado)]
+    if externo is not None:
+        sujetos.append(('langdetect', lambda textos: [externo(t) for t in textos], inicio_externo))
+    else:
+        print("langdetect no está instalado: solo se mide el detector integrado")
+
+    pool = [f for _, f in completas] + [f for _, f in cortas]
+    textos = [pool[k % len(pool)] for k in range(args.cues)]
+    for nombre, detectar, inicio in sujetos:
+        p_completas, errores = _precision(detectar, completas)
+        p_cortas, errores_cortas = _precision(detectar, cortas)
+        t0 = time.perf_counter()
+        primera = detectar(textos)
+        segundos = time.perf_counter() - t0
+        estable = primera == detectar(textos)
+        print(f"{nombre:10s} | frases {p_completas:6.1%} | {args.palabras} palabras {p_cortas:6.1%} | "
+              f"{args.cues / segundos:8.0f} subtítulos/s | primera llamada {inicio * 1000:6.0f} ms | "
+              f"repetible: {'sí' if estable else 'NO'}")
+        fallos = (errores + errores_cortas).most_common(6)
+        if fallos:
+            print(f"{'':10s} | errores más comunes: {', '.join(f'{k} ({n})' for k, n in fallos)}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,75 @@
+"""
+Ahorro por paso del decodificador con la lista corta de vocabulario.
+
+1. Construye la lista corta del idioma destino con las salidas del modelo
+   sobre el archivo de entrada, traduce con y sin ella y comprueba que las
+   traducciones son idénticas (exacto con el perfil 'rapido', voraz).
+2. Mide solo la proyección de salida con las dimensiones de M2M100 418M
+   (d_model 1024, 128112 tokens) frente a listas de distintos tamaños.
+
+Uso:
+    python benchmarks/bench_lista_corta.py [--entrada test_input.srt] [--modelo facebook/m2m100_418M]
+                                           [--src en] [--tgt es] [--perfil rapido]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import torch  # noqa: E402
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer  # noqa: E402
+
+from decodificacion import PERFILES_DECODIFICACION  # noqa: E402
+from subtitulos import abrir_subtitulos  # noqa: E402
+from vocabulario import ModeloListaCorta, construir_lista_corta, medir_ahorro  # noqa: E402
+
+
+def medir_proyeccion(d_model: int, vocab: int, tamanos: list, filas: int = 5, repeticiones: int = 50):
+    """ms por paso de la proyección de salida (filas = beams) para el vocabulario completo y cada tamaño."""
+    torch.manual_seed(0)
+    oculto = torch.randn(filas, d_model)
+    for n in [vocab] + tamanos:
+        peso = torch.randn(n, d_model)
+        torch.nn.functional.linear(oculto, peso)
+        t0 = time.perf_counter()
+        for _ in range(repeticiones):
+            torch.nn.functional.linear(oculto, peso)
+        ms = 1000 * (time.perf_counter() - t0) / repeticiones
+        print(f"  {n:7d} tokens: {ms:7.3f} ms/paso")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrada', default=os.path.join(RAIZ, 'test_input.srt'))
+    parser.add_argument('--modelo', default='facebook/m2m100_418M')
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    parser.add_argument('--perfil', choices=list(PERFILES_DECODIFICACION), default='rapido')
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    tokenizer = M2M100Tokenizer.from_pretrained(args.modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(args.modelo).to(device).eval()
+    textos = [t for t in abrir_subtitulos(args.entrada).textos if t and t.strip()]
+    print(f"{len(textos)} subtítulos | modelo {args.modelo} | perfil {args.perfil} | {device.type.upper()}")
+
+    ids = construir_lista_corta(tokenizer, args.tgt, model=model, textos_fuente=textos,
+                                src_lang=args.src, device=device, perfil=args.perfil)
+    corto = ModeloListaCorta(model, ids, args.tgt, tokenizer)
+    r = medir_ahorro(model, corto, tokenizer, textos, args.src, args.tgt, perfil=args.perfil, device=device)
+    print(f"Lista corta: {r['tamano_lista']} de {r['tamano_vocabulario']} tokens")
+    print(f"Paso del decodificador: {r['ms_por_paso_completo']:.3f} ms -> {r['ms_por_paso_lista_corta']:.3f} ms "
+          f"(ahorro {r['ahorro_ms_por_paso']:.3f} ms/paso)")
+    print(f"Traducciones idénticas: {r['identicas']}/{r['total']}")
+
+    print("Proyección de salida con dimensiones de M2M100 418M:")
+    medir_proyeccion(1024, 128112, [32000, 16000, 8000])
+    return 0 if args.perfil != 'rapido' or r['identicas'] == r['total'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
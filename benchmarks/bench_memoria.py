@@ -0,0 +1,79 @@
+"""
+Búsqueda en la memoria de traducción con muchos segmentos.
+
+Llena una memoria con segmentos sintéticos (1.000.000 por defecto, vocabulario
+amplio para que se parezca a texto real) y mide el tiempo de construcción y
+la latencia de búsqueda (media, p50, p99) para consultas casi idénticas
+(cambia una palabra o la puntuación) y para consultas sin coincidencia.
+
+Uso:
+    python benchmarks/bench_memoria.py [--segmentos 1000000] [--consultas 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lotes import rss_actual_mb  # noqa: E402
+from memoria_traduccion import MemoriaTraduccion  # noqa: E402
+
+SILABAS = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'to', 'vi', 'de', 'pa', 'ri', 'go', 'ba', 'che', 'tu',
+           'fe', 'na', 'si', 'mo', 'le', 'ga', 'po', 'da', 'ti', 'ro', 'ze', 'bu', 'ja', 'ke', 'wo')
+
+
+def vocabulario(n: int, rnd: random.Random) -> list:
+    return list({''.join(rnd.choice(SILABAS) for _ in range(rnd.randint(1, 4))) for _ in range(n)})
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def medir(memoria, consultas: list) -> tuple:
+    tiempos, aciertos = [], 0
+    for q in consultas:
+        t0 = time.perf_counter()
+        aciertos += memoria.buscar(q) is not None
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return sum(tiempos) / len(tiempos), percentil(tiempos, 50), percentil(tiempos, 99), aciertos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--segmentos', type=int, default=1000000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    parser.add_argument('--semilla', type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    palabras = vocabulario(20000, rnd)
+    segmentos = [' '.join(rnd.choice(palabras) for _ in range(rnd.randint(4, 12))) for _ in range(args.segmentos)]
+    memoria = MemoriaTraduccion('xx', 'yy')
+    rss0 = rss_actual_mb()
+    t0 = time.perf_counter()
+    bloque = 100000
+    for i in range(0, len(segmentos), bloque):
+        memoria.agregar_muchos(segmentos[i:i + bloque], [s.upper() for s in segmentos[i:i + bloque]])
+    print(f"Construcción: {len(memoria)} segmentos en {time.perf_counter() - t0:.1f}s | "
+          f"+{rss_actual_mb() - rss0:.0f} MB")
+
+    casi = []
+    for _ in range(args.consultas):
+        p = rnd.choice(segmentos).split()
+        p[rnd.randrange(len(p))] = rnd.choice(palabras).capitalize()
+        casi.append(' '.join(p) + '?')
+    nuevas = [' '.join(rnd.choice(palabras) for _ in range(rnd.randint(4, 12))) for _ in range(args.consultas)]
+    exactas = [rnd.choice(segmentos).capitalize() + '.' for _ in range(args.consultas)]
+    for nombre, consultas in (('exactas', exactas), ('casi idénticas', casi), ('sin coincidencia', nuevas)):
+        media, p50, p99, aciertos = medir(memoria, consultas)
+        print(f"{nombre:17s} media {media:.3f} ms | p50 {p50:.3f} ms | p99 {p99:.3f} ms | "
+              f"aciertos {aciertos}/{len(consultas)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Rendimiento de cada perfil de decodificación sobre un archivo de subtítulos.
+
+Traduce el archivo (por defecto test_input.srt) con cada perfil y muestra
+subtítulos/s, tokens generados/s y el tiempo total.
+
+Uso:
+    python benchmarks/bench_perfiles.py [--entrada test_input.srt] [--modelo facebook/m2m100_418M]
+                                        [--src en] [--tgt es] [--repeticiones 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import torch  # noqa: E402
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer  # noqa: E402
+
+from decodificacion import PERFILES_DECODIFICACION  # noqa: E402
+from lotes import PlanificadorLotes, traducir_lote  # noqa: E402
+from subtitulos import abrir_subtitulos  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrada', default=os.path.join(RAIZ, 'test_input.srt'))
+    parser.add_argument('--modelo', default='facebook/m2m100_418M')
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    tokenizer = M2M100Tokenizer.from_pretrained(args.modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(args.modelo).to(device).eval()
+    textos = abrir_subtitulos(args.entrada).textos
+    print(f"{len(textos)} subtítulos | modelo {args.modelo} | {device.type.upper()}")
+
+    # Calentamiento para no medir la primera inicialización
+    traducir_lote(textos[:1], tokenizer, model, args.src, args.tgt, device, PlanificadorLotes(device=device, log=None))
+
+    for perfil in PERFILES_DECODIFICACION:
+        mejor = None
+        for _ in range(max(1, args.repeticiones)):
+            t0 = time.perf_counter()
+            salida = traducir_lote(textos, tokenizer, model, args.src, args.tgt, device,
+                                   PlanificadorLotes(device=device, log=None), perfil=perfil)
+            dt = time.perf_counter() - t0
+            mejor = dt if mejor is None else min(mejor, dt)
+        tokens = sum(len(x) for x in tokenizer(salida)['input_ids'])
+        print(f"{perfil:12s} {mejor:7.3f}s | {len(textos) / mejor:7.2f} subtítulos/s | "
+              f"{tokens / mejor:8.1f} tokens/s")
+
+
+if __name__ == '__main__':
+    main()
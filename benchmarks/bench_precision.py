@@ -0,0 +1,128 @@
+"""
+Precisión fp32 frente a bf16: velocidad, memoria y coincidencia de la salida.
+
+Carga el modelo en cada precisión en un proceso aparte (la memoria de una
+carga no se mezcla con la de la otra) y traduce el archivo (por defecto
+test_input.srt) por lotes. Muestra subtítulos/s, memoria de los pesos y
+aumento de RSS tras traducir (incluye las páginas de los pesos proyectados
+desde el archivo), y para bf16 la coincidencia exacta y el chrF de sus
+traducciones frente a las de fp32. Indica también si la CPU tiene bf16
+nativo: sin él, bf16 se emula y es más lento.
+
+Funciona sin red: --modelo mini (diminuto), --modelo mediano (aleatorio con
+las dimensiones de M2M100 418M salvo el vocabulario, para tiempos realistas)
+o el modelo real si está descargado (auto, por defecto).
+
+Uso:
+    python benchmarks/bench_precision.py [--entrada test_input.srt] [--modelo auto|mini|mediano|ruta]
+                                         [--perfil calidad] [--repeticiones 5]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import torch  # noqa: E402
+
+from decodificacion import PERFIL_POR_DEFECTO  # noqa: E402
+from precision import admite_bf16, cpu_bf16_nativo, tipo_torch  # noqa: E402
+
+MODELO_REAL = 'facebook/m2m100_418M'
+
+
+def _ruta_modelo(modelo: str) -> str:
+    from modelo_mini import construir_modelo_mini
+    if modelo == 'auto':
+        try:
+            from transformers import M2M100Config
+            M2M100Config.from_pretrained(MODELO_REAL, local_files_only=True)
+            return MODELO_REAL
+        except Exception:
+            modelo = 'mini'
+    if modelo == 'mini':
+        return construir_modelo_mini()
+    if modelo == 'mediano':
+        return construir_modelo_mini(os.path.join(tempfile.gettempdir(), 'subtitulador_modelo_mediano'),
+                                     d_model=1024, capas=12, cabezas=16)
+    return modelo
+
+
+def _medir(ruta_modelo: str, precision: str, textos: list, src: str, tgt: str, perfil: str, repeticiones: int,
+           cola):
+    """En un proceso aparte: carga en esa precisión, traduce y devuelve medidas y salidas."""
+    import psutil
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from lotes import PlanificadorLotes, traducir_lote
+
+    proceso = psutil.Process()
+    rss0 = proceso.memory_info().rss
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    t0 = time.perf_counter()
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo, torch_dtype=tipo_torch(precision)).eval()
+    carga_s = time.perf_counter() - t0
+    pesos_mb = sum(p.numel() * p.element_size() for p in model.parameters()) / 1e6
+    device = torch.device('cpu')
+
+    def traducir():
+        return traducir_lote(textos, tokenizer, model, src, tgt, device, PlanificadorLotes(device=device, log=None),
+                             perfil=perfil)
+
+    traducir()  # Calentamiento
+    mejor = None
+    for _ in range(max(1, repeticiones)):
+        t0 = time.perf_counter()
+        salidas = traducir()
+        dt = time.perf_counter() - t0
+        mejor = dt if mejor is None else min(mejor, dt)
+    cola.put({'precision': precision, 'carga_s': carga_s, 'pesos_mb': pesos_mb,
+              'rss_mb': (proceso.memory_info().rss - rss0) / 1e6,
+              'subtitulos_s': len(textos) / mejor, 'salidas': salidas})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrada', default=os.path.join(RAIZ, 'test_input.srt'))
+    parser.add_argument('--modelo', default='auto', help="'auto', 'mini', 'mediano' o nombre/ruta de un M2M100.")
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    parser.add_argument('--perfil', default=PERFIL_POR_DEFECTO)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    from equivalencia import _leer_textos, chrf
+    textos = [t for t in _leer_textos(args.entrada) if t and t.strip()]
+    ruta_modelo = _ruta_modelo(args.modelo)
+    print(f"{len(textos)} subtítulos | modelo {ruta_modelo} | perfil {args.perfil} | "
+          f"bf16 nativo en la CPU: {'sí' if cpu_bf16_nativo() else 'no'} "
+          f"(se usaría con 'auto': {'sí' if admite_bf16('cpu') else 'no'})")
+
+    ctx = multiprocessing.get_context('spawn')
+    resultados = {}
+    for precision in ('fp32', 'bf16'):
+        cola = ctx.Queue()
+        proceso = ctx.Process(target=_medir, args=(ruta_modelo, precision, textos, args.src, args.tgt, args.perfil,
+                                                   args.repeticiones, cola))
+        proceso.start()
+        resultados[precision] = cola.get()
+        proceso.join()
+
+    base = resultados['fp32']
+    for precision, r in resultados.items():
+        linea = (f"{precision:5s} | {r['subtitulos_s']:8.2f} subtítulos/s (x{r['subtitulos_s'] / base['subtitulos_s']:.2f}) | "
+                 f"carga {r['carga_s']:5.1f}s | pesos {r['pesos_mb']:6.0f} MB | RSS +{r['rss_mb']:6.0f} MB")
+        if precision != 'fp32':
+            exactas = sum(a == b for a, b in zip(r['salidas'], base['salidas'])) / max(1, len(textos))
+            linea += f" | exactas {100 * exactas:5.1f}% | chrF {chrf(r['salidas'], base['salidas']):6.2f}"
+        print(linea)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+"""
+Traducción por posición de reproducción con un reproductor simulado.
+
+Genera un .srt sintético largo, empieza a traducir desde --desde con el modelo
+diminuto offline y, desde otro hilo, hace de reproductor: se conecta al socket
+de posición y, tras la primera escritura, salta a --salto. Mientras tanto lee
+la salida cada --sondeo segundos y comprueba que siempre es un archivo válido
+con todos los subtítulos, y mide cuándo quedan traducidos los minutos
+siguientes a cada posición. Al final, todo debe estar traducido.
+
+Uso:
+    python benchmarks/bench_reproduccion.py [--cues 1500] [--desde 20:00] [--salto 45:00] [--minutos 5]
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from reproduccion import Reproduccion, ServidorPosicion  # noqa: E402
+from sinteticos import generar_srt  # noqa: E402
+from subtitulos import abrir_subtitulos, marca_a_ms  # noqa: E402
+
+
+def _ventana_lista(original, ruta: str, desde_ms: int, minutos: float):
+    """True si todos los subtítulos de [desde_ms, desde_ms + minutos) están traducidos en ruta; None si no es válida."""
+    try:
+        salida = abrir_subtitulos(ruta)
+    except (OSError, ValueError):
+        return None
+    if len(salida) != len(original):
+        return None
+    hasta = desde_ms + minutos * 60000
+    return all(salida.textos[i] != original.textos[i]
+               for i in range(len(original)) if desde_ms <= original.inicios[i] < hasta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cues', type=int, default=1500)
+    parser.add_argument('--desde', default='20:00', help='Posición inicial.')
+    parser.add_argument('--salto', default='45:00', help='Posición a la que salta el reproductor.')
+    parser.add_argument('--minutos', type=float, default=5.0, help='Minutos por delante que se miden.')
+    parser.add_argument('--perfil', default='rapido')
+    parser.add_argument('--sondeo', type=float, default=0.2)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from lotes import PlanificadorLotes, traducir_lote
+    from modelo_mini import construir_modelo_mini
+    torch.set_num_threads(1)
+    ruta_modelo = construir_modelo_mini()
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo).eval()
+    device = torch.device('cpu')
+
+    tmp = tempfile.mkdtemp(prefix='subtitulador_reproduccion_')
+    try:
+        entrada = os.path.join(tmp, 'pelicula.srt')
+        salida = os.path.join(tmp, 'pelicula.es.srt')
+        generar_srt(entrada, args.cues, semilla=5)
+        original = abrir_subtitulos(entrada)
+        desde, salto = marca_a_ms(args.desde), marca_a_ms(args.salto)
+        print(f"{len(original)} subtítulos, {original.fines[-1] / 60000:.0f} minutos | desde {args.desde}, "
+              f"salto a {args.salto}")
+
+        planificador = PlanificadorLotes(device=device)
+        reproduccion = Reproduccion(
+            abrir_subtitulos(entrada), salida,
+            lambda textos: traducir_lote(textos, tokenizer, model, 'en', 'es', device, planificador=planificador,
+                                         perfil=args.perfil),
+            posicion_ms=desde, log=lambda m: None)
+        servidor = ServidorPosicion(reproduccion, 0).iniciar()
+        puerto = servidor.server_address[1]
+        t0 = time.perf_counter()
+        medidas = {}
+        invalidas = [0]
+        terminado = threading.Event()
+
+        def reproductor():
+            nonlocal t_posicion
+            with socket.create_connection(('127.0.0.1', puerto)) as s:
+                f = s.makefile('rw', encoding='utf-8')
+                posicion, etiqueta = desde, f"{args.desde} (inicio)"
+                while not terminado.is_set():
+                    if os.path.exists(salida):
+                        lista = _ventana_lista(original, salida, posicion, args.minutos)
+                        if lista is None:
+                            invalidas[0] += 1
+                        elif lista and etiqueta not in medidas:
+                            medidas[etiqueta] = time.perf_counter() - t_posicion
+                            if posicion == desde:
+                                # Primer tramo visible: saltar como haría el usuario
+                                f.write(f"{args.salto}\n")
+                                f.flush()
+                                f.readline()
+                                posicion, etiqueta = salto, f"{args.salto} (salto)"
+                                t_posicion = time.perf_counter()
+                    time.sleep(args.sondeo)
+
+        t_posicion = t0
+        hilo = threading.Thread(target=reproductor, daemon=True)
+        hilo.start()
+        reproduccion.ejecutar()
+        terminado.set()
+        hilo.join()
+        servidor.parar()
+        total = time.perf_counter() - t0
+
+        final = abrir_subtitulos(salida)
+        sin_traducir = sum(1 for a, b in zip(original.textos, final.textos) if a == b and a.strip())
+        print(f"Primera escritura: {reproduccion.primera_escritura:.2f}s | reescrituras: {reproduccion.escrituras} | "
+              f"lecturas no válidas: {invalidas[0]}")
+        for etiqueta, segundos in medidas.items():
+            print(f"{args.minutos:g} minutos desde {etiqueta} listos en {segundos:.2f}s")
+        print(f"Todo traducido en {total:.1f}s | subtítulos sin traducir al final: {sin_traducir}")
+        return 1 if sin_traducir or invalidas[0] or len(medidas) < 2 else 0
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
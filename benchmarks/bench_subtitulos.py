@@ -0,0 +1,76 @@
+"""
+Benchmark del lector/escritor nativo de subtítulos frente a pysrt.
+
+Genera un SRT sintético (50.000 subtítulos por defecto) y mide el tiempo de
+lectura, escritura y la memoria de ambas implementaciones.
+
+Uso:
+    python benchmarks/bench_subtitulos.py [--cues 50000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sinteticos import generar_srt  # noqa: E402
+from subtitulos import abrir_subtitulos  # noqa: E402
+
+def medir(nombre: str, leer, escribir, ruta_in: str, ruta_out: str) -> dict:
+    # La memoria se mide en una pasada aparte: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    leer(ruta_in)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    subs = leer(ruta_in)
+    t1 = time.perf_counter()
+    for sub in subs:
+        sub.text = sub.text.upper()
+    t2 = time.perf_counter()
+    escribir(subs, ruta_out)
+    t3 = time.perf_counter()
+    res = {'impl': nombre, 'lectura_s': t1 - t0, 'modificar_s': t2 - t1,
+           'escritura_s': t3 - t2, 'pico_mem_mb': pico / 1e6}
+    print(f"{nombre:8s} lectura {res['lectura_s']:.3f}s | modificar {res['modificar_s']:.3f}s | "
+          f"escritura {res['escritura_s']:.3f}s | memoria pico {res['pico_mem_mb']:.1f} MB")
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cues', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_in = os.path.join(tmp, 'sintetico.srt')
+        generar_srt(ruta_in, args.cues)
+        print(f"Archivo sintético: {args.cues} subtítulos, {os.path.getsize(ruta_in) / 1e6:.1f} MB")
+
+        nativo = medir('nativo', abrir_subtitulos, lambda s, r: s.guardar(r),
+                       ruta_in, os.path.join(tmp, 'nativo.srt'))
+        # Ida y vuelta sin cambios: debe ser idéntica byte a byte
+        intacto = os.path.join(tmp, 'intacto.srt')
+        abrir_subtitulos(ruta_in).guardar(intacto)
+        with open(ruta_in, 'rb') as a, open(intacto, 'rb') as b:
+            print(f"Ida y vuelta byte a byte: {'OK' if a.read() == b.read() else 'DIFERENTE'}")
+
+        try:
+            import pysrt
+        except ImportError:
+            print("pysrt no está instalado; se omite la comparación.")
+            return
+        ref = medir('pysrt', lambda r: pysrt.open(r, encoding='utf-8'),
+                    lambda s, r: s.save(r, encoding='utf-8'),
+                    ruta_in, os.path.join(tmp, 'pysrt.srt'))
+        total_n = nativo['lectura_s'] + nativo['escritura_s']
+        total_p = ref['lectura_s'] + ref['escritura_s']
+        print(f"Aceleración lectura+escritura: x{total_p / max(total_n, 1e-9):.1f}")
+
+
+if __name__ == '__main__':
+    main()
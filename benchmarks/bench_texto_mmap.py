@@ -0,0 +1,104 @@
+"""
+Lectura de .txt grandes: leer y partir en líneas frente a proyectar e indexar.
+
+Genera un .txt sintético de --mb megabytes con fines de línea mezclados y
+mide, para cada forma de leerlo, el tiempo y el aumento de memoria privada
+(sin las páginas del archivo proyectado): la de antes (read() +
+splitlines(keepends=True)) y TextoMapeado (mmap + índice de desplazamientos). Comprueba también que reescribir todas las líneas con
+TextoMapeado.escribir reproduce el archivo byte a byte.
+
+Uso:
+    python benchmarks/bench_texto_mmap.py [--mb 200]
+"""
+
+import argparse
+import gc
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sinteticos import PALABRAS  # noqa: E402
+from texto_mmap import TextoMapeado  # noqa: E402
+
+
+def _generar(ruta: str, mb: float, semilla: int = 0):
+    rnd = random.Random(semilla)
+    # Unos miles de líneas distintas repetidas: generar rápido cientos de MB
+    muestras = [(' '.join(rnd.choice(PALABRAS) for _ in range(rnd.randint(0, 20))) +
+                 rnd.choice(['\n', '\n', '\r\n'])).encode('utf-8') for _ in range(5000)]
+    bloque = b''.join(muestras)
+    with open(ruta, 'wb') as f:
+        for _ in range(max(1, int(mb * 1e6 / len(bloque)))):
+            f.write(bloque)
+        f.write(b'sin fin de linea')
+
+
+def _memoria_privada_mb() -> float:
+    """Memoria residente sin las páginas compartidas (las de un archivo proyectado se pueden liberar)."""
+    import psutil
+    info = psutil.Process().memory_info()
+    return (info.rss - getattr(info, 'shared', 0)) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mb', type=float, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='subtitulador_txt_')
+    try:
+        ruta = os.path.join(tmp, 'transcripcion.txt')
+        _generar(ruta, args.mb)
+        print(f"Archivo: {os.path.getsize(ruta) / 1e6:.0f} MB")
+
+        gc.collect()
+        rss0, t0 = _memoria_privada_mb(), time.perf_counter()
+        with open(ruta, 'r', encoding='utf-8', errors='ignore') as f:
+            lineas = f.read().splitlines(keepends=True)
+        print(f"read + splitlines: {time.perf_counter() - t0:6.2f}s | +{_memoria_privada_mb() - rss0:6.0f} MB | "
+              f"{len(lineas)} líneas")
+        del lineas
+        gc.collect()
+
+        rss0, t0 = _memoria_privada_mb(), time.perf_counter()
+        texto = TextoMapeado(ruta)
+        segundos = time.perf_counter() - t0
+        print(f"mmap + índice:     {segundos:6.2f}s | +{_memoria_privada_mb() - rss0:6.0f} MB | {len(texto)} líneas "
+              f"(índice {(texto.inicios.nbytes + texto.tipos.nbytes) / 1e6:.0f} MB)")
+
+        t0 = time.perf_counter()
+        medio = len(texto) // 2
+        primeras = list(texto.lineas(medio, medio + 1000))
+        print(f"1000 líneas desde la línea {medio}: {(time.perf_counter() - t0) * 1000:.1f} ms")
+        del primeras
+
+        t0 = time.perf_counter()
+        copia = os.path.join(tmp, 'copia.txt')
+        with texto, open(copia, 'wb') as f:
+            for ini, fin in texto.rangos(8):
+                texto.escribir(f, texto.lineas(ini, fin), ini)
+        iguales = _hash(ruta) == _hash(copia)
+        print(f"Reescritura por 8 rangos: {time.perf_counter() - t0:.2f}s | idéntica: {'sí' if iguales else 'NO'}")
+        return 0 if iguales else 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _hash(ruta: str) -> str:
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+"""
+Traducción en vivo con una fuente de subtítulos simulada.
+
+Hace de sistema de subtitulado: envía subtítulos sintéticos de uno en uno a un
+socket del modo vivo, a un ritmo medio de --ritmo subtítulos por segundo
+(llegadas de Poisson, con ráfagas ocasionales), y mide en el lado del cliente
+la latencia de cada uno, del envío a la recepción de su traducción.
+
+Sin --destino arranca en el mismo proceso un TraductorVivo con el modelo
+diminuto offline; con --destino alimenta un 'subtitulador.py vivo --escuchar'
+ya en marcha (tcp:PUERTO o unix:RUTA).
+
+Uso:
+    python benchmarks/bench_vivo.py [--cues 400] [--ritmo 4] [--plazo-ms 300] [--formato json|srt]
+    python benchmarks/bench_vivo.py --destino tcp:8766
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sinteticos import PALABRAS, longitudes  # noqa: E402
+from subtitulos import ms_a_marca  # noqa: E402
+from vivo import LOTE_MAX, PLAZO_MS, TraductorVivo, crear_servidor  # noqa: E402
+
+
+def _conectar(direccion: str) -> socket.socket:
+    tipo, _, resto = direccion.partition(':')
+    if tipo == 'unix':
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.connect(resto)
+        return s
+    host, _, puerto = resto.rpartition(':')
+    s = socket.create_connection((host or '127.0.0.1', int(puerto)))
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return s
+
+
+def _evento(i: int, t_ms: int, texto: str, formato: str) -> str:
+    if formato == 'json':
+        return json.dumps({'id': i, 'inicio': t_ms, 'fin': t_ms + 2000, 'texto': texto}) + '\n'
+    return f"{i}\n{ms_a_marca(t_ms)} --> {ms_a_marca(t_ms + 2000)}\n{texto}\n\n"
+
+
+def _leer_respuestas(archivo, formato: str, recibidos: dict, total: int):
+    """Anota la hora de llegada de cada traducción (por id)."""
+    bloque = []
+    for linea in archivo:
+        if formato == 'json':
+            recibidos[json.loads(linea)['id']] = time.perf_counter()
+        elif linea.strip():
+            bloque.append(linea)
+        elif bloque:
+            recibidos[int(bloque[0])] = time.perf_counter()
+            bloque = []
+        if len(recibidos) >= total:
+            return
+
+
+def _servidor_local(args) -> tuple:
+    """TraductorVivo con el modelo diminuto escuchando en un puerto TCP libre."""
+    import torch
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from lotes import PlanificadorLotes, traducir_lote
+    from modelo_mini import construir_modelo_mini
+    torch.set_num_threads(1)
+    ruta_modelo = construir_modelo_mini()
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo).eval()
+    device = torch.device('cpu')
+    planificador = PlanificadorLotes(device=device, log=None)
+    traductor = TraductorVivo(lambda textos: traducir_lote(textos, tokenizer, model, 'en', 'es', device,
+                                                           planificador=planificador, perfil='rapido'),
+                              plazo_ms=args.plazo_ms, lote_max=args.lote_max, log=print)
+    traductor.calentar()
+    traductor.iniciar()
+    servidor = crear_servidor(traductor, 'tcp:0')
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return traductor, servidor, f"tcp:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cues', type=int, default=400)
+    parser.add_argument('--ritmo', type=float, default=4.0, help='Subtítulos por segundo de media.')
+    parser.add_argument('--rafagas', type=float, default=0.05, help='Probabilidad de una ráfaga de 3-6 subtítulos seguidos.')
+    parser.add_argument('--formato', choices=['json', 'srt'], default='json')
+    parser.add_argument('--plazo-ms', type=float, default=PLAZO_MS)
+    parser.add_argument('--lote-max', type=int, default=LOTE_MAX)
+    parser.add_argument('--destino', help='Servidor vivo ya en marcha (tcp:PUERTO o unix:RUTA).')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    traductor = servidor = None
+    destino = args.destino
+    if destino is None:
+        traductor, servidor, destino = _servidor_local(args)
+
+    rnd = random.Random(args.semilla)
+    textos = [' '.join(rnd.choice(PALABRAS) for _ in range(n)) for n in longitudes(args.cues, rnd)]
+    enviados, recibidos = {}, {}
+    conexion = _conectar(destino)
+    lector = threading.Thread(target=_leer_respuestas, daemon=True,
+                              args=(conexion.makefile('r', encoding='utf-8'), args.formato, recibidos, args.cues))
+    lector.start()
+    t0 = time.perf_counter()
+    i = 0
+    while i < args.cues:
+        seguidos = rnd.randint(3, 6) if rnd.random() < args.rafagas else 1
+        for _ in range(min(seguidos, args.cues - i)):
+            i += 1
+            enviados[i] = time.perf_counter()
+            conexion.sendall(_evento(i, int((enviados[i] - t0) * 1000), textos[i - 1], args.formato).encode('utf-8'))
+        time.sleep(rnd.expovariate(args.ritmo))
+    lector.join(timeout=30)
+    segundos = time.perf_counter() - t0
+    conexion.close()
+
+    latencias = np.array([(recibidos[k] - enviados[k]) * 1000 for k in recibidos], dtype=np.float64)
+    perdidos = args.cues - len(recibidos)
+    if len(latencias):
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+        fuera = int((latencias > args.plazo_ms).sum())
+        print(f"{len(recibidos)}/{args.cues} subtítulos en {segundos:.1f}s ({args.cues / segundos:.1f}/s) | "
+              f"latencia (cliente) p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms, máx {latencias.max():.0f} ms "
+              f"| fuera de plazo ({args.plazo_ms:.0f} ms): {fuera}")
+    if traductor is not None:
+        servidor.shutdown()
+        traductor.parar()
+        print(traductor.resumen())
+    return 1 if perdidos else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
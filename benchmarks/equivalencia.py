@@ -0,0 +1,274 @@
+"""
+Equivalencia y calidad de los modos rápidos frente a la ruta de referencia.
+
+La referencia es traducir_texto subtítulo a subtítulo con el perfil por
+defecto. Cada modo candidato (lotes, perfiles, lista corta, cuantización, bf16)
+traduce las mismas entradas y se informa de:
+- coincidencia exacta con la referencia,
+- chrF y BLEU frente a la salida de referencia,
+- chrF y BLEU frente a traducciones humanas (--referencias, opcional),
+- aceleración respecto a la referencia.
+
+Termina con código 1 si algún modo baja de --min-chrf frente a la referencia
+o pierde más de --max-caida puntos de chrF frente a las humanas.
+
+Funciona sin red con el modelo diminuto (--modelo mini, por defecto si no
+está descargado facebook/m2m100_418M) o con el modelo real.
+
+Uso:
+    python benchmarks/equivalencia.py [--entrada test_input.srt | --cues 100] [--modelo auto]
+                                      [--modos lotes rapido lista-corta] [--referencias humano.srt]
+                                      [--min-chrf 90] [--max-caida 2] [--salida resultados.json]
+"""
+
+import argparse
+import copy
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+import warnings
+from collections import Counter
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import torch  # noqa: E402
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer  # noqa: E402
+
+import subtitulador  # noqa: E402
+from decodificacion import PERFIL_POR_DEFECTO  # noqa: E402
+from lotes import PlanificadorLotes, traducir_lote  # noqa: E402
+from modelo_mini import construir_modelo_mini  # noqa: E402
+from sinteticos import generar_srt  # noqa: E402
+from subtitulos import abrir_subtitulos  # noqa: E402
+from vocabulario import ModeloListaCorta, construir_lista_corta  # noqa: E402
+
+MODELO_REAL = 'facebook/m2m100_418M'
+
+
+# --- Métricas (implementación propia, sin dependencias) ---
+
+def _ngramas(secuencia, n: int) -> Counter:
+    return Counter(tuple(secuencia[i:i + n]) for i in range(len(secuencia) - n + 1))
+
+
+def chrf(hipotesis: list, referencias: list, orden: int = 6, beta: float = 2.0) -> float:
+    """chrF de corpus (0-100): F-beta de n-gramas de caracteres (sin espacios), n = 1..orden."""
+    aciertos = [0] * orden
+    total_hip = [0] * orden
+    total_ref = [0] * orden
+    for hip, ref in zip(hipotesis, referencias):
+        h, r = (hip or '').replace(' ', ''), (ref or '').replace(' ', '')
+        for n in range(1, orden + 1):
+            ng_h, ng_r = _ngramas(h, n), _ngramas(r, n)
+            aciertos[n - 1] += sum((ng_h & ng_r).values())
+            total_hip[n - 1] += sum(ng_h.values())
+            total_ref[n - 1] += sum(ng_r.values())
+    precisiones = [a / t for a, t in zip(aciertos, total_hip) if t]
+    exhaustividades = [a / t for a, t in zip(aciertos, total_ref) if t]
+    if not precisiones or not exhaustividades:
+        return 100.0 if hipotesis == referencias else 0.0
+    p = sum(precisiones) / len(precisiones)
+    r = sum(exhaustividades) / len(exhaustividades)
+    if p + r == 0:
+        return 0.0
+    b2 = beta * beta
+    return 100 * (1 + b2) * p * r / (b2 * p + r)
+
+
+def _palabras(texto: str) -> list:
+    return re.findall(r"\w+|[^\w\s]", (texto or '').lower())
+
+
+def bleu(hipotesis: list, referencias: list, orden: int = 4) -> float:
+    """BLEU de corpus (0-100) con penalización por brevedad y suavizado +1 en n > 1."""
+    aciertos = [0] * orden
+    totales = [0] * orden
+    long_hip = long_ref = 0
+    for hip, ref in zip(hipotesis, referencias):
+        h, r = _palabras(hip), _palabras(ref)
+        long_hip += len(h)
+        long_ref += len(r)
+        for n in range(1, orden + 1):
+            ng_h = _ngramas(h, n)
+            aciertos[n - 1] += sum((ng_h & _ngramas(r, n)).values())
+            totales[n - 1] += sum(ng_h.values())
+    if long_hip == 0 or aciertos[0] == 0:
+        return 100.0 if long_hip == long_ref == 0 else 0.0
+    log_p = sum(math.log((a + (n > 0)) / (t + (n > 0))) for n, (a, t) in enumerate(zip(aciertos, totales)) if t)
+    brevedad = 1.0 if long_hip > long_ref else math.exp(1 - long_ref / long_hip)
+    return 100 * brevedad * math.exp(log_p / orden)
+
+
+# --- Rutas de traducción ---
+
+def ruta_referencia(textos, tokenizer, model, src, tgt):
+    """Ruta de referencia: traducir_texto subtítulo a subtítulo con el perfil por defecto."""
+    return [subtitulador.traducir_texto(t, tokenizer, model, src, tgt, PERFIL_POR_DEFECTO) if t and t.strip() else t
+            for t in textos]
+
+
+# Cada modo es preparar(textos, tokenizer, model, src, tgt) -> traducir(textos): la
+# preparación (construir la lista corta, cuantizar) no cuenta en el tiempo del modo
+
+def _por_lotes(perfil):
+    def preparar(textos, tokenizer, model, src, tgt):
+        return lambda t: traducir_lote(t, tokenizer, model, src, tgt, subtitulador.device,
+                                       PlanificadorLotes(device=subtitulador.device, log=None), perfil=perfil)
+    return preparar
+
+
+def _lista_corta(textos, tokenizer, model, src, tgt):
+    # Lista construida con las salidas del modelo sobre las mismas entradas (cobertura total)
+    ids = construir_lista_corta(tokenizer, tgt, model=model, textos_fuente=textos, src_lang=src,
+                                device=subtitulador.device, perfil=PERFIL_POR_DEFECTO)
+    corto = ModeloListaCorta(model, ids, tgt, tokenizer)
+    return lambda t: ruta_referencia(t, tokenizer, corto, src, tgt)
+
+
+def _cuantizado(textos, tokenizer, model, src, tgt):
+    with warnings.catch_warnings():
+        # La API de cuantización dinámica está marcada como obsoleta en torch recientes
+        warnings.simplefilter('ignore')
+        cuantizado = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return lambda t: ruta_referencia(t, tokenizer, cuantizado, src, tgt)
+
+
+def _bf16(textos, tokenizer, model, src, tgt):
+    modelo = copy.deepcopy(model).to(torch.bfloat16)
+    return lambda t: ruta_referencia(t, tokenizer, modelo, src, tgt)
+
+
+MODOS = {
+    'lotes': _por_lotes(PERFIL_POR_DEFECTO),
+    'rapido': _por_lotes('rapido'),
+    'equilibrado': _por_lotes('equilibrado'),
+    'lista-corta': _lista_corta,
+    'cuantizado': _cuantizado,
+    'bf16': _bf16,
+}
+
+
+def _leer_textos(ruta: str) -> list:
+    if os.path.splitext(ruta)[1].lower() in ('.srt', '.vtt'):
+        return list(abrir_subtitulos(ruta).textos)
+    with open(ruta, encoding='utf-8', errors='ignore') as f:
+        return f.read().splitlines()
+
+
+def cargar(modelo: str):
+    """Carga el modelo pedido; 'auto' usa el real si está en la caché local y si no el diminuto."""
+    if modelo == 'auto':
+        try:
+            tokenizer = M2M100Tokenizer.from_pretrained(MODELO_REAL, local_files_only=True)
+            model = M2M100ForConditionalGeneration.from_pretrained(MODELO_REAL, local_files_only=True)
+            return tokenizer, model.to(subtitulador.device).eval(), MODELO_REAL
+        except Exception:
+            modelo = 'mini'
+    ruta = construir_modelo_mini() if modelo == 'mini' else modelo
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta)
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta).to(subtitulador.device).eval()
+    return tokenizer, model, ruta
+
+
+def comparar_modos(textos, tokenizer, model, src, tgt, modos, humanas=None) -> dict:
+    t0 = time.perf_counter()
+    referencia = ruta_referencia(textos, tokenizer, model, src, tgt)
+    t_ref = time.perf_counter() - t0
+    resultado = {'referencia': {'segundos': round(t_ref, 4)}}
+    if humanas:
+        resultado['referencia'].update(chrf_humanas=round(chrf(referencia, humanas), 2),
+                                       bleu_humanas=round(bleu(referencia, humanas), 2))
+    for nombre in modos:
+        try:
+            traducir = MODOS[nombre](textos, tokenizer, model, src, tgt)
+            t0 = time.perf_counter()
+            salida = traducir(textos)
+            segundos = time.perf_counter() - t0
+        except Exception as e:
+            print(f"[AVISO] Modo '{nombre}' omitido: {e}")
+            resultado[nombre] = {'error': str(e)}
+            continue
+        r = {
+            'segundos': round(segundos, 4),
+            'aceleracion': round(t_ref / segundos, 3) if segundos else None,
+            'coincidencia_exacta': round(sum(a == b for a, b in zip(salida, referencia)) / max(len(textos), 1), 4),
+            'chrf_referencia': round(chrf(salida, referencia), 2),
+            'bleu_referencia': round(bleu(salida, referencia), 2),
+        }
+        if humanas:
+            r.update(chrf_humanas=round(chrf(salida, humanas), 2), bleu_humanas=round(bleu(salida, humanas), 2))
+        resultado[nombre] = r
+    return resultado
+
+
+def evaluar_umbral(resultado: dict, min_chrf: float, max_caida: float) -> list:
+    """Lista de fallos (modo, motivo) según los umbrales."""
+    fallos = []
+    chrf_humano_ref = resultado['referencia'].get('chrf_humanas')
+    for nombre, r in resultado.items():
+        if nombre == 'referencia' or 'error' in r:
+            continue
+        if r['chrf_referencia'] < min_chrf:
+            fallos.append((nombre, f"chrF frente a la referencia {r['chrf_referencia']} < {min_chrf}"))
+        if chrf_humano_ref is not None and chrf_humano_ref - r['chrf_humanas'] > max_caida:
+            fallos.append((nombre, f"chrF frente a humanas cae {chrf_humano_ref - r['chrf_humanas']:.2f} > {max_caida}"))
+    return fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entrada', help='SRT/VTT/TXT de entrada (por defecto, uno sintético).')
+    parser.add_argument('--cues', type=int, default=60, help='Subtítulos del SRT sintético si no hay --entrada.')
+    parser.add_argument('--referencias', help='Traducciones humanas alineadas con la entrada (SRT/VTT/TXT).')
+    parser.add_argument('--modelo', default='auto', help="'auto', 'mini' o nombre/ruta de un M2M100.")
+    parser.add_argument('--modos', nargs='*', choices=list(MODOS), default=list(MODOS))
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    parser.add_argument('--min-chrf', type=float, default=90.0, help='chrF mínimo frente a la referencia.')
+    parser.add_argument('--max-caida', type=float, default=2.0, help='Caída máxima de chrF frente a las humanas.')
+    parser.add_argument('--salida', help='Archivo JSON de resultados.')
+    args = parser.parse_args()
+
+    tokenizer, model, nombre_modelo = cargar(args.modelo)
+    if args.entrada:
+        textos = _leer_textos(args.entrada)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = os.path.join(tmp, 'sintetico.srt')
+            generar_srt(ruta, args.cues)
+            textos = _leer_textos(ruta)
+    humanas = _leer_textos(args.referencias) if args.referencias else None
+    if humanas is not None and len(humanas) != len(textos):
+        print(f"[ERROR] Las referencias tienen {len(humanas)} segmentos y la entrada {len(textos)}")
+        return 2
+    print(f"{len(textos)} segmentos | modelo {nombre_modelo} | {args.src}->{args.tgt}")
+
+    resultado = comparar_modos(textos, tokenizer, model, args.src, args.tgt, args.modos, humanas)
+    print(f"{'referencia':12s} {resultado['referencia']['segundos']:8.3f}s")
+    for nombre in args.modos:
+        r = resultado[nombre]
+        if 'error' in r:
+            continue
+        linea = (f"{nombre:12s} {r['segundos']:8.3f}s | x{r['aceleracion']:.2f} | exactas {100 * r['coincidencia_exacta']:5.1f}% | "
+                 f"chrF {r['chrf_referencia']:6.2f} | BLEU {r['bleu_referencia']:6.2f}")
+        if humanas:
+            linea += f" | humanas chrF {r['chrf_humanas']:6.2f} BLEU {r['bleu_humanas']:6.2f}"
+        print(linea)
+
+    fallos = evaluar_umbral(resultado, args.min_chrf, args.max_caida)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({'modelo': nombre_modelo, 'segmentos': len(textos), 'resultados': resultado,
+                       'fallos': [{'modo': m, 'motivo': x} for m, x in fallos]}, f, indent=2, ensure_ascii=False)
+    for modo, motivo in fallos:
+        print(f"[FALLO] {modo}: {motivo}")
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
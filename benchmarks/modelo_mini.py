@@ -0,0 +1,91 @@
+"""
+Modelo M2M100 diminuto, inicializado al azar y construido sin red.
+
+Sirve para medir el rendimiento del flujo (lectura, tokenización, lotes,
+generación, escritura) sin descargar facebook/m2m100_418M. Las traducciones
+no tienen sentido, pero son deterministas para una misma semilla.
+
+Uso:
+    python benchmarks/modelo_mini.py [directorio] [--d-model 64] [--capas 2]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sinteticos import PALABRAS  # noqa: E402
+
+DIRECTORIO_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'subtitulador_modelo_mini')
+
+# Frases de los idiomas más habituales para que el tokenizador tenga piezas de ambos
+PALABRAS_ES = ('hola', 'mundo', 'esto', 'es', 'una', 'prueba', 'cómo', 'estás', 'hoy', 'el',
+               'tiempo', 'bueno', 'fuera', 'necesitamos', 'ir', 'ahora', 'por', 'favor', 'dónde', 'puso',
+               'mis', 'llaves', 'nunca', 'dije', 'eso', 'vuelve', 'aquí', 'mañana', 'qué', 'pasó', 'anoche')
+
+
+def _corpus(ruta: str, lineas: int = 2000):
+    import random
+    rnd = random.Random(0)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        for _ in range(lineas):
+            palabras = PALABRAS if rnd.random() < 0.5 else PALABRAS_ES
+            f.write(' '.join(rnd.choice(palabras) for _ in range(rnd.randint(3, 12))) + '\n')
+
+
+def construir_modelo_mini(directorio: str = DIRECTORIO_POR_DEFECTO, d_model: int = 64, capas: int = 2,
+                          cabezas: int = 4, vocab_spm: int = 500, semilla: int = 0) -> str:
+    """Crea (si no existe ya) tokenizador y modelo diminutos en directorio y devuelve la ruta."""
+    if os.path.isfile(os.path.join(directorio, 'config.json')):
+        return directorio
+    import sentencepiece as spm
+    import torch
+    from transformers import M2M100Config, M2M100ForConditionalGeneration, M2M100Tokenizer
+
+    os.makedirs(directorio, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_corpus = os.path.join(tmp, 'corpus.txt')
+        _corpus(ruta_corpus)
+        prefijo = os.path.join(tmp, 'sp')
+        spm.SentencePieceTrainer.train(input=ruta_corpus, model_prefix=prefijo, vocab_size=vocab_spm,
+                                       model_type='bpe', hard_vocab_limit=False, character_coverage=1.0,
+                                       bos_id=-1, eos_id=-1, unk_id=0, minloglevel=2)
+        # vocab.json de M2M100: especiales fijos y después las piezas de sentencepiece
+        vocab = {'<s>': 0, '<pad>': 1, '</s>': 2, '<unk>': 3}
+        with open(prefijo + '.vocab', encoding='utf-8') as f:
+            for linea in f:
+                pieza = linea.split('\t')[0]
+                if pieza not in vocab:
+                    vocab[pieza] = len(vocab)
+        ruta_vocab = os.path.join(tmp, 'vocab.json')
+        with open(ruta_vocab, 'w', encoding='utf-8') as f:
+            json.dump(vocab, f, ensure_ascii=False)
+        tokenizer = M2M100Tokenizer(ruta_vocab, prefijo + '.model')
+        tokenizer.save_pretrained(directorio)
+
+    # Los IDs de idioma van detrás del vocabulario: el tamaño debe cubrirlos
+    vocab_size = max(tokenizer.lang_code_to_id.values()) + 1 + 8
+    config = M2M100Config(vocab_size=vocab_size, d_model=d_model, encoder_layers=capas, decoder_layers=capas,
+                          encoder_attention_heads=cabezas, decoder_attention_heads=cabezas,
+                          encoder_ffn_dim=4 * d_model, decoder_ffn_dim=4 * d_model,
+                          max_position_embeddings=1024, pad_token_id=1, bos_token_id=0, eos_token_id=2,
+                          decoder_start_token_id=2)
+    torch.manual_seed(semilla)
+    M2M100ForConditionalGeneration(config).eval().save_pretrained(directorio)
+    return directorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directorio', nargs='?', default=DIRECTORIO_POR_DEFECTO)
+    parser.add_argument('--d-model', type=int, default=64)
+    parser.add_argument('--capas', type=int, default=2)
+    args = parser.parse_args()
+    print(construir_modelo_mini(args.directorio, d_model=args.d_model, capas=args.capas))
+
+
+if __name__ == '__main__':
+    main()
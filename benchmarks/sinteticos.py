@@ -0,0 +1,105 @@
+"""
+Generador de entradas sintéticas (SRT y TXT) para los benchmarks.
+
+El tamaño y la distribución de longitudes son configurables para reproducir
+desde diálogos de dos palabras hasta párrafos largos.
+
+Uso:
+    python benchmarks/sinteticos.py salida.srt --cues 1000 [--palabras-media 6] [--distribucion normal]
+    python benchmarks/sinteticos.py salida.txt --cues 1000
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subtitulos import ms_a_marca  # noqa: E402
+
+PALABRAS = ('hello', 'world', 'this', 'is', 'a', 'test', 'how', 'are', 'you', 'today',
+            'the', 'weather', 'nice', 'outside', 'we', 'need', 'to', 'go', 'now', 'please',
+            'where', 'did', 'she', 'put', 'my', 'keys', 'I', 'never', 'said', 'that',
+            'come', 'back', 'here', 'tomorrow', 'morning', 'what', 'happened', 'last', 'night', 'okay')
+
+DISTRIBUCIONES = ('uniforme', 'normal', 'lognormal')
+
+
+def longitudes(n: int, rnd: random.Random, palabras_media: float = 5.0, palabras_desv: float = 2.0,
+               distribucion: str = 'uniforme', minimo: int = 1, maximo: int = 60) -> list:
+    """n longitudes (en palabras) según la distribución indicada."""
+    if distribucion == 'normal':
+        valores = (rnd.gauss(palabras_media, palabras_desv) for _ in range(n))
+    elif distribucion == 'lognormal':
+        # Parámetros de la normal subyacente para que media y desviación sean las pedidas
+        sigma2 = math.log(1 + (palabras_desv / palabras_media) ** 2)
+        mu = math.log(palabras_media) - sigma2 / 2
+        valores = (rnd.lognormvariate(mu, math.sqrt(sigma2)) for _ in range(n))
+    else:
+        radio = palabras_desv * math.sqrt(3)
+        valores = (rnd.uniform(palabras_media - radio, palabras_media + radio) for _ in range(n))
+    return [max(minimo, min(maximo, int(round(v)))) for v in valores]
+
+
+def frase(rnd: random.Random, palabras: int) -> str:
+    texto = ' '.join(rnd.choice(PALABRAS) for _ in range(palabras))
+    return texto[0].upper() + texto[1:] + rnd.choice('..?!')
+
+
+def generar_srt(ruta: str, n: int, semilla: int = 1234, palabras_media: float = 5.0, palabras_desv: float = 2.0,
+                distribucion: str = 'uniforme', max_lineas: int = 2):
+    """Escribe un SRT sintético con n subtítulos de 1 a max_lineas líneas."""
+    rnd = random.Random(semilla)
+    t = 0
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        for i, total in enumerate(longitudes(n, rnd, palabras_media, palabras_desv, distribucion), 1):
+            dur = rnd.randint(800, 4000)
+            # Reparte las palabras del subtítulo entre sus líneas
+            num_lineas = min(rnd.randint(1, max_lineas), total)
+            cortes = sorted(rnd.sample(range(1, total), num_lineas - 1)) if num_lineas > 1 else []
+            tramos = zip([0] + cortes, cortes + [total])
+            lineas = [' '.join(rnd.choice(PALABRAS) for _ in range(fin - ini)) for ini, fin in tramos]
+            f.write(f"{i}\n{ms_a_marca(t)} --> {ms_a_marca(t + dur)}\n" + '\n'.join(lineas) + '\n\n')
+            t += dur + rnd.randint(0, 500)
+
+
+def generar_txt(ruta: str, n: int, semilla: int = 1234, palabras_media: float = 12.0, palabras_desv: float = 6.0,
+                distribucion: str = 'lognormal', prob_vacia: float = 0.1):
+    """Escribe un TXT sintético con n líneas de texto (y líneas vacías intercaladas con prob_vacia)."""
+    rnd = random.Random(semilla)
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        for palabras in longitudes(n, rnd, palabras_media, palabras_desv, distribucion):
+            if rnd.random() < prob_vacia:
+                f.write('\n')
+            # Líneas largas con varias frases, como un párrafo
+            partes, resto = [], palabras
+            while resto > 0:
+                k = min(resto, rnd.randint(3, 12))
+                partes.append(frase(rnd, k))
+                resto -= k
+            f.write(' '.join(partes) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('salida')
+    parser.add_argument('--cues', type=int, default=1000, help='Subtítulos (SRT) o líneas (TXT).')
+    parser.add_argument('--semilla', type=int, default=1234)
+    parser.add_argument('--palabras-media', type=float)
+    parser.add_argument('--palabras-desv', type=float)
+    parser.add_argument('--distribucion', choices=DISTRIBUCIONES)
+    args = parser.parse_args()
+
+    opciones = {k: v for k, v in (('palabras_media', args.palabras_media), ('palabras_desv', args.palabras_desv),
+                                  ('distribucion', args.distribucion)) if v is not None}
+    if args.salida.lower().endswith('.txt'):
+        generar_txt(args.salida, args.cues, args.semilla, **opciones)
+    else:
+        generar_srt(args.salida, args.cues, args.semilla, **opciones)
+    print(f"{args.salida}: {os.path.getsize(args.salida) / 1e3:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
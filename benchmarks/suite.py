@@ -0,0 +1,252 @@
+"""
+Suite de rendimiento de extremo a extremo con resultados en JSON.
+
+Genera entradas sintéticas, traduce con el modelo diminuto offline (o con el
+que se indique) y mide para cada caso: subtítulos/s, tokens generados/s, pico
+de memoria residente y tiempo hasta el primer subtítulo traducido (cuando
+termina la primera llamada a generate). Los resultados se pueden comparar
+entre commits con --comparar.
+
+Casos: traducir_srt, traducir_txt_a_txt_preservando_lineas y
+traducir_texto_largo de subtitulador.py, y los métodos de trabajo de la GUI
+(si customtkinter está instalado).
+
+Uso:
+    python benchmarks/suite.py [--cues 300] [--lineas 200] [--perfil rapido] [--modelo mini]
+                               [--salida resultados.json] [--comparar anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import torch  # noqa: E402
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer  # noqa: E402
+
+import subtitulador  # noqa: E402
+from decodificacion import PERFILES_DECODIFICACION  # noqa: E402
+from lotes import rss_actual_mb  # noqa: E402
+from modelo_mini import construir_modelo_mini  # noqa: E402
+from sinteticos import DISTRIBUCIONES, generar_srt, generar_txt  # noqa: E402
+
+
+class Medidor:
+    """Cuenta llamadas a generate, tokens generados, primer resultado y pico de RSS durante un caso."""
+
+    def __init__(self, model, pad_token_id: int, intervalo: float = 0.01):
+        self.model = model
+        self.pad = pad_token_id
+        self.intervalo = intervalo
+
+    def __enter__(self):
+        self.llamadas = 0
+        self.tokens = 0
+        self.primer_resultado = None
+        self.pico_rss_mb = rss_actual_mb()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        original = self.model.generate
+
+        def generate(*args, **kwargs):
+            salida = original(*args, **kwargs)
+            self.llamadas += 1
+            self.tokens += int((salida != self.pad).sum()) - salida.shape[0]
+            if self.primer_resultado is None:
+                self.primer_resultado = time.perf_counter()
+            return salida
+
+        # Atributo de instancia: tapa a generate de la clase solo durante la medición
+        self.model.generate = generate
+        self._hilo.start()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.fin = time.perf_counter()
+        self._parar.set()
+        self._hilo.join()
+        del self.model.generate
+        return False
+
+    def _muestrear(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico_rss_mb = max(self.pico_rss_mb, rss_actual_mb())
+
+    def resultado(self, cues: int) -> dict:
+        segundos = self.fin - self.inicio
+        return {
+            'cues': cues,
+            'segundos': round(segundos, 4),
+            'cues_por_s': round(cues / segundos, 3) if segundos else None,
+            'tokens_generados': self.tokens,
+            'tokens_por_s': round(self.tokens / segundos, 2) if segundos else None,
+            'llamadas_generate': self.llamadas,
+            'pico_rss_mb': round(self.pico_rss_mb, 1),
+            'tiempo_primer_cue_s': round(self.primer_resultado - self.inicio, 4) if self.primer_resultado else None,
+        }
+
+
+def _app_sin_ventana(device, perfil):
+    """Instancia de SubtituladorApp sin ventana para llamar a sus métodos de trabajo; None si no hay GUI."""
+    try:
+        import customtkinter  # noqa: F401
+        import subtitulador_gui
+    except Exception as e:
+        print(f"[AVISO] Se omiten los métodos de la GUI: {e}")
+        return None
+
+    class AppSinVentana(subtitulador_gui.SubtituladorApp):
+        def __init__(self):
+            # Sin CTk.__init__: no se crea ninguna ventana
+            self.current_device = device
+            self.perfil_actual = perfil
+            self.mensajes = []
+
+        def after(self, ms, func=None, *args):
+            return func(*args) if func else None
+
+        def log(self, mensaje):
+            self.mensajes.append(mensaje)
+
+        def actualizar_estado(self, texto, progreso=None):
+            pass
+
+    return AppSinVentana()
+
+
+def _contar_lineas(ruta: str) -> int:
+    with open(ruta, encoding='utf-8') as f:
+        return sum(1 for linea in f if linea.strip())
+
+
+def ejecutar(args) -> dict:
+    device = subtitulador.device
+    ruta_modelo = construir_modelo_mini() if args.modelo == 'mini' else args.modelo
+    tokenizer = M2M100Tokenizer.from_pretrained(ruta_modelo)
+    model = M2M100ForConditionalGeneration.from_pretrained(ruta_modelo).to(device).eval()
+    src, tgt, perfil = args.src, args.tgt, args.perfil
+
+    tmp = tempfile.mkdtemp(prefix='subtitulador_bench_')
+    srt = os.path.join(tmp, 'entrada.srt')
+    txt = os.path.join(tmp, 'entrada.txt')
+    generar_srt(srt, args.cues, args.semilla, args.palabras_media, args.palabras_desv, args.distribucion)
+    generar_txt(txt, args.lineas, args.semilla)
+    with open(txt, encoding='utf-8') as f:
+        texto_largo = f.read()
+    lineas = _contar_lineas(txt)
+
+    casos = [
+        ('traducir_srt', args.cues,
+         lambda: subtitulador.traducir_srt(srt, os.path.join(tmp, 'salida.srt'), tokenizer, model, src, tgt, perfil=perfil)),
+        ('traducir_txt_a_txt_preservando_lineas', lineas,
+         lambda: subtitulador.traducir_txt_a_txt_preservando_lineas(txt, os.path.join(tmp, 'salida.txt'), tokenizer,
+                                                                    model, src, tgt, perfil=perfil)),
+        ('traducir_texto_largo', lineas,
+         lambda: subtitulador.traducir_texto_largo(texto_largo, tokenizer, model, src, tgt, perfil=perfil)),
+    ]
+    app = _app_sin_ventana(device, perfil)
+    if app is not None:
+        casos += [
+            ('gui.traducir_srt', args.cues,
+             lambda: app.traducir_srt(srt, os.path.join(tmp, 'gui.srt'), tokenizer, model, src, tgt)),
+            ('gui.traducir_srt_a_txt', args.cues,
+             lambda: app.traducir_srt_a_txt(srt, os.path.join(tmp, 'gui_srt.txt'), tokenizer, model, src, tgt)),
+            ('gui.traducir_txt', lineas,
+             lambda: app.traducir_txt(txt, os.path.join(tmp, 'gui.txt'), tokenizer, model, src, tgt)),
+        ]
+    if args.solo:
+        casos = [c for c in casos if c[0] in args.solo]
+
+    # Calentamiento: la primera llamada inicializa hilos y cachés de torch
+    subtitulador.traducir_texto('hello world', tokenizer, model, src, tgt, perfil)
+
+    resultados = {}
+    try:
+        for nombre, cues, funcion in casos:
+            with Medidor(model, tokenizer.pad_token_id) as medidor:
+                funcion()
+            resultados[nombre] = medidor.resultado(cues)
+            r = resultados[nombre]
+            print(f"{nombre:40s} {r['segundos']:8.3f}s | {r['cues_por_s']:8.2f} cues/s | "
+                  f"{r['tokens_por_s']:9.1f} tokens/s | RSS pico {r['pico_rss_mb']:7.1f} MB | "
+                  f"primer cue {r['tiempo_primer_cue_s']}s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return {
+        'commit': _commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'equipo': {'python': platform.python_version(), 'torch': torch.__version__, 'procesador': platform.processor()
+                   or platform.machine(), 'hilos': torch.get_num_threads(), 'dispositivo': device.type},
+        'parametros': {'modelo': args.modelo, 'perfil': perfil, 'src': src, 'tgt': tgt, 'cues': args.cues,
+                       'lineas': args.lineas, 'semilla': args.semilla, 'palabras_media': args.palabras_media,
+                       'palabras_desv': args.palabras_desv, 'distribucion': args.distribucion},
+        'resultados': resultados,
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def comparar(actual: dict, anterior: dict):
+    """Imprime la variación de cues/s, pico de RSS y primer cue respecto a un resultado anterior."""
+    print(f"\nComparación con {anterior.get('commit')} ({anterior.get('fecha')}):")
+    if actual['parametros'] != anterior.get('parametros'):
+        print("[AVISO] Los parámetros no coinciden; la comparación puede no ser válida")
+    for nombre, r in actual['resultados'].items():
+        previo = anterior.get('resultados', {}).get(nombre)
+        if not previo:
+            continue
+        cambios = []
+        for clave, mejor_si_sube in (('cues_por_s', True), ('pico_rss_mb', False), ('tiempo_primer_cue_s', False)):
+            if r.get(clave) and previo.get(clave):
+                ratio = r[clave] / previo[clave]
+                signo = '+' if (ratio >= 1) == mejor_si_sube else '-'
+                cambios.append(f"{clave} x{ratio:.2f} ({signo})")
+        print(f"  {nombre:40s} " + ' | '.join(cambios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modelo', default='mini', help="'mini' (modelo diminuto offline) o nombre/ruta de un M2M100.")
+    parser.add_argument('--cues', type=int, default=300, help='Subtítulos del SRT sintético.')
+    parser.add_argument('--lineas', type=int, default=200, help='Líneas del TXT sintético.')
+    parser.add_argument('--palabras-media', type=float, default=5.0)
+    parser.add_argument('--palabras-desv', type=float, default=2.0)
+    parser.add_argument('--distribucion', choices=DISTRIBUCIONES, default='uniforme')
+    parser.add_argument('--semilla', type=int, default=1234)
+    parser.add_argument('--perfil', choices=list(PERFILES_DECODIFICACION), default='rapido')
+    parser.add_argument('--src', default='en')
+    parser.add_argument('--tgt', default='es')
+    parser.add_argument('--solo', nargs='*', help='Ejecutar solo estos casos.')
+    parser.add_argument('--salida', help='Archivo JSON de resultados.')
+    parser.add_argument('--comparar', help='JSON de una ejecución anterior con el que comparar.')
+    args = parser.parse_args()
+
+    datos = ejecutar(args)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, indent=2, ensure_ascii=False)
+        print(f"Resultados guardados en: {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(datos, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
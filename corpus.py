@@ -0,0 +1,219 @@
+"""
+Planificación por corpus: traducir muchos archivos (una temporada, una biblioteca) de una vez.
+
+Las mismas líneas se repiten entre los archivos de una serie y dentro de cada
+uno ("¿Qué?", "Vamos.", créditos, canciones). PlanCorpus no traduce archivo
+por archivo, sino en tres fases:
+
+  1. exploración: lee todas las entradas (.srt/.vtt, un segmento por
+     subtítulo; .txt, uno por línea) y construye una tabla global de
+     segmentos únicos normalizados con su número de apariciones;
+  2. traducción: cada segmento único se traduce una sola vez, todos los de
+     un mismo idioma origen en una única llamada (traducir_lote los reparte
+     en lotes grandes ordenados por longitud);
+  3. materialización: cada salida se escribe tomando de la tabla la
+     traducción de cada subtítulo o línea.
+
+La clave de un segmento es su texto en NFKC con los espacios colapsados
+(saltos de línea incluidos): la misma normalización que aplica SentencePiece
+(nmt_nfkc) en el tokenizador de M2M100, así que dos textos con la misma clave
+llegan al modelo como la misma entrada. Mayúsculas y puntuación sí distinguen
+segmentos (para las variantes parecidas está la memoria de traducción).
+
+El tiempo ahorrado se estima con el coste medio por segmento único medido en
+la fase 2.
+"""
+
+import json
+import os
+import time
+import unicodedata
+
+import numpy as np
+
+from daemon import EXTENSIONES
+from subtitulos import abrir_subtitulos, formato_por_extension
+from texto_mmap import TextoMapeado
+
+# Segmentos más repetidos que se listan en el informe
+MAS_REPETIDOS = 10
+
+
+def normalizar(texto: str) -> str:
+    """Clave de un segmento: NFKC y espacios colapsados, como lo ve el tokenizador."""
+    return ' '.join(unicodedata.normalize('NFKC', texto).split())
+
+
+def es_salida(nombre: str, tgt_lang: str) -> bool:
+    """<nombre>.<tgt><ext> es una salida nuestra (o ya está en el idioma destino)."""
+    base = os.path.splitext(nombre)[0]
+    return '.' in base and base.rpartition('.')[2] == tgt_lang
+
+
+def buscar_archivos(entradas: list, tgt_lang: str, salida: str = None) -> list:
+    """(entrada, salida) de los archivos indicados y de los que hay bajo las carpetas indicadas.
+
+    Sin salida, cada traducción va junto a su archivo como <nombre>.<tgt><ext>;
+    con salida, en esa carpeta, conservando la estructura de cada carpeta de entrada.
+    """
+    pares, vistos = [], set()
+
+    def destino(ruta: str, raiz: str = None) -> str:
+        base, ext = os.path.splitext(ruta)
+        if salida is None:
+            return f"{base}.{tgt_lang}{ext}"
+        if raiz is None:
+            return os.path.join(salida, f"{os.path.basename(base)}.{tgt_lang}{ext}")
+        return os.path.join(salida, os.path.basename(raiz), f"{os.path.relpath(base, raiz)}.{tgt_lang}{ext}")
+
+    def anotar(ruta: str, raiz: str = None):
+        ruta = os.path.abspath(ruta)
+        if ruta not in vistos:
+            vistos.add(ruta)
+            pares.append((ruta, destino(ruta, raiz)))
+
+    for entrada in entradas:
+        if not os.path.isdir(entrada):
+            anotar(entrada)
+            continue
+        raiz = os.path.abspath(entrada).rstrip(os.sep)
+        for directorio, carpetas, nombres in os.walk(raiz):
+            carpetas[:] = sorted(c for c in carpetas if not c.startswith('.'))
+            if salida is not None and os.path.abspath(directorio).startswith(os.path.join(os.path.abspath(salida), '')):
+                continue
+            for nombre in sorted(nombres):
+                if (not nombre.startswith('.') and os.path.splitext(nombre)[1].lower() in EXTENSIONES
+                        and not es_salida(nombre, tgt_lang)):
+                    anotar(os.path.join(directorio, nombre), raiz)
+    return pares
+
+
+def _leer_segmentos(ruta: str) -> list:
+    """Subtítulos de un .srt/.vtt o líneas (sin fin de línea) de un .txt."""
+    if os.path.splitext(ruta)[1].lower() in ('.srt', '.vtt'):
+        return abrir_subtitulos(ruta, encoding='utf-8').textos
+    with TextoMapeado(ruta) as texto:
+        return list(texto.lineas())
+
+
+class PlanCorpus:
+    """Tabla global de segmentos únicos de un conjunto de archivos y las salidas que se escriben con ella."""
+
+    def __init__(self, tgt_lang: str, log=print):
+        self.tgt_lang = tgt_lang
+        self.log = log
+        # (idioma origen, clave) -> posición en unicos
+        self._posiciones = {}
+        self.unicos = []
+        self.apariciones = []
+        self.traducciones = []
+        # Por archivo: entrada, salida, idioma origen e id de cada segmento en la tabla (-1: se copia tal cual)
+        self.archivos = []
+        self.segundos = {'exploracion': 0.0, 'traduccion': 0.0, 'materializacion': 0.0}
+
+    # --- Fase 1: exploración ---
+
+    def agregar(self, entrada: str, salida: str, src_lang: str) -> int:
+        """Anota en la tabla los segmentos de entrada. Devuelve cuántos tiene con texto."""
+        if os.path.splitext(entrada)[1].lower() not in EXTENSIONES:
+            raise ValueError(f"solo se admiten archivos {', '.join(EXTENSIONES)}: {entrada}")
+        t0 = time.perf_counter()
+        textos = _leer_segmentos(entrada)
+        ids = np.full(len(textos), -1, dtype=np.int32)
+        con_texto = 0
+        for i, texto in enumerate(textos):
+            if not texto or not texto.strip():
+                continue
+            con_texto += 1
+            if src_lang == self.tgt_lang:
+                continue
+            clave = (src_lang, normalizar(texto))
+            k = self._posiciones.get(clave)
+            if k is None:
+                k = self._posiciones[clave] = len(self.unicos)
+                self.unicos.append(clave)
+                self.apariciones.append(0)
+            self.apariciones[k] += 1
+            ids[i] = k
+        self.archivos.append({'entrada': entrada, 'salida': salida, 'src': src_lang, 'ids': ids,
+                              'segmentos': con_texto})
+        self.segundos['exploracion'] += time.perf_counter() - t0
+        return con_texto
+
+    # --- Fase 2: traducción ---
+
+    def traducir(self, traducir):
+        """Traduce cada segmento único una vez. traducir(textos, src) -> lista, en el mismo orden."""
+        t0 = time.perf_counter()
+        self.traducciones = [None] * len(self.unicos)
+        por_idioma = {}
+        for k, (src, _) in enumerate(self.unicos):
+            por_idioma.setdefault(src, []).append(k)
+        for src, posiciones in por_idioma.items():
+            self.log(f"[CORPUS] {src}->{self.tgt_lang}: {len(posiciones)} segmentos únicos "
+                     f"({sum(self.apariciones[k] for k in posiciones)} apariciones)")
+            traducidos = traducir([self.unicos[k][1] for k in posiciones], src)
+            for k, traduccion in zip(posiciones, traducidos):
+                self.traducciones[k] = traduccion
+        self.segundos['traduccion'] += time.perf_counter() - t0
+
+    # --- Fase 3: materialización ---
+
+    def materializar(self) -> int:
+        """Escribe todas las salidas con las traducciones de la tabla. Devuelve los archivos escritos."""
+        t0 = time.perf_counter()
+        for archivo in self.archivos:
+            entrada, salida, ids = archivo['entrada'], archivo['salida'], archivo['ids'].tolist()
+            os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+            if os.path.splitext(entrada)[1].lower() in ('.srt', '.vtt'):
+                subs = abrir_subtitulos(entrada, encoding='utf-8')
+                for i, k in enumerate(ids):
+                    if k >= 0:
+                        subs.fijar_texto(i, self.traducciones[k])
+                subs.guardar(salida, encoding='utf-8', formato=formato_por_extension(salida, subs.formato))
+            else:
+                with TextoMapeado(entrada) as texto, open(salida, 'wb') as f:
+                    texto.escribir(f, (linea if k < 0 else self.traducciones[k]
+                                       for linea, k in zip(texto.lineas(), ids)))
+        self.segundos['materializacion'] += time.perf_counter() - t0
+        return len(self.archivos)
+
+    # --- Informe ---
+
+    def informe(self) -> dict:
+        segmentos = sum(self.apariciones)
+        unicos = len(self.unicos)
+        ahorrados = segmentos - unicos
+        por_segmento = self.segundos['traduccion'] / unicos if unicos and self.traducciones else 0.0
+        orden = np.argsort(-np.asarray(self.apariciones, dtype=np.int64), kind='stable')[:MAS_REPETIDOS]
+        return {
+            'archivos': len(self.archivos),
+            'segmentos': segmentos,
+            'unicos': unicos,
+            'ratio': round(segmentos / unicos, 3) if unicos else 1.0,
+            'segmentos_ahorrados': ahorrados,
+            'segundos': {k: round(v, 2) for k, v in self.segundos.items()},
+            'segundos_ahorrados_estimados': round(por_segmento * ahorrados, 1),
+            'mas_repetidos': [{'texto': self.unicos[k][1], 'src': self.unicos[k][0],
+                               'apariciones': self.apariciones[k]} for k in orden.tolist()],
+            'detalle': [{'entrada': a['entrada'], 'salida': a['salida'], 'src': a['src'],
+                         'segmentos': a['segmentos']} for a in self.archivos],
+        }
+
+    def resumen(self) -> str:
+        datos = self.informe()
+        linea = (f"[CORPUS] {datos['archivos']} archivos | {datos['segmentos']} segmentos, {datos['unicos']} únicos "
+                 f"(x{datos['ratio']:.2f})")
+        if self.traducciones:
+            linea += (f" | traducción {datos['segundos']['traduccion']:.1f}s | ahorro estimado "
+                      f"~{datos['segundos_ahorrados_estimados']:.0f}s ({datos['segmentos_ahorrados']} segmentos "
+                      f"sin traducir)")
+        lineas = [linea]
+        for r in datos['mas_repetidos'][:5]:
+            if r['apariciones'] > 1:
+                lineas.append(f"  {r['apariciones']:5d} x {r['texto'][:60]!r}")
+        return '\n'.join(lineas)
+
+    def guardar_informe(self, ruta: str):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.informe(), f, indent=2, ensure_ascii=False)
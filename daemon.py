@@ -0,0 +1,420 @@
+"""
+Modo demonio: vigila carpetas y traduce automáticamente los subtítulos nuevos.
+
+Un catálogo SQLite guarda, por archivo e idioma destino, el tamaño y la fecha
+de modificación vistos, el hash del contenido traducido por última vez, el par
+de idiomas y el estado de la salida. Solo se encolan los archivos nuevos o
+cuyo contenido cambió desde la última traducción correcta; el modelo se carga
+una vez y se mantiene en memoria entre archivos.
+
+Al arrancar se reconcilia el catálogo con el disco: se recorren las carpetas
+con os.scandir y solo se calcula el hash de los archivos cuyo tamaño o fecha
+cambiaron, así que con 100k archivos sin cambios basta con un stat por
+archivo. Después se vigila con inotify (Linux, vía ctypes) o, si no está
+disponible, revisando las carpetas cada `sondeo` segundos.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import os
+import queue
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+import perfilado
+from vocabulario import DIRECTORIO_DATOS
+
+EXTENSIONES = ('.srt', '.vtt', '.txt')
+RUTA_CATALOGO = os.path.join(DIRECTORIO_DATOS, 'catalogo.sqlite3')
+# Segundos entre revisiones completas cuando no hay inotify
+SONDEO = 5.0
+# Un archivo modificado hace menos de esto puede estar todavía copiándose
+ASENTAMIENTO = 1.0
+
+PENDIENTE, TRADUCIDO, ERROR, OMITIDO = 'pendiente', 'traducido', 'error', 'omitido'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    ruta TEXT NOT NULL,
+    tgt TEXT NOT NULL,
+    src TEXT,
+    tamano INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT,
+    estado TEXT NOT NULL,
+    salida TEXT,
+    error TEXT,
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (ruta, tgt)
+) WITHOUT ROWID
+"""
+
+
+def hash_archivo(ruta: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class Catalogo:
+    """Catálogo SQLite de archivos vigilados: estado de la traducción por (ruta, idioma destino)."""
+
+    def __init__(self, ruta: str = RUTA_CATALOGO):
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        self.ruta = ruta
+        # La usan el bucle principal y el hilo de vigilancia: una transacción a la vez
+        self._lock = threading.RLock()
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute('PRAGMA synchronous=NORMAL')
+        self.conexion.execute(_ESQUEMA)
+        self.conexion.commit()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def registros(self, tgt: str, prefijos: list) -> dict:
+        """ruta -> (tamano, mtime_ns, hash, estado) de los archivos bajo alguno de los prefijos."""
+        resultado = {}
+        with self._lock:
+            for prefijo in prefijos:
+                base = os.path.join(prefijo, '')
+                # Rango [base, base + U+10FFFF): recorre la clave primaria en lugar de usar LIKE
+                filas = self.conexion.execute(
+                    'SELECT ruta, tamano, mtime_ns, hash, estado FROM archivos '
+                    'WHERE tgt = ? AND ruta >= ? AND ruta < ?', (tgt, base, base + '\U0010ffff'))
+                for ruta, tamano, mtime_ns, h, estado in filas:
+                    resultado[ruta] = (tamano, mtime_ns, h, estado)
+        return resultado
+
+    def registro(self, ruta: str, tgt: str):
+        with self._lock:
+            return self.conexion.execute('SELECT tamano, mtime_ns, hash, estado FROM archivos WHERE ruta = ? AND tgt = ?',
+                                         (ruta, tgt)).fetchone()
+
+    def guardar(self, filas: list):
+        """Inserta o actualiza (ruta, tgt, src, tamano, mtime_ns, hash, estado, salida, error) en una transacción."""
+        ahora = time.time()
+        with self._lock, self.conexion:
+            self.conexion.executemany(
+                'INSERT OR REPLACE INTO archivos (ruta, tgt, src, tamano, mtime_ns, hash, estado, salida, error, '
+                'actualizado) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [tuple(f) + (ahora,) for f in filas])
+
+    def actualizar_stat(self, filas: list):
+        """(tamano, mtime_ns, ruta, tgt): contenido igual con otra fecha (copiado de nuevo, touch...)."""
+        with self._lock, self.conexion:
+            self.conexion.executemany('UPDATE archivos SET tamano = ?, mtime_ns = ? WHERE ruta = ? AND tgt = ?', filas)
+
+    def borrar(self, filas: list):
+        """(ruta, tgt) de archivos que ya no existen."""
+        with self._lock, self.conexion:
+            self.conexion.executemany('DELETE FROM archivos WHERE ruta = ? AND tgt = ?', filas)
+
+    def recuento(self) -> dict:
+        with self._lock:
+            return dict(self.conexion.execute('SELECT estado, COUNT(*) FROM archivos GROUP BY estado').fetchall())
+
+
+class _Inotify:
+    """Vigilancia recursiva con inotify a través de ctypes (sin dependencias)."""
+
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    MASCARA = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _CABECERA = struct.Struct('iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify solo existe en Linux')
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.directorios = {}
+
+    def vigilar_arbol(self, raiz: str):
+        for directorio, _, _ in os.walk(raiz):
+            self.vigilar(directorio)
+
+    def vigilar(self, directorio: str):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directorio), self.MASCARA)
+        if wd < 0:
+            e = ctypes.get_errno()
+            # ENOSPC: se alcanzó fs.inotify.max_user_watches
+            raise OSError(e, f"{os.strerror(e)}: {directorio}")
+        self.directorios[wd] = directorio
+
+    def leer(self, espera: float) -> list:
+        """Eventos (ruta, mascara) disponibles en `espera` segundos; [(None, IN_Q_OVERFLOW)] si se perdieron."""
+        listos, _, _ = select.select([self.fd], [], [], espera)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return []
+        eventos, pos = [], 0
+        while pos + self._CABECERA.size <= len(datos):
+            wd, mascara, _, longitud = self._CABECERA.unpack_from(datos, pos)
+            pos += self._CABECERA.size
+            nombre = datos[pos:pos + longitud].rstrip(b'\0')
+            pos += longitud
+            if mascara & self.IN_Q_OVERFLOW:
+                eventos.append((None, mascara))
+                continue
+            if mascara & self.IN_IGNORED:
+                self.directorios.pop(wd, None)
+                continue
+            directorio = self.directorios.get(wd)
+            if directorio is not None:
+                eventos.append((os.path.join(directorio, os.fsdecode(nombre)) if nombre else directorio, mascara))
+        return eventos
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class Demonio:
+    """Vigila carpetas de entrada y traduce lo nuevo o cambiado, con el modelo cargado una sola vez."""
+
+    def __init__(self, directorios: list, tgt_langs: list, src_lang: str = 'auto', perfil: str = None,
+                 salida: str = None, catalogo: str = RUTA_CATALOGO, sondeo: float = SONDEO,
+                 lista_corta: bool = False, log=print):
+        self.directorios = [os.path.abspath(d) for d in directorios]
+        self.tgt_langs = list(tgt_langs)
+        self.src_lang = src_lang
+        self.perfil = perfil
+        self.salida = os.path.abspath(salida) if salida else None
+        self.catalogo = Catalogo(catalogo)
+        self.sondeo = sondeo
+        self.lista_corta = lista_corta
+        self.log = log
+        self.cola = queue.Queue()
+        self._encolados = set()
+        self._parar = threading.Event()
+        self.estadisticas = {'traducidos': 0, 'errores': 0, 'omitidos': 0, 'sin_cambios': 0}
+
+    # --- Qué es una entrada ---
+
+    def es_entrada(self, ruta: str, nombre: str = None) -> bool:
+        nombre = nombre or os.path.basename(ruta)
+        base, punto, ext = nombre.rpartition('.')
+        if not punto or nombre.startswith('.') or '.' + ext.lower() not in EXTENSIONES:
+            return False
+        if self.salida and ruta.startswith(os.path.join(self.salida, '')):
+            return False
+        # <nombre>.<tgt><ext> es una salida nuestra (o ya está en el idioma destino)
+        return base.rpartition('.')[2] not in self.tgt_langs if '.' in base else True
+
+    def ruta_salida(self, ruta: str, tgt: str) -> str:
+        base, ext = os.path.splitext(ruta)
+        if self.salida:
+            for raiz in self.directorios:
+                if ruta.startswith(os.path.join(raiz, '')):
+                    relativa = os.path.relpath(base, raiz)
+                    return os.path.join(self.salida, os.path.basename(raiz), f"{relativa}.{tgt}{ext}")
+        return f"{base}.{tgt}{ext}"
+
+    def _recorrer(self, raiz: str):
+        """(ruta, tamano, mtime_ns) de las entradas bajo raiz, con os.scandir."""
+        pila = [raiz]
+        while pila:
+            directorio = pila.pop()
+            try:
+                with os.scandir(directorio) as it:
+                    for entrada in it:
+                        if entrada.is_dir(follow_symlinks=False):
+                            if not entrada.name.startswith('.'):
+                                pila.append(entrada.path)
+                        elif entrada.is_file() and self.es_entrada(entrada.path, entrada.name):
+                            st = entrada.stat()
+                            yield entrada.path, st.st_size, st.st_mtime_ns
+            except OSError as e:
+                self.log(f"[DEMONIO] No se pudo leer {directorio}: {e}")
+
+    # --- Reconciliación ---
+
+    def reconciliar(self) -> int:
+        """Compara disco y catálogo, encola lo nuevo o cambiado y borra lo desaparecido. Devuelve lo encolado."""
+        t0 = time.perf_counter()
+        en_disco = {}
+        for raiz in self.directorios:
+            for ruta, tamano, mtime_ns in self._recorrer(raiz):
+                en_disco[ruta] = (tamano, mtime_ns)
+        encolados = 0
+        for tgt in self.tgt_langs:
+            conocidos = self.catalogo.registros(tgt, self.directorios)
+            nuevos, solo_stat = [], []
+            for ruta, (tamano, mtime_ns) in en_disco.items():
+                previo = conocidos.get(ruta)
+                if previo is not None:
+                    tamano_c, mtime_c, hash_c, estado = previo
+                    if (tamano_c, mtime_c) == (tamano, mtime_ns):
+                        # Sin cambios: solo se reintenta lo que quedó pendiente al parar
+                        if estado == PENDIENTE:
+                            encolados += self._encolar(ruta, tgt)
+                        continue
+                    if hash_c is not None and estado in (TRADUCIDO, OMITIDO) and hash_c == self._hash(ruta):
+                        solo_stat.append((tamano, mtime_ns, ruta, tgt))
+                        continue
+                nuevos.append((ruta, tgt, None, tamano, mtime_ns, None, PENDIENTE, None, None))
+                encolados += self._encolar(ruta, tgt)
+            self.catalogo.guardar(nuevos)
+            self.catalogo.actualizar_stat(solo_stat)
+            self.catalogo.borrar([(ruta, tgt) for ruta in conocidos if ruta not in en_disco])
+        self.log(f"[DEMONIO] Catálogo reconciliado: {len(en_disco)} archivos en disco, {encolados} por traducir "
+                 f"({time.perf_counter() - t0:.2f}s)")
+        return encolados
+
+    def _hash(self, ruta: str):
+        try:
+            return hash_archivo(ruta)
+        except OSError:
+            return None
+
+    def _encolar(self, ruta: str, tgt: str) -> int:
+        if (ruta, tgt) in self._encolados:
+            return 0
+        self._encolados.add((ruta, tgt))
+        self.cola.put((ruta, tgt))
+        return 1
+
+    def notificar(self, ruta: str):
+        """Un archivo se creó o cambió: encolarlo para cada idioma destino (se comprueba al procesarlo)."""
+        if self.es_entrada(ruta):
+            for tgt in self.tgt_langs:
+                self._encolar(ruta, tgt)
+
+    # --- Traducción ---
+
+    def procesar(self, ruta: str, tgt: str):
+        import subtitulador
+
+        try:
+            st = os.stat(ruta)
+        except FileNotFoundError:
+            self.catalogo.borrar([(ruta, tgt)])
+            return
+        while time.time() - st.st_mtime < ASENTAMIENTO:
+            # Puede que todavía se esté copiando: esperar a que deje de cambiar
+            time.sleep(ASENTAMIENTO)
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                return
+        contenido = hash_archivo(ruta)
+        previo = self.catalogo.registro(ruta, tgt)
+        destino = self.ruta_salida(ruta, tgt)
+        if previo is not None and previo[2] == contenido and previo[3] in (TRADUCIDO, OMITIDO):
+            self.catalogo.actualizar_stat([(st.st_size, st.st_mtime_ns, ruta, tgt)])
+            self.estadisticas['sin_cambios'] += 1
+            return
+
+        src = self.src_lang
+        try:
+            if src == 'auto':
+                src = subtitulador.detectar_idioma_entrada(ruta)
+            if src == tgt:
+                self.log(f"[DEMONIO] {ruta} ya está en '{tgt}'; se omite")
+                self.catalogo.guardar([(ruta, tgt, src, st.st_size, st.st_mtime_ns, contenido, OMITIDO, None, None)])
+                self.estadisticas['omitidos'] += 1
+                return
+            tokenizer, model, _ = subtitulador.cargar_modelo(src, tgt, lista_corta=self.lista_corta)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            tmp = os.path.join(os.path.dirname(destino), f".{os.getpid()}.{os.path.basename(destino)}")
+            t0 = time.perf_counter()
+            perfilado.iniciar_trabajo()
+            kwargs = {'perfil': self.perfil} if self.perfil else {}
+            subtitulador.traducir_archivo(ruta, tmp, tokenizer, model, src, tgt, **kwargs)
+            os.replace(tmp, destino)
+            perfilado.terminar_trabajo(self.log)
+        except Exception as e:
+            self.log(f"[DEMONIO] Error al traducir {ruta} ({src}->{tgt}): {e}")
+            self.catalogo.guardar([(ruta, tgt, src, st.st_size, st.st_mtime_ns, contenido, ERROR, None, str(e))])
+            self.estadisticas['errores'] += 1
+            return
+        self.catalogo.guardar([(ruta, tgt, src, st.st_size, st.st_mtime_ns, contenido, TRADUCIDO, destino, None)])
+        self.estadisticas['traducidos'] += 1
+        self.log(f"[DEMONIO] {ruta} ({src}->{tgt}) -> {destino} en {time.perf_counter() - t0:.1f}s")
+
+    # --- Bucle ---
+
+    def _vigilar(self):
+        """Hilo de vigilancia: inotify si se puede; si no, reconciliaciones periódicas."""
+        try:
+            inotify = _Inotify()
+            for raiz in self.directorios:
+                inotify.vigilar_arbol(raiz)
+        except OSError as e:
+            self.log(f"[DEMONIO] inotify no disponible ({e}); se revisan las carpetas cada {self.sondeo:g}s")
+            while not self._parar.wait(self.sondeo):
+                self.reconciliar()
+            return
+        self.log(f"[DEMONIO] Vigilando {len(inotify.directorios)} carpetas con inotify")
+        try:
+            while not self._parar.is_set():
+                for ruta, mascara in inotify.leer(0.5):
+                    if ruta is None:
+                        self.log('[DEMONIO] Se perdieron eventos de inotify; se reconcilia el catálogo')
+                        self.reconciliar()
+                    elif mascara & _Inotify.IN_ISDIR:
+                        if mascara & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO) and not os.path.basename(ruta).startswith('.'):
+                            # Carpeta nueva: vigilarla y encolar lo que ya traiga
+                            inotify.vigilar_arbol(ruta)
+                            for archivo, _, _ in self._recorrer(ruta):
+                                self.notificar(archivo)
+                    elif mascara & (_Inotify.IN_CLOSE_WRITE | _Inotify.IN_MOVED_TO):
+                        self.notificar(ruta)
+                    elif mascara & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM) and self.es_entrada(ruta):
+                        self.catalogo.borrar([(ruta, tgt) for tgt in self.tgt_langs])
+        except OSError as e:
+            self.log(f"[DEMONIO] Error de inotify ({e}); se revisan las carpetas cada {self.sondeo:g}s")
+            while not self._parar.wait(self.sondeo):
+                self.reconciliar()
+        finally:
+            inotify.cerrar()
+
+    def ejecutar(self, una_vez: bool = False):
+        """Reconcilia, traduce lo pendiente y (salvo una_vez) sigue vigilando hasta parar()."""
+        for raiz in self.directorios:
+            if not os.path.isdir(raiz):
+                raise FileNotFoundError(f"No existe la carpeta vigilada: {raiz}")
+        self.reconciliar()
+        if not una_vez:
+            threading.Thread(target=self._vigilar, daemon=True).start()
+        while not self._parar.is_set():
+            try:
+                ruta, tgt = self.cola.get(timeout=0.5)
+            except queue.Empty:
+                if una_vez:
+                    break
+                continue
+            self._encolados.discard((ruta, tgt))
+            self.procesar(ruta, tgt)
+        self.log(f"[DEMONIO] {self.resumen()}")
+
+    def parar(self):
+        self._parar.set()
+
+    def resumen(self) -> str:
+        e = self.estadisticas
+        catalogo = ', '.join(f"{estado} {n}" for estado, n in sorted(self.catalogo.recuento().items()))
+        return (f"traducidos {e['traducidos']} | sin cambios {e['sin_cambios']} | omitidos {e['omitidos']} | "
+                f"errores {e['errores']} | catálogo: {catalogo or 'vacío'}")
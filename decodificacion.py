@@ -0,0 +1,57 @@
+"""
+Perfiles de decodificación para model.generate.
+
+Cada perfil fija la búsqueda (voraz o por haz) y un límite de tokens nuevos
+proporcional a la longitud de la entrada, en lugar del max_length=512 fijo:
+una línea de tres palabras no necesita cientos de pasos de decodificación.
+"""
+
+# Límite absoluto del modelo (posiciones del decodificador de M2M100)
+MAX_TOKENS_MODELO = 512
+
+PERFILES_DECODIFICACION = {
+    # Voraz, con tope ajustado: lo más rápido, algo menos natural
+    'rapido': {'num_beams': 1, 'ratio': 1.5, 'margen': 8},
+    # Haz pequeño y tope intermedio
+    'equilibrado': {'num_beams': 2, 'ratio': 2.0, 'margen': 16},
+    # Búsqueda por haz como la configuración por defecto del modelo
+    'calidad': {'num_beams': 5, 'ratio': 3.0, 'margen': 32},
+    # Voraz con el tope más ajustado; no se ofrece al usuario, lo usa el modo con plazo (plazo.py)
+    'urgente': {'num_beams': 1, 'ratio': 1.2, 'margen': 4},
+}
+
+PERFIL_POR_DEFECTO = 'calidad'
+
+NOMBRES_PERFILES = {
+    'rapido': '⚡ Rápido',
+    'equilibrado': '⚖️ Equilibrado',
+    'calidad': '🎯 Calidad',
+}
+
+
+def obtener_perfil(nombre: str = None) -> dict:
+    """Devuelve el perfil por nombre; si no existe, el perfil por defecto."""
+    return PERFILES_DECODIFICACION.get(nombre or PERFIL_POR_DEFECTO,
+                                       PERFILES_DECODIFICACION[PERFIL_POR_DEFECTO])
+
+
+def max_tokens_nuevos(perfil: str, longitud_entrada: int) -> int:
+    """Tope de tokens generados para una entrada de longitud_entrada tokens."""
+    p = obtener_perfil(perfil)
+    return max(1, min(MAX_TOKENS_MODELO, int(p['ratio'] * longitud_entrada + p['margen'])))
+
+
+def argumentos_generacion(perfil: str, longitud_entrada: int) -> dict:
+    """Argumentos para model.generate según el perfil y la longitud (en tokens) de la entrada.
+
+    En un lote con relleno, longitud_entrada es la de la secuencia más larga.
+    """
+    p = obtener_perfil(perfil)
+    args = {
+        'num_beams': p['num_beams'],
+        'do_sample': False,
+        'max_new_tokens': max_tokens_nuevos(perfil, longitud_entrada),
+    }
+    if p['num_beams'] > 1:
+        args['early_stopping'] = True
+    return args
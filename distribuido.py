@@ -0,0 +1,509 @@
+"""
+Modo distribuido sin coordinador: cola de trabajo en un directorio compartido.
+
+Cualquier número de trabajadores, en uno o varios equipos, apuntan al mismo
+directorio (NFS, SMB o cualquier sistema de archivos con creación exclusiva
+y rename atómico):
+
+    cola/
+      entrada/       archivos .srt/.vtt/.txt a traducir (los deja el usuario)
+      salida/        traducciones terminadas: <nombre>.<tgt><ext>
+      planes/        reparto de cada archivo en tareas (lo fija el primer trabajador)
+      concesiones/   una concesión por tarea en curso, renovada con latidos
+      partes/        resultados de los rangos de subtítulos (o líneas) de archivos grandes
+      hechas/        marca de cada tarea terminada
+      fallidas/      marca (con el error) de cada tarea que falló; borrarla la reintenta
+
+Cada archivo es una tarea; un .srt/.vtt con más de cues_por_tarea subtítulos
+(o un .txt con más de cues_por_tarea líneas) se reparte en rangos y una
+última tarea de ensamblado escribe la salida.
+
+Una concesión se crea con O_CREAT | O_EXCL, así que solo un trabajador la
+obtiene. Su dueño actualiza la fecha de modificación cada `latido` segundos;
+si pasan `caducidad` segundos sin latido (trabajador muerto o colgado), otro
+trabajador la reclama. Los resultados se escriben en un temporal y se
+publican con os.replace: nunca hay salidas a medias, y si dos trabajadores
+llegan a publicar la misma tarea el contenido es el mismo.
+
+Los relojes de los equipos deben estar razonablemente sincronizados (NTP):
+la caducidad se compara con la hora local y debe ser mucho mayor que el
+desfase entre equipos.
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+import perfilado
+from perfilado import tramo
+from subtitulos import abrir_subtitulos
+from texto_mmap import TextoMapeado
+
+EXTENSIONES = ('.srt', '.vtt', '.txt')
+# Subtítulos (o líneas de un .txt) por tarea al repartir un archivo grande entre trabajadores
+CUES_POR_TAREA = 2000
+# Segundos sin latido tras los que una concesión se considera abandonada
+CADUCIDAD = 120.0
+# Segundos entre latidos (renovaciones) de una concesión
+LATIDO = 15.0
+# Segundos entre revisiones de la cola cuando todo lo pendiente lo tienen otros
+ESPERA = 5.0
+
+_SUBCARPETAS = ('entrada', 'salida', 'planes', 'concesiones', 'partes', 'hechas', 'fallidas')
+ENSAMBLADO = 'ensamblado'
+
+
+def _escribir_atomico(ruta: str, contenido: str):
+    """Escribe en un temporal junto a ruta y lo publica con os.replace."""
+    tmp = os.path.join(os.path.dirname(ruta), f".{uuid.uuid4().hex}.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+    os.replace(tmp, ruta)
+
+
+def _leer_json(ruta: str):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Concesion:
+    """Concesión exclusiva de una tarea: archivo creado con O_EXCL y renovado con latidos."""
+
+    def __init__(self, ruta: str, trabajador: str, caducidad: float = CADUCIDAD, latido: float = LATIDO,
+                 log=print):
+        self.ruta = ruta
+        self.trabajador = trabajador
+        self.caducidad = caducidad
+        self.latido = latido
+        self.log = log
+        # Identifica esta concesión concreta (el mismo trabajador puede volver a tomar la tarea)
+        self.ficha = uuid.uuid4().hex
+        self.perdida = threading.Event()
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def adquirir(self) -> bool:
+        """Intenta tomar la tarea; reclama la concesión si la anterior ha caducado."""
+        contenido = json.dumps({'trabajador': self.trabajador, 'host': socket.gethostname(), 'pid': os.getpid(),
+                                'ficha': self.ficha, 'desde': time.time()})
+        for _ in range(2):
+            try:
+                fd = os.open(self.ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._reclamar_caducada():
+                    return False
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(contenido)
+            self._hilo = threading.Thread(target=self._latir, daemon=True)
+            self._hilo.start()
+            return True
+        return False
+
+    def _reclamar_caducada(self) -> bool:
+        """Retira la concesión existente si ha caducado. True si se puede volver a intentar crearla."""
+        try:
+            edad = time.time() - os.stat(self.ruta).st_mtime
+        except FileNotFoundError:
+            return True
+        if edad < self.caducidad:
+            return False
+        # Apartarla con rename: entre varios que la vean caducada, solo uno lo consigue
+        apartada = f"{self.ruta}.{self.ficha}"
+        try:
+            os.rename(self.ruta, apartada)
+        except FileNotFoundError:
+            return True
+        try:
+            anterior = _leer_json(apartada) or {}
+            if time.time() - os.stat(apartada).st_mtime < self.caducidad:
+                # Otro la reclamó y la renovó justo antes del rename: devolvérsela si sigue libre
+                try:
+                    os.link(apartada, self.ruta)
+                except OSError:
+                    pass
+                return False
+            self.log(f"[COLA] Concesión caducada de {anterior.get('trabajador', '?')} reclamada: "
+                     f"{os.path.basename(self.ruta)}")
+            return True
+        finally:
+            try:
+                os.unlink(apartada)
+            except OSError:
+                pass
+
+    def vigente(self) -> bool:
+        """True si la concesión sigue siendo de este trabajador."""
+        if self.perdida.is_set():
+            return False
+        datos = _leer_json(self.ruta)
+        return bool(datos) and datos.get('ficha') == self.ficha
+
+    def _latir(self):
+        while not self._parar.wait(self.latido):
+            if not self.vigente():
+                self.perdida.set()
+                self.log(f"[COLA] Concesión perdida: {os.path.basename(self.ruta)}")
+                return
+            try:
+                ahora = time.time()
+                os.utime(self.ruta, (ahora, ahora))
+            except OSError:
+                pass
+
+    def liberar(self):
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+        if self.vigente():
+            try:
+                os.unlink(self.ruta)
+            except OSError:
+                pass
+
+
+class Tarea:
+    """Unidad de trabajo: un archivo completo, un rango [inicio, fin) de subtítulos o el ensamblado."""
+
+    __slots__ = ('archivo', 'inicio', 'fin', 'ensamblado')
+
+    def __init__(self, archivo: str, inicio: int = None, fin: int = None, ensamblado: bool = False):
+        self.archivo = archivo
+        self.inicio = inicio
+        self.fin = fin
+        self.ensamblado = ensamblado
+
+    @property
+    def id(self) -> str:
+        if self.ensamblado:
+            return f"{self.archivo}@{ENSAMBLADO}"
+        if self.inicio is None:
+            return self.archivo
+        return f"{self.archivo}@{self.inicio:07d}-{self.fin:07d}"
+
+    def __repr__(self):
+        return f"Tarea({self.id})"
+
+
+class Trabajador:
+    """Trabajador de la cola: toma tareas libres (o caducadas), las traduce y publica el resultado."""
+
+    def __init__(self, directorio: str, tgt_lang: str, src_lang: str = 'auto', perfil: str = None,
+                 cues_por_tarea: int = CUES_POR_TAREA, caducidad: float = CADUCIDAD, latido: float = LATIDO,
+                 espera: float = ESPERA, nombre: str = None, lista_corta: bool = False, log=print):
+        self.directorio = directorio
+        self.tgt_lang = tgt_lang
+        self.src_lang = src_lang
+        self.perfil = perfil
+        self.cues_por_tarea = max(1, int(cues_por_tarea))
+        self.caducidad = caducidad
+        self.latido = min(latido, caducidad / 3)
+        self.espera = espera
+        self.nombre = nombre or f"{socket.gethostname()}-{os.getpid()}"
+        self.lista_corta = lista_corta
+        self.log = log
+        for carpeta in _SUBCARPETAS:
+            os.makedirs(self._ruta(carpeta), exist_ok=True)
+
+    def _ruta(self, *partes) -> str:
+        return os.path.join(self.directorio, *partes)
+
+    def ruta_salida(self, archivo: str) -> str:
+        nombre, ext = os.path.splitext(archivo)
+        return self._ruta('salida', f"{nombre}.{self.tgt_lang}{ext}")
+
+    # --- Reparto ---
+
+    def archivos(self) -> list:
+        return sorted(a for a in os.listdir(self._ruta('entrada'))
+                      if not a.startswith('.') and os.path.splitext(a)[1].lower() in EXTENSIONES
+                      and os.path.isfile(self._ruta('entrada', a)))
+
+    def plan(self, archivo: str) -> dict:
+        """Reparto del archivo en tareas e idioma origen; el primer trabajador que lo calcula lo fija."""
+        ruta = self._ruta('planes', archivo + '.json')
+        plan = _leer_json(ruta)
+        if plan is not None:
+            return plan
+        entrada = self._ruta('entrada', archivo)
+        rangos, textos = None, None
+        if os.path.splitext(archivo)[1].lower() in ('.srt', '.vtt'):
+            textos = abrir_subtitulos(entrada, encoding='utf-8').textos
+            if len(textos) > self.cues_por_tarea:
+                rangos = [[i, min(len(textos), i + self.cues_por_tarea)]
+                          for i in range(0, len(textos), self.cues_por_tarea)]
+        else:
+            # .txt: rangos de líneas con un número parecido de bytes, sin cargar el archivo
+            with TextoMapeado(entrada) as texto:
+                if len(texto) > self.cues_por_tarea:
+                    rangos = texto.rangos(-(-len(texto) // self.cues_por_tarea))
+        src = self.src_lang
+        if src == 'auto':
+            import subtitulador
+            if textos is not None:
+                src = subtitulador.detectar_idioma_archivo(entrada)
+            else:
+                with open(entrada, 'r', encoding='utf-8', errors='ignore') as f:
+                    src = subtitulador.detectar_idioma_texto(f.read(200000))
+        plan = {'archivo': archivo, 'src': src, 'tgt': self.tgt_lang, 'rangos': rangos,
+                'cues': len(textos) if textos is not None else None}
+        # Publicar con link: falla si otro trabajador lo fijó mientras tanto, y entonces vale el suyo
+        tmp = self._ruta('planes', f".{uuid.uuid4().hex}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, ensure_ascii=False)
+        try:
+            os.link(tmp, ruta)
+        except FileExistsError:
+            plan = _leer_json(ruta) or plan
+        finally:
+            os.unlink(tmp)
+        return plan
+
+    def tareas(self, archivo: str, plan: dict) -> list:
+        if not plan.get('rangos'):
+            return [Tarea(archivo)]
+        return [Tarea(archivo, ini, fin) for ini, fin in plan['rangos']] + [Tarea(archivo, ensamblado=True)]
+
+    def hecha(self, tarea: Tarea) -> bool:
+        return os.path.exists(self._ruta('hechas', tarea.id))
+
+    def fallida(self, tarea: Tarea) -> bool:
+        return os.path.exists(self._ruta('fallidas', tarea.id))
+
+    def _ruta_parte(self, tarea: Tarea) -> str:
+        return self._ruta('partes', f"{tarea.id}.json")
+
+    def pendientes(self) -> list:
+        """(tarea, plan) de todo lo que no está hecho ni fallido, en orden de archivo."""
+        resultado = []
+        for archivo in self.archivos():
+            try:
+                plan = self.plan(archivo)
+            except Exception as e:
+                self.log(f"[COLA] No se pudo repartir {archivo}: {e}")
+                continue
+            tareas = [t for t in self.tareas(archivo, plan) if not self.hecha(t) and not self.fallida(t)]
+            for t in tareas:
+                # El ensamblado solo se puede tomar cuando todos los rangos están hechos
+                if t.ensamblado and len(tareas) > 1:
+                    continue
+                resultado.append((t, plan))
+        return resultado
+
+    # --- Bucle ---
+
+    def ejecutar(self, esperar: bool = True) -> int:
+        """Procesa tareas hasta que no quede nada pendiente. Devuelve cuántas completó este trabajador.
+
+        Con esperar=True sigue revisando mientras otros tengan tareas en curso,
+        para reclamarlas si su trabajador muere.
+        """
+        self.log(f"[COLA] Trabajador {self.nombre} en {self.directorio} (-> {self.tgt_lang})")
+        perfilado.iniciar_trabajo()
+        completadas = 0
+        while True:
+            pendientes = self.pendientes()
+            tomada = False
+            for tarea, plan in pendientes:
+                concesion = Concesion(self._ruta('concesiones', tarea.id + '.lease'), self.nombre,
+                                      self.caducidad, self.latido, self.log)
+                if not concesion.adquirir():
+                    continue
+                try:
+                    # Pudo terminarla otro entre la revisión y la concesión
+                    if self.hecha(tarea):
+                        continue
+                    completadas += self._procesar(tarea, plan, concesion)
+                finally:
+                    concesion.liberar()
+                tomada = True
+                break
+            if tomada:
+                continue
+            if not pendientes or not esperar:
+                break
+            time.sleep(self.espera)
+        self.log(f"[COLA] Trabajador {self.nombre}: {completadas} tareas completadas")
+        perfilado.terminar_trabajo(self.log)
+        return completadas
+
+    def _procesar(self, tarea: Tarea, plan: dict, concesion: Concesion) -> int:
+        t0 = time.perf_counter()
+        try:
+            publicar = self._ejecutar_tarea(tarea, plan, concesion)
+        except Exception as e:
+            self.log(f"[COLA] Falló {tarea.id}: {e}")
+            _escribir_atomico(self._ruta('fallidas', tarea.id),
+                              json.dumps({'trabajador': self.nombre, 'error': str(e), 'fecha': time.time()}))
+            return 0
+        if publicar is None:
+            self.log(f"[COLA] Se descarta {tarea.id}: la concesión ya no es de este trabajador")
+            return 0
+        segundos = time.perf_counter() - t0
+        _escribir_atomico(self._ruta('hechas', tarea.id),
+                          json.dumps({'trabajador': self.nombre, 'segundos': round(segundos, 3), 'fecha': time.time()}))
+        self.log(f"[COLA] {tarea.id} completada en {segundos:.1f}s")
+        return 1
+
+    def _ejecutar_tarea(self, tarea: Tarea, plan: dict, concesion: Concesion):
+        """Traduce la tarea a un temporal y lo publica si la concesión sigue vigente. None si se perdió."""
+        import subtitulador
+
+        entrada = self._ruta('entrada', tarea.archivo)
+        src, tgt = plan['src'], plan['tgt']
+        es_txt = os.path.splitext(tarea.archivo)[1].lower() == '.txt'
+        if tarea.ensamblado:
+            destino = self.ruta_salida(tarea.archivo)
+            tmp = self._temporal(destino)
+            if es_txt:
+                with TextoMapeado(entrada) as texto, open(tmp, 'wb') as f, tramo('escritura'):
+                    for ini, fin in plan['rangos']:
+                        texto.escribir(f, self._leer_parte(tarea.archivo, ini, fin), ini)
+                return self._publicar(tmp, destino, concesion)
+            subs = abrir_subtitulos(entrada, encoding='utf-8')
+            for ini, fin in plan['rangos']:
+                for i, traducido in enumerate(self._leer_parte(tarea.archivo, ini, fin), start=ini):
+                    subs.fijar_texto(i, traducido)
+            with tramo('escritura'):
+                subs.guardar(tmp, encoding='utf-8', formato=subs.formato)
+            return self._publicar(tmp, destino, concesion)
+
+        if tarea.inicio is None:
+            destino = self.ruta_salida(tarea.archivo)
+            tmp = self._temporal(destino)
+            ext = os.path.splitext(tarea.archivo)[1].lower()
+            if src == tgt:
+                shutil.copyfile(entrada, tmp)
+            else:
+                tokenizer, model, _ = subtitulador.cargar_modelo(src, tgt, lista_corta=self.lista_corta)
+                if ext == '.txt':
+                    subtitulador.traducir_txt_a_txt_preservando_lineas(entrada, tmp, tokenizer, model, src, tgt,
+                                                                       **self._perfil())
+                else:
+                    subtitulador.traducir_srt(entrada, tmp, tokenizer, model, src, tgt, **self._perfil())
+            return self._publicar(tmp, destino, concesion)
+
+        # Rango de subtítulos (o de líneas de un .txt) de un archivo grande: el resultado es la lista traducida
+        with tramo('lectura'):
+            if es_txt:
+                with TextoMapeado(entrada) as texto:
+                    textos = list(texto.lineas(tarea.inicio, tarea.fin))
+            else:
+                textos = abrir_subtitulos(entrada, encoding='utf-8').textos[tarea.inicio:tarea.fin]
+        if src == tgt:
+            traducidos = list(textos)
+        else:
+            tokenizer, model, _ = subtitulador.cargar_modelo(src, tgt, lista_corta=self.lista_corta)
+            if es_txt:
+                traducidos = subtitulador.traducir_lineas(textos, tokenizer, model, src, tgt, **self._perfil())
+            else:
+                traducidos = subtitulador._traducir_unidades(textos, tokenizer, model, src, tgt, **self._perfil())
+        destino = self._ruta_parte(tarea)
+        tmp = self._temporal(destino)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(traducidos, f, ensure_ascii=False)
+        return self._publicar(tmp, destino, concesion)
+
+    def _leer_parte(self, archivo: str, ini: int, fin: int) -> list:
+        parte = _leer_json(self._ruta_parte(Tarea(archivo, ini, fin)))
+        if parte is None or len(parte) != fin - ini:
+            raise RuntimeError(f"falta o está incompleta la parte {ini}-{fin}")
+        return parte
+
+    def _perfil(self) -> dict:
+        return {'perfil': self.perfil} if self.perfil else {}
+
+    def _temporal(self, destino: str) -> str:
+        # Conserva la extensión: traducir_srt decide el formato por ella
+        return os.path.join(os.path.dirname(destino), f".{uuid.uuid4().hex}.{os.path.basename(destino)}")
+
+    def _publicar(self, tmp: str, destino: str, concesion: Concesion):
+        if not concesion.vigente():
+            os.unlink(tmp)
+            return None
+        os.replace(tmp, destino)
+        return destino
+
+    # --- Estado ---
+
+    def estado(self) -> dict:
+        """Recuento de tareas y concesiones en curso (sin tomar ninguna)."""
+        resumen = {'archivos': 0, 'tareas': 0, 'hechas': 0, 'fallidas': 0, 'en_curso': [], 'caducadas': []}
+        ahora = time.time()
+        for archivo in self.archivos():
+            plan = _leer_json(self._ruta('planes', archivo + '.json'))
+            resumen['archivos'] += 1
+            tareas = self.tareas(archivo, plan) if plan else [Tarea(archivo)]
+            resumen['tareas'] += len(tareas)
+            resumen['hechas'] += sum(self.hecha(t) for t in tareas)
+            resumen['fallidas'] += sum(self.fallida(t) for t in tareas)
+        for nombre in sorted(os.listdir(self._ruta('concesiones'))):
+            if not nombre.endswith('.lease'):
+                continue
+            ruta = self._ruta('concesiones', nombre)
+            try:
+                edad = ahora - os.stat(ruta).st_mtime
+            except OSError:
+                continue
+            datos = _leer_json(ruta) or {}
+            entrada = (nombre[:-len('.lease')], datos.get('trabajador', '?'), round(edad, 1))
+            resumen['caducadas' if edad >= self.caducidad else 'en_curso'].append(entrada)
+        return resumen
+
+    def resumen_estado(self) -> str:
+        e = self.estado()
+        lineas = [f"[COLA] {e['archivos']} archivos | {e['hechas']}/{e['tareas']} tareas hechas | "
+                  f"{e['fallidas']} fallidas | {len(e['en_curso'])} en curso | {len(e['caducadas'])} caducadas"]
+        for tarea, trabajador, edad in e['en_curso']:
+            lineas.append(f"  {tarea:50s} {trabajador} (último latido hace {edad}s)")
+        for tarea, trabajador, edad in e['caducadas']:
+            lineas.append(f"  {tarea:50s} {trabajador} CADUCADA (hace {edad}s)")
+        return '\n'.join(lineas)
+
+
+def _proceso_trabajador(directorio: str, tgt_lang: str, procesos: int, esperar: bool, precision: str,
+                        opciones: dict):
+    from autoajuste import aplicar_ajuste, nucleos_fisicos
+    import torch
+    import subtitulador
+    subtitulador.precision_modelo = precision
+    ajuste = aplicar_ajuste(en_grupo=True)
+    if ajuste is None or ajuste['trabajadores'] != procesos:
+        # Sin perfil para este tamaño de grupo: repartir los núcleos en lugar de que cada proceso use todos
+        torch.set_num_threads(max(1, nucleos_fisicos() // procesos))
+    Trabajador(directorio, tgt_lang, **opciones).ejecutar(esperar=esperar)
+
+
+def ejecutar_procesos(procesos: int, directorio: str, tgt_lang: str, esperar: bool = True, nombre: str = None,
+                      precision: str = 'fp32', **opciones) -> int:
+    """Lanza 'procesos' trabajadores en este equipo, cada uno en su proceso y con su modelo. Devuelve cuántos fallaron.
+
+    Cada proceso usa los hilos por trabajador del autoajuste (autoajuste.py) o,
+    sin perfil para ese número de procesos, núcleos / procesos hilos. precision es
+    la ya resuelta ('fp32' o 'bf16') con que cada proceso carga el modelo.
+    """
+    import multiprocessing
+    ctx = multiprocessing.get_context('spawn')
+    base = nombre or f"{socket.gethostname()}-{os.getpid()}"
+    grupo = [ctx.Process(target=_proceso_trabajador,
+                         args=(directorio, tgt_lang, procesos, esperar, precision,
+                               dict(opciones, nombre=f"{base}-{i}")))
+             for i in range(procesos)]
+    for proceso in grupo:
+        proceso.start()
+    try:
+        for proceso in grupo:
+            proceso.join()
+    except KeyboardInterrupt:
+        for proceso in grupo:
+            proceso.terminate()
+            proceso.join()
+        raise
+    return sum(proceso.exitcode != 0 for proceso in grupo)
@@ -0,0 +1,196 @@
+"""
+Unión de subtítulos por frase.
+
+Una frase suele repartirse en dos o tres subtítulos seguidos ("I told you" /
+"we'd be late."): traducidos por separado, cada trozo es una secuencia más
+para el modelo y la traducción sale fragmentada (el orden de las palabras
+cambia entre idiomas). UnionFrases junta los subtítulos de una misma frase
+en una unidad, la traduce una vez y reparte la traducción entre los
+subtítulos originales, en proporción a su duración, sin tocar los tiempos.
+
+Un subtítulo sigue en el siguiente si:
+- no termina en fin de frase (. ? ! …, con comillas o cierres detrás); unos
+  puntos suspensivos finales solo cuentan como continuación si el siguiente
+  empieza por puntos suspensivos o por minúscula;
+- el hueco entre ambos no pasa de HUECO_MAX_MS;
+- ninguno es un diálogo (líneas que empiezan por guion) ni lleva etiquetas;
+- la frase no pasa de MAX_SUBTITULOS subtítulos ni de MAX_CARACTERES.
+
+El reparto corta entre palabras, cerca del punto que toca a cada subtítulo
+por su duración, y prefiere cortar tras una coma o un punto si queda cerca.
+Cada trozo se envuelve en líneas con la función que se pasa (la de
+subtitulador.py). Si la traducción tiene menos palabras que subtítulos, esa
+frase se traduce subtítulo a subtítulo.
+"""
+
+import itertools
+import re
+
+# Hueco máximo (ms) entre dos subtítulos de una misma frase
+HUECO_MAX_MS = 1500
+MAX_SUBTITULOS = 3
+MAX_CARACTERES = 240
+# Ancho mínimo de línea al envolver un trozo (el de la línea más larga del original si es mayor)
+MAX_CHARS_LINEA = 42
+# Ventaja de cortar tras una pausa frente al punto proporcional (fracción de la longitud media de un trozo)
+VENTAJA_PAUSA = 0.3
+
+_RE_FIN_FRASE = re.compile(r'[.?!…。？！]["\'»”’)\]]*$')
+_RE_SUSPENSIVOS_FIN = re.compile(r'\s*(?:\.\.\.|…)$')
+_RE_SUSPENSIVOS_INICIO = re.compile(r'^(?:\.\.\.|…)\s*')
+_RE_ETIQUETAS = re.compile(r'<[^>]+>|\{[^}]*\}')
+_PAUSAS = ',;:.?!…'
+
+
+def _limpio(texto: str) -> str:
+    return ' '.join((texto or '').split())
+
+
+def _es_dialogo(texto: str) -> bool:
+    return any(linea.lstrip().startswith(('-', '–', '—')) for linea in texto.splitlines())
+
+
+def continua(actual: str, siguiente: str) -> bool:
+    """True si, por su puntuación, la frase de actual sigue en siguiente."""
+    a, s = _limpio(actual), _limpio(siguiente)
+    if not a or not s:
+        return False
+    if _es_dialogo(actual) or _es_dialogo(siguiente) or _RE_ETIQUETAS.search(a) or _RE_ETIQUETAS.search(s):
+        return False
+    if _RE_SUSPENSIVOS_FIN.search(a):
+        return bool(_RE_SUSPENSIVOS_INICIO.match(s)) or s[0].islower()
+    return not _RE_FIN_FRASE.search(a)
+
+
+def agrupar(textos: list, inicios, fines, hueco_max_ms: int = HUECO_MAX_MS) -> list:
+    """Grupos de índices consecutivos que forman una frase (los demás, de uno en uno)."""
+    grupos = []
+    for i, texto in enumerate(textos):
+        if grupos:
+            grupo = grupos[-1]
+            j = grupo[-1]
+            if (len(grupo) < MAX_SUBTITULOS and inicios[i] - fines[j] <= hueco_max_ms
+                    and sum(len(textos[k]) for k in grupo) + len(texto) <= MAX_CARACTERES
+                    and continua(textos[j], texto)):
+                grupo.append(i)
+                continue
+        grupos.append([i])
+    return grupos
+
+
+def unir(textos: list) -> str:
+    """Texto de la frase: los trozos en una línea, sin los puntos suspensivos que los enlazaban."""
+    frase = ''
+    for texto in map(_limpio, textos):
+        if frase and _RE_SUSPENSIVOS_FIN.search(frase) and _RE_SUSPENSIVOS_INICIO.match(texto):
+            frase = _RE_SUSPENSIVOS_FIN.sub('', frase)
+            texto = _RE_SUSPENSIVOS_INICIO.sub('', texto)
+        frase = f"{frase} {texto}" if frase else texto
+    return frase
+
+
+def repartir(texto: str, pesos: list) -> list:
+    """Parte texto entre palabras en len(pesos) trozos proporcionales a pesos; None si no hay palabras para todos."""
+    palabras = texto.split()
+    n = len(pesos)
+    if len(palabras) < n:
+        return None
+    if n == 1:
+        return [' '.join(palabras)]
+    # Caracteres hasta el final de cada palabra (con su espacio)
+    finales = list(itertools.accumulate(len(p) + 1 for p in palabras))
+    total = finales[-1]
+    suma = sum(pesos)
+    ventaja = VENTAJA_PAUSA * total / n
+    piezas, desde, acumulado = [], 0, 0
+    for j in range(n - 1):
+        acumulado += pesos[j]
+        objetivo = total * acumulado / suma
+
+        def coste(k):
+            # k: última palabra del trozo j
+            return abs(finales[k] - objetivo) - (ventaja if palabras[k][-1] in _PAUSAS else 0)
+
+        # Al menos una palabra para este trozo y para cada uno de los que faltan
+        k = min(range(desde, len(palabras) - (n - j) + 1), key=coste)
+        piezas.append(' '.join(palabras[desde:k + 1]))
+        desde = k + 1
+    piezas.append(' '.join(palabras[desde:]))
+    return piezas
+
+
+class UnionFrases:
+    """Traducción por frases de los subtítulos de un archivo, devuelta subtítulo a subtítulo."""
+
+    def __init__(self, textos: list, inicios, fines, hueco_max_ms: int = HUECO_MAX_MS):
+        self.textos = list(textos)
+        self.duraciones = [max(1, fin - ini) for ini, fin in zip(inicios, fines)]
+        self.grupos = agrupar(self.textos, inicios, fines, hueco_max_ms)
+        self.unidades = [self.textos[g[0]] if len(g) == 1 else unir([self.textos[k] for k in g])
+                         for g in self.grupos]
+        self.sueltos = 0
+        self.llamadas = None
+        self.llamadas_sin_union = None
+        self.llamadas_sueltos = 0
+
+    def traducir(self, traducir, envolver, contar_lotes=None, fallos=None) -> list:
+        """Traducción de cada subtítulo original.
+
+        traducir(textos, posiciones) -> lista traduce unidades (y, si hace falta,
+        subtítulos sueltos); posiciones[i] son los índices de los subtítulos
+        originales de textos[i]. envolver(texto, max_chars) reparte un trozo en
+        líneas.
+        contar_lotes(textos) -> int, si se da, estima las llamadas a generate
+        con y sin unión para el resumen. fallos (lotes.InformeFallos) es el
+        informe que rellena traducir: las unidades que contiene no se
+        tradujeron y se dejan los originales. Una traducción igual al original
+        ("OK.", un nombre) no es un fallo.
+        """
+        traducidas = traducir(self.unidades, self.grupos)
+        resultado = list(self.textos)
+        sueltos = []
+        for grupo, unidad, traduccion in zip(self.grupos, self.unidades, traducidas):
+            if len(grupo) == 1:
+                resultado[grupo[0]] = traduccion
+                continue
+            if fallos is not None and unidad in fallos:
+                continue
+            piezas = repartir(traduccion, [self.duraciones[k] for k in grupo])
+            if piezas is None:
+                sueltos.extend(grupo)
+                continue
+            for k, pieza in zip(grupo, piezas):
+                ancho = max([MAX_CHARS_LINEA] + [len(linea) for linea in self.textos[k].splitlines()])
+                resultado[k] = envolver(pieza, ancho)
+        if sueltos:
+            for k, traduccion in zip(sueltos, traducir([self.textos[k] for k in sueltos], [[k] for k in sueltos])):
+                resultado[k] = traduccion
+        self.sueltos = len(sueltos)
+        if contar_lotes is not None:
+            self.llamadas_sin_union = contar_lotes(self.textos)
+            self.llamadas_sueltos = contar_lotes([self.textos[k] for k in sueltos]) if sueltos else 0
+            self.llamadas = contar_lotes(self.unidades) + self.llamadas_sueltos
+        return resultado
+
+    def resumen(self) -> str:
+        """Secuencias y llamadas con unión frente a sin ella, contando lo que se volvió a traducir suelto."""
+        subtitulos = sum(1 for t in self.textos if t and t.strip())
+        unidades = sum(1 for t in self.unidades if t and t.strip()) + self.sueltos
+        frases = [g for g in self.grupos if len(g) > 1]
+        ahorro = subtitulos - unidades
+        texto = (f"[FRASES] {subtitulos} subtítulos -> {unidades} secuencias para el modelo "
+                 f"({sum(map(len, frases))} subtítulos unidos en {len(frases)} frases, "
+                 + (f"{ahorro} secuencias menos" if ahorro >= 0 else f"{-ahorro} secuencias más"))
+        if self.sueltos:
+            texto += f"; {self.sueltos} subtítulos repartidos uno a uno"
+        texto += ")"
+        if self.llamadas is not None:
+            texto += f" | ~{self.llamadas} llamadas a generate en lugar de {self.llamadas_sin_union} "
+            eliminadas = self.llamadas_sin_union - self.llamadas
+            if eliminadas < 0:
+                texto += f"({-eliminadas} llamadas extra por reparto fallido)"
+            elif self.llamadas_sueltos:
+                texto += f"({eliminadas} eliminadas, descontadas {self.llamadas_sueltos} por reparto fallido)"
+            else:
+                texto += f"({eliminadas} eliminadas)"
+        return texto
@@ -0,0 +1,363 @@
+"""
+Identificación de idioma integrada e idioma por subtítulo.
+
+Detección: sin langdetect (lento al iniciar y no determinista sin semilla).
+Primero se mira la escritura dominante del texto, que basta para la mayoría de
+idiomas (coreano, japonés, chino, tailandés, griego, hebreo, árabe, hindi,
+bengalí). Para los de escritura latina o cirílica se puntúa con un modelo de
+n-gramas de caracteres (1 a 3) por idioma: cada n-grama se reduce por hash a
+una de CUBETAS columnas y la puntuación de un texto es la suma del log de la
+probabilidad de sus n-gramas en cada idioma (Bayes ingenuo). Todo se hace con
+NumPy y por lotes: los textos se concatenan, se calculan los hashes de todas
+las posiciones a la vez y se suman por texto con np.add.reduceat.
+
+Los pesos están precalculados en idiomas.npz (uint8 cuantizado, ~CUBETAS x 21
+bytes), que se carga una sola vez; construir_perfil() lo regenera a partir de
+los perfiles de n-gramas que incluye el paquete langdetect. El malayo ('ms')
+no tiene perfil: se detecta como indonesio.
+
+Idioma por subtítulo: hay archivos mezclados (una película en español con
+escenas en inglés). EnrutadoIdiomas detecta el idioma de cada subtítulo y
+traduce por separado los grupos de cada idioma, cada uno con su src_lang. Los
+subtítulos que ya están en el idioma destino se dejan tal cual. Un subtítulo
+corto (menos de MIN_LETRAS letras) toma el idioma del último subtítulo con
+detección fiable; si no lo hay, el idioma por defecto (el del archivo). Así
+las réplicas breves («OK», «¿Qué?») siguen a su escena. Uno de detección
+dudosa (probabilidad menor que PROBABILIDAD_MIN, o idioma no admitido) se
+queda con el más probable de esos dos según su propia distribución.
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from perfilado import tramo
+
+# Letras mínimas para fiarse de la detección de un subtítulo
+MIN_LETRAS = 10
+# Probabilidad mínima de la detección de un subtítulo
+PROBABILIDAD_MIN = 0.9
+
+RUTA_PERFIL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'idiomas.npz')
+# Columnas del hash de n-gramas (potencia de 2)
+CUBETAS = 1 << 14
+# Divisor de las puntuaciones antes de pasarlas a probabilidades: cada carácter
+# aparece en tres n-gramas solapados y, sin él, la probabilidad sale demasiado segura
+TEMPERATURA = 3.0
+# Textos por lote al puntuar (acota la memoria temporal)
+LOTE_DETECCION = 2048
+# Idiomas que se distinguen por n-gramas, por escritura
+IDIOMAS_LATINOS = ('en', 'es', 'de', 'fr', 'it', 'pt', 'nl', 'pl', 'sv', 'no', 'da', 'fi', 'tr', 'ro', 'cs',
+                   'hu', 'id', 'vi')
+IDIOMAS_CIRILICOS = ('ru', 'uk', 'bg')
+
+# Escrituras: rangos de puntos de código y el idioma que implican (None: decidir por n-gramas)
+_LATINA, _CIRILICA, _KANA, _HAN = 1, 2, 3, 4
+_ESCRITURAS = (
+    (_LATINA, None, ((0x41, 0x24F), (0x1E00, 0x1EFF))),
+    (_CIRILICA, None, ((0x400, 0x52F),)),
+    (_KANA, 'ja', ((0x3040, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F))),
+    (_HAN, 'zh', ((0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF))),
+    (5, 'el', ((0x370, 0x3FF), (0x1F00, 0x1FFF))),
+    (6, 'he', ((0x590, 0x5FF),)),
+    (7, 'ar', ((0x600, 0x6FF), (0x750, 0x77F), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF))),
+    (8, 'hi', ((0x900, 0x97F),)),
+    (9, 'bn', ((0x980, 0x9FF),)),
+    (10, 'th', ((0xE00, 0xE7F),)),
+    (11, 'ko', ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF))),
+)
+_NUM_ESCRITURAS = 12
+
+
+def _tabla_escrituras() -> tuple:
+    rangos = sorted((ini, fin, ident) for ident, _, tramos in _ESCRITURAS for ini, fin in tramos)
+    bordes, clases = [0], [0]
+    for ini, fin, ident in rangos:
+        bordes += [ini, fin + 1]
+        clases += [ident, 0]
+    return np.array(bordes, dtype=np.uint32), np.array(clases, dtype=np.int64)
+
+
+_BORDES, _CLASES = _tabla_escrituras()
+# Todos los idiomas detectables: los de n-gramas (en el orden del perfil) y los de escritura propia
+CODIGOS = IDIOMAS_LATINOS + IDIOMAS_CIRILICOS + tuple(idioma for _, idioma, _ in _ESCRITURAS if idioma)
+_COLUMNA_ESCRITURA = np.zeros(_NUM_ESCRITURAS, dtype=np.int64)
+for _ident, _idioma, _ in _ESCRITURAS:
+    if _idioma:
+        _COLUMNA_ESCRITURA[_ident] = CODIGOS.index(_idioma)
+
+# Normalización como la de los perfiles de langdetect: ș/ț rumanas con cedilla, vocales vietnamitas agrupadas
+_TRADUCCION = str.maketrans({'\u0219': '\u015f', '\u021b': '\u0163'})
+_NO_LETRAS = re.compile(r'[\W\d_]+')
+_ETIQUETAS = re.compile(r'<[^>]*>|\{[^}]*\}')
+_SEPARADOR = 0  # entre textos concatenados; ningún n-grama lo cruza
+_ESPACIO = 32
+
+
+def normalizar_codigo(codigo: str) -> str:
+    """Código de langdetect a código de M2M100 ('zh-cn' -> 'zh')."""
+    return 'zh' if codigo.startswith('zh') else codigo
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize('NFC', texto or '').lower().translate(_TRADUCCION)
+    return _NO_LETRAS.sub(' ', texto).strip()
+
+
+def _limpiar(texto: str) -> str:
+    """Texto sin etiquetas de formato (<i>, {\\an8})."""
+    return _ETIQUETAS.sub(' ', texto or '').strip()
+
+
+def _codigos(textos: list) -> np.ndarray:
+    """Puntos de código de ' t1 ', ' t2 '... separados por _SEPARADOR (uno también al principio)."""
+    unido = '\x00' + '\x00'.join(f" {t} " for t in textos) + '\x00'
+    return _agrupar_vietnamita(np.frombuffer(unido.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64))
+
+
+def _agrupar_vietnamita(c: np.ndarray) -> np.ndarray:
+    c[(c >= 0x1EA0) & (c <= 0x1EFF)] = 0x1EC3
+    return c
+
+
+_SEMILLA = 0x27D4EB2F165667C5
+_PRIMOS = tuple(np.uint64(p) for p in (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9))
+
+
+def _cubetas(columnas: list) -> np.ndarray:
+    """Cubeta de cada n-grama, dados sus caracteres por columnas (arrays uint64)."""
+    h = np.full(len(columnas[0]), (len(columnas) * _SEMILLA) & 0xFFFFFFFFFFFFFFFF, dtype=np.uint64)
+    for columna, primo in zip(columnas, _PRIMOS):
+        h += columna * primo
+    h ^= h >> np.uint64(29)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(32)
+    return (h & np.uint64(CUBETAS - 1)).astype(np.int64)
+
+
+def _hashes(c: np.ndarray) -> tuple:
+    """(cubetas, posiciones) de los n-gramas de 1 a 3 caracteres de c, como los de langdetect."""
+    es_sep = c == _SEPARADOR
+    es_esp = c == _ESPACIO
+    # Unigramas: letras; bigramas: sin separador y no dos espacios; trigramas: sin separador ni espacio central
+    validos = (
+        ~es_sep & ~es_esp,
+        ~es_sep[:-1] & ~es_sep[1:] & ~(es_esp[:-1] & es_esp[1:]),
+        ~es_sep[:-2] & ~es_sep[1:-1] & ~es_sep[2:] & ~es_esp[1:-1],
+    )
+    cubetas, posiciones = [], []
+    for k, valido in enumerate(validos, start=1):
+        pos = np.flatnonzero(valido)
+        cubetas.append(_cubetas([c[pos + j] for j in range(k)]))
+        posiciones.append(pos)
+    return np.concatenate(cubetas), np.concatenate(posiciones)
+
+
+# --- Perfil ---
+
+def construir_perfil(ruta: str = RUTA_PERFIL, origen: str = None) -> str:
+    """Genera el archivo de pesos a partir de los perfiles de langdetect (directorio origen)."""
+    if origen is None:
+        import langdetect
+        origen = os.path.join(os.path.dirname(langdetect.__file__), 'profiles')
+    idiomas = IDIOMAS_LATINOS + IDIOMAS_CIRILICOS
+    logp = np.empty((CUBETAS, len(idiomas)), dtype=np.float64)
+    for col, idioma in enumerate(idiomas):
+        with open(os.path.join(origen, idioma), encoding='utf-8') as f:
+            perfil = json.load(f)
+        # Sin distinguir mayúsculas (el texto se pasa a minúsculas al detectar)
+        frecuencias = Counter()
+        for ngrama, n in perfil['freq'].items():
+            minusculas = ngrama.lower()
+            if len(minusculas) == len(ngrama):
+                frecuencias[minusculas] += n
+        ngramas = list(frecuencias)
+        largos = np.array([len(g) for g in ngramas])
+        cuentas = np.array([frecuencias[g] for g in ngramas], dtype=np.float64)
+        totales = np.array(perfil['n_words'], dtype=np.float64)
+        cubetas = np.empty(len(ngramas), dtype=np.int64)
+        for k in (1, 2, 3):
+            indices = np.flatnonzero(largos == k)
+            chars = np.array([[ord(ch) for ch in ngramas[i]] for i in indices], dtype=np.uint64).reshape(-1, k)
+            cubetas[indices] = _cubetas([_agrupar_vietnamita(chars[:, j].copy()) for j in range(k)])
+        # Probabilidad de cada cubeta; las vacías (n-gramas poco frecuentes, podados del perfil) con la mínima / 2
+        prob = np.bincount(cubetas, weights=cuentas / totales[largos - 1], minlength=CUBETAS)
+        logp[:, col] = np.log(np.maximum(prob, 0.5 * prob[prob > 0].min()))
+    # Restar la media por cubeta no cambia la comparación entre idiomas y acota el rango a cuantizar
+    logp -= logp.mean(axis=1, keepdims=True)
+    minimo, maximo = float(logp.min()), float(logp.max())
+    escala = (maximo - minimo) / 255
+    pesos = np.round((logp - minimo) / escala).astype(np.uint8)
+    np.savez_compressed(ruta, pesos=pesos, minimo=minimo, escala=escala, idiomas=np.array(idiomas))
+    return ruta
+
+
+_perfil = None
+_lock_perfil = threading.Lock()
+
+
+def _cargar_perfil() -> tuple:
+    """(pesos float32 [CUBETAS, idiomas], idiomas, máscara de cirílicos), cargado una sola vez."""
+    global _perfil
+    with _lock_perfil:
+        if _perfil is None:
+            with np.load(RUTA_PERFIL) as datos:
+                pesos = datos['pesos'].astype(np.float32) * np.float32(datos['escala']) + np.float32(datos['minimo'])
+                idiomas = [str(x) for x in datos['idiomas']]
+            if tuple(idiomas) != CODIGOS[:len(idiomas)]:
+                raise ValueError(f"{RUTA_PERFIL} no corresponde a esta versión; regenerarlo con construir_perfil()")
+            cirilicos = np.array([i in IDIOMAS_CIRILICOS for i in idiomas])
+            _perfil = pesos, idiomas, cirilicos
+        return _perfil
+
+
+# --- Detección ---
+
+def _puntuar_lote(normalizados: list) -> np.ndarray:
+    pesos, idiomas, cirilicos = _cargar_perfil()
+    c = _codigos(normalizados)
+    doc = np.cumsum(c == _SEPARADOR) - 1
+    total = len(normalizados)
+    # Escritura dominante de cada texto
+    escritura = _CLASES[np.searchsorted(_BORDES, c, side='right') - 1]
+    conteos = np.bincount(doc * _NUM_ESCRITURAS + escritura, minlength=(total + 1) * _NUM_ESCRITURAS)
+    conteos = conteos[:total * _NUM_ESCRITURAS].reshape(total, _NUM_ESCRITURAS)
+    conteos[:, 0] = 0
+    letras = conteos.sum(axis=1)
+    dominante = conteos.argmax(axis=1)
+    # Kanji con kana: japonés
+    japones = (dominante == _HAN) & (conteos[:, _KANA] > 0)
+    conteos[japones, _KANA] += conteos[japones, _HAN]
+    dominante[japones] = _KANA
+    # Puntuación por n-gramas de los textos de escritura latina o cirílica
+    cubetas, posiciones = _hashes(c)
+    orden = np.argsort(posiciones, kind='stable')
+    cubetas, doc_ngrama = cubetas[orden], doc[posiciones[orden]]
+    por_texto = np.bincount(doc_ngrama, minlength=total)
+    puntos = np.zeros((total, len(idiomas)), dtype=np.float32)
+    con_ngramas = np.flatnonzero(por_texto)
+    if len(con_ngramas):
+        inicios = np.concatenate([[0], np.cumsum(por_texto)[:-1]])[con_ngramas]
+        puntos[con_ngramas] = np.add.reduceat(pesos[cubetas], inicios, axis=0)
+    # Solo compiten los idiomas de la escritura del texto
+    puntos[np.ix_(dominante == _CIRILICA, ~cirilicos)] = -np.inf
+    puntos[np.ix_(dominante != _CIRILICA, cirilicos)] = -np.inf
+    puntos /= TEMPERATURA
+    puntos -= puntos.max(axis=1, keepdims=True)
+    probs = np.exp(puntos)
+    probs /= probs.sum(axis=1, keepdims=True)
+    # Columnas: idiomas por n-gramas y después los de escritura propia (su parte de las letras)
+    matriz = np.zeros((total, len(CODIGOS)), dtype=np.float32)
+    por_ngramas = (dominante == _LATINA) | (dominante == _CIRILICA)
+    matriz[por_ngramas, :len(idiomas)] = probs[por_ngramas]
+    propias = np.flatnonzero(~por_ngramas & (letras > 0))
+    matriz[propias, _COLUMNA_ESCRITURA[dominante[propias]]] = conteos[propias, dominante[propias]] / letras[propias]
+    return matriz
+
+
+def probabilidades(textos: list) -> np.ndarray:
+    """Probabilidad de cada idioma de CODIGOS (columnas) para cada texto (filas); ceros si no tiene letras."""
+    _cargar_perfil()
+    matriz = np.zeros((len(textos), len(CODIGOS)), dtype=np.float32)
+    for ini in range(0, len(textos), LOTE_DETECCION):
+        matriz[ini:ini + LOTE_DETECCION] = _puntuar_lote([_normalizar(t) for t in textos[ini:ini + LOTE_DETECCION]])
+    return matriz
+
+
+def detectar_idiomas(textos: list) -> list:
+    """(código, probabilidad) del idioma de cada texto, o None si no tiene letras. Determinista."""
+    matriz = probabilidades(textos)
+    mejores = matriz.argmax(axis=1)
+    return [(CODIGOS[m], float(fila[m])) if fila[m] > 0 else None for fila, m in zip(matriz, mejores.tolist())]
+
+
+def detectar_subtitulo(texto: str):
+    """(código, probabilidad) del idioma de un texto, o None si no se puede detectar."""
+    return detectar_idiomas([texto])[0]
+
+
+def detectar_texto(texto: str, defecto: str = 'en', max_caracteres: int = 20000) -> str:
+    """Idioma mayoritario de un texto (los primeros max_caracteres bastan)."""
+    with tramo('deteccion_idioma'):
+        deteccion = detectar_subtitulo((texto or '')[:max_caracteres])
+    return deteccion[0] if deteccion is not None else defecto
+
+
+class EnrutadoIdiomas:
+    """Traduce cada subtítulo desde su idioma, por grupos, y deja tal cual los que ya están en tgt_lang."""
+
+    def __init__(self, tgt_lang: str, defecto: str, admitidos=None, log=print):
+        self.tgt_lang = tgt_lang
+        self.defecto = defecto
+        self.admitidos = set(admitidos) if admitidos is not None else None
+        self.log = log or (lambda *_: None)
+        self.por_idioma = Counter()
+        self.dudosos = 0
+        self.pasados = 0
+        self.llamadas_ahorradas = 0
+
+    def detectar(self, textos: list) -> list:
+        """Idioma de cada texto (None para los vacíos)."""
+        idiomas = []
+        previo = self.defecto
+        with tramo('deteccion_idioma', textos=len(textos)):
+            limpios = [_limpiar(t) for t in textos]
+            matriz = probabilidades(limpios)
+        columna = {codigo: i for i, codigo in enumerate(CODIGOS)}
+        for limpio, probs in zip(limpios, matriz):
+            if not limpio:
+                idiomas.append(None)
+                continue
+            mejor = CODIGOS[int(probs.argmax())]
+            if sum(ch.isalpha() for ch in limpio) < MIN_LETRAS:
+                self.dudosos += 1
+            elif probs.max() < PROBABILIDAD_MIN or (self.admitidos is not None and mejor not in self.admitidos):
+                # Dudoso: entre el idioma anterior y el de por defecto, el más probable para este subtítulo
+                self.dudosos += 1
+                candidatos = [c for c in (previo, self.defecto) if c in columna]
+                if candidatos:
+                    previo = max(candidatos, key=lambda c: probs[columna[c]])
+            else:
+                previo = mejor
+            idiomas.append(previo)
+        return idiomas
+
+    def traducir(self, textos: list, traducir, idiomas: list = None, contar_lotes=None) -> list:
+        """traducir(textos, src_lang) -> lista traduce cada grupo; devuelve las traducciones en orden.
+
+        contar_lotes(textos, src_lang) -> int, si se da, estima las llamadas a
+        generate que habrían necesitado los subtítulos que se dejan tal cual.
+        """
+        if idiomas is None:
+            idiomas = self.detectar(textos)
+        resultado = list(textos)
+        grupos = {}
+        for i, idioma in enumerate(idiomas):
+            if idioma is not None:
+                grupos.setdefault(idioma, []).append(i)
+        for idioma, indices in grupos.items():
+            self.por_idioma[idioma] += len(indices)
+        pasados = grupos.pop(self.tgt_lang, [])
+        self.pasados += len(pasados)
+        if pasados and contar_lotes is not None:
+            self.llamadas_ahorradas += contar_lotes([textos[i] for i in pasados], self.defecto)
+        # El grupo más numeroso primero: suele ser el idioma del archivo
+        for idioma, indices in sorted(grupos.items(), key=lambda g: -len(g[1])):
+            if len(grupos) > 1:
+                self.log(f"[IDIOMA] {len(indices)} subtítulos en '{idioma}'")
+            for i, traduccion in zip(indices, traducir([textos[i] for i in indices], idioma)):
+                resultado[i] = traduccion
+        return resultado
+
+    def resumen(self) -> str:
+        idiomas = ', '.join(f"{k} {n}" for k, n in self.por_idioma.most_common())
+        texto = (f"[IDIOMA] Por idioma: {idiomas or 'ninguno'} | {self.dudosos} dudosos (idioma del contexto) | "
+                 f"{self.pasados} ya en '{self.tgt_lang}' sin traducir")
+        if self.pasados:
+            texto += f" (~{self.llamadas_ahorradas} llamadas a generate ahorradas)"
+        return texto
@@ -0,0 +1,374 @@
+"""
+Traducción por lotes con tamaño adaptativo y limitado por memoria.
+
+El planificador agrupa los textos por longitud y forma lotes cuyo coste en
+tokens no supere un presupuesto derivado de un techo de memoria configurable
+(menos lo que el proceso ya ocupa). Si un lote provoca un error de memoria,
+se reduce a la mitad y se reintenta; tras varios lotes correctos el tamaño
+vuelve a crecer poco a poco.
+
+Si un lote falla por otro motivo (una entrada patológica), se biseca: cada
+mitad se reintenta como un lote y solo se sigue partiendo la que falla, hasta
+aislar los textos que fallan solos. Esos textos se quedan sin traducir y se
+anotan en un InformeFallos, que se puede guardar en JSON.
+"""
+
+import bisect
+import json
+import os
+import time
+
+import torch
+
+from decodificacion import PERFIL_POR_DEFECTO, argumentos_generacion, obtener_perfil
+from perfilado import tramo
+from precision import contexto_generacion
+
+# Techo de memoria por defecto (MB). None = 75 % de la memoria del dispositivo.
+MEMORIA_MAX_MB = None
+# Máximo de secuencias por lote, con independencia del presupuesto de tokens
+LOTE_MAX = 64
+# Tope de tokens por lote además del de memoria (None = solo el de memoria); lo fija el autoajuste
+TOKENS_MAX = None
+# Tokens de salida esperados por token de entrada al estimar el coste de un lote
+FACTOR_SALIDA = 2.0
+# Lotes correctos consecutivos necesarios para volver a crecer tras un fallo
+EXITOS_PARA_CRECER = 4
+
+
+def rss_actual_mb() -> float:
+    """Memoria residente actual del proceso en MB (0 si no se puede medir)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except Exception:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except Exception:
+        pass
+    try:
+        import resource
+        # ru_maxrss es el pico (KB en Linux, bytes en macOS): mejor que nada
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1e6 if pico > 1 << 32 else pico / 1e3
+    except Exception:
+        return 0.0
+
+
+def memoria_total_mb() -> float:
+    """Memoria física total del equipo en MB (4096 si no se puede medir)."""
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 1e6
+    except Exception:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 1e6
+    except Exception:
+        return 4096.0
+
+
+class TraduccionCancelada(Exception):
+    """La lanza al_progresar o al_traducir para detener traducir_lote entre dos lotes."""
+
+
+def es_error_memoria(exc: BaseException) -> bool:
+    """True si la excepción corresponde a falta de memoria (CPU o GPU)."""
+    if isinstance(exc, MemoryError):
+        return True
+    oom_cuda = getattr(torch.cuda, 'OutOfMemoryError', None)
+    if oom_cuda is not None and isinstance(exc, oom_cuda):
+        return True
+    mensaje = str(exc).lower()
+    return isinstance(exc, RuntimeError) and ('out of memory' in mensaje or 'not enough memory' in mensaje
+                                              or "can't allocate memory" in mensaje)
+
+
+def bytes_por_token(model) -> int:
+    """Estimación de memoria por token generado: cachés K/V de auto-atención y atención cruzada."""
+    config = getattr(model, 'config', None)
+    capas = getattr(config, 'decoder_layers', 12) or 12
+    d_model = getattr(config, 'd_model', 1024) or 1024
+    try:
+        tam_elemento = next(model.parameters()).element_size()
+    except Exception:
+        tam_elemento = 4
+    # 2 (K y V) x 2 (auto + cruzada) x capas x d_model, más un margen x2 para activaciones
+    return 2 * 2 * capas * d_model * tam_elemento * 2
+
+
+class PlanificadorLotes:
+    """Dimensiona lotes por presupuesto de tokens y se adapta a errores de memoria."""
+
+    def __init__(self, memoria_max_mb: float = None, lote_max: int = None, device=None, log=print,
+                 tokens_max: int = None):
+        if memoria_max_mb is None:
+            entorno = os.environ.get('SUBTITULADOR_MEMORIA_MAX_MB')
+            memoria_max_mb = float(entorno) if entorno else MEMORIA_MAX_MB
+        self.device = torch.device(device) if device is not None else torch.device('cpu')
+        if memoria_max_mb is None:
+            memoria_max_mb = 0.75 * self._memoria_dispositivo_mb()
+        self.memoria_max_mb = float(memoria_max_mb)
+        self.lote_max = max(1, int(lote_max if lote_max is not None else LOTE_MAX))
+        tokens_max = tokens_max if tokens_max is not None else TOKENS_MAX
+        self.tokens_max = int(tokens_max) if tokens_max else None
+        self.log = log or (lambda *_: None)
+        # Fracción del presupuesto en uso: baja a la mitad con cada error de memoria
+        self.factor = 1.0
+        self._exitos = 0
+        self.retrocesos = 0
+        self.tamanos = []
+
+    def _memoria_dispositivo_mb(self) -> float:
+        if self.device.type == 'cuda':
+            try:
+                return torch.cuda.get_device_properties(self.device).total_memory / 1e6
+            except Exception:
+                pass
+        return memoria_total_mb()
+
+    def memoria_en_uso_mb(self) -> float:
+        if self.device.type == 'cuda':
+            try:
+                return torch.cuda.memory_allocated(self.device) / 1e6
+            except Exception:
+                pass
+        return rss_actual_mb()
+
+    def presupuesto_tokens(self, model, num_beams: int = 1) -> int:
+        """Tokens (entrada + salida estimada, x beams) que caben en la memoria libre bajo el techo y en tokens_max."""
+        libre_mb = max(0.0, self.memoria_max_mb - self.memoria_en_uso_mb())
+        por_token = bytes_por_token(model) * max(1, num_beams)
+        presupuesto = libre_mb * 1e6 / por_token
+        if self.tokens_max:
+            presupuesto = min(presupuesto, self.tokens_max)
+        return max(1, int(presupuesto * self.factor))
+
+    def siguiente_lote(self, orden: list, longitudes: list, pos: int, model, num_beams: int = 1) -> list:
+        """Toma posiciones de 'orden' a partir de pos mientras quepan en el presupuesto actual.
+
+        'orden' debe estar ordenado por longitud creciente para minimizar el relleno.
+        """
+        presupuesto = self.presupuesto_tokens(model, num_beams)
+        lote_max = max(1, int(self.lote_max * self.factor))
+        lote = [orden[pos]]
+        pos += 1
+        while pos < len(orden) and len(lote) < lote_max:
+            # Con relleno, todas las secuencias ocupan lo que la más larga (la última, por el orden)
+            coste = (len(lote) + 1) * longitudes[orden[pos]] * (1 + FACTOR_SALIDA)
+            if coste > presupuesto:
+                break
+            lote.append(orden[pos])
+            pos += 1
+        return lote
+
+    def contar_lotes(self, longitudes: list, model, num_beams: int = 1) -> int:
+        """Lotes que formaría siguiente_lote para textos con estas longitudes, sin traducir nada."""
+        orden = sorted(range(len(longitudes)), key=lambda k: longitudes[k])
+        pos = lotes = 0
+        while pos < len(orden):
+            pos += len(self.siguiente_lote(orden, longitudes, pos, model, num_beams))
+            lotes += 1
+        return lotes
+
+    def registrar_exito(self, tamano: int):
+        if not self.tamanos or self.tamanos[-1] != tamano:
+            self.log(f"[LOTES] Tamaño de lote efectivo: {tamano} (RSS {rss_actual_mb():.0f} MB)")
+        self.tamanos.append(tamano)
+        self._exitos += 1
+        if self.factor < 1.0 and self._exitos >= EXITOS_PARA_CRECER:
+            self.factor = min(1.0, self.factor * 1.5)
+            self._exitos = 0
+            self.log(f"[LOTES] Recuperando tamaño de lote (factor {self.factor:.2f})")
+
+    def registrar_error_memoria(self, tamano: int) -> bool:
+        """Reduce el lote a la mitad. Devuelve False si ya no se puede reducir más."""
+        self.retrocesos += 1
+        self._exitos = 0
+        if tamano <= 1:
+            return False
+        # El siguiente lote tendrá como mucho la mitad de secuencias que el que falló
+        self.factor = min(self.factor / 2, (tamano // 2) / self.lote_max)
+        self.log(f"[LOTES] Memoria insuficiente con {tamano} secuencias; reintentando con {tamano // 2}")
+        if self.device.type == 'cuda':
+            torch.cuda.empty_cache()
+        return True
+
+    def resumen(self) -> str:
+        if not self.tamanos:
+            return "[LOTES] Sin lotes procesados"
+        media = sum(self.tamanos) / len(self.tamanos)
+        return (f"[LOTES] {len(self.tamanos)} lotes | tamaño medio {media:.1f} | "
+                f"mín {min(self.tamanos)} | máx {max(self.tamanos)} | retrocesos {self.retrocesos}")
+
+
+class InformeFallos:
+    """Textos que no se pudieron traducir (aislados por bisección) y cuánto costó aislarlos."""
+
+    def __init__(self):
+        self.fallos = []
+        self.lotes_fallidos = 0
+        self.reintentos = 0
+        self._ubicados = 0
+        self._textos = set()
+
+    def __len__(self) -> int:
+        return len(self.fallos)
+
+    def __contains__(self, texto: str) -> bool:
+        return texto in self._textos
+
+    def anotar(self, texto: str, error: BaseException):
+        self.fallos.append({'texto': texto, 'error': type(error).__name__, 'mensaje': str(error)[:500],
+                            'posiciones': []})
+        self._textos.add(texto)
+
+    def ubicar(self, textos: list, desde: int = 0, posiciones: list = None):
+        """Anota en los fallos nuevos dónde aparecen en textos: posiciones[i], o desde + i + 1 (subtítulo o línea)."""
+        pendientes = {}
+        for fallo in self.fallos[self._ubicados:]:
+            pendientes.setdefault(fallo['texto'], []).append(fallo)
+        self._ubicados = len(self.fallos)
+        if not pendientes:
+            return
+        vistos = {}
+        for i, texto in enumerate(textos):
+            candidatos = pendientes.get(texto)
+            if candidatos:
+                # Textos repetidos: una aparición por fallo, en orden; las que sobran, al último
+                k = vistos.get(texto, 0)
+                vistos[texto] = k + 1
+                candidatos[min(k, len(candidatos) - 1)]['posiciones'].append(
+                    posiciones[i] if posiciones is not None else desde + i + 1)
+
+    def a_dict(self) -> dict:
+        return {'fallos': self.fallos, 'lotes_fallidos': self.lotes_fallidos, 'reintentos': self.reintentos,
+                'fecha': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+    def resumen(self) -> str:
+        if not self.lotes_fallidos:
+            return "[LOTES] Sin lotes fallidos"
+        lineas = [f"[LOTES] {self.lotes_fallidos} lotes fallidos | {len(self.fallos)} textos sin traducir | "
+                  f"{self.reintentos} reintentos por bisección"]
+        for fallo in self.fallos[:10]:
+            donde = f" (posición {', '.join(map(str, fallo['posiciones'][:5]))})" if fallo['posiciones'] else ''
+            lineas.append(f"  {fallo['error']}{donde}: {fallo['texto'][:60]!r}")
+        if len(self.fallos) > 10:
+            lineas.append(f"  ... y {len(self.fallos) - 10} más")
+        return '\n'.join(lineas)
+
+    def guardar(self, ruta: str):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.a_dict(), f, indent=2, ensure_ascii=False)
+
+
+def biseccionar(elementos: list, traducir, al_fallar, error: BaseException = None, fallos: InformeFallos = None) -> list:
+    """traducir(elementos) -> lista; si falla, reintenta cada mitad como un lote y parte solo la que falla.
+
+    al_fallar(elemento, error) da el resultado de un elemento que falla solo.
+    Con error, elementos ya falló con ese error y se empieza por partirlo.
+    """
+    if error is None:
+        if fallos is not None:
+            fallos.reintentos += 1
+        try:
+            return traducir(elementos)
+        except TraduccionCancelada:
+            raise
+        except Exception as e:
+            error = e
+    if len(elementos) == 1:
+        return [al_fallar(elementos[0], error)]
+    mitad = len(elementos) // 2
+    return (biseccionar(elementos[:mitad], traducir, al_fallar, fallos=fallos)
+            + biseccionar(elementos[mitad:], traducir, al_fallar, fallos=fallos))
+
+
+def traducir_lote(textos: list, tokenizer, model, src_lang: str, tgt_lang: str, device,
+                  planificador: PlanificadorLotes = None, al_progresar=None,
+                  perfil: str = PERFIL_POR_DEFECTO, fallos: InformeFallos = None, al_traducir=None,
+                  asistente=None) -> list:
+    """Traduce una lista de textos por lotes y devuelve las traducciones en el mismo orden.
+
+    Los textos vacíos se devuelven tal cual. al_progresar(hechos, total) se llama tras cada lote,
+    y al_traducir(indices, traducciones) con las posiciones en textos de ese lote y sus traducciones
+    (los lotes van de textos cortos a largos). Cualquiera de los dos puede lanzar TraduccionCancelada.
+    perfil elige la búsqueda y el tope de longitud (ver decodificacion.py).
+    Con fallos, un lote que falla (salvo por memoria) se biseca y los textos que
+    fallan solos se devuelven sin traducir y se anotan allí; sin fallos, el error se propaga.
+    Con asistente (asistida.Asistente) y búsqueda voraz, los textos de al menos
+    asistente.longitud_min tokens se generan de uno en uno con generación asistida (ver asistida.py).
+    """
+    resultado = list(textos)
+    pendientes = [i for i, t in enumerate(textos) if t and t.strip()]
+    if not pendientes or src_lang == tgt_lang:
+        return resultado
+    if planificador is None:
+        planificador = PlanificadorLotes(device=device)
+
+    tokenizer.src_lang = src_lang
+    forced_bos = tokenizer.get_lang_id(tgt_lang)
+    with tramo('tokenizacion', textos=len(pendientes)) as t:
+        ids = tokenizer([textos[i] for i in pendientes], truncation=True)['input_ids']
+        longitudes = [len(x) for x in ids]
+        t.contar(tokens_entrada=sum(longitudes))
+    num_beams = obtener_perfil(perfil)['num_beams']
+
+    def generar(lote: list) -> list:
+        entradas = tokenizer.pad({'input_ids': [ids[k] for k in lote]}, return_tensors='pt')
+        entradas = {k: v.to(device) for k, v in entradas.items()}
+        args = argumentos_generacion(perfil, max(longitudes[k] for k in lote))
+        with tramo('generate', textos=len(lote)) as t, torch.no_grad(), contexto_generacion(model, device):
+            if len(lote) == 1 and longitudes[lote[0]] >= limite_asistido():
+                salida = asistente.generar(model, entradas, forced_bos_token_id=forced_bos, **args)
+            else:
+                salida = model.generate(**entradas, forced_bos_token_id=forced_bos, **args)
+            t.contar(tokens_salida=int((salida != tokenizer.pad_token_id).sum()))
+        with tramo('batch_decode'):
+            return tokenizer.batch_decode(salida, skip_special_tokens=True)
+
+    def al_fallar(k: int, error: BaseException) -> str:
+        fallos.anotar(textos[pendientes[k]], error)
+        return textos[pendientes[k]]
+
+    def limite_asistido() -> float:
+        # Se consulta en cada lote: la calibración puede desactivar el asistente
+        if asistente is None or not asistente.admite(model, perfil):
+            return float('inf')
+        return asistente.longitud_min
+
+    orden = sorted(range(len(pendientes)), key=lambda k: longitudes[k])
+    longitudes_ordenadas = [longitudes[k] for k in orden]
+    pos = 0
+    while pos < len(orden):
+        # Los textos largos quedan al final del orden y, con asistente, van de uno en uno
+        corte = bisect.bisect_left(longitudes_ordenadas, limite_asistido())
+        if pos >= corte:
+            lote = [orden[pos]]
+        else:
+            lote = planificador.siguiente_lote(orden if corte == len(orden) else orden[:corte], longitudes, pos,
+                                               model, num_beams)
+        try:
+            traducciones = generar(lote)
+        except Exception as e:
+            # Sin memoria: reducir y reintentar el mismo tramo
+            if es_error_memoria(e) and planificador.registrar_error_memoria(len(lote)):
+                continue
+            if fallos is None:
+                raise
+            # Otro error: aislar los textos culpables; el resto se traduce en sub-lotes
+            fallos.lotes_fallidos += 1
+            with tramo('biseccion', textos=len(lote)):
+                traducciones = biseccionar(lote, generar, al_fallar, error=e, fallos=fallos)
+        for k, traduccion in zip(lote, traducciones):
+            resultado[pendientes[k]] = traduccion
+        planificador.registrar_exito(len(lote))
+        pos += len(lote)
+        if al_traducir is not None:
+            al_traducir([pendientes[k] for k in lote], traducciones)
+        if al_progresar is not None:
+            al_progresar(pos, len(orden))
+    return resultado
@@ -0,0 +1,469 @@
+"""
+Memoria de traducción difusa.
+
+Antes de traducir, cada texto se busca en la memoria del par de idiomas:
+- Igual salvo mayúsculas/puntuación: se reutiliza la traducción guardada
+  (ajustando la puntuación final y las mayúsculas). Una interrogación o
+  exclamación final sí cuenta: "You are coming?" no reutiliza la traducción
+  de "You are coming." (ni al revés), ni en las coincidencias casi iguales.
+- Casi igual (similitud >= umbral) con un único tramo de palabras distinto,
+  p. ej. un nombre: se sustituye ese tramo en la traducción guardada; si el
+  tramo no es un nombre o número, se traducen solo los dos tramos y se
+  sustituye si la traducción del tramo viejo aparece en la guardada. Si no se
+  puede sustituir, la frase se traduce entera: la palabra distinta es
+  justo la que cambia el sentido ("she said no" / "he said no").
+- Casi igual sin ninguna palabra distinta (solo espacios o puntuación dentro
+  de las palabras, p. ej. "e-mail" / "email"): se reutiliza la guardada.
+- En otro caso se traduce con el modelo y el resultado se añade a la memoria.
+
+Índice: MinHash de palabras con LSH por bandas. Las claves
+de todas las bandas van en un único array ordenado (np.searchsorted) más un
+diccionario para las inserciones recientes, así la búsqueda apenas depende
+del tamaño de la memoria.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from vocabulario import DIRECTORIO_DATOS
+
+# Similitud mínima para intentar sustituir el tramo distinto
+UMBRAL_SIMILITUD = 0.8
+# Similitud mínima para reutilizar la traducción guardada tal cual (solo si no cambia ninguna palabra)
+UMBRAL_DIFUSO = 0.95
+# 16 bandas de 4 permutaciones: con similitud de Jaccard 0.6 (una palabra
+# cambiada en una frase de 4) la probabilidad de ser candidato es ~0.9; con
+# 0.05 (frases sin relación), ~1e-4
+BANDAS = 16
+FILAS_BANDA = 4
+NUM_PERMUTACIONES = BANDAS * FILAS_BANDA
+# Inserciones acumuladas en diccionarios antes de fusionarlas con los arrays ordenados
+MAX_RECIENTES = 65536
+# Candidatos (por nº de bandas coincidentes) que se verifican con la similitud exacta
+MAX_CANDIDATOS = 5
+# Versión de la normalización: los índices guardados con otra se reconstruyen al cargar
+FORMATO = 2
+
+_rng = np.random.RandomState(20240611)
+# Hash multiplicativo (a*x + b) >> 32 sobre uint64 con desbordamiento: sin módulos
+_A = (_rng.randint(1, 1 << 62, size=NUM_PERMUTACIONES).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+_B = _rng.randint(0, 1 << 62, size=NUM_PERMUTACIONES).astype(np.uint64)
+_MEZCLA = (_rng.randint(1, 1 << 62, size=FILAS_BANDA).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+# Sal por banda para que las claves de bandas distintas no se confundan en el mismo array
+_SAL = _rng.randint(1, 1 << 62, size=BANDAS).astype(np.uint64)
+_DESPLAZAMIENTO = np.uint64(32)
+
+_RE_PALABRAS = re.compile(r"\w+|[^\w\s]")
+_RE_NO_PALABRA = re.compile(r"[^\w\s]+")
+_FINALES = '.?!…'
+_RE_FINAL = re.compile(r"[^\w\s]*\s*$")
+
+Coincidencia = namedtuple('Coincidencia', 'tipo traduccion origen similitud tramo_viejo tramo_nuevo')
+
+
+def _tono(texto: str) -> str:
+    """'?', '!' o '!?' si la puntuación final del texto lo incluye; '' si no (punto, puntos suspensivos...)."""
+    return ''.join(sorted(set(_RE_FINAL.search(texto or '').group()) & set('?!')))
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin puntuación y con espacios simples: lo que no cambia la traducción.
+
+    La interrogación o exclamación final se conserva como última palabra: una
+    pregunta necesita su propia traducción.
+    """
+    palabras = _RE_NO_PALABRA.sub(' ', (texto or '').lower()).split()
+    tono = _tono(texto)
+    return ' '.join(palabras + [tono] if tono else palabras)
+
+
+def _clave_exacta(normalizado: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalizado.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _tejas(normalizado: str) -> list:
+    """Hashes estables de las palabras distintas (el orden lo comprueba la verificación)."""
+    return [zlib.crc32(p.encode('utf-8')) for p in set(normalizado.split())] or [0]
+
+
+def firmas_minhash(normalizados: list) -> np.ndarray:
+    """Firmas MinHash (N, NUM_PERMUTACIONES) de una lista de textos normalizados, vectorizado por bloques."""
+    tejas = [_tejas(n) for n in normalizados]
+    longitudes = np.fromiter((len(t) for t in tejas), dtype=np.int64, count=len(tejas))
+    planas = np.fromiter((h for t in tejas for h in t), dtype=np.uint64, count=int(longitudes.sum()))
+    inicios = np.concatenate(([0], np.cumsum(longitudes)[:-1])).astype(np.int64)
+    salida = np.empty((len(normalizados), NUM_PERMUTACIONES), dtype=np.uint64)
+    # Bloques pequeños: la matriz intermedia es (tejas del bloque x NUM_PERMUTACIONES)
+    bloque = 4096
+    for seg in range(0, len(normalizados), bloque):
+        fin_seg = min(len(normalizados), seg + bloque)
+        ini, fin = inicios[seg], inicios[fin_seg - 1] + longitudes[fin_seg - 1]
+        with np.errstate(over='ignore'):
+            valores = (planas[ini:fin, None] * _A + _B) >> _DESPLAZAMIENTO
+        salida[seg:fin_seg] = np.minimum.reduceat(valores, inicios[seg:fin_seg] - ini, axis=0)
+    return salida
+
+
+def claves_bandas(firmas: np.ndarray) -> np.ndarray:
+    """(N, NUM_PERMUTACIONES) -> (N, BANDAS) claves uint64 con la sal de cada banda."""
+    f = firmas.reshape(len(firmas), BANDAS, FILAS_BANDA)
+    with np.errstate(over='ignore'):
+        return (f * _MEZCLA).sum(axis=2, dtype=np.uint64) + _SAL
+
+
+class _IndiceClaves:
+    """Multimapa clave uint64 -> ids: array ordenado más diccionario de inserciones recientes."""
+
+    def __init__(self):
+        self.claves = np.empty(0, np.uint64)
+        self.ids = np.empty(0, np.int32)
+        self.recientes = {}
+        self.num_recientes = 0
+
+    def agregar(self, claves: list, ident: int):
+        for clave in claves:
+            self.recientes.setdefault(clave, []).append(ident)
+        self.num_recientes += len(claves)
+
+    def fusionar(self, claves_extra: np.ndarray = None, ids_extra: np.ndarray = None):
+        partes_c, partes_i = [self.claves], [self.ids]
+        if self.recientes:
+            pares = [(c, i) for c, ids in self.recientes.items() for i in ids]
+            partes_c.append(np.fromiter((c for c, _ in pares), dtype=np.uint64, count=len(pares)))
+            partes_i.append(np.fromiter((i for _, i in pares), dtype=np.int32, count=len(pares)))
+        if claves_extra is not None:
+            partes_c.append(claves_extra)
+            partes_i.append(ids_extra)
+        claves = np.concatenate(partes_c)
+        ids = np.concatenate(partes_i)
+        orden = np.argsort(claves, kind='stable')
+        self.claves, self.ids = claves[orden], ids[orden]
+        self.recientes = {}
+        self.num_recientes = 0
+
+    def buscar(self, claves: list) -> list:
+        """ids de todas las claves (con repeticiones: una por clave coincidente)."""
+        resultado = []
+        if len(self.claves):
+            consulta = np.array(claves, dtype=np.uint64)
+            inicios = np.searchsorted(self.claves, consulta, side='left')
+            fines = np.searchsorted(self.claves, consulta, side='right')
+            for ini, fin in zip(inicios.tolist(), fines.tolist()):
+                if fin > ini:
+                    resultado.extend(self.ids[ini:fin].tolist())
+        if self.recientes:
+            for clave in claves:
+                resultado.extend(self.recientes.get(clave, ()))
+        return resultado
+
+
+class MemoriaTraduccion:
+    """Memoria de traducción de un par de idiomas con búsqueda exacta y difusa."""
+
+    def __init__(self, src_lang: str = '', tgt_lang: str = '', umbral: float = UMBRAL_SIMILITUD,
+                 umbral_difuso: float = UMBRAL_DIFUSO, retraducir_tramo: bool = True):
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.umbral = umbral
+        self.umbral_difuso = max(umbral, umbral_difuso)
+        self.retraducir_tramo = retraducir_tramo
+        # Coste medio de traducir un segmento con el modelo (para estimar el ahorro)
+        self.segundos_por_traduccion = 0.0
+        self.origenes = []
+        self.traducciones = []
+        self._normalizados = []
+        self._exactas = _IndiceClaves()
+        self._bandas = _IndiceClaves()
+        self.reiniciar_estadisticas()
+
+    def __len__(self):
+        return len(self.origenes)
+
+    def reiniciar_estadisticas(self):
+        self.estadisticas = {'consultas': 0, 'exactas': 0, 'difusas': 0, 'tramos': 0, 'fallos': 0,
+                             'segundos_busqueda': 0.0, 'segundos_ahorrados': 0.0}
+
+    def registrar_coste(self, segundos: float, segmentos: int):
+        if segmentos:
+            por_segmento = segundos / segmentos
+            previo = self.segundos_por_traduccion
+            self.segundos_por_traduccion = por_segmento if not previo else 0.8 * previo + 0.2 * por_segmento
+
+    # --- Índice ---
+
+    def agregar(self, origen: str, traduccion: str):
+        self.agregar_muchos([origen], [traduccion])
+
+    def agregar_muchos(self, origenes: list, traducciones: list):
+        """Añade pares (origen, traducción); los textos ya presentes (normalizados) se actualizan."""
+        nuevos, en_lote = [], {}
+        for o, t in zip(origenes, traducciones):
+            if not o or not o.strip() or not t or not t.strip():
+                continue
+            n = normalizar(o)
+            existente = en_lote.get(n)
+            if existente is None:
+                existente = self._buscar_exacta(n)
+            if existente is not None:
+                self.origenes[existente], self.traducciones[existente] = o, t
+                continue
+            en_lote[n] = len(self.origenes)
+            self.origenes.append(o)
+            self.traducciones.append(t)
+            self._normalizados.append(n)
+            nuevos.append(n)
+        if not nuevos:
+            return
+        base = len(self.origenes) - len(nuevos)
+        exactas = np.fromiter((_clave_exacta(n) for n in nuevos), dtype=np.uint64, count=len(nuevos))
+        bandas = claves_bandas(firmas_minhash(nuevos))
+        if len(nuevos) >= MAX_RECIENTES:
+            # Carga masiva: directamente a los arrays ordenados
+            ids = np.arange(base, base + len(nuevos), dtype=np.int32)
+            self._exactas.fusionar(exactas, ids)
+            self._bandas.fusionar(bandas.ravel(), np.repeat(ids, BANDAS))
+            return
+        for ident, exacta, fila in zip(range(base, base + len(nuevos)), exactas.tolist(), bandas.tolist()):
+            self._exactas.agregar([exacta], ident)
+            self._bandas.agregar(fila, ident)
+        if self._exactas.num_recientes >= MAX_RECIENTES:
+            self._exactas.fusionar()
+            self._bandas.fusionar()
+
+    def _buscar_exacta(self, normalizado: str):
+        for i in self._exactas.buscar([_clave_exacta(normalizado)]):
+            if self._normalizados[i] == normalizado:
+                return i
+        return None
+
+    # --- Búsqueda ---
+
+    def buscar(self, texto: str):
+        """Coincidencia para texto, o None. tipo: 'exacta', 'tramo' (un tramo distinto) o 'difusa'."""
+        t0 = time.perf_counter()
+        try:
+            return self._buscar(texto)
+        finally:
+            self.estadisticas['segundos_busqueda'] += time.perf_counter() - t0
+
+    def _buscar(self, texto: str):
+        if not self.origenes or not texto or not texto.strip():
+            return None
+        n = normalizar(texto)
+        i = self._buscar_exacta(n)
+        if i is not None:
+            return Coincidencia('exacta', _ajustar_forma(texto, self.origenes[i], self.traducciones[i]),
+                                self.origenes[i], 1.0, None, None)
+        candidatos = self._bandas.buscar(claves_bandas(firmas_minhash([n]))[0].tolist())
+        if not candidatos:
+            return None
+        votos = Counter(candidatos)
+        mejor, similitud = None, self.umbral
+        tono = _tono(texto)
+        for ident, _ in votos.most_common(MAX_CANDIDATOS):
+            if _tono(self.origenes[ident]) != tono:
+                continue  # Pregunta o exclamación frente a afirmación: ni sustituir tramo ni reutilizar
+            comparador = difflib.SequenceMatcher(None, n, self._normalizados[ident], autojunk=False)
+            # Cotas superiores baratas antes de la similitud exacta
+            if comparador.real_quick_ratio() < similitud or comparador.quick_ratio() < similitud:
+                continue
+            s = comparador.ratio()
+            if s >= similitud:
+                mejor, similitud = ident, s
+        if mejor is None:
+            return None
+        viejo, nuevo = _tramo_distinto(self.origenes[mejor], texto)
+        tipo = 'tramo' if viejo is not None else 'difusa'
+        return Coincidencia(tipo, self.traducciones[mejor], self.origenes[mejor], similitud, viejo, nuevo)
+
+    # --- Persistencia ---
+
+    def guardar(self, ruta: str):
+        """Guarda textos (JSON lines) e índices (npz) en ruta.jsonl y ruta.npz."""
+        self._exactas.fusionar()
+        self._bandas.fusionar()
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        with open(ruta + '.jsonl.tmp', 'w', encoding='utf-8') as f:
+            for o, t in zip(self.origenes, self.traducciones):
+                f.write(json.dumps([o, t], ensure_ascii=False) + '\n')
+        np.savez(ruta + '.tmp.npz', exactas_c=self._exactas.claves, exactas_i=self._exactas.ids,
+                 bandas_c=self._bandas.claves, bandas_i=self._bandas.ids,
+                 coste=np.float64(self.segundos_por_traduccion), formato=np.int64(FORMATO))
+        os.replace(ruta + '.jsonl.tmp', ruta + '.jsonl')
+        os.replace(ruta + '.tmp.npz', ruta + '.npz')
+
+    @classmethod
+    def cargar(cls, ruta: str, src_lang: str = '', tgt_lang: str = '', **kwargs):
+        """Carga una memoria guardada; si no existe o está dañada, devuelve una vacía."""
+        memoria = cls(src_lang, tgt_lang, **kwargs)
+        try:
+            with open(ruta + '.jsonl', encoding='utf-8') as f:
+                pares = [json.loads(linea) for linea in f if linea.strip()]
+            with np.load(ruta + '.npz') as datos:
+                arrays = {k: datos[k] for k in ('exactas_c', 'exactas_i', 'bandas_c', 'bandas_i')}
+                if 'coste' in datos:
+                    memoria.segundos_por_traduccion = float(datos['coste'])
+                formato = int(datos['formato']) if 'formato' in datos else 1
+        except (OSError, ValueError, KeyError):
+            return memoria
+        if (formato != FORMATO or len(arrays['exactas_c']) != len(pares)
+                or len(arrays['bandas_c']) != BANDAS * len(pares)):
+            # Índice desfasado respecto a los textos o de otra normalización: se reconstruye
+            memoria.agregar_muchos([o for o, _ in pares], [t for _, t in pares])
+            return memoria
+        memoria.origenes = [o for o, _ in pares]
+        memoria.traducciones = [t for _, t in pares]
+        memoria._normalizados = [normalizar(o) for o in memoria.origenes]
+        memoria._exactas.claves, memoria._exactas.ids = arrays['exactas_c'], arrays['exactas_i']
+        memoria._bandas.claves, memoria._bandas.ids = arrays['bandas_c'], arrays['bandas_i']
+        return memoria
+
+    def resumen(self) -> str:
+        e = self.estadisticas
+        aciertos = e['exactas'] + e['difusas'] + e['tramos']
+        tasa = 100 * aciertos / e['consultas'] if e['consultas'] else 0.0
+        media_ms = 1000 * e['segundos_busqueda'] / e['consultas'] if e['consultas'] else 0.0
+        return (f"[MEMORIA] {e['consultas']} consultas | aciertos {aciertos} ({tasa:.1f} %): "
+                f"exactas {e['exactas']}, tramo {e['tramos']}, difusas {e['difusas']} | "
+                f"búsqueda media {media_ms:.3f} ms | ahorro estimado {e['segundos_ahorrados']:.1f}s | "
+                f"{len(self)} segmentos")
+
+
+def ruta_memoria(src_lang: str, tgt_lang: str) -> str:
+    return os.path.join(DIRECTORIO_DATOS, f"memoria_{src_lang}_{tgt_lang}")
+
+
+def _ajustar_forma(texto: str, origen: str, traduccion: str) -> str:
+    """Adapta puntuación final y mayúsculas de la traducción guardada al texto consultado."""
+    t = texto.rstrip()
+    final_nuevo = t[-1] if t and t[-1] in _FINALES else ''
+    o = origen.rstrip()
+    final_viejo = o[-1] if o and o[-1] in _FINALES else ''
+    # Solo si la consulta termina en puntuación distinta (sin ella, la guardada vale)
+    if final_nuevo and final_nuevo != final_viejo:
+        base = traduccion.rstrip()
+        if base and base[-1] in _FINALES:
+            base = base[:-1]
+        traduccion = base + final_nuevo
+    if texto.isupper() and not origen.isupper():
+        traduccion = traduccion.upper()
+    return traduccion
+
+
+def _tramo_distinto(origen: str, texto: str):
+    """(tramo viejo, tramo nuevo) si origen y texto difieren en un único tramo de palabras; si no (None, None)."""
+    palabras_o = [p for p in _RE_PALABRAS.findall(origen) if p[0].isalnum() or p[0] == '_']
+    palabras_t = [p for p in _RE_PALABRAS.findall(texto) if p[0].isalnum() or p[0] == '_']
+    ops = [op for op in difflib.SequenceMatcher(None, [p.lower() for p in palabras_o],
+                                                [p.lower() for p in palabras_t], autojunk=False).get_opcodes()
+           if op[0] != 'equal']
+    if len(ops) != 1 or ops[0][0] != 'replace':
+        return None, None
+    _, i1, i2, j1, j2 = ops[0]
+    return ' '.join(palabras_o[i1:i2]), ' '.join(palabras_t[j1:j2])
+
+
+def _solo_forma(origen: str, texto: str) -> bool:
+    """True si origen y texto solo difieren en mayúsculas, espacios o puntuación (ninguna palabra distinta)."""
+    return normalizar(origen).replace(' ', '') == normalizar(texto).replace(' ', '')
+
+
+def _es_invariable(tramo: str) -> bool:
+    """Nombres propios y números: se copian tal cual en la traducción."""
+    return all(p[0].isupper() or p.isdigit() for p in tramo.split())
+
+
+def _sustituir(traduccion: str, viejo: str, nuevo: str):
+    """Sustituye viejo por nuevo si aparece exactamente una vez como palabra(s) completa(s).
+
+    No distingue mayúsculas; si el tramo encontrado empieza en mayúscula, nuevo también.
+    """
+    patron = re.compile(r'(?<!\w)' + re.escape(viejo) + r'(?!\w)', re.IGNORECASE)
+    encontrados = patron.findall(traduccion)
+    if len(encontrados) != 1:
+        return None
+    if encontrados[0][:1].isupper() and nuevo:
+        nuevo = nuevo[0].upper() + nuevo[1:]
+    return patron.sub(lambda _: nuevo, traduccion)
+
+
+def traducir_con_memoria(textos: list, memoria: MemoriaTraduccion, traducir, no_guardar=()) -> list:
+    """Traduce textos consultando antes la memoria; traducir(lista) -> lista traduce lo que falte.
+
+    Las traducciones nuevas del modelo se añaden a la memoria, salvo las de los
+    textos que estén en no_guardar tras traducir (p. ej. los que no se pudieron traducir).
+    """
+    e = memoria.estadisticas
+    resultado = list(textos)
+    pendientes, parches = [], []
+    for i, texto in enumerate(textos):
+        if not texto or not texto.strip():
+            continue
+        e['consultas'] += 1
+        c = memoria.buscar(texto)
+        if c is None:
+            pendientes.append(i)
+            continue
+        if c.tipo == 'exacta':
+            resultado[i] = c.traduccion
+            e['exactas'] += 1
+            continue
+        if c.similitud >= memoria.umbral_difuso and _solo_forma(c.origen, texto):
+            resultado[i] = _ajustar_forma(texto, c.origen, c.traduccion)
+            e['difusas'] += 1
+            continue
+        if c.tipo == 'tramo':
+            if _es_invariable(c.tramo_viejo) and _es_invariable(c.tramo_nuevo):
+                parcheada = _sustituir(c.traduccion, c.tramo_viejo, c.tramo_nuevo)
+                if parcheada is not None:
+                    resultado[i] = _ajustar_forma(texto, c.origen, parcheada)
+                    e['tramos'] += 1
+                    continue
+            if memoria.retraducir_tramo:
+                parches.append((i, c))
+                continue
+        pendientes.append(i)
+
+    # Un solo lote: textos sin coincidencia útil y los tramos (viejo y nuevo) de los parches
+    unidades = [textos[i] for i in pendientes]
+    for _, c in parches:
+        unidades += [c.tramo_viejo, c.tramo_nuevo]
+    repetir = []
+    if unidades:
+        t0 = time.perf_counter()
+        traducidas = traducir(unidades)
+        memoria.registrar_coste(time.perf_counter() - t0, len(unidades))
+        for i, t in zip(pendientes, traducidas):
+            resultado[i] = t
+        base = len(pendientes)
+        for k, (i, c) in enumerate(parches):
+            viejo_t = traducidas[base + 2 * k].strip(' .?!…')
+            nuevo_t = traducidas[base + 2 * k + 1].strip(' .?!…')
+            parcheada = _sustituir(c.traduccion, viejo_t, nuevo_t) if viejo_t and nuevo_t else None
+            if parcheada is not None:
+                resultado[i] = _ajustar_forma(textos[i], c.origen, parcheada)
+                e['tramos'] += 1
+            else:
+                repetir.append(i)
+        if repetir:
+            # La traducción del tramo no aparece en la guardada: traducir la frase entera
+            t0 = time.perf_counter()
+            for i, t in zip(repetir, traducir([textos[i] for i in repetir])):
+                resultado[i] = t
+            memoria.registrar_coste(time.perf_counter() - t0, len(repetir))
+    nuevos = pendientes + repetir
+    e['fallos'] += len(nuevos)
+    # Ahorro: frases no traducidas, descontando los tramos cortos que sí se tradujeron
+    aciertos = len(textos) - len(nuevos) - sum(1 for t in textos if not t or not t.strip())
+    e['segundos_ahorrados'] += max(0.0, (aciertos - len(parches)) * memoria.segundos_por_traduccion)
+    nuevos = [i for i in nuevos if textos[i] not in no_guardar]
+    memoria.agregar_muchos([textos[i] for i in nuevos], [resultado[i] for i in nuevos])
+    return resultado
@@ -0,0 +1,160 @@
+"""
+Instrumentación ligera por etapas.
+
+Cada etapa de un trabajo (lectura, detección de idioma, carga del modelo,
+tokenización, generate, batch_decode, escritura...) se envuelve en un tramo
+con nombre:
+
+    with tramo('generate') as t:
+        salida = model.generate(...)
+        t.contar(tokens_salida=...)
+
+Al final del trabajo, resumen() da tiempo y contadores agregados por etapa y
+exportar_traza() escribe un JSON de eventos de traza de Chrome (chrome://tracing
+o https://ui.perfetto.dev). Desactivado, tramo() devuelve un objeto vacío
+compartido y no mide nada.
+
+Variables de entorno: SUBTITULADOR_PERFILADO=0 lo desactiva;
+SUBTITULADOR_TRAZA=<ruta.json> guarda además la traza de cada trabajo.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+class _TramoNulo:
+    """Tramo que no hace nada (perfilado desactivado)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def contar(self, **valores):
+        pass
+
+
+_NULO = _TramoNulo()
+
+
+class _Tramo:
+    __slots__ = ('perfilador', 'nombre', 'contadores', 'inicio')
+
+    def __init__(self, perfilador, nombre: str, contadores: dict):
+        self.perfilador = perfilador
+        self.nombre = nombre
+        self.contadores = contadores
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perfilador._registrar(self.nombre, self.inicio, time.perf_counter(), self.contadores)
+        return False
+
+    def contar(self, **valores):
+        """Suma contadores (tokens, textos...) a este tramo."""
+        for clave, valor in valores.items():
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+
+class Perfilador:
+    """Agrega tiempo y contadores por etapa y, si se pide, guarda los eventos para la traza."""
+
+    def __init__(self, activo: bool = True, guardar_eventos: bool = False):
+        self.activo = activo
+        self.guardar_eventos = guardar_eventos
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Vacía agregados y eventos (al empezar cada trabajo)."""
+        with self._lock:
+            # nombre -> {'llamadas', 'segundos', contadores...}; conserva el orden de aparición
+            self.etapas = {}
+            self.eventos = []
+            self.origen = time.perf_counter()
+
+    def tramo(self, nombre: str, **contadores):
+        if not self.activo:
+            return _NULO
+        return _Tramo(self, nombre, contadores)
+
+    def _registrar(self, nombre: str, inicio: float, fin: float, contadores: dict):
+        with self._lock:
+            etapa = self.etapas.get(nombre)
+            if etapa is None:
+                etapa = self.etapas[nombre] = {'llamadas': 0, 'segundos': 0.0}
+            etapa['llamadas'] += 1
+            etapa['segundos'] += fin - inicio
+            for clave, valor in contadores.items():
+                etapa[clave] = etapa.get(clave, 0) + valor
+            if self.guardar_eventos:
+                self.eventos.append((nombre, inicio, fin, threading.get_ident(), contadores))
+
+    def resumen(self) -> str:
+        """Tabla de tiempo y contadores por etapa."""
+        if not self.etapas:
+            return "[PERFIL] Sin etapas medidas"
+        lineas = ["[PERFIL] Tiempo por etapa:"]
+        for nombre, etapa in self.etapas.items():
+            extra = ' | '.join(f"{k} {v}" for k, v in etapa.items() if k not in ('llamadas', 'segundos'))
+            linea = f"  {nombre:22s} {etapa['segundos']:9.3f}s  x{etapa['llamadas']}"
+            if 'tokens_salida' in etapa and etapa['segundos'] > 0:
+                extra += f" | {etapa['tokens_salida'] / etapa['segundos']:.1f} tokens/s"
+            lineas.append(linea + (f"  ({extra})" if extra else ''))
+        return '\n'.join(lineas)
+
+    def exportar_traza(self, ruta: str):
+        """Escribe los eventos en formato de traza de Chrome (eventos completos 'X', en microsegundos)."""
+        pid = os.getpid()
+        with self._lock:
+            eventos = [{'name': nombre, 'ph': 'X', 'pid': pid, 'tid': tid,
+                        'ts': round((inicio - self.origen) * 1e6, 1), 'dur': round((fin - inicio) * 1e6, 1),
+                        'args': contadores}
+                       for nombre, inicio, fin, tid, contadores in self.eventos]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f)
+
+
+RUTA_TRAZA = os.environ.get('SUBTITULADOR_TRAZA') or None
+
+perfilador = Perfilador(activo=os.environ.get('SUBTITULADOR_PERFILADO', '1') != '0',
+                        guardar_eventos=RUTA_TRAZA is not None)
+
+
+def tramo(nombre: str, **contadores):
+    """Tramo con nombre del perfilador global."""
+    return perfilador.tramo(nombre, **contadores)
+
+
+def configurar(activo: bool = None, ruta_traza: str = None):
+    """Activa/desactiva el perfilador global y fija la ruta de la traza (None: sin traza)."""
+    global RUTA_TRAZA
+    if activo is not None:
+        perfilador.activo = activo
+    if ruta_traza is not None:
+        RUTA_TRAZA = ruta_traza
+    perfilador.guardar_eventos = RUTA_TRAZA is not None
+
+
+def iniciar_trabajo():
+    perfilador.reiniciar()
+
+
+def terminar_trabajo(log=print):
+    """Muestra el resumen del trabajo y exporta la traza si hay ruta configurada."""
+    if not perfilador.activo:
+        return
+    log(perfilador.resumen())
+    if RUTA_TRAZA:
+        try:
+            perfilador.exportar_traza(RUTA_TRAZA)
+            log(f"[PERFIL] Traza guardada en: {RUTA_TRAZA}")
+        except OSError as e:
+            log(f"[PERFIL] No se pudo guardar la traza: {e}")
@@ -0,0 +1,261 @@
+"""
+Traducción con plazo: terminar dentro de un presupuesto de tiempo real.
+
+El trabajo se traduce en tramos, en el orden del archivo. Tras cada tramo se
+mide el coste real (segundos por token de entrada) del nivel de calidad en uso
+y se elige, para lo que falta, el nivel más alto que cabe en el tiempo que
+queda con un margen de seguridad. Niveles, de más a menos calidad:
+
+    calidad      haz de 5
+    equilibrado  haz de 2
+    rapido       voraz
+    urgente      voraz con tope de longitud más ajustado
+    reducido     'urgente' con el modelo cuantizado a int8 (solo CPU, si se ofrece)
+
+Nunca se sube por encima del perfil elegido por el usuario. Para cada
+subtítulo se anota el nivel con el que se tradujo; resumen() y
+guardar_informe() lo cuentan por rangos.
+
+Los niveles aún no medidos se estiman a partir de uno medido con una relación
+de costes aproximada (COSTE_RELATIVO); en cuanto se usan, vale su medida.
+"""
+
+import copy
+import json
+import time
+import warnings
+
+import torch
+
+from decodificacion import PERFIL_POR_DEFECTO
+from lotes import InformeFallos, PlanificadorLotes, traducir_lote
+
+# (nombre del nivel, perfil de decodificación, usa el modelo reducido)
+NIVELES = (
+    ('calidad', 'calidad', False),
+    ('equilibrado', 'equilibrado', False),
+    ('rapido', 'rapido', False),
+    ('urgente', 'urgente', False),
+    ('reducido', 'urgente', True),
+)
+# Coste aproximado de cada nivel respecto a 'calidad' (antes de medirlo)
+COSTE_RELATIVO = {'calidad': 1.0, 'equilibrado': 0.5, 'rapido': 0.25, 'urgente': 0.2, 'reducido': 0.12}
+# Fracción del tiempo restante que se reserva como margen al elegir nivel
+MARGEN = 0.1
+# Margen mayor para volver a subir de nivel (evita oscilar entre dos niveles)
+MARGEN_SUBIDA = 0.25
+# Subtítulos del primer tramo (medición inicial) y mínimo de los siguientes
+TRAMO_INICIAL = 32
+# Número aproximado de decisiones a lo largo del trabajo
+DECISIONES = 40
+# Coste fijo por texto (en tokens equivalentes): tokens especiales, fin de secuencia...
+TOKENS_FIJOS = 4
+
+
+def segundos_plazo(texto: str) -> float:
+    """'90' o '90s' -> 90; '45m' -> 2700; '1.5h' -> 5400."""
+    texto = str(texto).strip().lower()
+    factor = {'s': 1, 'm': 60, 'h': 3600}.get(texto[-1:], None)
+    valor = float(texto[:-1] if factor else texto)
+    if valor <= 0:
+        raise ValueError(f"plazo no válido: {texto}")
+    return valor * (factor or 1)
+
+
+def cuantizar_modelo(model):
+    """Copia del modelo con las capas lineales cuantizadas a int8 (CPU)."""
+    en_lugar = False
+    if model.dtype != torch.float32:
+        # La cuantización dinámica parte de fp32 (un modelo en bf16 se copia antes a fp32)
+        model, en_lugar = copy.deepcopy(model).float(), True
+    with warnings.catch_warnings():
+        # La API de cuantización dinámica está marcada como obsoleta en torch recientes
+        warnings.simplefilter('ignore')
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=en_lugar)
+
+
+class Plazo:
+    """Control del presupuesto de tiempo de un trabajo: elige nivel de calidad tramo a tramo."""
+
+    def __init__(self, presupuesto_s: float, perfil: str = PERFIL_POR_DEFECTO, modelo_reducido=None,
+                 margen: float = MARGEN, log=print):
+        """modelo_reducido: función sin argumentos que devuelve el modelo reducido (o None), o None."""
+        self.presupuesto = float(presupuesto_s)
+        self.margen = margen
+        self.log = log
+        # El plazo cuenta desde que se crea (incluye leer el archivo y cargar el modelo)
+        self.inicio = time.perf_counter()
+        nombres = [n for n, _, _ in NIVELES]
+        tope = nombres.index(perfil) if perfil in nombres else 0
+        self.niveles = [nv for nv in NIVELES[tope:] if not nv[2] or modelo_reducido is not None]
+        self._obtener_reducido = modelo_reducido
+        self._reducido = None
+        self.actual = 0
+        # nombre del nivel -> segundos por token medidos (media móvil)
+        self.coste = {}
+        self.tokens_restantes = 0
+        # Tramos traducidos: nivel e índices de los textos (o subtítulos, tras ubicar)
+        self.tramos = []
+        self._ubicados = 0
+
+    # --- Estimación ---
+
+    def transcurrido(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def coste_estimado(self, k: int):
+        """Segundos por token del nivel k: medido o, si no, derivado de otro nivel medido."""
+        nombre = self.niveles[k][0]
+        if nombre in self.coste:
+            return self.coste[nombre]
+        for otro, segundos in self.coste.items():
+            return segundos * COSTE_RELATIVO[nombre] / COSTE_RELATIVO[otro]
+        return None
+
+    def proyeccion(self):
+        """Segundos totales previstos al ritmo del nivel actual (None hasta la primera medida)."""
+        coste = self.coste_estimado(self.actual)
+        if coste is None:
+            return None
+        return self.transcurrido() + coste * self.tokens_restantes
+
+    def _elegir_nivel(self, tokens_restantes: int) -> int:
+        restante = self.presupuesto - self.transcurrido()
+        for k in range(len(self.niveles)):
+            coste = self.coste_estimado(k)
+            if coste is None:
+                return self.actual
+            margen = MARGEN_SUBIDA if k < self.actual else self.margen
+            if coste * tokens_restantes <= restante * (1 - margen):
+                return k
+        return len(self.niveles) - 1
+
+    def _preparar(self, k: int) -> int:
+        """Prepara el modelo reducido si el nivel k lo usa; si no se puede, quita ese nivel y baja a k - 1."""
+        if not self.niveles[k][2] or self._reducido is not None:
+            return k
+        t0 = time.perf_counter()
+        try:
+            self._reducido = self._obtener_reducido()
+        except Exception as e:
+            self.log(f"[PLAZO] No se pudo preparar el modelo reducido: {e}")
+        if self._reducido is None:
+            del self.niveles[k]
+            return max(0, k - 1)
+        self.log(f"[PLAZO] Modelo reducido preparado en {time.perf_counter() - t0:.1f}s")
+        return k
+
+    # --- Traducción ---
+
+    def traducir(self, textos: list, tokenizer, model, src_lang: str, tgt_lang: str, device,
+                 planificador: PlanificadorLotes = None, al_progresar=None, fallos: InformeFallos = None,
+                 al_traducir=None, asistente=None) -> list:
+        """Traduce textos por tramos ajustando el nivel al plazo. al_progresar(hechos, total) tras cada lote.
+
+        fallos, asistente y al_traducir(indices, traducciones) se pasan a
+        traducir_lote, con los índices referidos a textos.
+        """
+        resultado = list(textos)
+        pendientes = [i for i, t in enumerate(textos) if t and t.strip()]
+        if not pendientes or src_lang == tgt_lang:
+            return resultado
+        if planificador is None:
+            planificador = PlanificadorLotes(device=device)
+        tokenizer.src_lang = src_lang
+        pesos = [len(x) + TOKENS_FIJOS for x in tokenizer([textos[i] for i in pendientes], truncation=True)['input_ids']]
+        self.tokens_restantes = sum(pesos)
+        tamano_tramo = max(TRAMO_INICIAL, len(pendientes) // DECISIONES)
+
+        pos = 0
+        while pos < len(pendientes):
+            if pos:
+                nuevo = self._preparar(self._elegir_nivel(self.tokens_restantes))
+                if nuevo != self.actual:
+                    self.log(f"[PLAZO] {self.niveles[self.actual][0]} -> {self.niveles[nuevo][0]} "
+                             f"({self.transcurrido():.0f}s de {self.presupuesto:.0f}s, {len(pendientes) - pos} "
+                             f"subtítulos por traducir)")
+                    self.actual = nuevo
+            nombre, perfil, reducido = self.niveles[self.actual]
+            fin = min(len(pendientes), pos + (TRAMO_INICIAL if not pos else tamano_tramo))
+            indices = pendientes[pos:fin]
+            modelo = self._reducido if reducido else model
+
+            def progreso(hechos, total, base=pos):
+                if al_progresar is not None:
+                    al_progresar(base + hechos, len(pendientes))
+
+            def traducidos_lote(ks, traducciones, indices=indices):
+                if al_traducir is not None:
+                    al_traducir([indices[k] for k in ks], traducciones)
+
+            t0 = time.perf_counter()
+            traducidos = traducir_lote([textos[i] for i in indices], tokenizer, modelo, src_lang, tgt_lang, device,
+                                       planificador=planificador, al_progresar=progreso, perfil=perfil,
+                                       fallos=fallos, al_traducir=traducidos_lote, asistente=asistente)
+            segundos = time.perf_counter() - t0
+            tokens = sum(pesos[pos:fin])
+            medido = segundos / max(1, tokens)
+            previo = self.coste.get(nombre)
+            self.coste[nombre] = medido if previo is None else 0.5 * previo + 0.5 * medido
+            self.tokens_restantes -= tokens
+            for i, t in zip(indices, traducidos):
+                resultado[i] = t
+            self._anotar(nombre, indices)
+            pos = fin
+        return resultado
+
+    def _anotar(self, nombre: str, indices: list):
+        if len(self.tramos) > self._ubicados and self.tramos[-1]['nivel'] == nombre:
+            self.tramos[-1]['indices'].extend(indices)
+        else:
+            self.tramos.append({'nivel': nombre, 'indices': list(indices)})
+
+    def ubicar(self, posiciones: list):
+        """Pasa los tramos anotados desde la última llamada a subtítulos: el texto i son los subtítulos posiciones[i].
+
+        Para cuando los textos traducidos no son los subtítulos uno a uno (--unir-frases).
+        """
+        for t in self.tramos[self._ubicados:]:
+            t['indices'] = [k for i in t['indices'] for k in posiciones[i]]
+        self._ubicados = len(self.tramos)
+
+    # --- Informe ---
+
+    def informe(self) -> dict:
+        segundos = self.transcurrido()
+        # Un subtítulo traducido otra vez cuenta con el último nivel
+        nivel_de = {}
+        for t in self.tramos:
+            for k in t['indices']:
+                nivel_de[k] = t['nivel']
+        por_nivel, tramos = {}, []
+        for k in sorted(nivel_de):
+            nivel = nivel_de[k]
+            por_nivel[nivel] = por_nivel.get(nivel, 0) + 1
+            if tramos and tramos[-1]['nivel'] == nivel:
+                tramos[-1]['hasta'] = k + 1
+                tramos[-1]['subtitulos'] += 1
+            else:
+                tramos.append({'nivel': nivel, 'desde': k + 1, 'hasta': k + 1, 'subtitulos': 1})
+        return {
+            'presupuesto_s': round(self.presupuesto, 1),
+            'segundos': round(segundos, 1),
+            'cumplido': segundos <= self.presupuesto,
+            'subtitulos_por_nivel': por_nivel,
+            # Índices de subtítulo empezando en 1, como en el archivo; subtitulos no cuenta los vacíos
+            'tramos': tramos,
+            'segundos_por_token': {k: round(v, 6) for k, v in self.coste.items()},
+        }
+
+    def resumen(self) -> str:
+        datos = self.informe()
+        estado = 'dentro del plazo' if datos['cumplido'] else 'FUERA del plazo'
+        lineas = [f"[PLAZO] {datos['segundos']:.0f}s de {datos['presupuesto_s']:.0f}s ({estado}) | " +
+                  ', '.join(f"{n}: {c}" for n, c in datos['subtitulos_por_nivel'].items())]
+        for t in datos['tramos']:
+            lineas.append(f"  subtítulos {t['desde']}-{t['hasta']}: {t['nivel']} ({t['subtitulos']})")
+        return '\n'.join(lineas)
+
+    def guardar_informe(self, ruta: str):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.informe(), f, indent=2, ensure_ascii=False)
@@ -0,0 +1,108 @@
+"""
+Precisión del modelo: fp32 o bfloat16.
+
+En bf16 los pesos ocupan la mitad (unos 0,9 GB en lugar de 1,9 GB para
+M2M100 418M), y en CPUs con bf16 nativo (AVX512_BF16 o AMX en Xeon/EPYC
+recientes, BF16 en ARMv8.6+) las multiplicaciones de matrices van más
+rápido. Sin soporte nativo bf16 se emula y es más lento que fp32, así que
+'auto' solo lo elige si lo hay, y 'bf16' vuelve a fp32 avisando.
+
+Los pesos se cargan directamente en bf16 (from_pretrained con torch_dtype),
+sin pasar por una copia en fp32. generate se ejecuta bajo torch.autocast
+(contexto_generacion): los tensores que el modelo crea por el camino en fp32
+(p. ej. las posiciones sinusoidales al ampliarse) no rompen la ejecución en
+bf16. La salida puede diferir ligeramente de la de fp32;
+benchmarks/bench_precision.py mide velocidad, memoria y coincidencia.
+"""
+
+import contextlib
+import platform
+import subprocess
+
+import torch
+
+PRECISIONES = ('fp32', 'bf16', 'auto')
+PRECISION_POR_DEFECTO = 'fp32'
+TIPOS = {'fp32': torch.float32, 'bf16': torch.bfloat16}
+NOMBRES_PRECISIONES = {
+    'fp32': '🎯 FP32 (exacta)',
+    'bf16': '⚡ BF16 (mitad de memoria)',
+    'auto': '🔍 Automática',
+}
+
+_bf16_nativo = None
+
+
+def cpu_bf16_nativo() -> bool:
+    """True si la CPU tiene instrucciones bf16 nativas."""
+    global _bf16_nativo
+    if _bf16_nativo is None:
+        _bf16_nativo = _detectar_bf16_nativo()
+    return _bf16_nativo
+
+
+def _detectar_bf16_nativo() -> bool:
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8', errors='ignore') as f:
+            banderas = set()
+            for linea in f:
+                # 'flags' en x86, 'Features' en ARM
+                if linea.startswith(('flags', 'Features')):
+                    banderas.update(linea.split(':', 1)[1].split())
+        return bool(banderas & {'avx512_bf16', 'amx_bf16', 'bf16'})
+    except OSError:
+        pass
+    if platform.system() == 'Darwin':
+        try:
+            salida = subprocess.run(['sysctl', '-n', 'hw.optional.arm.FEAT_BF16'], capture_output=True,
+                                    text=True, timeout=5).stdout
+            return salida.strip() == '1'
+        except (OSError, subprocess.SubprocessError):
+            return False
+    # Windows y otros: lo que indique oneDNN (admite bf16 con AVX-512, aunque no sea nativo)
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def admite_bf16(device) -> bool:
+    """True si bf16 es rápido en el dispositivo."""
+    device = torch.device(device)
+    if device.type == 'cuda':
+        try:
+            return torch.cuda.is_bf16_supported()
+        except Exception:
+            return False
+    return cpu_bf16_nativo()
+
+
+def resolver_precision(precision: str, device, log=print) -> str:
+    """'fp32' o 'bf16' para la precisión pedida ('fp32', 'bf16' o 'auto') en device."""
+    precision = precision or PRECISION_POR_DEFECTO
+    if precision not in PRECISIONES:
+        raise ValueError(f"precisión no válida: {precision}")
+    if precision == 'fp32':
+        return 'fp32'
+    if admite_bf16(device):
+        return 'bf16'
+    if precision == 'bf16':
+        log(f"[PRECISION] {torch.device(device).type.upper()} sin bf16 nativo: se usa fp32")
+    return 'fp32'
+
+
+def tipo_torch(precision: str) -> torch.dtype:
+    return TIPOS.get(precision, torch.float32)
+
+
+def precision_de(model) -> str:
+    """'bf16' si los pesos del modelo (o del modelo envuelto) están en bf16; si no, 'fp32'."""
+    return 'bf16' if getattr(model, 'dtype', None) == torch.bfloat16 else 'fp32'
+
+
+def contexto_generacion(model, device=None):
+    """Contexto para model.generate: autocast a bf16 si el modelo está en bf16; si no, nada."""
+    if precision_de(model) != 'bf16':
+        return contextlib.nullcontext()
+    tipo = torch.device(device).type if device is not None else 'cpu'
+    return torch.autocast(device_type=tipo, dtype=torch.bfloat16)
@@ -0,0 +1,221 @@
+"""
+Traducción por posición de reproducción: primero lo que se va a ver.
+
+En lugar de traducir el archivo en orden, los subtítulos se traducen por
+prioridad alrededor de una posición (la marca de inicio o la posición actual
+del reproductor): primero los que empiezan justo después, y los anteriores
+con menos prioridad (PESO_ATRAS). Tras cada tramo se reescribe la salida
+completa, un .srt/.vtt válido con lo traducido hasta ese momento y el resto en
+el idioma original, de modo que los primeros minutos están listos en segundos.
+
+Los tramos empiezan pequeños (TRAMOS) y crecen; si la posición cambia (un
+salto en el reproductor), el orden de lo pendiente se recalcula y los tramos
+vuelven a empezar pequeños.
+
+La posición puede llegar del reproductor por un socket TCP local
+(ServidorPosicion): una línea por mensaje con una marca de tiempo ('754.2',
+'12:34', '00:12:34,500'), o 'estado' para consultar el progreso.
+"""
+
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from subtitulos import ArchivoSubtitulos, formato_por_extension, marca_a_ms, ms_a_marca
+
+# Un subtítulo ya pasado cuenta como PESO_ATRAS veces más lejano que uno por venir
+PESO_ATRAS = 4
+# Tamaño de los tramos sucesivos tras empezar o tras un salto (el último se repite)
+TRAMOS = (8, 16, 32, 64)
+# Segundos mínimos entre reescrituras de la salida (la última siempre se escribe)
+INTERVALO_ESCRITURA = 1.0
+# Minutos por delante de la posición cuya disponibilidad se anuncia
+VENTANA_MS = 5 * 60 * 1000
+
+# La máscara solo se puede leer cambiándola: se lee una vez, antes de que haya hilos
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _permisos(ruta: str) -> int:
+    """Permisos de ruta si ya existe; si no, los de un archivo nuevo (0666 menos la máscara)."""
+    try:
+        return os.stat(ruta).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def orden_prioridad(inicios, fines, pendientes, posicion_ms: int):
+    """Índices de pendientes ordenados por distancia a posicion_ms (los anteriores, penalizados)."""
+    pendientes = np.asarray(pendientes, dtype=np.int64)
+    ini = np.asarray(inicios, dtype=np.int64)[pendientes]
+    fin = np.asarray(fines, dtype=np.int64)[pendientes]
+    distancia = np.where(fin < posicion_ms, (posicion_ms - fin) * PESO_ATRAS, np.maximum(0, ini - posicion_ms))
+    # Orden estable: a igual distancia, el orden del archivo
+    return pendientes[np.argsort(distancia, kind='stable')].tolist()
+
+
+class Reproduccion:
+    """Traduce un archivo de subtítulos por prioridad de reproducción y reescribe la salida sobre la marcha."""
+
+    def __init__(self, subs: ArchivoSubtitulos, ruta_salida: str, traducir, posicion_ms: int = 0,
+                 intervalo_escritura: float = INTERVALO_ESCRITURA, encoding: str = 'utf-8', log=print):
+        """traducir(textos) -> lista de traducciones en el mismo orden."""
+        self.subs = subs
+        self.ruta_salida = ruta_salida
+        self.formato = formato_por_extension(ruta_salida, subs.formato)
+        self.traducir = traducir
+        self.intervalo_escritura = intervalo_escritura
+        self.encoding = encoding
+        self.log = log
+        self._lock = threading.Lock()
+        self._posicion = int(posicion_ms)
+        self._salto = True
+        self.pendientes = [i for i, t in enumerate(subs.textos) if t and t.strip()]
+        self.total = len(self.pendientes)
+        self.hechos = 0
+        self.escrituras = 0
+        self.inicio = None
+        self.primera_escritura = None
+        self._ultima_escritura = 0.0
+        self._sucio = False
+        self._ventana_anunciada = None
+
+    # --- Posición ---
+
+    @property
+    def posicion(self) -> int:
+        with self._lock:
+            return self._posicion
+
+    def fijar_posicion(self, posicion_ms: int):
+        """Nueva posición del reproductor; lo pendiente se reordena antes del siguiente tramo."""
+        with self._lock:
+            if int(posicion_ms) != self._posicion:
+                self._posicion = int(posicion_ms)
+                self._salto = True
+
+    def _tomar_salto(self):
+        """Posición actual si ha cambiado desde la última consulta; si no, None."""
+        with self._lock:
+            if not self._salto:
+                return None
+            self._salto = False
+            return self._posicion
+
+    # --- Trabajo ---
+
+    def ejecutar(self):
+        """Traduce todo lo pendiente por prioridad; la salida queda completa al terminar."""
+        self.inicio = time.perf_counter()
+        k = 0
+        while self.pendientes:
+            posicion = self._tomar_salto()
+            if posicion is not None:
+                self.pendientes = orden_prioridad(self.subs.inicios, self.subs.fines, self.pendientes, posicion)
+                if self.hechos:
+                    self.log(f"[REPRODUCCION] Posición {ms_a_marca(posicion)}: "
+                             f"{len(self.pendientes)} subtítulos pendientes reordenados")
+                k = 0
+                self._ventana_anunciada = None
+            tramo = self.pendientes[:TRAMOS[min(k, len(TRAMOS) - 1)]]
+            k += 1
+            traducidos = self.traducir([self.subs.textos[i] for i in tramo])
+            for i, texto in zip(tramo, traducidos):
+                self.subs.fijar_texto(i, texto)
+            del self.pendientes[:len(tramo)]
+            self.hechos += len(tramo)
+            self._sucio = True
+            if time.perf_counter() - self._ultima_escritura >= self.intervalo_escritura:
+                self.escribir()
+            self._comprobar_ventana()
+        self.escribir()
+        return self
+
+    def _comprobar_ventana(self):
+        """Anuncia (una vez por posición) cuándo están traducidos los VENTANA_MS siguientes."""
+        posicion = self.posicion
+        if self._ventana_anunciada == posicion:
+            return
+        inicios = self.subs.inicios
+        if any(posicion <= inicios[i] < posicion + VENTANA_MS for i in self.pendientes):
+            return
+        self._ventana_anunciada = posicion
+        self.log(f"[REPRODUCCION] {VENTANA_MS // 60000} minutos desde {ms_a_marca(posicion)} listos en "
+                 f"{time.perf_counter() - self.inicio:.1f}s ({self.hechos}/{self.total} subtítulos)")
+
+    def escribir(self):
+        """Reescribe la salida de forma atómica (el reproductor nunca ve un archivo a medias)."""
+        if not self._sucio and self.escrituras:
+            return
+        directorio = os.path.dirname(os.path.abspath(self.ruta_salida))
+        extension = os.path.splitext(self.ruta_salida)[1]
+        fd, temporal = tempfile.mkstemp(prefix='.reproduccion_', suffix=extension, dir=directorio)
+        try:
+            with os.fdopen(fd, 'w', encoding=self.encoding, newline='') as f:
+                f.write(self.subs.a_texto(self.formato))
+            # mkstemp crea el archivo con 0600: se dejan los permisos que tendría uno normal
+            os.chmod(temporal, _permisos(self.ruta_salida))
+            os.replace(temporal, self.ruta_salida)
+        except BaseException:
+            try:
+                os.unlink(temporal)
+            except OSError:
+                pass
+            raise
+        self.escrituras += 1
+        self._sucio = False
+        self._ultima_escritura = time.perf_counter()
+        if self.primera_escritura is None:
+            self.primera_escritura = self._ultima_escritura - self.inicio
+            self.log(f"[REPRODUCCION] Primera escritura en {self.primera_escritura:.1f}s "
+                     f"({self.hechos}/{self.total} subtítulos traducidos)")
+
+    def estado(self) -> str:
+        return f"{ms_a_marca(self.posicion)} {self.hechos}/{self.total}"
+
+    def resumen(self) -> str:
+        segundos = time.perf_counter() - self.inicio if self.inicio is not None else 0.0
+        return (f"[REPRODUCCION] {self.hechos}/{self.total} subtítulos en {segundos:.1f}s | "
+                f"primera escritura: {self.primera_escritura or 0:.1f}s | reescrituras: {self.escrituras}")
+
+
+class _ManejadorPosicion(socketserver.StreamRequestHandler):
+    def handle(self):
+        reproduccion = self.server.reproduccion
+        for linea in self.rfile:
+            texto = linea.decode('utf-8', errors='replace').strip()
+            if not texto:
+                continue
+            if texto.lower() == 'estado':
+                respuesta = reproduccion.estado()
+            else:
+                try:
+                    reproduccion.fijar_posicion(marca_a_ms(texto))
+                    respuesta = f"ok {ms_a_marca(reproduccion.posicion)}"
+                except ValueError:
+                    respuesta = f"error marca no válida: {texto}"
+            self.wfile.write((respuesta + '\n').encode('utf-8'))
+
+
+class ServidorPosicion(socketserver.ThreadingTCPServer):
+    """Servidor TCP local que recibe la posición del reproductor, una marca de tiempo por línea."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, reproduccion: Reproduccion, puerto: int, host: str = '127.0.0.1'):
+        super().__init__((host, puerto), _ManejadorPosicion)
+        self.reproduccion = reproduccion
+
+    def iniciar(self) -> 'ServidorPosicion':
+        threading.Thread(target=self.serve_forever, name='servidor-posicion', daemon=True).start()
+        return self
+
+    def parar(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,194 @@
+"""
+Modelo residente: descarga por inactividad y recarga rápida.
+
+Una sesión larga (la GUI abierta todo el día) no necesita tener ~2 GB de
+pesos en memoria entre trabajo y trabajo. ModeloResidente guarda el modelo
+mientras se usa y lo descarga cuando lleva más de `inactividad_s` sin usarse
+(comprobar_inactividad(), que el llamador invoca periódicamente), devolviendo
+la memoria al sistema.
+
+Para que la siguiente carga sea rápida, la primera vez se guarda una copia
+local del modelo con save_pretrained (DIRECTORIO_DATOS/modelos): solo la
+configuración y los pesos en safetensors, sin pickle, así que abrirla no
+ejecuta código. Las cargas siguientes la abren con from_pretrained, que
+proyecta el archivo en memoria y no inicializa pesos (normalmente las
+páginas siguen en la caché de disco del sistema). La copia se rehace si no se
+puede leer. Cada precisión (fp32, bf16; ver precision.py) tiene su copia: la
+de bf16 ocupa la mitad y se abre ya en bf16.
+"""
+
+import contextlib
+import ctypes
+import gc
+import os
+import shutil
+import threading
+import time
+
+import torch
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+
+from lotes import rss_actual_mb
+from perfilado import tramo
+from precision import PRECISION_POR_DEFECTO, tipo_torch
+from vocabulario import DIRECTORIO_DATOS
+
+# Minutos sin uso tras los que se descarga el modelo por defecto (0 = nunca)
+INACTIVIDAD_MIN = 10
+DIRECTORIO_COPIAS = os.path.join(DIRECTORIO_DATOS, 'modelos')
+
+
+def ruta_copia_local(model_name: str, precision: str = PRECISION_POR_DEFECTO) -> str:
+    """Carpeta de la copia local (config.json y model.safetensors) de model_name en esa precisión."""
+    sufijo = '' if precision == 'fp32' else f".{precision}"
+    return os.path.join(DIRECTORIO_COPIAS, model_name.replace('/', '_') + sufijo)
+
+
+def devolver_memoria():
+    """Recoge basura y pide al asignador que devuelva al sistema la memoria libre."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    try:
+        # glibc retiene los bloques liberados; malloc_trim los devuelve al sistema
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModeloResidente:
+    """Tokenizador y modelo M2M100 cargados bajo demanda y descargados tras un tiempo sin uso."""
+
+    def __init__(self, model_name: str = 'facebook/m2m100_418M', inactividad_s: float = INACTIVIDAD_MIN * 60,
+                 copia_local: bool = True, log=print):
+        self.model_name = model_name
+        self.inactividad_s = inactividad_s
+        self.copia_local = copia_local
+        self.log = log
+        self.tokenizer = None
+        self.model = None
+        self.device = None
+        self.precision = None
+        self.ultimo_uso = time.monotonic()
+        self._en_uso = 0
+        self._lock = threading.RLock()
+
+    @property
+    def cargado(self) -> bool:
+        return self.model is not None
+
+    # --- Carga ---
+
+    def obtener(self, device, precision: str = PRECISION_POR_DEFECTO) -> tuple:
+        """(tokenizer, model) en device y en precision ('fp32' o 'bf16'), cargándolo o moviéndolo si hace falta."""
+        with self._lock:
+            if self.tokenizer is None:
+                self.tokenizer = M2M100Tokenizer.from_pretrained(self.model_name)
+            if self.model is not None and self.precision != precision:
+                self.model = None
+                devolver_memoria()
+            if self.model is None:
+                with tramo('carga_modelo'):
+                    self.model = self._cargar(precision)
+                self.precision = precision
+                self.device = None
+            if self.device != device:
+                self.model = self.model.to(device)
+                self.device = device
+            self.ultimo_uso = time.monotonic()
+            return self.tokenizer, self.model
+
+    def reservar(self):
+        """Impide la descarga hasta el liberar() correspondiente."""
+        with self._lock:
+            self._en_uso += 1
+
+    def liberar(self):
+        with self._lock:
+            self._en_uso = max(0, self._en_uso - 1)
+            self.ultimo_uso = time.monotonic()
+
+    @contextlib.contextmanager
+    def usar(self, device, precision: str = PRECISION_POR_DEFECTO):
+        """Como obtener(), pero el modelo no se descarga mientras dure el bloque."""
+        self.reservar()
+        try:
+            yield self.obtener(device, precision)
+        finally:
+            self.liberar()
+
+    def _cargar(self, precision: str = PRECISION_POR_DEFECTO):
+        ruta = ruta_copia_local(self.model_name, precision)
+        t0 = time.perf_counter()
+        if self.copia_local and self._copia_valida(ruta):
+            try:
+                model = M2M100ForConditionalGeneration.from_pretrained(ruta, torch_dtype=tipo_torch(precision))
+                model.eval()
+                self.log(f"Modelo cargado de la copia local en {time.perf_counter() - t0:.1f}s")
+                return model
+            except Exception as e:
+                self.log(f"No se pudo leer la copia local del modelo ({e}); se carga el original")
+        model = M2M100ForConditionalGeneration.from_pretrained(self.model_name, torch_dtype=tipo_torch(precision))
+        model.eval()
+        self.log(f"Modelo cargado en {time.perf_counter() - t0:.1f}s")
+        if self.copia_local:
+            self._guardar_copia(model, ruta)
+        return model
+
+    def _copia_valida(self, ruta: str) -> bool:
+        return all(os.path.isfile(os.path.join(ruta, nombre)) for nombre in ('config.json', 'model.safetensors'))
+
+    def _guardar_copia(self, model, ruta: str):
+        t0 = time.perf_counter()
+        temporal = ruta + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            shutil.rmtree(temporal, ignore_errors=True)
+            model.save_pretrained(temporal, safe_serialization=True)
+            shutil.rmtree(ruta, ignore_errors=True)
+            os.replace(temporal, ruta)
+            self.log(f"Copia local del modelo guardada en {time.perf_counter() - t0:.1f}s "
+                     f"(las próximas cargas serán más rápidas)")
+        except Exception as e:
+            self.log(f"No se pudo guardar la copia local del modelo: {e}")
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    # --- Descarga ---
+
+    def descargar(self, motivo: str = None) -> bool:
+        """Libera el modelo (no mientras se usa). True si se descargó."""
+        with self._lock:
+            if self.model is None or self._en_uso:
+                return False
+            antes = rss_actual_mb()
+            self.model = None
+            self.device = None
+            self.precision = None
+            devolver_memoria()
+            self.log(f"Modelo descargado{f' ({motivo})' if motivo else ''}: "
+                     f"{antes:.0f} MB -> {rss_actual_mb():.0f} MB")
+            return True
+
+    def segundos_inactivo(self) -> float:
+        return 0.0 if self._en_uso else time.monotonic() - self.ultimo_uso
+
+    def comprobar_inactividad(self) -> bool:
+        """Descarga el modelo si lleva más de inactividad_s sin usarse. True si se descargó."""
+        if not self.inactividad_s or self.model is None or self.segundos_inactivo() < self.inactividad_s:
+            return False
+        return self.descargar(f"{self.segundos_inactivo() / 60:.0f} min sin uso")
+
+    # --- Memoria ---
+
+    def texto_memoria(self) -> str:
+        """Resumen de una línea: memoria del proceso (y de la GPU) y estado del modelo."""
+        partes = [f"RAM {rss_actual_mb():.0f} MB"]
+        if torch.cuda.is_available():
+            partes.append(f"GPU {torch.cuda.memory_allocated() / 1e6:.0f} MB")
+        if self.model is None:
+            estado = 'modelo descargado'
+        elif self._en_uso:
+            estado = 'modelo en uso'
+        else:
+            estado = f"modelo cargado, {self.segundos_inactivo() / 60:.0f} min sin uso"
+        return ' · '.join(partes) + f" ({estado})"
@@ -1,11 +1,32 @@
-import pysrt
 from transformers import MarianMTModel, MarianTokenizer
 from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 from tkinter import Tk, filedialog, messagebox
 from tkinter import ttk
+import argparse
+import contextlib
+import json
 import os
+import sys
 import torch
 import re
+from asistida import Asistente
+from autoajuste import (CUES_MUESTRA, aplicar_ajuste, autoajustar, cargar_ajuste, guardar_ajuste, resumen_ajuste,
+                        ruta_ajuste)
+from decodificacion import NOMBRES_PERFILES, PERFIL_POR_DEFECTO, argumentos_generacion, obtener_perfil
+from frases import UnionFrases
+from idioma import EnrutadoIdiomas, detectar_texto
+from lotes import InformeFallos, PlanificadorLotes, biseccionar, traducir_lote
+from memoria_traduccion import MemoriaTraduccion, ruta_memoria, traducir_con_memoria
+import perfilado
+from perfilado import tramo
+from plazo import Plazo, cuantizar_modelo, segundos_plazo
+from precision import PRECISION_POR_DEFECTO, PRECISIONES, contexto_generacion, resolver_precision, tipo_torch
+from reproduccion import Reproduccion, ServidorPosicion
+from subtitulos import ArchivoSubtitulos, abrir_subtitulos, formato_por_extension, marca_a_ms, segundos_a_ms
+from texto_mmap import TextoMapeado
+from vivo import LOTE_MAX as LOTE_MAX_VIVO, PLAZO_MS, TraductorVivo, crear_servidor, servir_flujo
+from vocabulario import (ModeloListaCorta, cargar_lista_corta, construir_lista_corta,
+                         guardar_lista_corta, ruta_lista_corta)
 try:
     import winsound  # Solo Windows
 except Exception:
@@ -13,6 +34,11 @@ except Exception:
 
 # Selección de dispositivo: GPU (si disponible) o CPU
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Precisión de los pesos: 'fp32' o 'bf16' (ver precision.py); la fija la CLI con --precision
+precision_modelo = PRECISION_POR_DEFECTO
+
+# Líneas por bloque al traducir un .txt (el progreso para reanudar se anota tras cada bloque)
+LINEAS_POR_BLOQUE = 5000
 
 
 # Lista ampliada de idiomas comunes (códigos ISO 639-1 compatibles con M2M100)
@@ -54,33 +80,127 @@ IDIOMAS = {
 
 _m2m_tokenizer = None
 _m2m_model = None
+# Modelos recortados a la lista corta de cada idioma destino (ver vocabulario.py)
+_m2m_listas_cortas = {}
+
 
+def cargar_modelo(src_lang: str = 'en', tgt_lang: str = 'es', lista_corta: bool = False):
+    """Carga (o reutiliza) el modelo multilenguaje M2M100 para cualquier par soportado.
 
-def cargar_modelo(src_lang: str = 'en', tgt_lang: str = 'es'):
-    """Carga (o reutiliza) el modelo multilenguaje M2M100 para cualquier par soportado."""
+    Con lista_corta=True y una lista guardada para tgt_lang, devuelve el modelo
+    con la proyección de salida recortada a esa lista.
+    """
     global _m2m_model, _m2m_tokenizer
     model_name = 'facebook/m2m100_418M'
+    tipo = tipo_torch(precision_modelo)
+    if _m2m_model is not None and _m2m_model.dtype != tipo:
+        # De fp32 a bf16 basta convertir (igual que cargar en bf16); al revés se perdería precisión: recargar
+        _m2m_model = _m2m_model.to(tipo) if tipo == torch.bfloat16 else None
+        _m2m_listas_cortas.clear()
     if _m2m_tokenizer is None or _m2m_model is None:
-        _m2m_tokenizer = M2M100Tokenizer.from_pretrained(model_name)
-        _m2m_model = M2M100ForConditionalGeneration.from_pretrained(model_name)
-        _m2m_model = _m2m_model.to(device)
-        _m2m_model.eval()
+        with tramo('carga_modelo'):
+            _m2m_tokenizer = M2M100Tokenizer.from_pretrained(model_name)
+            # Los pesos se cargan directamente en la precisión pedida, sin copia intermedia en fp32
+            _m2m_model = M2M100ForConditionalGeneration.from_pretrained(model_name, torch_dtype=tipo)
+            _m2m_model = _m2m_model.to(device)
+            _m2m_model.eval()
+    if lista_corta:
+        if tgt_lang not in _m2m_listas_cortas:
+            ruta = ruta_lista_corta(model_name, tgt_lang)
+            ids = cargar_lista_corta(ruta)
+            if ids is None:
+                print(f"[VOCAB] No hay lista corta para '{tgt_lang}' ({ruta}); se usa el vocabulario completo")
+                return _m2m_tokenizer, _m2m_model, model_name
+            _m2m_listas_cortas[tgt_lang] = ModeloListaCorta(_m2m_model, ids, tgt_lang, _m2m_tokenizer)
+        modelo = _m2m_listas_cortas[tgt_lang]
+        print(f"[VOCAB] Lista corta '{tgt_lang}': {modelo.tamano} de {_m2m_model.config.vocab_size} tokens")
+        return _m2m_tokenizer, modelo, model_name
     return _m2m_tokenizer, _m2m_model, model_name
 
 
-def traducir_texto(texto, tokenizer, model, src_lang: str, tgt_lang: str):
-    """Traduce una cadena con M2M100 para src_lang->tgt_lang."""
+def fijar_precision(precision: str, log=print) -> str:
+    """Fija la precisión de cargar_modelo ('fp32', 'bf16' o 'auto'; ver precision.py). Devuelve la resultante."""
+    global precision_modelo
+    precision_modelo = resolver_precision(precision, device, log=log)
+    return precision_modelo
+
+
+def traducir_texto(texto, tokenizer, model, src_lang: str, tgt_lang: str, perfil: str = PERFIL_POR_DEFECTO):
+    """Traduce una cadena con M2M100 para src_lang->tgt_lang con el perfil de decodificación dado."""
     # Configurar idioma origen y decodificar hacia el idioma destino
     tokenizer.src_lang = src_lang
-    inputs = tokenizer(texto, return_tensors='pt', padding=True, truncation=True)
+    with tramo('tokenizacion', textos=1) as t:
+        inputs = tokenizer(texto, return_tensors='pt', padding=True, truncation=True)
+        t.contar(tokens_entrada=inputs['input_ids'].shape[1])
     inputs = {k: v.to(device) for k, v in inputs.items()}
     forced_bos = tokenizer.get_lang_id(tgt_lang)
-    with torch.no_grad():
-        traduccion = model.generate(**inputs, forced_bos_token_id=forced_bos, max_length=512)
-    texto_traducido = tokenizer.batch_decode(traduccion, skip_special_tokens=True)[0]
+    args = argumentos_generacion(perfil, inputs['input_ids'].shape[1])
+    with tramo('generate', textos=1) as t, torch.no_grad(), contexto_generacion(model, device):
+        traduccion = model.generate(**inputs, forced_bos_token_id=forced_bos, **args)
+        t.contar(tokens_salida=traduccion.shape[1])
+    with tramo('batch_decode'):
+        texto_traducido = tokenizer.batch_decode(traduccion, skip_special_tokens=True)[0]
     return texto_traducido
 
 
+def _traducir_unidades(textos: list, tokenizer, model, src_lang: str, tgt_lang: str,
+                       planificador: PlanificadorLotes = None, al_progresar=None,
+                       perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None,
+                       plazo: Plazo = None, fallos: InformeFallos = None, asistente: Asistente = None) -> list:
+    """Traduce una lista de textos por lotes; si un lote falla, se biseca para aislar los textos culpables.
+
+    Con memoria, los textos ya traducidos (o casi iguales) se toman de ella y
+    solo el resto pasa por el modelo. Con plazo, el nivel de calidad se ajusta
+    para terminar a tiempo (plazo.py); en ese caso no se usa la memoria.
+    Los textos que fallan solos se dejan sin traducir y se anotan en fallos;
+    sin fallos, se usa un informe propio que se imprime si no queda vacío.
+    Con asistente, los textos largos se generan con generación asistida (asistida.py).
+    """
+    propio = fallos is None
+    if propio:
+        fallos = InformeFallos()
+    resultado = _traducir_con_fallos(textos, tokenizer, model, src_lang, tgt_lang, planificador, al_progresar,
+                                     perfil, memoria, plazo, fallos, asistente)
+    if propio and fallos.lotes_fallidos:
+        fallos.ubicar(textos)
+        print(fallos.resumen())
+    return resultado
+
+
+def _traducir_con_fallos(textos: list, tokenizer, model, src_lang: str, tgt_lang: str, planificador, al_progresar,
+                         perfil: str, memoria, plazo, fallos: InformeFallos, asistente: Asistente = None) -> list:
+    if plazo is not None:
+        try:
+            return plazo.traducir(textos, tokenizer, model, src_lang, tgt_lang, device,
+                                  planificador=planificador, al_progresar=al_progresar, fallos=fallos,
+                                  asistente=asistente)
+        except Exception as e:
+            print(f"[ADVERTENCIA] Falló la traducción con plazo ({e}); se traduce con el perfil rápido")
+            return _traducir_con_fallos(textos, tokenizer, model, src_lang, tgt_lang, planificador, al_progresar,
+                                        'rapido', None, None, fallos, asistente)
+    if memoria is not None:
+        with tramo('memoria', textos=len(textos)):
+            return traducir_con_memoria(textos, memoria, lambda pendientes: _traducir_con_fallos(
+                pendientes, tokenizer, model, src_lang, tgt_lang, planificador, al_progresar, perfil, None, None,
+                fallos, asistente), no_guardar=fallos)
+
+    def traducir(parte: list) -> list:
+        return traducir_lote(parte, tokenizer, model, src_lang, tgt_lang, device, planificador=planificador,
+                             al_progresar=al_progresar, perfil=perfil, fallos=fallos, asistente=asistente)
+
+    def al_fallar(texto: str, error: BaseException) -> str:
+        fallos.anotar(texto, error)
+        return texto
+
+    try:
+        return traducir(textos)
+    except Exception as e:
+        # Fallo fuera de la generación (p. ej. al tokenizar): bisecar sobre los textos
+        print(f"[ADVERTENCIA] Falló la traducción por lotes ({e}); se aíslan los segmentos que fallan")
+        fallos.lotes_fallidos += 1
+        return biseccionar(list(textos), traducir, al_fallar, error=e, fallos=fallos)
+
+
 def _chunk_text_by_tokens(texto: str, tokenizer, max_tokens: int = 480) -> list:
     """Divide un texto largo en trozos con límite aproximado de tokens para el modelo."""
     piezas = re.split(r'(?:(?<=[\.!?])\s+|\n{2,})', texto or '')
@@ -117,125 +237,227 @@ def _chunk_text_by_tokens(texto: str, tokenizer, max_tokens: int = 480) -> list:
     return chunks
 
 
-def traducir_texto_largo(texto: str, tokenizer, model, src_lang: str, tgt_lang: str, max_tokens: int = 480) -> str:
+def traducir_texto_largo(texto: str, tokenizer, model, src_lang: str, tgt_lang: str, max_tokens: int = 480,
+                         perfil: str = PERFIL_POR_DEFECTO, fallos: InformeFallos = None,
+                         asistente: Asistente = None) -> str:
     """Traduce un texto largo troceándolo para respetar límites del modelo."""
     if not texto:
         return ''
     if src_lang == tgt_lang:
         return texto
     tokenizer.src_lang = src_lang
-    forced_bos = tokenizer.get_lang_id(tgt_lang)
-    partes = _chunk_text_by_tokens(texto, tokenizer, max_tokens=max_tokens)
-    resultados = []
-    for parte in partes:
-        inputs = tokenizer(parte, return_tensors='pt', padding=True, truncation=True)
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-        with torch.no_grad():
-            out = model.generate(**inputs, forced_bos_token_id=forced_bos, max_length=512)
-        resultados.append(tokenizer.batch_decode(out, skip_special_tokens=True)[0])
-    return '\n'.join(resultados)
-
-
-def _traducir_linea_preservando(long_line: str, tokenizer, model, src_lang: str, tgt_lang: str, max_tokens: int = 480) -> str:
-    """Traduce una línea potencialmente larga. Si excede tokens, trocea y une sin añadir saltos nuevos."""
-    # Caso trivial
-    try:
-        token_count = len(tokenizer(long_line, return_tensors='pt', truncation=False).input_ids[0])
-    except Exception:
-        token_count = 0
-    if token_count and token_count <= max_tokens:
-        return traducir_texto(long_line, tokenizer, model, src_lang, tgt_lang)
-    # Trocear por tokens y unir con un espacio para no introducir \n extra
-    partes = _chunk_text_by_tokens(long_line, tokenizer, max_tokens=max_tokens)
-    traducidas = []
-    for p in partes:
-        traducidas.append(traducir_texto(p, tokenizer, model, src_lang, tgt_lang))
-    return ' '.join(traducidas)
+    with tramo('troceado'):
+        partes = _chunk_text_by_tokens(texto, tokenizer, max_tokens=max_tokens)
+    return '\n'.join(_traducir_unidades(partes, tokenizer, model, src_lang, tgt_lang, perfil=perfil, fallos=fallos,
+                                         asistente=asistente))
+
+
+def traducir_lineas(contenidos: list, tokenizer, model, src_lang: str, tgt_lang: str, max_tokens: int = 480,
+                    perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None,
+                    fallos: InformeFallos = None, desde: int = 0, asistente: Asistente = None) -> list:
+    """Traduce líneas de texto (sin fin de línea) una a una; las que exceden max_tokens se trocean y se unen.
+
+    Con fallos, los trozos que no se pudieron traducir se anotan con su número
+    de línea (contenidos[0] es la línea desde + 1).
+    """
+    traducidas = list(contenidos)
+    if src_lang == tgt_lang:
+        return traducidas
+    # Cada línea con texto aporta uno o varios trozos (si excede max_tokens) a un único lote global
+    tokenizer.src_lang = src_lang
+    con_texto = [i for i, c in enumerate(contenidos) if c.strip()]
+    with tramo('troceado', textos=len(con_texto)):
+        longitudes = [len(x) for x in tokenizer([contenidos[i] for i in con_texto])['input_ids']] if con_texto else []
+        unidades, tramos = [], []
+        for i, n_tokens in zip(con_texto, longitudes):
+            partes = [contenidos[i]] if n_tokens <= max_tokens else _chunk_text_by_tokens(contenidos[i], tokenizer, max_tokens=max_tokens)
+            tramos.append((i, len(unidades), len(unidades) + len(partes)))
+            unidades.extend(partes)
+    resultado = _traducir_unidades(unidades, tokenizer, model, src_lang, tgt_lang, perfil=perfil, memoria=memoria,
+                                   fallos=fallos, asistente=asistente)
+    if fallos is not None and fallos.lotes_fallidos:
+        fallos.ubicar(unidades, posiciones=[desde + i + 1 for i, ini, fin in tramos for _ in range(ini, fin)])
+    for i, ini, fin in tramos:
+        # Unir los trozos con un espacio para no introducir \n extra
+        traducidas[i] = ' '.join(resultado[ini:fin])
+    return traducidas
 
 
 def traducir_txt_a_txt_preservando_lineas(archivo_txt: str, archivo_salida_txt: str, tokenizer, model,
-                                         src_lang: str, tgt_lang: str, max_tokens: int = 480):
-    """Traduce un .txt preservando exactamente los saltos de línea del archivo original."""
-    with open(archivo_txt, 'r', encoding='utf-8', errors='ignore') as f:
-        lineas = f.read().splitlines(keepends=True)
-
-    out = []
-    for ln in lineas:
-        # Separar el fin de línea para preservarlo tal cual
-        if ln.endswith('\r\n'):
-            contenido, fin = ln[:-2], '\r\n'
-        elif ln.endswith('\n'):
-            contenido, fin = ln[:-1], '\n'
-        else:
-            contenido, fin = ln, ''
+                                         src_lang: str, tgt_lang: str, max_tokens: int = 480,
+                                         perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None,
+                                         reanudar: bool = False, fallos: InformeFallos = None,
+                                         asistente: Asistente = None):
+    """Traduce un .txt preservando exactamente los fines de línea del archivo original.
 
-        if contenido.strip():
-            if src_lang != tgt_lang:
-                try:
-                    traducida = _traducir_linea_preservando(contenido, tokenizer, model, src_lang, tgt_lang, max_tokens=max_tokens)
-                except Exception:
-                    traducida = contenido
-            else:
-                traducida = contenido
-        else:
-            traducida = contenido
-        out.append(traducida + fin)
+    El archivo se lee proyectado en memoria (texto_mmap.py) y se traduce por
+    bloques de LINEAS_POR_BLOQUE líneas; tras cada bloque se anota el progreso
+    en <salida>.progreso. Con reanudar, si ese progreso es de la misma entrada,
+    se continúa desde la última línea escrita.
+    """
+    with tramo('lectura'):
+        texto = TextoMapeado(archivo_txt)
+    ruta_progreso = archivo_salida_txt + '.progreso'
+    firma = {'entrada': os.path.abspath(archivo_txt), 'tamano': texto.tamano, 'mtime_ns': texto.mtime_ns,
+             'src': src_lang, 'tgt': tgt_lang}
+    desde, escritos = 0, 0
+    if reanudar:
+        previo = _leer_progreso(ruta_progreso)
+        if (previo is not None and all(previo.get(k) == v for k, v in firma.items())
+                and os.path.isfile(archivo_salida_txt) and os.path.getsize(archivo_salida_txt) >= previo['bytes']):
+            desde, escritos = previo['linea'], previo['bytes']
+            print(f"Reanudando en la línea {desde + 1} de {len(texto)}")
+    with texto, open(archivo_salida_txt, 'r+b' if desde else 'wb') as f:
+        f.seek(escritos)
+        f.truncate()
+        for ini in range(desde, len(texto), LINEAS_POR_BLOQUE):
+            fin = min(len(texto), ini + LINEAS_POR_BLOQUE)
+            traducidas = traducir_lineas(list(texto.lineas(ini, fin)), tokenizer, model, src_lang, tgt_lang,
+                                         max_tokens=max_tokens, perfil=perfil, memoria=memoria, fallos=fallos,
+                                         desde=ini, asistente=asistente)
+            with tramo('escritura'):
+                escritos += texto.escribir(f, traducidas, ini)
+                f.flush()
+            if fin < len(texto):
+                _guardar_progreso(ruta_progreso, dict(firma, linea=fin, bytes=escritos))
+    if os.path.exists(ruta_progreso):
+        os.remove(ruta_progreso)
 
-    with open(archivo_salida_txt, 'w', encoding='utf-8') as f:
-        f.write(''.join(out))
 
+def _leer_progreso(ruta: str):
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-def traducir_srt(archivo_entrada, archivo_salida, tokenizer, model, src_lang: str, tgt_lang: str):
-    """Traduce un archivo .srt y lo guarda en archivo_salida usando src_lang->tgt_lang."""
-    subs = pysrt.open(archivo_entrada, encoding='utf-8')
 
-    for sub in subs:
-        texto = sub.text
-        try:
-            sub.text = traducir_texto(texto, tokenizer, model, src_lang, tgt_lang)
-        except Exception as e:
-            print(f"[ADVERTENCIA] No se pudo traducir un segmento: {e}")
-            sub.text = texto
+def _guardar_progreso(ruta: str, progreso: dict):
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(progreso, f)
+    os.replace(temporal, ruta)
+
+
+def traducir_srt(archivo_entrada, archivo_salida, tokenizer, model, src_lang: str, tgt_lang: str,
+                 perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None, plazo: Plazo = None,
+                 fallos: InformeFallos = None, idioma_por_subtitulo: bool = False, unir_frases: bool = False,
+                 asistente: Asistente = None):
+    """Traduce un archivo .srt/.vtt y lo guarda en archivo_salida usando src_lang->tgt_lang.
+
+    Con plazo, la calidad baja lo necesario para terminar dentro del presupuesto de tiempo.
+    Con fallos, los subtítulos que no se pudieron traducir se anotan con su número de orden.
+    Con idioma_por_subtitulo, cada subtítulo se traduce desde su propio idioma
+    (src_lang es el de los dudosos) y los que ya están en tgt_lang se dejan tal cual (idioma.py).
+    Con unir_frases, los subtítulos de una misma frase se traducen juntos y la
+    traducción se reparte entre ellos (frases.py); no se combina con idioma_por_subtitulo.
+    """
+    with tramo('lectura'):
+        subs = abrir_subtitulos(archivo_entrada, encoding='utf-8')
+    planificador = PlanificadorLotes(device=device)
+
+    if idioma_por_subtitulo:
+        enrutado = EnrutadoIdiomas(tgt_lang, src_lang, admitidos=[k for k in IDIOMAS if k != 'auto'])
+        # La memoria es de src_lang->tgt_lang: solo se usa con ese grupo
+        traducidos = enrutado.traducir(subs.textos, lambda textos, src: _traducir_unidades(
+            textos, tokenizer, model, src, tgt_lang, planificador, perfil=perfil,
+            memoria=memoria if src == src_lang else None, fallos=fallos, asistente=asistente),
+            contar_lotes=lambda textos, src: _contar_lotes(textos, tokenizer, model, src, planificador, perfil))
+        print(enrutado.resumen())
+    elif unir_frases:
+        union = UnionFrases(subs.textos, subs.inicios, subs.fines)
+        # Sin --informe-fallos también hace falta saber qué frases fallaron
+        informe = fallos if fallos is not None else InformeFallos()
+
+        def traducir_frases(textos, posiciones):
+            traducciones = _traducir_unidades(textos, tokenizer, model, src_lang, tgt_lang, planificador,
+                                              perfil=perfil, memoria=memoria, plazo=plazo, fallos=informe,
+                                              asistente=asistente)
+            if plazo is not None:
+                # El plazo anota índices de textos: se pasan a números de subtítulo
+                plazo.ubicar(posiciones)
+            return traducciones
+
+        traducidos = union.traducir(
+            traducir_frases,
+            _wrap_text_for_subtitle,
+            contar_lotes=lambda textos: _contar_lotes(textos, tokenizer, model, src_lang, planificador, perfil),
+            fallos=informe)
+        print(union.resumen())
+        # Una frase que falla se anota en la posición de su primer subtítulo
+        informe.ubicar(union.unidades, posiciones=[grupo[0] + 1 for grupo in union.grupos])
+        if fallos is None and informe.lotes_fallidos:
+            print(informe.resumen())
+    else:
+        traducidos = _traducir_unidades(subs.textos, tokenizer, model, src_lang, tgt_lang, planificador,
+                                        perfil=perfil, memoria=memoria, plazo=plazo, fallos=fallos, asistente=asistente)
+    if fallos is not None:
+        fallos.ubicar(subs.textos)
+    for i, texto in enumerate(traducidos):
+        subs.fijar_texto(i, texto)
+    print(planificador.resumen())
+    if plazo is not None:
+        print(plazo.resumen())
+
+    with tramo('escritura'):
+        subs.guardar(archivo_salida, encoding='utf-8', formato=formato_por_extension(archivo_salida, subs.formato))
 
-    subs.save(archivo_salida, encoding='utf-8')
+
+def _contar_lotes(textos: list, tokenizer, model, src_lang: str, planificador: PlanificadorLotes, perfil: str) -> int:
+    """Llamadas a generate que harían falta para traducir textos (sin traducirlos)."""
+    tokenizer.src_lang = src_lang
+    longitudes = [len(x) for x in tokenizer([t for t in textos if t and t.strip()], truncation=True)['input_ids']]
+    return planificador.contar_lotes(longitudes, model, obtener_perfil(perfil)['num_beams']) if longitudes else 0
+
+
+def traducir_srt_por_posicion(archivo_entrada, archivo_salida, tokenizer, model, src_lang: str, tgt_lang: str,
+                              posicion_ms: int = 0, puerto: int = None, perfil: str = PERFIL_POR_DEFECTO,
+                              memoria: MemoriaTraduccion = None, fallos: InformeFallos = None,
+                              asistente: Asistente = None):
+    """Traduce un .srt/.vtt empezando por lo más cercano a posicion_ms y reescribe la salida tras cada tramo.
+
+    Con puerto, la posición del reproductor se actualiza por un socket TCP local (reproduccion.py).
+    """
+    with tramo('lectura'):
+        subs = abrir_subtitulos(archivo_entrada, encoding='utf-8')
+    planificador = PlanificadorLotes(device=device)
+    reproduccion = Reproduccion(subs, archivo_salida, lambda textos: _traducir_unidades(
+        textos, tokenizer, model, src_lang, tgt_lang, planificador, perfil=perfil, memoria=memoria, fallos=fallos,
+        asistente=asistente), posicion_ms=posicion_ms)
+    servidor = None
+    if puerto is not None:
+        servidor = ServidorPosicion(reproduccion, puerto).iniciar()
+        print(f"[REPRODUCCION] Esperando la posición del reproductor en 127.0.0.1:{servidor.server_address[1]}")
+    try:
+        with tramo('traduccion_por_posicion', subtitulos=len(subs)):
+            reproduccion.ejecutar()
+    finally:
+        if servidor is not None:
+            servidor.parar()
+    if fallos is not None:
+        fallos.ubicar(subs.textos)
+    print(planificador.resumen())
+    print(reproduccion.resumen())
 
 
 def detectar_idioma_archivo(archivo_entrada: str) -> str:
-    """Detecta el idioma mayoritario del SRT usando 'langdetect' con heurísticas de respaldo."""
+    """Detecta el idioma mayoritario del SRT/VTT con el detector integrado (idioma.py)."""
     try:
-        subs = pysrt.open(archivo_entrada, encoding='utf-8')
+        subs = abrir_subtitulos(archivo_entrada, encoding='utf-8')
         muestras = []
         for sub in subs:
             if sub.text and sub.text.strip():
                 muestras.append(sub.text)
             if len(muestras) >= 50:
                 break
-        muestra = "\n".join(muestras)
-        try:
-            from langdetect import detect
-            code = detect(muestra)
-            # Normalizar ciertos códigos a equivalentes M2M100 si hace falta
-            # p.ej. 'zh-cn' -> 'zh'
-            if code.startswith('zh'):
-                return 'zh'
-            return code
-        except Exception:
-            pass
-        # Heurísticas simples de respaldo
-        if any('\u0400' <= ch <= '\u04FF' for ch in muestra):
-            return 'ru'
-        if any(ch in 'äöüÄÖÜß' for ch in muestra):
-            return 'de'
-        if any(ch in 'áéíóúÁÉÍÓÚñÑ' for ch in muestra):
-            return 'es'
-        return 'en'
+        return detectar_texto("\n".join(muestras))
     except Exception:
         # Si no se puede leer, asumir inglés
         return 'en'
 
 
 def seleccionar_archivo_entrada():
-    """Abre un diálogo para seleccionar el archivo de entrada (.srt o .txt)."""
+    """Abre un diálogo para seleccionar el archivo de entrada (.srt, .vtt o .txt)."""
     root = Tk()
     root.withdraw()
     # Traer ventana al frente en Windows
@@ -244,8 +466,8 @@ def seleccionar_archivo_entrada():
     except Exception:
         pass
     ruta = filedialog.askopenfilename(
-        title='Selecciona el archivo a traducir (SRT o TXT)',
-        filetypes=[('SubRip (*.srt)', '*.srt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')]
+        title='Selecciona el archivo a traducir (SRT, VTT o TXT)',
+        filetypes=[('SubRip (*.srt)', '*.srt'), ('WebVTT (*.vtt)', '*.vtt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')]
     )
     root.destroy()
     return ruta
@@ -263,43 +485,15 @@ def seleccionar_archivo_salida(nombre_sugerido: str):
         title='Guardar subtítulos traducidos como...',
         defaultextension='.srt',
         initialfile=nombre_sugerido,
-        filetypes=[('SubRip (*.srt)', '*.srt'), ('Todos los archivos', '*.*')]
+        filetypes=[('SubRip (*.srt)', '*.srt'), ('WebVTT (*.vtt)', '*.vtt'), ('Todos los archivos', '*.*')]
     )
     root.destroy()
     return ruta
 
 
 def detectar_idioma_texto(texto: str) -> str:
-    """Detecta el idioma mayoritario de un texto plano."""
-    muestra = (texto or '').strip()
-    if not muestra:
-        return 'en'
-    try:
-        from langdetect import detect
-        code = detect(muestra)
-        if code.startswith('zh'):
-            return 'zh'
-        return code
-    except Exception:
-        pass
-    # Heurísticas muy simples
-    if any('\u0400' <= ch <= '\u04FF' for ch in muestra):
-        return 'ru'
-    if any(ch in 'äöüÄÖÜß' for ch in muestra):
-        return 'de'
-    if any(ch in 'áéíóúÁÉÍÓÚñÑ' for ch in muestra):
-        return 'es'
-    return 'en'
-
-
-def _seconds_to_subrip_time(total_seconds: float) -> pysrt.SubRipTime:
-    total_seconds = max(0.0, float(total_seconds))
-    ms = int(round((total_seconds - int(total_seconds)) * 1000))
-    total = int(total_seconds)
-    h = total // 3600
-    m = (total % 3600) // 60
-    s = total % 60
-    return pysrt.SubRipTime(hours=h, minutes=m, seconds=s, milliseconds=ms)
+    """Detecta el idioma mayoritario de un texto plano ('en' si no tiene letras)."""
+    return detectar_texto(texto)
 
 
 def _wrap_text_for_subtitle(texto: str, max_chars: int = 42) -> str:
@@ -336,29 +530,30 @@ def _segmentar_texto(texto: str, modo: str = 'oracion') -> list:
 
 def traducir_txt_a_srt(archivo_txt: str, archivo_salida_srt: str, tokenizer, model,
                        src_lang: str, tgt_lang: str, duracion_seg: float = 3.0,
-                       modo_segmentacion: str = 'oracion', max_chars_linea: int = 42):
+                       modo_segmentacion: str = 'oracion', max_chars_linea: int = 42,
+                       perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None,
+                       fallos: InformeFallos = None, asistente: Asistente = None):
     """Lee un .txt, lo segmenta, traduce (si procede) y guarda un .srt sintético."""
-    with open(archivo_txt, 'r', encoding='utf-8', errors='ignore') as f:
+    with tramo('lectura'), open(archivo_txt, 'r', encoding='utf-8', errors='ignore') as f:
         texto = f.read()
 
     segmentos = _segmentar_texto(texto, modo_segmentacion)
-    subs = pysrt.SubRipFile()
-    for i, seg in enumerate(segmentos):
-        texto_seg = seg
-        try:
-            if src_lang and tgt_lang and src_lang != tgt_lang:
-                texto_seg = traducir_texto(seg, tokenizer, model, src_lang, tgt_lang)
-        except Exception as e:
-            print(f"[ADVERTENCIA] Fallo traduciendo un segmento TXT: {e}")
-            texto_seg = seg
-
+    if src_lang and tgt_lang and src_lang != tgt_lang:
+        traducidos = _traducir_unidades(segmentos, tokenizer, model, src_lang, tgt_lang, perfil=perfil, memoria=memoria,
+                                        fallos=fallos, asistente=asistente)
+        if fallos is not None:
+            fallos.ubicar(segmentos)
+    else:
+        traducidos = segmentos
+    subs = ArchivoSubtitulos(formato_por_extension(archivo_salida_srt))
+    for i, texto_seg in enumerate(traducidos):
         texto_envuelto = _wrap_text_for_subtitle(texto_seg, max_chars_linea)
-        start = _seconds_to_subrip_time(i * float(duracion_seg))
-        end = _seconds_to_subrip_time((i + 1) * float(duracion_seg))
-        item = pysrt.SubRipItem(index=i + 1, start=start, end=end, text=texto_envuelto)
-        subs.append(item)
+        start = segundos_a_ms(i * float(duracion_seg))
+        end = segundos_a_ms((i + 1) * float(duracion_seg))
+        subs.agregar(start, end, texto_envuelto, indice=i + 1)
 
-    subs.save(archivo_salida_srt, encoding='utf-8')
+    with tramo('escritura'):
+        subs.guardar(archivo_salida_srt, encoding='utf-8')
 
 
 def app_gui():
@@ -378,11 +573,13 @@ def app_gui():
     var_src = StringVar()
     var_tgt = StringVar()
     var_out_fmt = StringVar()
+    var_perfil = StringVar()
 
     # Valores iniciales
     var_src.set('en')
     var_tgt.set('es')
     var_out_fmt.set('srt')
+    var_perfil.set(PERFIL_POR_DEFECTO)
 
     # Layout
     frm = ttk.Frame(root, padding=12)
@@ -395,12 +592,12 @@ def app_gui():
     ent_in = ttk.Entry(frm, textvariable=var_in_path, width=60)
     ent_in.grid(row=0, column=1, sticky='ew', pady=4)
     def on_browse_in():
-        path = filedialog.askopenfilename(title='Selecciona el archivo (SRT o TXT)', filetypes=[('SubRip (*.srt)', '*.srt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')])
+        path = filedialog.askopenfilename(title='Selecciona el archivo (SRT, VTT o TXT)', filetypes=[('SubRip (*.srt)', '*.srt'), ('WebVTT (*.vtt)', '*.vtt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')])
         if path:
             var_in_path.set(path)
             # Detectar idioma según tipo de archivo
             _, ext = os.path.splitext(path.lower())
-            if ext == '.srt':
+            if ext in ('.srt', '.vtt'):
                 detected = detectar_idioma_archivo(path)
             elif ext == '.txt':
                 try:
@@ -415,7 +612,8 @@ def app_gui():
             base = os.path.basename(path)
             nombre, _ = os.path.splitext(base)
             fmt = (var_out_fmt.get().strip() or 'srt').lower()
-            ext_out = '.srt' if fmt == 'srt' else '.txt'
+            # Un .vtt de entrada conserva su formato salvo que se elija TXT
+            ext_out = '.txt' if fmt != 'srt' else ('.vtt' if ext == '.vtt' else '.srt')
             var_out_path.set(os.path.join(os.path.dirname(path), f"{nombre}.{var_tgt.get()}{ext_out}"))
     ttk.Button(frm, text='Examinar...', command=on_browse_in).grid(row=0, column=2, padx=(8,0), pady=4)
 
@@ -432,7 +630,7 @@ def app_gui():
             initialfile = f"{nombre}.{var_tgt.get()}{ext_out}"
         fmt = (var_out_fmt.get().strip() or 'srt').lower()
         defext = '.srt' if fmt == 'srt' else '.txt'
-        ftypes = [('SubRip (*.srt)', '*.srt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')]
+        ftypes = [('SubRip (*.srt)', '*.srt'), ('WebVTT (*.vtt)', '*.vtt'), ('Texto (*.txt)', '*.txt'), ('Todos los archivos', '*.*')]
         path = filedialog.asksaveasfilename(title='Guardar archivo como', defaultextension=defext, initialfile=initialfile, filetypes=ftypes)
         if path:
             var_out_path.set(path)
@@ -467,15 +665,21 @@ def app_gui():
             var_out_path.set(os.path.join(os.path.dirname(var_in_path.get()), f"{nombre}.{var_tgt.get()}{ext_out}"))
     cb_fmt.bind('<<ComboboxSelected>>', on_change_fmt)
 
+    # Perfil de decodificación
+    ttk.Label(frm, text='Velocidad:').grid(row=5, column=0, sticky='w', padx=(0,8), pady=4)
+    cb_perfil = ttk.Combobox(frm, textvariable=var_perfil, values=list(NOMBRES_PERFILES.keys()), state='readonly', width=12)
+    cb_perfil.grid(row=5, column=1, sticky='w', pady=4)
+
     # Botón traducir
     def on_translate():
         in_path = var_in_path.get().strip()
         out_path = var_out_path.get().strip()
         src = var_src.get().strip()
         tgt = var_tgt.get().strip()
+        perfil = var_perfil.get().strip() or PERFIL_POR_DEFECTO
 
         if not in_path or not os.path.isfile(in_path):
-            messagebox.showerror('Error', 'Debes seleccionar un archivo .srt o .txt válido de entrada.')
+            messagebox.showerror('Error', 'Debes seleccionar un archivo .srt, .vtt o .txt válido de entrada.')
             return
         if not out_path:
             messagebox.showerror('Error', 'Debes indicar dónde guardar el archivo de salida.')
@@ -484,9 +688,10 @@ def app_gui():
             messagebox.showerror('Error', 'El idioma de origen y destino no pueden ser iguales.')
             return
         _, ext_in = os.path.splitext(in_path.lower())
+        perfilado.iniciar_trabajo()
         # Detección automática si procede
         if src == 'auto':
-            if ext_in == '.srt':
+            if ext_in in ('.srt', '.vtt'):
                 src = detectar_idioma_archivo(in_path)
             else:
                 try:
@@ -511,14 +716,14 @@ def app_gui():
         try:
             out_fmt = (var_out_fmt.get().strip() or 'srt').lower()
             if out_fmt == 'srt':
-                if ext_in == '.srt':
-                    traducir_srt(in_path, out_path, tokenizer, model, src, tgt)
+                if ext_in in ('.srt', '.vtt'):
+                    traducir_srt(in_path, out_path, tokenizer, model, src, tgt, perfil=perfil)
                 elif ext_in == '.txt':
                     # Usuario quiere SRT desde TXT, pero ya no soportamos segmentación ni duración.
                     messagebox.showerror('No soportado', 'La salida SRT desde TXT ya no está soportada. Selecciona formato de salida TXT para preservar el texto tal cual.')
                     return
                 else:
-                    messagebox.showerror('Tipo no soportado', 'Solo se admiten archivos .srt o .txt.')
+                    messagebox.showerror('Tipo no soportado', 'Solo se admiten archivos .srt, .vtt o .txt.')
                     return
             elif out_fmt == 'txt':
                 # Forzar extensión .txt si no la tiene
@@ -526,11 +731,11 @@ def app_gui():
                     base, _ = os.path.splitext(out_path)
                     out_path = base + '.txt'
                     var_out_path.set(out_path)
-                if ext_in == '.srt':
-                    subs = pysrt.open(in_path, encoding='utf-8')
+                if ext_in in ('.srt', '.vtt'):
+                    subs = abrir_subtitulos(in_path, encoding='utf-8')
                     texto = '\n'.join(sub.text for sub in subs if sub.text)
                     if src != tgt and tokenizer is not None and model is not None:
-                        texto_out = traducir_texto_largo(texto, tokenizer, model, src, tgt)
+                        texto_out = traducir_texto_largo(texto, tokenizer, model, src, tgt, perfil=perfil)
                     else:
                         texto_out = texto
                     with open(out_path, 'w', encoding='utf-8') as f:
@@ -538,7 +743,7 @@ def app_gui():
                 elif ext_in == '.txt':
                     # Traducción preservando líneas
                     if src != tgt and tokenizer is not None and model is not None:
-                        traducir_txt_a_txt_preservando_lineas(in_path, out_path, tokenizer, model, src, tgt)
+                        traducir_txt_a_txt_preservando_lineas(in_path, out_path, tokenizer, model, src, tgt, perfil=perfil)
                     else:
                         # Solo copiar si no hay traducción
                         with open(in_path, 'r', encoding='utf-8', errors='ignore') as f:
@@ -546,11 +751,12 @@ def app_gui():
                         with open(out_path, 'w', encoding='utf-8') as f:
                             f.write(contenido)
                 else:
-                    messagebox.showerror('Tipo no soportado', 'Solo se admiten archivos .srt o .txt.')
+                    messagebox.showerror('Tipo no soportado', 'Solo se admiten archivos .srt, .vtt o .txt.')
                     return
             else:
                 messagebox.showerror('Formato no soportado', 'Formato de salida desconocido.')
                 return
+            perfilado.terminar_trabajo()
             # Aviso sonoro y visual al completar
             try:
                 if winsound is not None:
@@ -571,12 +777,502 @@ def app_gui():
             messagebox.showerror('Error durante la traducción', str(e))
 
     btn = ttk.Button(frm, text='Traducir', command=on_translate)
-    btn.grid(row=5, column=1, sticky='w', pady=(8,0))
+    btn.grid(row=6, column=1, sticky='w', pady=(8,0))
 
     # Expandir entry principal
     frm.columnconfigure(1, weight=1)
     root.mainloop()
 
 
+def main(argv=None):
+    """Punto de entrada: sin argumentos abre la GUI; con subcomando trabaja por línea de comandos."""
+    parser = argparse.ArgumentParser(description='Subtitulador traductor (M2M100).')
+    sub = parser.add_subparsers(dest='comando')
+
+    p_trad = sub.add_parser('traducir', help='Traduce un archivo .srt, .vtt o .txt sin abrir la GUI.')
+    p_trad.add_argument('entrada')
+    p_trad.add_argument('salida', nargs='?', help='Por defecto: <nombre>.<tgt><ext> junto a la entrada.')
+    p_trad.add_argument('--src', default='auto', help="Idioma origen (o 'auto').")
+    p_trad.add_argument('--tgt', default='es', help='Idioma destino.')
+    p_trad.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO,
+                        help='Perfil de decodificación (velocidad frente a calidad).')
+    p_trad.add_argument('--lista-corta', action='store_true',
+                        help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_trad.add_argument('--memoria', action='store_true',
+                        help='Reutilizar traducciones de la memoria de traducción del par de idiomas y ampliarla.')
+    p_trad.add_argument('--plazo', help="Presupuesto de tiempo para .srt/.vtt (p. ej. '90', '45m', '1.5h'): la calidad "
+                        "baja lo necesario para terminar a tiempo, empezando por --perfil.")
+    p_trad.add_argument('--informe-plazo', help='Guardar en JSON qué subtítulos se tradujeron con qué nivel.')
+    p_trad.add_argument('--desde', help="Traducir primero alrededor de esta posición ('754', '12:34', '00:12:34,500') "
+                        "y reescribir la salida .srt/.vtt tras cada tramo.")
+    p_trad.add_argument('--puerto-reproductor', type=int,
+                        help='Recibir la posición del reproductor por un socket TCP local en este puerto (implica --desde).')
+    p_trad.add_argument('--reanudar', action='store_true',
+                        help='De .txt a .txt: continuar una traducción interrumpida desde la última línea escrita.')
+    p_trad.add_argument('--idioma-por-subtitulo', action='store_true',
+                        help='Archivos con varios idiomas (.srt/.vtt): detectar el idioma de cada subtítulo, traducir '
+                             'cada grupo desde su idioma y dejar tal cual los que ya están en el idioma destino.')
+    p_trad.add_argument('--unir-frases', action='store_true',
+                        help='Traducir juntos los subtítulos de una misma frase (.srt/.vtt) y repartir la traducción '
+                             'entre ellos según su duración.')
+    p_trad.add_argument('--asistente', help="Generación asistida de las líneas largas con búsqueda voraz (--perfil "
+                        "rapido): 'ngramas' o la ruta de un M2M100 pequeño con el mismo vocabulario. Misma salida, "
+                        "menos pasos del modelo; si no es compatible o no acelera, se genera sin asistente.")
+    p_trad.add_argument('--informe-fallos',
+                        help='Guardar en JSON los subtítulos o líneas que no se pudieron traducir y el motivo.')
+    p_trad.add_argument('--traza', help='Guardar una traza de Chrome (JSON) con las etapas del trabajo.')
+    p_trad.add_argument('--sin-perfil', action='store_true', help='No medir ni mostrar el tiempo por etapa.')
+
+    p_vocab = sub.add_parser('lista-corta', help='Construye la lista corta de vocabulario de un idioma destino.')
+    p_vocab.add_argument('--tgt', required=True, help='Idioma destino.')
+    p_vocab.add_argument('--corpus', nargs='*', default=[], help='Archivos .txt/.srt/.vtt escritos en el idioma destino.')
+    p_vocab.add_argument('--muestras', nargs='*', default=[], help='Archivos en el idioma origen que se traducen para recoger los tokens generados.')
+    p_vocab.add_argument('--src', default='auto', help="Idioma origen de las muestras (o 'auto').")
+    p_vocab.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO)
+
+    p_cola = sub.add_parser('trabajador', help='Trabajador del modo distribuido: traduce los archivos de un directorio compartido.')
+    p_cola.add_argument('directorio', help='Directorio compartido de la cola (los archivos a traducir van en <directorio>/entrada).')
+    p_cola.add_argument('--tgt', default='es', help='Idioma destino.')
+    p_cola.add_argument('--src', default='auto', help="Idioma origen (o 'auto', por archivo).")
+    p_cola.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO)
+    p_cola.add_argument('--lista-corta', action='store_true', help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_cola.add_argument('--cues-por-tarea', type=int, default=2000,
+                        help='Subtítulos por tarea al repartir archivos grandes entre trabajadores.')
+    p_cola.add_argument('--caducidad', type=float, default=120.0,
+                        help='Segundos sin latido tras los que otro trabajador reclama una tarea.')
+    p_cola.add_argument('--latido', type=float, default=15.0, help='Segundos entre renovaciones de la concesión.')
+    p_cola.add_argument('--nombre', help='Nombre del trabajador (por defecto: <equipo>-<pid>).')
+    p_cola.add_argument('--no-esperar', action='store_true',
+                        help='Terminar en cuanto no queden tareas libres, aunque otros tengan tareas en curso.')
+    p_cola.add_argument('--estado', action='store_true', help='Mostrar el estado de la cola y salir.')
+    p_cola.add_argument('--procesos', type=int,
+                        help='Trabajadores en este equipo, cada uno en su proceso (por defecto, los del autoajuste o 1).')
+
+    p_vig = sub.add_parser('vigilar', help='Modo demonio: traduce automáticamente lo nuevo o cambiado en unas carpetas.')
+    p_vig.add_argument('carpetas', nargs='+', help='Carpetas de entrada (se recorren recursivamente).')
+    p_vig.add_argument('--tgt', nargs='+', default=['es'], help='Idioma(s) destino.')
+    p_vig.add_argument('--src', default='auto', help="Idioma origen (o 'auto', por archivo).")
+    p_vig.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO)
+    p_vig.add_argument('--lista-corta', action='store_true', help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_vig.add_argument('--salida', help='Carpeta de salida (por defecto, <nombre>.<tgt><ext> junto a cada archivo).')
+    p_vig.add_argument('--catalogo', help='Base de datos SQLite del catálogo (por defecto en ~/.subtitulador).')
+    p_vig.add_argument('--sondeo', type=float, default=5.0, help='Segundos entre revisiones si no hay inotify.')
+    p_vig.add_argument('--una-vez', action='store_true', help='Reconciliar, traducir lo pendiente y salir.')
+
+    p_vivo = sub.add_parser('vivo', help='Traducción en vivo de subtítulos que llegan de uno en uno (stdin o socket local).')
+    p_vivo.add_argument('--src', default='en', help='Idioma origen.')
+    p_vivo.add_argument('--tgt', default='es', help='Idioma destino.')
+    p_vivo.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default='rapido')
+    p_vivo.add_argument('--lista-corta', action='store_true', help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_vivo.add_argument('--escuchar', help="Socket local en lugar de stdin/stdout: 'tcp:8766' o 'unix:/ruta/al.sock'.")
+    p_vivo.add_argument('--plazo-ms', type=float, default=PLAZO_MS, help='Latencia objetivo por subtítulo (ms).')
+    p_vivo.add_argument('--lote-max', type=int, default=LOTE_MAX_VIVO, help='Máximo de subtítulos por microlote.')
+
+    p_ajuste = sub.add_parser('autoajustar', help='Mide hilos, trabajadores y tamaño de lote en este equipo y guarda '
+                                                   'la mejor configuración.')
+    p_ajuste.add_argument('muestra', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                     'test_input.srt'),
+                          help='Archivo .srt/.vtt/.txt de calibración (por defecto, test_input.srt).')
+    p_ajuste.add_argument('--src', default='auto', help="Idioma origen de la muestra (o 'auto').")
+    p_ajuste.add_argument('--tgt', default='es', help='Idioma destino.')
+    p_ajuste.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO)
+    p_ajuste.add_argument('--lista-corta', action='store_true', help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_ajuste.add_argument('--cues', type=int, default=CUES_MUESTRA, help='Subtítulos de la muestra que se traducen en cada prueba.')
+    p_ajuste.add_argument('--hilos', type=int, nargs='+', help='Hilos intra-op a probar (por defecto, potencias de 2 y los núcleos).')
+    p_ajuste.add_argument('--trabajadores', type=int, nargs='+', help='Trabajadores en paralelo a probar.')
+    p_ajuste.add_argument('--lotes', type=int, nargs='+', help='Lotes máximos a probar.')
+    p_ajuste.add_argument('--repeticiones', type=int, default=1, help='Mediciones por configuración (se toma la mediana).')
+    p_ajuste.add_argument('--mostrar', action='store_true', help='Mostrar el perfil guardado de este equipo y salir.')
+
+    p_corpus = sub.add_parser('corpus', help='Traduce muchos archivos a la vez: cada texto repetido entre ellos (o '
+                                             'dentro de uno) se traduce una sola vez.')
+    p_corpus.add_argument('entradas', nargs='+', help='Archivos .srt/.vtt/.txt o carpetas (se recorren recursivamente).')
+    p_corpus.add_argument('--src', default='auto', help="Idioma origen (o 'auto', por archivo).")
+    p_corpus.add_argument('--tgt', default='es', help='Idioma destino.')
+    p_corpus.add_argument('--perfil', choices=list(NOMBRES_PERFILES.keys()), default=PERFIL_POR_DEFECTO)
+    p_corpus.add_argument('--lista-corta', action='store_true', help='Usar la lista corta de vocabulario del idioma destino, si existe.')
+    p_corpus.add_argument('--memoria', action='store_true',
+                          help='Usar y ampliar la memoria de traducción del par de idiomas con los segmentos únicos.')
+    p_corpus.add_argument('--salida', help='Carpeta de salida (por defecto, <nombre>.<tgt><ext> junto a cada archivo).')
+    p_corpus.add_argument('--informe', help='Guardar en JSON el informe de deduplicación (segmentos, únicos, ahorro).')
+
+    for p in (p_trad, p_vocab, p_cola, p_vig, p_vivo, p_ajuste, p_corpus):
+        p.add_argument('--precision', choices=list(PRECISIONES), default=PRECISION_POR_DEFECTO,
+                       help="Precisión de los pesos: 'bf16' ocupa la mitad y es más rápido con bf16 nativo (si no lo "
+                            "hay, se usa fp32); 'auto' elige bf16 solo si hay soporte.")
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'precision', None):
+        fijar_precision(args.precision, log=(lambda m: print(m, file=sys.stderr)) if args.comando == 'vivo' else print)
+    if args.comando != 'autoajustar':
+        # El perfil del equipo (autoajustar) fija hilos y lotes; en modo vivo stdout es la salida de traducciones
+        aplicar_ajuste(log=(lambda m: print(m, file=sys.stderr)) if args.comando == 'vivo' else print)
+    if args.comando is None:
+        app_gui()
+        return 0
+    if args.comando == 'traducir':
+        return _cli_traducir(args)
+    if args.comando == 'lista-corta':
+        return _cli_lista_corta(args)
+    if args.comando == 'trabajador':
+        return _cli_trabajador(args)
+    if args.comando == 'vigilar':
+        return _cli_vigilar(args)
+    if args.comando == 'vivo':
+        return _cli_vivo(args)
+    if args.comando == 'autoajustar':
+        return _cli_autoajustar(args)
+    if args.comando == 'corpus':
+        return _cli_corpus(args)
+    return 0
+
+
+def _leer_textos(ruta: str) -> list:
+    """Textos de un archivo de subtítulos (uno por cue) o de texto (uno por línea no vacía)."""
+    if os.path.splitext(ruta)[1].lower() in ('.srt', '.vtt'):
+        return [t for t in abrir_subtitulos(ruta, encoding='utf-8').textos if t and t.strip()]
+    with open(ruta, 'r', encoding='utf-8', errors='ignore') as f:
+        return [l.strip() for l in f if l.strip()]
+
+
+def _cli_lista_corta(args) -> int:
+    for ruta in args.corpus + args.muestras:
+        if not os.path.isfile(ruta):
+            print(f"[ERROR] No existe el archivo: {ruta}")
+            return 1
+    if not args.corpus and not args.muestras:
+        print('[ERROR] Indica al menos un archivo con --corpus o --muestras.')
+        return 1
+    corpus = [t for ruta in args.corpus for t in _leer_textos(ruta)]
+    muestras = [t for ruta in args.muestras for t in _leer_textos(ruta)]
+    src = args.src
+    if muestras and src == 'auto':
+        src = detectar_idioma_texto('\n'.join(muestras[:200]))
+        print(f"Idioma detectado en las muestras: {src}")
+    tokenizer, model, model_name = cargar_modelo(src if muestras else 'en', args.tgt)
+    ids = construir_lista_corta(tokenizer, args.tgt, corpus=corpus, model=model if muestras else None,
+                                textos_fuente=muestras, src_lang=src, device=device, perfil=args.perfil)
+    ruta = ruta_lista_corta(model_name, args.tgt)
+    guardar_lista_corta(ruta, ids, args.tgt, model_name)
+    print(f"[VOCAB] Lista corta '{args.tgt}': {len(ids)} de {model.config.vocab_size} tokens. Guardada en: {ruta}")
+    return 0
+
+
+def _cli_trabajador(args) -> int:
+    # Importación diferida: distribuido usa las funciones de traducción de este módulo
+    from distribuido import Trabajador, ejecutar_procesos
+    if not os.path.isdir(args.directorio):
+        print(f"[ERROR] No existe el directorio de la cola: {args.directorio}")
+        return 1
+    opciones = {'src_lang': args.src, 'perfil': args.perfil, 'cues_por_tarea': args.cues_por_tarea,
+                'caducidad': args.caducidad, 'latido': args.latido, 'lista_corta': args.lista_corta}
+    trabajador = Trabajador(args.directorio, args.tgt, nombre=args.nombre, **opciones)
+    if args.estado:
+        print(trabajador.resumen_estado())
+        return 0
+    procesos = args.procesos
+    if procesos is None:
+        ajuste = cargar_ajuste(log=lambda m: None)
+        procesos = ajuste['trabajadores'] if ajuste else 1
+    if procesos > 1:
+        print(f"[COLA] {procesos} trabajadores en este equipo")
+        fallidos = ejecutar_procesos(procesos, args.directorio, args.tgt, esperar=not args.no_esperar,
+                                     nombre=args.nombre, precision=precision_modelo, **opciones)
+        print(trabajador.resumen_estado())
+        return 1 if fallidos else 0
+    trabajador.ejecutar(esperar=not args.no_esperar)
+    print(trabajador.resumen_estado())
+    return 0
+
+
+def _cli_vigilar(args) -> int:
+    # Importación diferida, como en _cli_trabajador
+    from daemon import RUTA_CATALOGO, Demonio
+    for carpeta in args.carpetas:
+        if not os.path.isdir(carpeta):
+            print(f"[ERROR] No existe la carpeta: {carpeta}")
+            return 1
+    demonio = Demonio(args.carpetas, args.tgt, src_lang=args.src, perfil=args.perfil, salida=args.salida,
+                      catalogo=args.catalogo or RUTA_CATALOGO, sondeo=args.sondeo, lista_corta=args.lista_corta)
+    try:
+        demonio.ejecutar(una_vez=args.una_vez)
+    except KeyboardInterrupt:
+        print(f"[DEMONIO] Detenido. {demonio.resumen()}")
+    return 0
+
+
+def _cli_autoajustar(args) -> int:
+    if args.mostrar:
+        ajuste = cargar_ajuste(device=device)
+        if ajuste is None:
+            print(f"[AJUSTE] No hay perfil válido para este equipo ({ruta_ajuste()})")
+            return 1
+        print(resumen_ajuste(ajuste))
+        return 0
+    if not os.path.isfile(args.muestra):
+        print(f"[ERROR] No existe el archivo de calibración: {args.muestra}")
+        return 1
+    textos = _leer_textos(args.muestra)
+    if not textos:
+        print(f"[ERROR] El archivo de calibración no tiene texto: {args.muestra}")
+        return 1
+    # Repartidos por todo el archivo, no solo el principio
+    paso = max(1, len(textos) / max(1, args.cues))
+    textos = [textos[int(i * paso)] for i in range(min(args.cues, len(textos)))]
+    src = args.src
+    if src == 'auto':
+        src = detectar_idioma_texto('\n'.join(textos))
+        print(f"Idioma detectado en la muestra: {src}")
+    if src == args.tgt:
+        print("[ERROR] El idioma de origen y destino no pueden ser iguales.")
+        return 1
+    perfilado.configurar(activo=False)
+    tokenizer, model, model_name = cargar_modelo(src, args.tgt, lista_corta=args.lista_corta)
+    print(f"[AJUSTE] {model_name} ({src}->{args.tgt}, perfil {args.perfil}) | {len(textos)} subtítulos por prueba")
+    ajuste = autoajustar(lambda parte, planificador: traducir_lote(parte, tokenizer, model, src, args.tgt, device,
+                                                                   planificador=planificador, perfil=args.perfil),
+                         textos, device=device, hilos=args.hilos, trabajadores=args.trabajadores,
+                         lotes_max=args.lotes, repeticiones=args.repeticiones)
+    ajuste.update({'modelo': model_name, 'perfil': args.perfil, 'idiomas': f"{src}-{args.tgt}"})
+    print(f"[AJUSTE] Perfil guardado en: {guardar_ajuste(ajuste)}")
+    return 0
+
+
+def _cli_corpus(args) -> int:
+    # Importación diferida, como en _cli_trabajador
+    from corpus import PlanCorpus, buscar_archivos
+    for entrada in args.entradas:
+        if not os.path.exists(entrada):
+            print(f"[ERROR] No existe: {entrada}")
+            return 1
+    archivos = buscar_archivos(args.entradas, args.tgt, salida=args.salida)
+    if not archivos:
+        print('[ERROR] No hay archivos .srt, .vtt o .txt que traducir.')
+        return 1
+    perfilado.configurar(activo=False)
+    plan = PlanCorpus(args.tgt)
+    for entrada, salida in archivos:
+        src = args.src if args.src != 'auto' else detectar_idioma_entrada(entrada)
+        try:
+            plan.agregar(entrada, salida, src)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] No se pudo leer {entrada}: {e}")
+            return 1
+        if src == args.tgt:
+            print(f"[CORPUS] {entrada} ya está en '{args.tgt}': se copia sin traducir")
+    print(plan.resumen())
+
+    def traducir(textos: list, src: str) -> list:
+        tokenizer, model, model_name = cargar_modelo(src, args.tgt, lista_corta=args.lista_corta)
+        print(f"Dispositivo: {'GPU (CUDA)' if device.type == 'cuda' else 'CPU'} | Modelo: {model_name} | "
+              f"Perfil: {args.perfil} | Precisión: {precision_modelo}")
+        memoria = None
+        if args.memoria:
+            memoria = MemoriaTraduccion.cargar(ruta_memoria(src, args.tgt), src, args.tgt)
+            print(f"[MEMORIA] {len(memoria)} segmentos cargados ({src}->{args.tgt})")
+        # Como las líneas de un .txt: los segmentos que exceden el límite del modelo se trocean
+        traducidos = traducir_lineas(textos, tokenizer, model, src, args.tgt, perfil=args.perfil, memoria=memoria)
+        if memoria is not None:
+            print(memoria.resumen())
+            try:
+                memoria.guardar(ruta_memoria(src, args.tgt))
+            except OSError as e:
+                print(f"[MEMORIA] No se pudo guardar la memoria: {e}")
+        return traducidos
+
+    plan.traducir(traducir)
+    plan.materializar()
+    print(plan.resumen())
+    if args.informe:
+        plan.guardar_informe(args.informe)
+        print(f"[CORPUS] Informe guardado en: {args.informe}")
+    print(f"Traducción completada: {len(archivos)} archivos")
+    return 0
+
+
+def _cli_vivo(args) -> int:
+    if args.src == args.tgt:
+        print("[ERROR] El idioma de origen y destino no pueden ser iguales.", file=sys.stderr)
+        return 1
+    perfilado.configurar(activo=False)
+    # stdout puede ser la salida de traducciones: todo mensaje va a stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        tokenizer, model, model_name = cargar_modelo(args.src, args.tgt, lista_corta=args.lista_corta)
+    planificador = PlanificadorLotes(device=device, log=None)
+    traductor = TraductorVivo(lambda textos: traducir_lote(textos, tokenizer, model, args.src, args.tgt, device,
+                                                           planificador=planificador, perfil=args.perfil),
+                              plazo_ms=args.plazo_ms, lote_max=args.lote_max)
+    traductor.calentar()
+    traductor.iniciar()
+    try:
+        if args.escuchar:
+            try:
+                servidor = crear_servidor(traductor, args.escuchar)
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] No se pudo escuchar en {args.escuchar}: {e}", file=sys.stderr)
+                return 1
+            print(f"[VIVO] {model_name} ({args.src}->{args.tgt}) escuchando en {args.escuchar}", file=sys.stderr)
+            with servidor:
+                servidor.serve_forever()
+        else:
+            def escribir(texto):
+                sys.stdout.write(texto)
+                sys.stdout.flush()
+            servir_flujo(sys.stdin, escribir, traductor)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        traductor.parar()
+        print(traductor.resumen(), file=sys.stderr)
+    return 0
+
+
+def detectar_idioma_entrada(entrada: str) -> str:
+    """Idioma mayoritario de un archivo .srt/.vtt o de texto plano."""
+    if os.path.splitext(entrada)[1].lower() in ('.srt', '.vtt'):
+        return detectar_idioma_archivo(entrada)
+    with open(entrada, 'r', encoding='utf-8', errors='ignore') as f:
+        return detectar_idioma_texto(f.read())
+
+
+def traducir_archivo(entrada: str, salida: str, tokenizer, model, src_lang: str, tgt_lang: str,
+                     perfil: str = PERFIL_POR_DEFECTO, memoria: MemoriaTraduccion = None, reanudar: bool = False,
+                     fallos: InformeFallos = None, idioma_por_subtitulo: bool = False,
+                     unir_frases: bool = False, asistente: Asistente = None) -> bool:
+    """Traduce entrada a salida según sus extensiones (.srt/.vtt/.txt). False si la combinación no se admite.
+
+    reanudar solo se aplica de .txt a .txt (ver traducir_txt_a_txt_preservando_lineas), e
+    idioma_por_subtitulo y unir_frases de .srt/.vtt a .srt/.vtt (ver traducir_srt).
+    fallos recoge los textos que no se pudieron traducir (ver lotes.InformeFallos).
+    asistente genera los textos largos con generación asistida (ver asistida.py).
+    """
+    ext_in = os.path.splitext(entrada)[1].lower()
+    ext_out = os.path.splitext(salida)[1].lower()
+    if ext_in in ('.srt', '.vtt') and ext_out in ('.srt', '.vtt'):
+        traducir_srt(entrada, salida, tokenizer, model, src_lang, tgt_lang, perfil=perfil, memoria=memoria,
+                     fallos=fallos, idioma_por_subtitulo=idioma_por_subtitulo, unir_frases=unir_frases,
+                     asistente=asistente)
+    elif ext_in in ('.srt', '.vtt'):
+        subs = abrir_subtitulos(entrada, encoding='utf-8')
+        texto = '\n'.join(t for t in subs.textos if t)
+        with open(salida, 'w', encoding='utf-8') as f:
+            f.write(traducir_texto_largo(texto, tokenizer, model, src_lang, tgt_lang, perfil=perfil, fallos=fallos,
+                                         asistente=asistente))
+    elif ext_in == '.txt' and ext_out in ('.srt', '.vtt'):
+        traducir_txt_a_srt(entrada, salida, tokenizer, model, src_lang, tgt_lang, perfil=perfil, memoria=memoria,
+                           fallos=fallos, asistente=asistente)
+    elif ext_in == '.txt':
+        traducir_txt_a_txt_preservando_lineas(entrada, salida, tokenizer, model, src_lang, tgt_lang, perfil=perfil,
+                                              memoria=memoria, reanudar=reanudar, fallos=fallos, asistente=asistente)
+    else:
+        return False
+    return True
+
+
+def _cli_traducir(args) -> int:
+    entrada = args.entrada
+    if not os.path.isfile(entrada):
+        print(f"[ERROR] No existe el archivo de entrada: {entrada}")
+        return 1
+    perfilado.configurar(activo=not args.sin_perfil, ruta_traza=args.traza)
+    perfilado.iniciar_trabajo()
+    plazo = None
+    if args.plazo:
+        try:
+            presupuesto = segundos_plazo(args.plazo)
+        except ValueError:
+            print(f"[ERROR] Plazo no válido: {args.plazo}")
+            return 1
+        # El modelo reducido (cuantizado a int8) solo se prepara si hace falta, y solo en CPU
+        plazo = Plazo(presupuesto, args.perfil,
+                      modelo_reducido=(lambda: cuantizar_modelo(_m2m_model)) if device.type == 'cpu' else None)
+    posicion_ms = 0
+    if args.desde is not None:
+        try:
+            posicion_ms = marca_a_ms(args.desde)
+        except ValueError:
+            print(f"[ERROR] Posición no válida: {args.desde}")
+            return 1
+    nombre, ext_in = os.path.splitext(entrada)
+    ext_in = ext_in.lower()
+    salida = args.salida or f"{nombre}.{args.tgt}{ext_in}"
+
+    src = args.src
+    if src == 'auto':
+        src = detectar_idioma_entrada(entrada)
+        print(f"Idioma detectado: {src}")
+    if args.idioma_por_subtitulo:
+        if ext_in not in ('.srt', '.vtt') or os.path.splitext(salida)[1].lower() not in ('.srt', '.vtt'):
+            print('[ERROR] --idioma-por-subtitulo solo se admite de .srt/.vtt a .srt/.vtt.')
+            return 1
+        if plazo is not None or args.desde is not None or args.puerto_reproductor is not None or args.unir_frases:
+            print('[ERROR] --idioma-por-subtitulo no se combina con --plazo, --desde, --puerto-reproductor ni '
+                  '--unir-frases.')
+            return 1
+    elif src == args.tgt:
+        # Con idioma por subtítulo, un archivo mayoritariamente en el idioma destino es válido
+        print("[ERROR] El idioma de origen y destino no pueden ser iguales.")
+        return 1
+
+    tokenizer, model, model_name = cargar_modelo(src, args.tgt, lista_corta=args.lista_corta)
+    print(f"Dispositivo: {'GPU (CUDA)' if device.type == 'cuda' else 'CPU'} | Modelo: {model_name} | "
+          f"Perfil: {args.perfil} | Precisión: {precision_modelo}")
+    memoria = None
+    if args.memoria:
+        with tramo('carga_memoria'):
+            memoria = MemoriaTraduccion.cargar(ruta_memoria(src, args.tgt), src, args.tgt)
+        print(f"[MEMORIA] {len(memoria)} segmentos cargados ({src}->{args.tgt})")
+    asistente = Asistente.crear(args.asistente, tokenizer, model, perfil=args.perfil) if args.asistente else None
+    fallos = InformeFallos()
+    if args.unir_frases:
+        if ext_in not in ('.srt', '.vtt') or os.path.splitext(salida)[1].lower() not in ('.srt', '.vtt'):
+            print('[ERROR] --unir-frases solo se admite de .srt/.vtt a .srt/.vtt.')
+            return 1
+        if args.desde is not None or args.puerto_reproductor is not None:
+            print('[ERROR] --unir-frases no se combina con --desde ni --puerto-reproductor.')
+            return 1
+    if plazo is not None:
+        if ext_in not in ('.srt', '.vtt') or os.path.splitext(salida)[1].lower() not in ('.srt', '.vtt'):
+            print('[ERROR] --plazo solo se admite de .srt/.vtt a .srt/.vtt.')
+            return 1
+        if memoria is not None:
+            print('[MEMORIA] Con --plazo no se usa la memoria de traducción')
+            memoria = None
+        traducir_srt(entrada, salida, tokenizer, model, src, args.tgt, perfil=args.perfil, plazo=plazo, fallos=fallos,
+                     unir_frases=args.unir_frases, asistente=asistente)
+        if args.informe_plazo:
+            plazo.guardar_informe(args.informe_plazo)
+            print(f"[PLAZO] Informe guardado en: {args.informe_plazo}")
+    elif args.desde is not None or args.puerto_reproductor is not None:
+        if ext_in not in ('.srt', '.vtt') or os.path.splitext(salida)[1].lower() not in ('.srt', '.vtt'):
+            print('[ERROR] --desde/--puerto-reproductor solo se admiten de .srt/.vtt a .srt/.vtt.')
+            return 1
+        traducir_srt_por_posicion(entrada, salida, tokenizer, model, src, args.tgt, posicion_ms=posicion_ms,
+                                  puerto=args.puerto_reproductor, perfil=args.perfil, memoria=memoria, fallos=fallos,
+                                  asistente=asistente)
+    elif not traducir_archivo(entrada, salida, tokenizer, model, src, args.tgt, perfil=args.perfil, memoria=memoria,
+                              reanudar=args.reanudar, fallos=fallos, idioma_por_subtitulo=args.idioma_por_subtitulo,
+                              unir_frases=args.unir_frases, asistente=asistente):
+        print('[ERROR] Solo se admiten archivos .srt, .vtt o .txt.')
+        return 1
+    if asistente is not None:
+        print(asistente.resumen())
+    if fallos.lotes_fallidos:
+        print(fallos.resumen())
+    if args.informe_fallos:
+        fallos.guardar(args.informe_fallos)
+        print(f"[LOTES] Informe de fallos guardado en: {args.informe_fallos}")
+    if memoria is not None:
+        print(memoria.resumen())
+        try:
+            with tramo('guardado_memoria'):
+                memoria.guardar(ruta_memoria(src, args.tgt))
+        except OSError as e:
+            print(f"[MEMORIA] No se pudo guardar la memoria: {e}")
+    perfilado.terminar_trabajo()
+    print(f"Traducción completada. Guardado en: {salida}")
+    return 0
+
+
 if __name__ == '__main__':
-    app_gui()
\ No newline at end of file
+    raise SystemExit(main())
\ No newline at end of file
@@ -2,7 +2,7 @@
 Subtitulador con Interfaz Gráfica Moderna
 =========================================
 Versión con GUI mejorada usando CustomTkinter para una apariencia moderna.
-Traduce archivos SRT y TXT usando el modelo M2M100 de Facebook.
+Traduce archivos SRT, VTT y TXT usando el modelo M2M100 de Facebook.
 """
 
 import subprocess
@@ -88,8 +88,6 @@ def verificar_e_instalar_dependencias():
     dependencias = [
         ('customtkinter', 'customtkinter'),
         ('transformers', 'transformers'),
-        ('pysrt', 'pysrt'),
-        ('langdetect', 'langdetect'),
         ('sentencepiece', 'sentencepiece'),
     ]
     
@@ -178,23 +176,37 @@ def verificar_e_instalar_dependencias():
     print("\n✅ Todas las dependencias están instaladas")
     print(f"📂 Entorno virtual: {VENV_DIR}\n")
 
-# Verificar dependencias antes de importar
-verificar_e_instalar_dependencias()
+# Verificar dependencias antes de importar (solo al ejecutarse como programa:
+# importado desde otro script, p. ej. los benchmarks, usa el entorno actual)
+if __name__ == '__main__':
+    verificar_e_instalar_dependencias()
 
 # Ahora importamos todo
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
+import collections
 import threading
+import time
 import torch
 import re
-import pysrt
-from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 
 try:
     import winsound
 except Exception:
     winsound = None
 
+from autoajuste import aplicar_ajuste
+from decodificacion import NOMBRES_PERFILES, PERFIL_POR_DEFECTO
+from idioma import detectar_texto
+from lotes import InformeFallos, PlanificadorLotes, TraduccionCancelada, biseccionar, traducir_lote
+import perfilado
+from perfilado import tramo
+from plazo import Plazo, cuantizar_modelo
+from precision import NOMBRES_PRECISIONES, PRECISION_POR_DEFECTO, admite_bf16, resolver_precision
+from residente import INACTIVIDAD_MIN, ModeloResidente
+from subtitulos import abrir_subtitulos, formato_por_extension
+from texto_mmap import TextoMapeado
+
 # Configuración de tema
 ctk.set_appearance_mode("dark")  # "dark", "light", "system"
 ctk.set_default_color_theme("blue")
@@ -242,9 +254,134 @@ IDIOMAS = {
     'ko': '🇰🇷 Coreano',
 }
 
-# Variables globales del modelo
-_m2m_tokenizer = None
-_m2m_model = None
+# Modelo global: se carga en el primer trabajo y se descarga tras un tiempo sin uso
+_modelo = ModeloResidente('facebook/m2m100_418M')
+# Cada cuánto se revisa la inactividad y se actualiza la memoria mostrada
+INTERVALO_MEMORIA_MS = 5000
+# Subtítulos que muestra a la vez la vista previa: solo se dibujan esos, aunque haya miles
+FILAS_VISTA_PREVIA = 8
+# Cada cuánto pasan a la vista previa los subtítulos recién traducidos
+INTERVALO_VISTA_PREVIA_MS = 250
+# Caracteres por línea en la vista previa (el resto se corta)
+ANCHO_VISTA_PREVIA = 160
+
+
+def _una_linea(texto: str) -> str:
+    texto = ' / '.join(p.strip() for p in str(texto).splitlines() if p.strip())
+    return texto if len(texto) <= ANCHO_VISTA_PREVIA else texto[:ANCHO_VISTA_PREVIA - 1] + '…'
+
+
+class VistaPrevia(ctk.CTkFrame):
+    """Pares origen/traducción que aparecen a medida que terminan los lotes.
+
+    El hilo de traducción solo los encola (agregar); un temporizador de la
+    interfaz los recoge y redibuja únicamente los FILAS_VISTA_PREVIA visibles,
+    así que 10.000 subtítulos cuestan lo mismo de pintar que 10. Mientras se
+    está al final sigue a los nuevos; al subir con la rueda o la barra se queda quieta.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, **kwargs)
+        self.pares = []
+        self._nuevos = collections.deque()
+        self.inicio = 0
+        self.siguiendo = True
+        self.total = 0
+        self.etiqueta = "subtítulo"
+        
+        self.label_resumen = ctk.CTkLabel(
+            self,
+            text="Los subtítulos traducidos aparecerán aquí según terminen los lotes",
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.label_resumen.pack(anchor="w", padx=5)
+        
+        cuerpo = ctk.CTkFrame(self, fg_color="transparent")
+        cuerpo.pack(fill="both", expand=True)
+        self.texto = ctk.CTkTextbox(
+            cuerpo,
+            height=100,
+            wrap="none",
+            activate_scrollbars=False,
+            font=ctk.CTkFont(family="Consolas", size=11)
+        )
+        self.texto.pack(side="left", fill="both", expand=True)
+        self.texto.configure(state="disabled")
+        self.barra = ctk.CTkScrollbar(cuerpo, command=self._desplazar)
+        self.barra.pack(side="right", fill="y")
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.texto.bind(evento, self._rueda)
+        self.after(INTERVALO_VISTA_PREVIA_MS, self._refrescar)
+        
+    def reiniciar(self):
+        """Vacía la vista para un trabajo nuevo (desde el hilo de la interfaz)"""
+        self._nuevos.clear()
+        self.pares = []
+        self.inicio = 0
+        self.siguiendo = True
+        self.total = 0
+        self._dibujar()
+        
+    def fijar_total(self, total: int, etiqueta: str):
+        """Número de textos del trabajo, para el resumen (desde cualquier hilo)"""
+        self.total = total
+        self.etiqueta = etiqueta or "subtítulo"
+        
+    def agregar(self, pares: list):
+        """Encola (número, origen, traducción) recién traducidos (desde cualquier hilo)"""
+        self._nuevos.extend(pares)
+        
+    def _refrescar(self):
+        if self._nuevos:
+            for _ in range(len(self._nuevos)):
+                self.pares.append(self._nuevos.popleft())
+            if self.siguiendo:
+                self.inicio = self._inicio_max()
+            self._dibujar()
+        self.after(INTERVALO_VISTA_PREVIA_MS, self._refrescar)
+        
+    def _inicio_max(self) -> int:
+        return max(0, len(self.pares) - FILAS_VISTA_PREVIA)
+        
+    def _dibujar(self):
+        visibles = self.pares[self.inicio:self.inicio + FILAS_VISTA_PREVIA]
+        lineas = []
+        for numero, origen, traduccion in visibles:
+            lineas.append(f"{numero:>6} │ {_una_linea(origen)}")
+            lineas.append(f"{'':>6} │ → {_una_linea(traduccion)}")
+        self.texto.configure(state="normal")
+        self.texto.delete("1.0", "end")
+        self.texto.insert("1.0", "\n".join(lineas))
+        self.texto.configure(state="disabled")
+        
+        n = len(self.pares)
+        if n:
+            self.barra.set(self.inicio / n, (self.inicio + len(visibles)) / n)
+            self.label_resumen.configure(
+                text=f"{n} de {self.total or n} {self.etiqueta}s traducidos · "
+                     f"mostrando {self.inicio + 1}-{self.inicio + len(visibles)} (en orden de llegada)"
+            )
+        else:
+            self.barra.set(0, 1)
+            
+    def _ir_a(self, inicio: int):
+        self.inicio = max(0, min(inicio, self._inicio_max()))
+        self.siguiendo = self.inicio >= self._inicio_max()
+        self._dibujar()
+        
+    def _desplazar(self, accion: str, *args):
+        """Órdenes de la barra de desplazamiento ('moveto' o 'scroll', como en yview)"""
+        if accion == "moveto":
+            self._ir_a(round(float(args[0]) * len(self.pares)))
+        elif accion == "scroll":
+            paso = int(args[0]) * (FILAS_VISTA_PREVIA if args[1] == "pages" else 1)
+            self._ir_a(self.inicio + paso)
+            
+    def _rueda(self, evento):
+        arriba = evento.num == 4 or getattr(evento, 'delta', 0) > 0
+        self._ir_a(self.inicio + (-3 if arriba else 3))
+        return "break"
 
 
 class SubtituladorApp(ctk.CTk):
@@ -253,8 +390,8 @@ class SubtituladorApp(ctk.CTk):
         
         # Configuración de la ventana principal
         self.title("🎬 Subtitulador Traductor")
-        self.geometry("800x650")
-        self.minsize(700, 600)
+        self.geometry("800x760")
+        self.minsize(700, 700)
         
         # Variables
         self.archivo_entrada = ctk.StringVar()
@@ -265,9 +402,15 @@ class SubtituladorApp(ctk.CTk):
         self.dispositivo_seleccionado = ctk.StringVar(value='cuda' if CUDA_DISPONIBLE else 'cpu')
         self.progreso = ctk.DoubleVar(value=0)
         self.traduciendo = False
+        # Se activa con el botón Cancelar; la traducción para al terminar el lote en curso
+        self.cancelacion = threading.Event()
         
         # Crear interfaz
         self.crear_interfaz()
+        _modelo.log = lambda m: self.after(0, lambda m=m: self.log(m))
+        # Hilos y lotes medidos para este equipo con 'subtitulador.py autoajustar', si los hay
+        aplicar_ajuste(log=self.log)
+        self.after(INTERVALO_MEMORIA_MS, self.vigilar_memoria)
         
     def crear_interfaz(self):
         # Frame principal con padding
@@ -354,7 +497,7 @@ class SubtituladorApp(ctk.CTk):
         self.entry_entrada = ctk.CTkEntry(
             entrada_inner,
             textvariable=self.archivo_entrada,
-            placeholder_text="Selecciona un archivo .srt o .txt",
+            placeholder_text="Selecciona un archivo .srt, .vtt o .txt",
             height=40,
             font=ctk.CTkFont(size=13)
         )
@@ -484,6 +627,87 @@ class SubtituladorApp(ctk.CTk):
         self.combo_formato.pack(fill="x", pady=(5, 0))
         self.combo_formato.set("📺 SRT (Subtítulos)")
         
+        # Perfil de decodificación (velocidad frente a calidad)
+        perfil_frame = ctk.CTkFrame(opciones_grid, fg_color="transparent")
+        perfil_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(
+            perfil_frame,
+            text="Velocidad:",
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w")
+        
+        self.combo_perfil = ctk.CTkComboBox(
+            perfil_frame,
+            values=list(NOMBRES_PERFILES.values()),
+            width=200,
+            height=35,
+            font=ctk.CTkFont(size=12),
+            command=self.on_perfil_change
+        )
+        self.combo_perfil.pack(fill="x", pady=(5, 0))
+        self.combo_perfil.set(NOMBRES_PERFILES[PERFIL_POR_DEFECTO])
+        
+        # Plazo: si se indica, la calidad baja lo necesario para terminar a tiempo
+        plazo_frame = ctk.CTkFrame(opciones_grid, fg_color="transparent")
+        plazo_frame.grid(row=1, column=1, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(
+            plazo_frame,
+            text="Plazo (minutos):",
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w")
+        
+        self.entry_plazo = ctk.CTkEntry(
+            plazo_frame,
+            placeholder_text="Sin plazo",
+            width=200,
+            height=35,
+            font=ctk.CTkFont(size=12)
+        )
+        self.entry_plazo.pack(fill="x", pady=(5, 0))
+        
+        # Minutos sin uso tras los que se libera la memoria del modelo (vacío o 0: nunca)
+        inactividad_frame = ctk.CTkFrame(opciones_grid, fg_color="transparent")
+        inactividad_frame.grid(row=1, column=2, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(
+            inactividad_frame,
+            text="Descargar modelo tras (min):",
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w")
+        
+        self.entry_inactividad = ctk.CTkEntry(
+            inactividad_frame,
+            placeholder_text="Nunca",
+            width=200,
+            height=35,
+            font=ctk.CTkFont(size=12)
+        )
+        self.entry_inactividad.pack(fill="x", pady=(5, 0))
+        self.entry_inactividad.insert(0, str(INACTIVIDAD_MIN))
+        
+        # Precisión de los pesos: bf16 ocupa la mitad y es más rápido en CPUs con bf16 nativo
+        precision_frame = ctk.CTkFrame(opciones_grid, fg_color="transparent")
+        precision_frame.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
+        
+        ctk.CTkLabel(
+            precision_frame,
+            text="Precisión:",
+            font=ctk.CTkFont(size=13)
+        ).pack(anchor="w")
+        
+        self.combo_precision = ctk.CTkComboBox(
+            precision_frame,
+            values=list(NOMBRES_PRECISIONES.values()),
+            width=200,
+            height=35,
+            font=ctk.CTkFont(size=12),
+            command=self.on_precision_change
+        )
+        self.combo_precision.pack(fill="x", pady=(5, 0))
+        self.combo_precision.set(NOMBRES_PRECISIONES[PRECISION_POR_DEFECTO])
+        
         # ========== BARRA DE PROGRESO ==========
         progreso_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
         progreso_frame.pack(fill="x", pady=10)
@@ -499,6 +723,14 @@ class SubtituladorApp(ctk.CTk):
         self.barra_progreso.pack(fill="x", pady=(5, 0))
         self.barra_progreso.set(0)
         
+        self.label_memoria = ctk.CTkLabel(
+            progreso_frame,
+            text=_modelo.texto_memoria(),
+            font=ctk.CTkFont(size=11),
+            text_color="gray"
+        )
+        self.label_memoria.pack(anchor="w", padx=5, pady=(5, 0))
+        
         # ========== BOTONES DE ACCIÓN ==========
         botones_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
         botones_frame.pack(fill="x", pady=20)
@@ -540,22 +772,33 @@ class SubtituladorApp(ctk.CTk):
         )
         btn_limpiar.pack(side="left")
         
-        # ========== LOG DE ACTIVIDAD ==========
-        log_frame = ctk.CTkFrame(main_frame)
-        log_frame.pack(fill="both", expand=True, pady=(10, 0))
+        self.btn_cancelar = ctk.CTkButton(
+            btns_secundarios,
+            text="⏹ Cancelar",
+            command=self.cancelar_traduccion,
+            width=150,
+            height=35,
+            state="disabled",
+            fg_color="#C62828",
+            hover_color="#8E0000"
+        )
+        self.btn_cancelar.pack(side="right")
         
-        ctk.CTkLabel(
-            log_frame,
-            text="📋 Registro de actividad",
-            font=ctk.CTkFont(size=14, weight="bold")
-        ).pack(anchor="w", padx=15, pady=(10, 5))
+        # ========== LOG DE ACTIVIDAD Y VISTA PREVIA ==========
+        self.pestanas = ctk.CTkTabview(main_frame, height=160)
+        self.pestanas.pack(fill="both", expand=True, pady=(10, 0))
+        pestana_log = self.pestanas.add("📋 Registro de actividad")
+        pestana_vista = self.pestanas.add("👁️ Vista previa")
         
         self.log_text = ctk.CTkTextbox(
-            log_frame,
+            pestana_log,
             height=100,
             font=ctk.CTkFont(family="Consolas", size=11)
         )
-        self.log_text.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+        self.log_text.pack(fill="both", expand=True, padx=5, pady=(0, 5))
+        
+        self.vista_previa = VistaPrevia(pestana_vista, fg_color="transparent")
+        self.vista_previa.pack(fill="both", expand=True, padx=5, pady=(0, 5))
         self.log("Aplicación iniciada. Selecciona un archivo para comenzar.")
         
     def log(self, mensaje: str):
@@ -578,6 +821,7 @@ class SubtituladorApp(ctk.CTk):
             title='Selecciona el archivo a traducir',
             filetypes=[
                 ('Subtítulos SRT', '*.srt'),
+                ('Subtítulos WebVTT', '*.vtt'),
                 ('Archivos de texto', '*.txt'),
                 ('Todos los archivos', '*.*')
             ]
@@ -600,8 +844,8 @@ class SubtituladorApp(ctk.CTk):
         """Abre diálogo para seleccionar archivo de salida"""
         formato = self.combo_formato.get()
         if "SRT" in formato:
-            ext = '.srt'
-            ftypes = [('Subtítulos SRT', '*.srt'), ('Todos los archivos', '*.*')]
+            ext = '.vtt' if self.archivo_entrada.get().lower().endswith('.vtt') else '.srt'
+            ftypes = [('Subtítulos SRT', '*.srt'), ('Subtítulos WebVTT', '*.vtt'), ('Todos los archivos', '*.*')]
         else:
             ext = '.txt'
             ftypes = [('Archivos de texto', '*.txt'), ('Todos los archivos', '*.*')]
@@ -633,7 +877,11 @@ class SubtituladorApp(ctk.CTk):
         idioma_dest = self.obtener_codigo_idioma(self.combo_destino.get())
         
         formato = self.combo_formato.get()
-        ext = '.srt' if "SRT" in formato else '.txt'
+        if "SRT" in formato:
+            # Un .vtt de entrada conserva su formato
+            ext = '.vtt' if ruta_entrada.lower().endswith('.vtt') else '.srt'
+        else:
+            ext = '.txt'
         
         nueva_ruta = os.path.join(directorio, f"{nombre}.{idioma_dest}{ext}")
         self.archivo_salida.set(nueva_ruta)
@@ -646,10 +894,34 @@ class SubtituladorApp(ctk.CTk):
         """Callback cuando cambia el formato"""
         self.actualizar_ruta_salida()
         
+    def on_perfil_change(self, *args):
+        """Callback cuando cambia el perfil de decodificación"""
+        self.log(f"Perfil de decodificación: {self.obtener_perfil()}")
+        
+    def obtener_perfil(self) -> str:
+        """Obtiene el nombre interno del perfil desde el texto del combobox"""
+        seleccion = self.combo_perfil.get()
+        for clave, nombre in NOMBRES_PERFILES.items():
+            if nombre == seleccion:
+                return clave
+        return PERFIL_POR_DEFECTO
+        
+    def on_precision_change(self, *args):
+        """Callback cuando cambia la precisión del modelo"""
+        dispositivo = self.dispositivo_seleccionado.get()
+        soporte = "con" if admite_bf16(dispositivo) else "sin"
+        self.log(f"Precisión: {self.obtener_precision()} ({dispositivo.upper()} {soporte} bf16 nativo)")
+        
+    def obtener_precision(self) -> str:
+        """Obtiene el nombre interno de la precisión desde el texto del combobox"""
+        seleccion = self.combo_precision.get()
+        for clave, nombre in NOMBRES_PRECISIONES.items():
+            if nombre == seleccion:
+                return clave
+        return PRECISION_POR_DEFECTO
+        
     def on_dispositivo_change(self, *args):
         """Callback cuando cambia el dispositivo"""
-        global _m2m_model, _m2m_tokenizer
-        
         # Si no hay combo (solo CPU), no hacer nada
         if self.combo_dispositivo is None:
             return
@@ -665,17 +937,15 @@ class SubtituladorApp(ctk.CTk):
             self.label_dispositivo_estado.configure(text="✅", text_color="#FF9800")
             self.log("Dispositivo cambiado a: CPU")
         
-        # Limpiar modelo cargado para forzar recarga en nuevo dispositivo
-        if _m2m_model is not None:
-            _m2m_model = None
-            _m2m_tokenizer = None
-            self.log("Modelo descargado. Se recargará en el nuevo dispositivo.")
+        # Liberar el modelo cargado: se recargará (desde la copia local) en el nuevo dispositivo
+        if _modelo.descargar('cambio de dispositivo'):
+            self.log("Se recargará en el nuevo dispositivo.")
         
     def detectar_idioma(self, archivo: str, extension: str) -> str:
         """Detecta el idioma del archivo"""
         try:
-            if extension == '.srt':
-                subs = pysrt.open(archivo, encoding='utf-8')
+            if extension in ('.srt', '.vtt'):
+                subs = abrir_subtitulos(archivo, encoding='utf-8')
                 muestras = []
                 for sub in subs:
                     if sub.text and sub.text.strip():
@@ -687,23 +957,7 @@ class SubtituladorApp(ctk.CTk):
                 with open(archivo, 'r', encoding='utf-8', errors='ignore') as f:
                     muestra = f.read(5000)
                     
-            try:
-                from langdetect import detect
-                code = detect(muestra)
-                if code.startswith('zh'):
-                    return 'zh'
-                return code
-            except Exception:
-                pass
-                
-            # Heurísticas
-            if any('\u0400' <= ch <= '\u04FF' for ch in muestra):
-                return 'ru'
-            if any(ch in 'äöüÄÖÜß' for ch in muestra):
-                return 'de'
-            if any(ch in 'áéíóúÁÉÍÓÚñÑ¿¡' for ch in muestra):
-                return 'es'
-            return 'en'
+            return detectar_texto(muestra)
         except Exception:
             return 'en'
             
@@ -721,10 +975,30 @@ class SubtituladorApp(ctk.CTk):
         self.combo_origen.set(IDIOMAS['auto'])
         self.combo_destino.set(IDIOMAS['es'])
         self.combo_formato.set("📺 SRT (Subtítulos)")
+        self.combo_perfil.set(NOMBRES_PERFILES[PERFIL_POR_DEFECTO])
+        self.combo_precision.set(NOMBRES_PRECISIONES[PRECISION_POR_DEFECTO])
+        self.entry_plazo.delete(0, "end")
+        self.entry_inactividad.delete(0, "end")
+        self.entry_inactividad.insert(0, str(INACTIVIDAD_MIN))
         self.barra_progreso.set(0)
         self.label_estado.configure(text="⏳ Listo para traducir")
+        if not self.traduciendo:
+            self.vista_previa.reiniciar()
         self.log("Campos limpiados")
         
+    def vigilar_memoria(self):
+        """Descarga el modelo si lleva demasiado sin usarse y actualiza la memoria mostrada"""
+        texto = self.entry_inactividad.get().strip().replace(',', '.')
+        try:
+            _modelo.inactividad_s = max(0.0, float(texto)) * 60 if texto else 0
+        except ValueError:
+            pass
+        if not self.traduciendo:
+            # La descarga libera memoria en el hilo de la interfaz: es rápida (no hay E/S)
+            _modelo.comprobar_inactividad()
+        self.label_memoria.configure(text=f"🧠 {_modelo.texto_memoria()}")
+        self.after(INTERVALO_MEMORIA_MS, self.vigilar_memoria)
+        
     def actualizar_estado(self, texto: str, progreso: float = None):
         """Actualiza el estado y progreso desde cualquier hilo"""
         self.label_estado.configure(text=texto)
@@ -732,6 +1006,13 @@ class SubtituladorApp(ctk.CTk):
             self.barra_progreso.set(progreso)
         self.update_idletasks()
         
+    def cancelar_traduccion(self):
+        """Pide parar la traducción en curso: termina el lote actual y no guarda nada"""
+        if self.traduciendo and not self.cancelacion.is_set():
+            self.cancelacion.set()
+            self.btn_cancelar.configure(state="disabled")
+            self.log("Cancelando: se detiene al terminar el lote en curso...")
+            
     def iniciar_traduccion(self):
         """Inicia el proceso de traducción en un hilo separado"""
         if self.traduciendo:
@@ -743,7 +1024,7 @@ class SubtituladorApp(ctk.CTk):
         ruta_salida = self.archivo_salida.get().strip()
         
         if not ruta_entrada or not os.path.isfile(ruta_entrada):
-            messagebox.showerror("Error", "Debes seleccionar un archivo .srt o .txt válido")
+            messagebox.showerror("Error", "Debes seleccionar un archivo .srt, .vtt o .txt válido")
             return
             
         if not ruta_salida:
@@ -753,6 +1034,7 @@ class SubtituladorApp(ctk.CTk):
         src = self.obtener_codigo_idioma(self.combo_origen.get())
         tgt = self.obtener_codigo_idioma(self.combo_destino.get())
         
+        perfilado.iniciar_trabajo()
         if src == 'auto':
             _, ext = os.path.splitext(ruta_entrada.lower())
             src = self.detectar_idioma(ruta_entrada, ext)
@@ -763,8 +1045,32 @@ class SubtituladorApp(ctk.CTk):
             messagebox.showerror("Error", "El idioma de origen y destino no pueden ser iguales")
             return
             
+        plazo_minutos = self.entry_plazo.get().strip().replace(',', '.')
+        try:
+            plazo_minutos = float(plazo_minutos) if plazo_minutos else None
+            if plazo_minutos is not None and plazo_minutos <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "El plazo debe ser un número de minutos mayor que cero")
+            return
+        # El plazo cuenta desde que se pulsa Traducir (incluye cargar el modelo)
+        self.plazo_actual = None
+        if plazo_minutos is not None:
+            cpu = self.dispositivo_seleccionado.get() == 'cpu'
+            self.plazo_actual = Plazo(
+                plazo_minutos * 60, self.obtener_perfil(),
+                modelo_reducido=(lambda: cuantizar_modelo(_modelo.model)) if cpu else None,
+                log=lambda m: self.after(0, lambda m=m: self.log(m))
+            )
+            self.log(f"Plazo: {plazo_minutos:g} min (fin antes de las "
+                     f"{time.strftime('%H:%M:%S', time.localtime(time.time() + plazo_minutos * 60))})")
+            
         # Deshabilitar botón
         self.btn_traducir.configure(state="disabled", text="⏳ Traduciendo...")
+        self.btn_cancelar.configure(state="normal")
+        self.cancelacion.clear()
+        self.vista_previa.reiniciar()
+        self.pestanas.set("👁️ Vista previa")
         self.traduciendo = True
         
         # Iniciar hilo
@@ -776,8 +1082,8 @@ class SubtituladorApp(ctk.CTk):
         
     def proceso_traduccion(self, ruta_entrada: str, ruta_salida: str, src: str, tgt: str):
         """Proceso de traducción ejecutado en hilo separado"""
-        global _m2m_tokenizer, _m2m_model
-        
+        # Reservado durante todo el trabajo: no se descarga por inactividad a mitad
+        _modelo.reservar()
         try:
             # Obtener dispositivo seleccionado
             dispositivo_str = self.dispositivo_seleccionado.get()
@@ -787,29 +1093,27 @@ class SubtituladorApp(ctk.CTk):
             self.after(0, lambda: self.actualizar_estado("🔄 Cargando modelo de traducción...", 0.1))
             self.after(0, lambda d=dispositivo_str: self.log(f"Cargando modelo M2M100 en {d.upper()}..."))
             
-            model_name = 'facebook/m2m100_418M'
-            if _m2m_tokenizer is None or _m2m_model is None:
-                _m2m_tokenizer = M2M100Tokenizer.from_pretrained(model_name)
-                _m2m_model = M2M100ForConditionalGeneration.from_pretrained(model_name)
-                _m2m_model = _m2m_model.to(current_device)
-                _m2m_model.eval()
-            else:
-                # Mover modelo al dispositivo correcto si ya está cargado
-                _m2m_model = _m2m_model.to(current_device)
+            precision = resolver_precision(self.obtener_precision(), current_device,
+                                           log=lambda m: self.after(0, lambda m=m: self.log(m)))
+            tokenizer, model = _modelo.obtener(current_device, precision)
+            if self.cancelacion.is_set():
+                raise TraduccionCancelada()
                 
-            self.after(0, lambda d=dispositivo_str: self.log(f"Modelo cargado en {d.upper()}"))
+            self.after(0, lambda d=dispositivo_str, p=precision: self.log(f"Modelo cargado en {d.upper()} ({p})"))
             self.after(0, lambda: self.actualizar_estado("📝 Procesando archivo...", 0.2))
             
-            # Guardar referencia al dispositivo para las funciones de traducción
+            # Guardar referencia al dispositivo y al perfil para las funciones de traducción
             self.current_device = current_device
+            self.perfil_actual = self.obtener_perfil()
+            self.fallos_actual = InformeFallos()
             
             _, ext_in = os.path.splitext(ruta_entrada.lower())
             formato = self.combo_formato.get()
             es_srt_salida = "SRT" in formato
             
             if es_srt_salida:
-                if ext_in == '.srt':
-                    self.traducir_srt(ruta_entrada, ruta_salida, _m2m_tokenizer, _m2m_model, src, tgt)
+                if ext_in in ('.srt', '.vtt'):
+                    self.traducir_srt(ruta_entrada, ruta_salida, tokenizer, model, src, tgt)
                 else:
                     raise Exception("La salida SRT desde TXT no está soportada. Usa formato TXT.")
             else:
@@ -817,12 +1121,17 @@ class SubtituladorApp(ctk.CTk):
                 if not ruta_salida.lower().endswith('.txt'):
                     ruta_salida = os.path.splitext(ruta_salida)[0] + '.txt'
                     
-                if ext_in == '.srt':
-                    self.traducir_srt_a_txt(ruta_entrada, ruta_salida, _m2m_tokenizer, _m2m_model, src, tgt)
+                if ext_in in ('.srt', '.vtt'):
+                    self.traducir_srt_a_txt(ruta_entrada, ruta_salida, tokenizer, model, src, tgt)
                 else:
-                    self.traducir_txt(ruta_entrada, ruta_salida, _m2m_tokenizer, _m2m_model, src, tgt)
+                    self.traducir_txt(ruta_entrada, ruta_salida, tokenizer, model, src, tgt)
                     
             # Completado
+            if getattr(self, 'plazo_actual', None) is not None:
+                self.after(0, lambda r=self.plazo_actual.resumen(): self.log(r))
+            if self.fallos_actual.lotes_fallidos:
+                self.guardar_fallos(self.fallos_actual, ruta_salida)
+            perfilado.terminar_trabajo(log=lambda m: self.after(0, lambda m=m: self.log(m)))
             self.after(0, lambda: self.actualizar_estado("✅ ¡Traducción completada!", 1.0))
             self.after(0, lambda: self.log(f"Archivo guardado: {ruta_salida}"))
             
@@ -838,7 +1147,13 @@ class SubtituladorApp(ctk.CTk):
                 f"Traducción completada.\n\nArchivo guardado en:\n{ruta_salida}"
             ))
             
+        except TraduccionCancelada:
+            perfilado.terminar_trabajo(log=lambda m: self.after(0, lambda m=m: self.log(m)))
+            self.after(0, lambda: self.actualizar_estado("⏹ Traducción cancelada", 0))
+            self.after(0, lambda: self.log("Traducción cancelada: no se ha guardado ningún archivo"))
+            
         except Exception as e:
+            self.after(0, lambda: self.pestanas.set("📋 Registro de actividad"))
             self.after(0, lambda: self.actualizar_estado(f"❌ Error: {str(e)[:50]}...", 0))
             self.after(0, lambda: self.log(f"ERROR: {str(e)}"))
             try:
@@ -849,91 +1164,120 @@ class SubtituladorApp(ctk.CTk):
             self.after(0, lambda: messagebox.showerror("Error", str(e)))
             
         finally:
+            # Sin referencias al modelo (ni a su copia reducida) fuera de _modelo: así puede descargarse
+            self.plazo_actual = None
+            _modelo.liberar()
             self.traduciendo = False
             self.after(0, lambda: self.btn_traducir.configure(state="normal", text="🚀 Traducir"))
+            self.after(0, lambda: self.btn_cancelar.configure(state="disabled"))
             
-    def traducir_texto(self, texto: str, tokenizer, model, src: str, tgt: str) -> str:
-        """Traduce un texto corto"""
+    def traducir_lote(self, textos: list, tokenizer, model, src: str, tgt: str, etiqueta: str) -> list:
+        """Traduce una lista de textos por lotes actualizando la barra de progreso"""
         current_device = getattr(self, 'current_device', torch.device('cpu'))
-        tokenizer.src_lang = src
-        inputs = tokenizer(texto, return_tensors='pt', padding=True, truncation=True)
-        inputs = {k: v.to(current_device) for k, v in inputs.items()}
-        forced_bos = tokenizer.get_lang_id(tgt)
-        with torch.no_grad():
-            traduccion = model.generate(**inputs, forced_bos_token_id=forced_bos, max_length=512)
-        return tokenizer.batch_decode(traduccion, skip_special_tokens=True)[0]
+        planificador = PlanificadorLotes(
+            device=current_device,
+            log=lambda m: self.after(0, lambda m=m: self.log(m))
+        )
         
-    def traducir_srt(self, entrada: str, salida: str, tokenizer, model, src: str, tgt: str):
-        """Traduce un archivo SRT"""
-        subs = pysrt.open(entrada, encoding='utf-8')
-        total = len(subs)
+        plazo = getattr(self, 'plazo_actual', None)
+        self.vista_previa.fijar_total(sum(1 for t in textos if t and t.strip()), etiqueta)
+        
+        def al_progresar(hechos, total):
+            if self.cancelacion.is_set():
+                raise TraduccionCancelada()
+            progreso = 0.2 + (0.8 * hechos / max(total, 1))
+            texto = f"🔄 Traduciendo {etiqueta} {hechos}/{total}..."
+            if plazo is not None:
+                texto += self.texto_plazo(plazo)
+            self.after(0, lambda p=progreso, t=texto: self.actualizar_estado(t, p))
+        
+        def al_traducir(indices, traducciones):
+            # Solo encola: la vista previa se redibuja desde el hilo de la interfaz
+            self.vista_previa.agregar([(i + 1, textos[i], t) for i, t in zip(indices, traducciones)])
+        
+        # Los lotes que fallan se bisecan en traducir_lote; los textos que fallan solos quedan en fallos
+        # Un informe vacío es falso (__len__): se compara con None
+        fallos = getattr(self, 'fallos_actual', None)
+        if fallos is None:
+            fallos = InformeFallos()
+        
+        def traducir(parte: list) -> list:
+            # Las partes de una bisección no alimentan la vista previa (sus índices no son los de textos)
+            if plazo is not None:
+                return plazo.traducir(parte, tokenizer, model, src, tgt, current_device,
+                                      planificador=planificador, al_progresar=al_progresar, fallos=fallos,
+                                      al_traducir=al_traducir if parte is textos else None)
+            return traducir_lote(parte, tokenizer, model, src, tgt, current_device,
+                                 planificador=planificador, al_progresar=al_progresar,
+                                 perfil=getattr(self, 'perfil_actual', PERFIL_POR_DEFECTO), fallos=fallos,
+                                 al_traducir=al_traducir if parte is textos else None)
+        
+        def al_fallar(texto: str, error: BaseException) -> str:
+            fallos.anotar(texto, error)
+            return texto
         
-        for i, sub in enumerate(subs):
-            try:
-                sub.text = self.traducir_texto(sub.text, tokenizer, model, src, tgt)
-            except Exception as e:
-                self.after(0, lambda e=e: self.log(f"Advertencia: {str(e)[:50]}"))
-                
-            # Actualizar progreso
-            progreso = 0.2 + (0.8 * (i + 1) / total)
-            self.after(0, lambda p=progreso, i=i, t=total: 
-                self.actualizar_estado(f"🔄 Traduciendo subtítulo {i+1}/{t}...", p))
+        try:
+            resultado = traducir(textos)
+        except TraduccionCancelada:
+            raise
+        except Exception as e:
+            # Fallo fuera de la generación (p. ej. al tokenizar): aislar los textos culpables
+            self.after(0, lambda e=e: self.log(f"Advertencia: fallo en lote ({str(e)[:50]}); se aíslan los textos que fallan"))
+            fallos.lotes_fallidos += 1
+            resultado = biseccionar(list(textos), traducir, al_fallar, error=e, fallos=fallos)
+        fallos.ubicar(textos)
+        self.after(0, lambda r=planificador.resumen(): self.log(r))
+        return resultado
+        
+    def guardar_fallos(self, fallos: InformeFallos, ruta_salida: str):
+        """Muestra el resumen de fallos y guarda el informe junto a la salida"""
+        ruta = ruta_salida + '.fallos.json'
+        try:
+            fallos.guardar(ruta)
+            mensaje = f"{fallos.resumen()}\nInforme de fallos: {ruta}"
+        except OSError as e:
+            mensaje = f"{fallos.resumen()}\nNo se pudo guardar el informe de fallos: {e}"
+        self.after(0, lambda m=mensaje: self.log(m))
+        
+    def texto_plazo(self, plazo: Plazo) -> str:
+        """Fin previsto frente al plazo y nivel de calidad en uso, para la línea de estado"""
+        previsto = plazo.proyeccion()
+        if previsto is None:
+            return " · midiendo velocidad"
+        ahora = time.time()
+        fin = time.strftime('%H:%M:%S', time.localtime(ahora + previsto - plazo.transcurrido()))
+        limite = time.strftime('%H:%M:%S', time.localtime(ahora + plazo.presupuesto - plazo.transcurrido()))
+        marca = "✅" if previsto <= plazo.presupuesto else "⚠️"
+        return f" · fin previsto {fin} (plazo {limite}) {marca} · nivel {plazo.niveles[plazo.actual][0]}"
+        
+    def traducir_srt(self, entrada: str, salida: str, tokenizer, model, src: str, tgt: str):
+        """Traduce un archivo SRT o VTT"""
+        with tramo('lectura'):
+            subs = abrir_subtitulos(entrada, encoding='utf-8')
+        traducidos = self.traducir_lote(subs.textos, tokenizer, model, src, tgt, "subtítulo")
+        for i, texto in enumerate(traducidos):
+            subs.fijar_texto(i, texto)
                 
-        subs.save(salida, encoding='utf-8')
+        with tramo('escritura'):
+            subs.guardar(salida, encoding='utf-8', formato=formato_por_extension(salida, subs.formato))
         
     def traducir_srt_a_txt(self, entrada: str, salida: str, tokenizer, model, src: str, tgt: str):
-        """Extrae texto de SRT, traduce y guarda como TXT"""
-        subs = pysrt.open(entrada, encoding='utf-8')
-        lineas = []
-        total = len(subs)
-        
-        for i, sub in enumerate(subs):
-            try:
-                texto_traducido = self.traducir_texto(sub.text, tokenizer, model, src, tgt)
-                lineas.append(texto_traducido)
-            except Exception:
-                lineas.append(sub.text)
-                
-            progreso = 0.2 + (0.8 * (i + 1) / total)
-            self.after(0, lambda p=progreso, i=i, t=total:
-                self.actualizar_estado(f"🔄 Traduciendo {i+1}/{t}...", p))
+        """Extrae texto de SRT/VTT, traduce y guarda como TXT"""
+        with tramo('lectura'):
+            subs = abrir_subtitulos(entrada, encoding='utf-8')
+        lineas = self.traducir_lote(subs.textos, tokenizer, model, src, tgt, "")
                 
-        with open(salida, 'w', encoding='utf-8') as f:
+        with tramo('escritura'), open(salida, 'w', encoding='utf-8') as f:
             f.write('\n'.join(lineas))
             
     def traducir_txt(self, entrada: str, salida: str, tokenizer, model, src: str, tgt: str):
-        """Traduce un archivo TXT preservando saltos de línea"""
-        with open(entrada, 'r', encoding='utf-8', errors='ignore') as f:
-            lineas = f.read().splitlines(keepends=True)
-            
-        resultado = []
-        total = len(lineas)
-        
-        for i, linea in enumerate(lineas):
-            # Preservar fin de línea
-            if linea.endswith('\r\n'):
-                contenido, fin = linea[:-2], '\r\n'
-            elif linea.endswith('\n'):
-                contenido, fin = linea[:-1], '\n'
-            else:
-                contenido, fin = linea, ''
-                
-            if contenido.strip():
-                try:
-                    traducido = self.traducir_texto(contenido, tokenizer, model, src, tgt)
-                except Exception:
-                    traducido = contenido
-            else:
-                traducido = contenido
-                
-            resultado.append(traducido + fin)
-            
-            progreso = 0.2 + (0.8 * (i + 1) / total)
-            self.after(0, lambda p=progreso, i=i, t=total:
-                self.actualizar_estado(f"🔄 Traduciendo línea {i+1}/{t}...", p))
-                
-        with open(salida, 'w', encoding='utf-8') as f:
-            f.write(''.join(resultado))
+        """Traduce un archivo TXT preservando los fines de línea originales"""
+        with tramo('lectura'):
+            texto = TextoMapeado(entrada)
+        with texto:
+            traducidos = self.traducir_lote(list(texto.lineas()), tokenizer, model, src, tgt, "línea")
+            with tramo('escritura'), open(salida, 'wb') as f:
+                texto.escribir(f, traducidos)
 
 
 def main():
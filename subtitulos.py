@@ -0,0 +1,328 @@
+"""
+Lectura y escritura nativa de subtítulos SRT y WebVTT.
+
+Sustituye a pysrt en el flujo de traducción. Los tiempos se guardan en
+arrays de enteros (milisegundos), los textos en una lista y el contenido
+original se conserva junto con los desplazamientos de cada bloque, de modo
+que los subtítulos que no se modifican se reescriben byte a byte igual que
+en el archivo de entrada.
+"""
+
+import os
+import re
+from array import array
+
+FORMATO_SRT = 'srt'
+FORMATO_VTT = 'vtt'
+
+# Línea de tiempos completa; el grupo 1 abarca solo las dos marcas (sin ajustes VTT)
+_RE_TIEMPO = re.compile(
+    r'^[ \t]*((\d+):(\d{2}):(\d{2})[,.](\d{3})[ \t]*-->[ \t]*(\d+):(\d{2}):(\d{2})[,.](\d{3}))',
+    re.MULTILINE,
+)
+_RE_TIEMPO_VTT = re.compile(
+    r'^[ \t]*((?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})[ \t]*-->[ \t]*(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3}))',
+    re.MULTILINE,
+)
+_RE_LINEA_BLANCO = re.compile(r'^[ \t\r]*$', re.MULTILINE)
+
+# Marcas de cambio por subtítulo
+_CAMBIO_TEXTO = 1
+_CAMBIO_TIEMPO = 2
+
+
+def ms_a_marca(ms: int, formato: str = FORMATO_SRT) -> str:
+    """Convierte milisegundos a 'HH:MM:SS,mmm' (SRT) o 'HH:MM:SS.mmm' (VTT)."""
+    ms = max(0, int(ms))
+    h, resto = divmod(ms, 3600000)
+    m, resto = divmod(resto, 60000)
+    s, mil = divmod(resto, 1000)
+    sep = '.' if formato == FORMATO_VTT else ','
+    return f"{h:02d}:{m:02d}:{s:02d}{sep}{mil:03d}"
+
+
+def segundos_a_ms(total_segundos: float) -> int:
+    """Convierte segundos (float) a milisegundos enteros."""
+    return int(round(max(0.0, float(total_segundos)) * 1000))
+
+
+def marca_a_ms(marca: str) -> int:
+    """Convierte '754.2' (segundos), 'MM:SS', 'HH:MM:SS' o 'HH:MM:SS,mmm' a milisegundos."""
+    partes = marca.strip().replace(',', '.').split(':')
+    if not 1 <= len(partes) <= 3:
+        raise ValueError(f"marca de tiempo no válida: {marca!r}")
+    segundos = 0.0
+    for parte in partes:
+        segundos = segundos * 60 + float(parte)
+    return segundos_a_ms(segundos)
+
+
+def detectar_formato(ruta: str, contenido: str = '') -> str:
+    """Deduce el formato por extensión y, si no es concluyente, por la cabecera."""
+    _, ext = os.path.splitext((ruta or '').lower())
+    if ext == '.vtt':
+        return FORMATO_VTT
+    if ext == '.srt':
+        return FORMATO_SRT
+    if contenido.lstrip('\ufeff').startswith('WEBVTT'):
+        return FORMATO_VTT
+    return FORMATO_SRT
+
+
+def formato_por_extension(ruta: str, por_defecto: str = FORMATO_SRT) -> str:
+    """Formato de salida según la extensión de la ruta ('.srt'/'.vtt') o por_defecto."""
+    _, ext = os.path.splitext((ruta or '').lower())
+    if ext == '.vtt':
+        return FORMATO_VTT
+    if ext == '.srt':
+        return FORMATO_SRT
+    return por_defecto
+
+
+class Subtitulo:
+    """Vista ligera sobre un subtítulo de un ArchivoSubtitulos (no copia datos)."""
+
+    __slots__ = ('_archivo', '_i')
+
+    def __init__(self, archivo, i: int):
+        self._archivo = archivo
+        self._i = i
+
+    @property
+    def index(self) -> int:
+        return self._archivo.indices[self._i]
+
+    @property
+    def start(self) -> int:
+        """Inicio en milisegundos."""
+        return self._archivo.inicios[self._i]
+
+    @start.setter
+    def start(self, ms: int):
+        self._archivo.fijar_tiempos(self._i, ms, self._archivo.fines[self._i])
+
+    @property
+    def end(self) -> int:
+        """Fin en milisegundos."""
+        return self._archivo.fines[self._i]
+
+    @end.setter
+    def end(self, ms: int):
+        self._archivo.fijar_tiempos(self._i, self._archivo.inicios[self._i], ms)
+
+    @property
+    def text(self) -> str:
+        return self._archivo.textos[self._i]
+
+    @text.setter
+    def text(self, valor: str):
+        self._archivo.fijar_texto(self._i, valor)
+
+    def __repr__(self):
+        return f"Subtitulo({self.index}, {self.start}, {self.end}, {self.text!r})"
+
+
+class ArchivoSubtitulos:
+    """Colección compacta de subtítulos SRT/VTT con escritura fiel al original."""
+
+    __slots__ = (
+        'formato', 'indices', 'inicios', 'fines', 'textos',
+        '_original', '_prefijo_fin', '_bloque_ini', '_tiempo_ini', '_tiempo_fin',
+        '_texto_ini', '_texto_fin', '_cambios', '_eol',
+    )
+
+    def __init__(self, formato: str = FORMATO_SRT):
+        self.formato = formato
+        self.indices = array('q')
+        self.inicios = array('q')
+        self.fines = array('q')
+        self.textos = []
+        self._original = ''
+        self._prefijo_fin = 0
+        # Desplazamientos dentro de _original (-1 para subtítulos nuevos)
+        self._bloque_ini = array('q')
+        self._tiempo_ini = array('q')
+        self._tiempo_fin = array('q')
+        self._texto_ini = array('q')
+        self._texto_fin = array('q')
+        self._cambios = bytearray()
+        self._eol = '\n'
+
+    # ------------------------------------------------------------------ lectura
+    @classmethod
+    def desde_texto(cls, contenido: str, formato: str = None) -> 'ArchivoSubtitulos':
+        """Analiza el contenido completo de un archivo SRT o VTT."""
+        if formato is None:
+            formato = detectar_formato('', contenido)
+        archivo = cls(formato)
+        archivo._original = contenido
+        archivo._prefijo_fin = len(contenido)
+        if '\r\n' in contenido:
+            archivo._eol = '\r\n'
+
+        re_tiempo = _RE_TIEMPO if formato == FORMATO_SRT else _RE_TIEMPO_VTT
+        buscar_blanco = _RE_LINEA_BLANCO.search
+        buscar, rbuscar = contenido.find, contenido.rfind
+        n = len(contenido)
+        # Referencias locales: el bucle se ejecuta una vez por subtítulo
+        indices, inicios, fines, textos = archivo.indices, archivo.inicios, archivo.fines, archivo.textos
+        bloques, t_ini, t_fin = archivo._bloque_ini, archivo._tiempo_ini, archivo._tiempo_fin
+        x_ini, x_fin, cambios = archivo._texto_ini, archivo._texto_fin, archivo._cambios
+        for m in re_tiempo.finditer(contenido):
+            linea_ini = m.start()
+            # Identificador opcional en la línea anterior (si no está en blanco)
+            bloque_ini = linea_ini
+            ident = ''
+            if linea_ini > 0:
+                anterior = rbuscar('\n', 0, linea_ini - 1) + 1
+                ident = contenido[anterior:linea_ini - 1].strip()
+                if ident and '-->' not in ident:
+                    bloque_ini = anterior
+
+            fin_linea = buscar('\n', m.end())
+            texto_ini = n if fin_linea < 0 else fin_linea + 1
+            blanco = buscar_blanco(contenido, texto_ini)
+            if blanco is None:
+                texto_fin = n
+            elif blanco.start() == texto_ini:
+                texto_fin = texto_ini
+            else:
+                texto_fin = _sin_eol(contenido, texto_ini, blanco.start())
+            texto = contenido[texto_ini:texto_fin]
+            if '\r' in texto:
+                texto = texto.replace('\r\n', '\n')
+
+            if not bloques:
+                archivo._prefijo_fin = bloque_ini
+            h1, m1, s1, ms1, h2, m2, s2, ms2 = m.group(2, 3, 4, 5, 6, 7, 8, 9)
+            indices.append(int(ident) if ident.isdigit() else len(bloques) + 1)
+            inicios.append(((int(h1 or 0) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(ms1))
+            fines.append(((int(h2 or 0) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(ms2))
+            textos.append(texto)
+            bloques.append(bloque_ini)
+            t_ini.append(m.start(1))
+            t_fin.append(m.end(1))
+            x_ini.append(texto_ini)
+            x_fin.append(texto_fin)
+            cambios.append(0)
+        return archivo
+
+    # -------------------------------------------------------------- colección
+    def __len__(self) -> int:
+        return len(self.inicios)
+
+    def __getitem__(self, i: int) -> Subtitulo:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return Subtitulo(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield Subtitulo(self, i)
+
+    def fijar_texto(self, i: int, texto: str):
+        """Sustituye el texto del subtítulo i (normalizado a saltos '\\n')."""
+        texto = (texto or '').replace('\r\n', '\n')
+        if texto != self.textos[i]:
+            self.textos[i] = texto
+            self._cambios[i] |= _CAMBIO_TEXTO
+
+    def fijar_tiempos(self, i: int, inicio_ms: int, fin_ms: int):
+        """Sustituye los tiempos (ms) del subtítulo i."""
+        if inicio_ms != self.inicios[i] or fin_ms != self.fines[i]:
+            self.inicios[i] = int(inicio_ms)
+            self.fines[i] = int(fin_ms)
+            self._cambios[i] |= _CAMBIO_TIEMPO
+
+    def agregar(self, inicio_ms: int, fin_ms: int, texto: str, indice: int = None):
+        """Añade un subtítulo nuevo al final."""
+        self.indices.append(len(self) + 1 if indice is None else int(indice))
+        self.inicios.append(int(inicio_ms))
+        self.fines.append(int(fin_ms))
+        self.textos.append((texto or '').replace('\r\n', '\n'))
+        for arr in (self._bloque_ini, self._tiempo_ini, self._tiempo_fin, self._texto_ini, self._texto_fin):
+            arr.append(-1)
+        self._cambios.append(_CAMBIO_TEXTO | _CAMBIO_TIEMPO)
+
+    # ---------------------------------------------------------------- escritura
+    def a_texto(self, formato: str = None) -> str:
+        """Serializa el archivo. Con otro formato distinto al original se regenera completo."""
+        if formato is not None and formato != self.formato:
+            return self._generar(formato)
+        original = self._original
+        partes = []
+        if original:
+            partes.append(original[:self._prefijo_fin])
+        elif self.formato == FORMATO_VTT:
+            partes.append('WEBVTT' + self._eol + self._eol)
+        total = len(self)
+        for i in range(total):
+            bloque_ini = self._bloque_ini[i]
+            if bloque_ini < 0:
+                partes.append(self._bloque_nuevo(i, self.formato))
+                continue
+            if i + 1 < total and self._bloque_ini[i + 1] >= 0:
+                bloque_fin = self._bloque_ini[i + 1]
+            else:
+                bloque_fin = len(original)
+            cambios = self._cambios[i]
+            if not cambios:
+                partes.append(original[bloque_ini:bloque_fin])
+                continue
+            partes.append(self._bloque_modificado(i, bloque_ini, bloque_fin, cambios))
+        return ''.join(partes)
+
+    def guardar(self, ruta: str, encoding: str = 'utf-8', formato: str = None):
+        """Escribe el archivo en disco sin traducir finales de línea."""
+        with open(ruta, 'w', encoding=encoding, newline='') as f:
+            f.write(self.a_texto(formato))
+
+    def _bloque_modificado(self, i: int, bloque_ini: int, bloque_fin: int, cambios: int) -> str:
+        original = self._original
+        eol = '\r\n' if original[self._tiempo_fin[i]:self._texto_ini[i]].endswith('\r\n') else '\n'
+        if cambios & _CAMBIO_TIEMPO:
+            cabecera = (original[bloque_ini:self._tiempo_ini[i]]
+                        + self._linea_tiempos(i, self.formato)
+                        + original[self._tiempo_fin[i]:self._texto_ini[i]])
+        else:
+            cabecera = original[bloque_ini:self._texto_ini[i]]
+        texto = self.textos[i].replace('\n', eol) if eol != '\n' else self.textos[i]
+        cola = original[self._texto_fin[i]:bloque_fin]
+        if self._texto_ini[i] == self._texto_fin[i] and texto:
+            # El original no tenía texto: añadir el fin de línea que falta
+            texto += eol
+        elif not texto and self._texto_ini[i] != self._texto_fin[i]:
+            cola = cola[len(eol):] if cola.startswith(eol) else cola
+        return cabecera + texto + cola
+
+    def _linea_tiempos(self, i: int, formato: str) -> str:
+        return f"{ms_a_marca(self.inicios[i], formato)} --> {ms_a_marca(self.fines[i], formato)}"
+
+    def _bloque_nuevo(self, i: int, formato: str) -> str:
+        eol = self._eol
+        texto = self.textos[i].replace('\n', eol) if eol != '\n' else self.textos[i]
+        cabecera = '' if formato == FORMATO_VTT else f"{self.indices[i]}{eol}"
+        return f"{cabecera}{self._linea_tiempos(i, formato)}{eol}{texto}{eol}{eol}"
+
+    def _generar(self, formato: str) -> str:
+        partes = ['WEBVTT' + self._eol + self._eol] if formato == FORMATO_VTT else []
+        partes.extend(self._bloque_nuevo(i, formato) for i in range(len(self)))
+        return ''.join(partes)
+
+
+def _sin_eol(contenido: str, ini: int, fin: int) -> int:
+    """Devuelve el final de la línea [ini, fin) sin su salto de línea."""
+    if fin > ini and contenido[fin - 1] == '\n':
+        fin -= 1
+        if fin > ini and contenido[fin - 1] == '\r':
+            fin -= 1
+    return fin
+
+
+def abrir_subtitulos(ruta: str, encoding: str = 'utf-8') -> ArchivoSubtitulos:
+    """Abre un archivo .srt o .vtt conservando el contenido original."""
+    with open(ruta, 'r', encoding=encoding, newline='') as f:
+        contenido = f.read()
+    return ArchivoSubtitulos.desde_texto(contenido, detectar_formato(ruta, contenido))
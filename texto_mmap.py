@@ -0,0 +1,154 @@
+"""
+Archivos de texto proyectados en memoria con índice de líneas.
+
+En lugar de leer el archivo entero a una cadena y partirla en una lista de
+líneas (dos copias completas), el archivo se proyecta con mmap y se indexa una
+sola vez con NumPy: desplazamiento de inicio de cada línea (int64) y tipo de
+fin de línea (uint8: ninguno, '\\n', '\\r\\n' o '\\r'), unos 9 bytes por línea.
+
+Con el índice, cualquier línea o rango de líneas se lee sin recorrer el resto
+(reanudar desde la línea k, repartir rangos entre trabajadores) y la salida se
+escribe con los mismos fines de línea que la entrada, byte a byte.
+"""
+
+import itertools
+import mmap
+import os
+
+import numpy as np
+
+# Fines de línea por tipo (índice en el array de tipos)
+SIN_FIN, FIN_LF, FIN_CRLF, FIN_CR = 0, 1, 2, 3
+FINES = ('', '\n', '\r\n', '\r')
+_FINES_BYTES = tuple(f.encode('ascii') for f in FINES)
+_LONGITUD_FIN = np.array([len(f) for f in FINES], dtype=np.int64)
+# Bytes por bloque al indexar (acota la memoria temporal de las comparaciones)
+BLOQUE_INDICE = 1 << 24
+# Líneas por tramo al leer o escribir seguidas
+LINEAS_POR_TRAMO = 10000
+
+
+def indexar_lineas(datos) -> tuple:
+    """(inicios, tipos) de las líneas de datos (bytes o mmap); inicios tiene una entrada más: el tamaño."""
+    total = len(datos)
+    if not total:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+    arr = np.frombuffer(datos, dtype=np.uint8)
+    fines, tipos = [], []
+    for ini in range(0, total, BLOQUE_INDICE):
+        bloque = arr[ini:ini + BLOQUE_INDICE]
+        lf = np.flatnonzero(bloque == 10) + ini
+        cr = np.flatnonzero(bloque == 13) + ini
+        # '\r' suelto (no seguido de '\n'; el siguiente byte puede estar en el bloque siguiente)
+        siguiente = cr + 1
+        cr = cr[(siguiente >= total) | (arr[np.minimum(siguiente, total - 1)] != 10)]
+        tipo_lf = np.where((lf > 0) & (arr[np.maximum(lf - 1, 0)] == 13), FIN_CRLF, FIN_LF).astype(np.uint8)
+        posiciones = np.concatenate([lf, cr]) + 1
+        clases = np.concatenate([tipo_lf, np.full(len(cr), FIN_CR, dtype=np.uint8)])
+        orden = np.argsort(posiciones, kind='stable')
+        fines.append(posiciones[orden])
+        tipos.append(clases[orden])
+    del arr
+    fines = np.concatenate(fines)
+    tipos = np.concatenate(tipos)
+    if not len(fines) or fines[-1] != total:
+        # Última línea sin fin de línea
+        fines = np.append(fines, total)
+        tipos = np.append(tipos, np.uint8(SIN_FIN))
+    inicios = np.concatenate([np.zeros(1, dtype=np.int64), fines.astype(np.int64)])
+    return inicios, tipos
+
+
+class TextoMapeado:
+    """Archivo de texto proyectado en memoria, con acceso por número de línea."""
+
+    def __init__(self, ruta: str, encoding: str = 'utf-8', errors: str = 'ignore'):
+        self.ruta = ruta
+        self.encoding = encoding
+        self.errors = errors
+        self._archivo = open(ruta, 'rb')
+        estado = os.fstat(self._archivo.fileno())
+        self.tamano = estado.st_size
+        self.mtime_ns = estado.st_mtime_ns
+        # mmap no admite archivos vacíos
+        self._mm = mmap.mmap(self._archivo.fileno(), 0, access=mmap.ACCESS_READ) if self.tamano else None
+        self._vista = memoryview(self._mm) if self._mm is not None else memoryview(b'')
+        self.inicios, self.tipos = indexar_lineas(self._vista)
+
+    def __len__(self) -> int:
+        return len(self.tipos)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        """Libera la proyección (las vistas de bytes_linea() dejan de ser válidas)."""
+        self._vista.release()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._archivo.close()
+
+    # --- Lectura ---
+
+    def _limites(self, i: int) -> tuple:
+        fin = int(self.inicios[i + 1])
+        return int(self.inicios[i]), fin - int(_LONGITUD_FIN[self.tipos[i]])
+
+    def bytes_linea(self, i: int) -> memoryview:
+        """Contenido de la línea i sin su fin de línea, sin copiarlo."""
+        ini, fin = self._limites(i)
+        return self._vista[ini:fin]
+
+    def linea(self, i: int) -> str:
+        ini, fin = self._limites(i)
+        return str(self._vista[ini:fin], self.encoding, self.errors)
+
+    def fin_linea(self, i: int) -> str:
+        return FINES[self.tipos[i]]
+
+    def lineas(self, desde: int = 0, hasta: int = None):
+        """Contenido de las líneas [desde, hasta), sin sus fines de línea."""
+        hasta = len(self) if hasta is None else min(hasta, len(self))
+        vista, encoding, errors = self._vista, self.encoding, self.errors
+        for ini in range(desde, hasta, LINEAS_POR_TRAMO):
+            fin = min(hasta, ini + LINEAS_POR_TRAMO)
+            # Listas de Python por tramos: indexar arrays de NumPy elemento a elemento es lento
+            inicios = self.inicios[ini:fin].tolist()
+            finales = (self.inicios[ini + 1:fin + 1] - _LONGITUD_FIN[self.tipos[ini:fin]]).tolist()
+            for a, b in zip(inicios, finales):
+                yield str(vista[a:b], encoding, errors)
+
+    def desplazamiento(self, i: int) -> int:
+        """Byte en el que empieza la línea i (el tamaño si i == len)."""
+        return int(self.inicios[i])
+
+    def rangos(self, partes: int) -> list:
+        """Hasta `partes` rangos [ini, fin) de líneas contiguas con un número parecido de bytes."""
+        total = len(self)
+        if not total:
+            return []
+        partes = max(1, min(partes, total))
+        objetivos = np.linspace(0, self.tamano, partes + 1)[1:-1]
+        cortes = np.unique(np.searchsorted(self.inicios[:-1], objetivos).clip(1, total - 1)) if partes > 1 else []
+        limites = [0] + [int(c) for c in cortes] + [total]
+        return [[a, b] for a, b in zip(limites, limites[1:]) if a < b]
+
+    # --- Escritura ---
+
+    def escribir(self, f, textos, desde: int = 0) -> int:
+        """Escribe en f (binario) textos como las líneas desde, desde+1... con sus fines originales. Bytes escritos."""
+        escritos = 0
+        textos = iter(textos)
+        while True:
+            tramo = [t.encode(self.encoding) for t in itertools.islice(textos, LINEAS_POR_TRAMO)]
+            if not tramo:
+                return escritos
+            fines = [_FINES_BYTES[k] for k in self.tipos[desde:desde + len(tramo)].tolist()]
+            datos = b''.join(itertools.chain.from_iterable(zip(tramo, fines)))
+            f.write(datos)
+            escritos += len(datos)
+            desde += len(tramo)
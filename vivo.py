@@ -0,0 +1,348 @@
+"""
+Traducción en vivo: subtítulos que llegan de uno en uno, traducidos en milisegundos.
+
+Los eventos llegan por stdin o por un socket local (TCP o Unix), uno a uno,
+como líneas JSON:
+
+    {"id": 12, "inicio": 754200, "fin": 756900, "texto": "Good evening."}
+
+(también se admiten las claves "start", "end" y "text", e "inicio"/"fin" como
+marcas '00:12:34,200') o como bloques SRT separados por una línea en blanco.
+Cada traducción se emite en cuanto está lista, en el mismo formato que llegó
+(las líneas JSON añaden "original" y "latencia_ms").
+
+Un único hilo traduce con el modelo ya cargado y caliente, agrupando en
+microlotes: toma lo que esté en cola y, si el plazo del evento más antiguo lo
+permite, espera una ventana corta (VENTANA_S) por si llega más. El plazo se
+respeta con una estimación del coste de un lote de n textos (fijo + n por
+texto) ajustada con los lotes recientes. La latencia de cada evento (de la
+recepción a la emisión) se guarda para los percentiles p50/p95/p99.
+
+Como stdout puede ser la salida de traducciones, los mensajes van a stderr.
+"""
+
+import collections
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+
+from subtitulos import FORMATO_SRT, ArchivoSubtitulos, marca_a_ms, ms_a_marca
+
+# Plazo por defecto de cada evento (ms, de la recepción a la emisión)
+PLAZO_MS = 300
+# Máximo de textos por microlote
+LOTE_MAX = 8
+# Espera máxima por más eventos antes de traducir un lote incompleto
+VENTANA_S = 0.015
+# Lotes recientes con los que se ajusta el modelo de coste
+MUESTRAS_COSTE = 64
+# Latencias guardadas para los percentiles (las más recientes)
+MUESTRAS_LATENCIA = 100000
+# Segundos entre informes periódicos de latencia
+INTERVALO_INFORME = 30.0
+
+
+def _log_stderr(mensaje: str):
+    print(mensaje, file=sys.stderr, flush=True)
+
+
+class Evento:
+    """Un subtítulo recibido y cómo devolver su traducción."""
+
+    __slots__ = ('id', 'inicio', 'fin', 'texto', 'formato', 'llegada', 'responder')
+
+    def __init__(self, id_, inicio, fin, texto: str, formato: str, responder=None):
+        self.id = id_
+        self.inicio = inicio
+        self.fin = fin
+        self.texto = texto
+        self.formato = formato
+        self.llegada = time.perf_counter()
+        self.responder = responder
+
+    def a_texto(self, traduccion: str, latencia_ms: float) -> str:
+        """Evento traducido en el formato de entrada (una línea JSON o un bloque SRT)."""
+        if self.formato == 'json':
+            datos = {'id': self.id, 'inicio': self.inicio, 'fin': self.fin, 'texto': traduccion,
+                     'original': self.texto, 'latencia_ms': round(latencia_ms, 1)}
+            return json.dumps(datos, ensure_ascii=False) + '\n'
+        return f"{self.id}\n{ms_a_marca(self.inicio)} --> {ms_a_marca(self.fin)}\n{traduccion}\n\n"
+
+
+def _tiempo_ms(valor):
+    if valor is None or isinstance(valor, (int, float)):
+        return valor
+    return marca_a_ms(str(valor))
+
+
+def leer_eventos(flujo, responder=None):
+    """Genera los eventos de un flujo de texto (líneas JSON o bloques SRT), según llegan."""
+    bloque = []
+    for linea in flujo:
+        linea = linea.rstrip('\r\n')
+        if not bloque and linea.lstrip().startswith('{'):
+            try:
+                datos = json.loads(linea)
+            except ValueError:
+                _log_stderr(f"[VIVO] Línea JSON no válida: {linea[:80]}")
+                continue
+            texto = datos.get('texto', datos.get('text', ''))
+            if not isinstance(texto, str):
+                _log_stderr(f"[VIVO] Evento sin texto válido: {linea[:80]}")
+                continue
+            try:
+                inicio = _tiempo_ms(datos.get('inicio', datos.get('start')))
+                fin = _tiempo_ms(datos.get('fin', datos.get('end')))
+            except (ValueError, TypeError) as e:
+                _log_stderr(f"[VIVO] Tiempos no válidos ({e}): {linea[:80]}")
+                continue
+            yield Evento(datos.get('id'), inicio, fin, texto, 'json', responder)
+        elif linea.strip():
+            bloque.append(linea)
+        elif bloque:
+            yield from _eventos_srt(bloque, responder)
+            bloque = []
+    if bloque:
+        yield from _eventos_srt(bloque, responder)
+
+
+def _eventos_srt(bloque: list, responder):
+    subs = ArchivoSubtitulos.desde_texto('\n'.join(bloque) + '\n', FORMATO_SRT)
+    if not len(subs):
+        _log_stderr(f"[VIVO] Bloque SRT no válido: {bloque[0][:80]}")
+    for i in range(len(subs)):
+        yield Evento(subs.indices[i], subs.inicios[i], subs.fines[i], subs.textos[i], 'srt', responder)
+
+
+class TraductorVivo:
+    """Traduce eventos en microlotes con un plazo por evento y mide su latencia."""
+
+    def __init__(self, traducir, plazo_ms: float = PLAZO_MS, lote_max: int = LOTE_MAX,
+                 ventana_s: float = VENTANA_S, intervalo_informe: float = INTERVALO_INFORME, log=_log_stderr):
+        """traducir(textos) -> lista de traducciones en el mismo orden."""
+        self.traducir = traducir
+        self.plazo = plazo_ms / 1000.0
+        self.lote_max = lote_max
+        self.ventana = ventana_s
+        self.intervalo_informe = intervalo_informe
+        self.log = log
+        self.cola = queue.Queue()
+        self._lotes = collections.deque(maxlen=MUESTRAS_COSTE)
+        self._fijo = 0.0
+        self._por_texto = 0.0
+        self._latencias = collections.deque(maxlen=MUESTRAS_LATENCIA)
+        self._lock = threading.Lock()
+        self.eventos = 0
+        self.fuera_plazo = 0
+        self.num_lotes = 0
+        self._ultimo_informe = time.perf_counter()
+        self._hilo = None
+
+    # --- Ciclo de vida ---
+
+    def calentar(self, texto: str = 'Hello.'):
+        """Primera traducción fuera de plazo: reserva memoria y mide un lote de 1."""
+        t0 = time.perf_counter()
+        self.traducir([texto])
+        self._registrar_lote(1, time.perf_counter() - t0)
+        self.log(f"[VIVO] Modelo caliente ({(time.perf_counter() - t0) * 1000:.0f} ms por subtítulo)")
+
+    def iniciar(self) -> 'TraductorVivo':
+        self._hilo = threading.Thread(target=self._bucle, name='traductor-vivo', daemon=True)
+        self._hilo.start()
+        return self
+
+    def enviar(self, evento: Evento):
+        self.cola.put(evento)
+
+    def parar(self):
+        """Termina lo encolado y detiene el hilo traductor."""
+        self.cola.put(None)
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    # --- Microlotes ---
+
+    def coste_estimado(self, n: int) -> float:
+        """Segundos previstos para traducir un lote de n textos."""
+        return self._fijo + self._por_texto * n
+
+    def _registrar_lote(self, n: int, segundos: float):
+        self._lotes.append((n, segundos))
+        tamanos = np.array([m for m, _ in self._lotes], dtype=np.float64)
+        tiempos = np.array([s for _, s in self._lotes], dtype=np.float64)
+        if len(set(tamanos.tolist())) >= 2:
+            por_texto, fijo = np.polyfit(tamanos, tiempos, 1)
+            self._por_texto, self._fijo = max(0.0, float(por_texto)), max(0.0, float(fijo))
+        else:
+            # Un solo tamaño observado: todo el coste se reparte por texto
+            self._fijo, self._por_texto = 0.0, float(tiempos.mean() / tamanos.mean())
+
+    def _formar_lote(self, primero: Evento) -> tuple:
+        """Lote que empieza por primero; el segundo valor indica si hay que terminar."""
+        lote = [primero]
+        limite = primero.llegada + self.plazo
+        fin = False
+        # Lo que ya está en cola entra sin esperar
+        while len(lote) < self.lote_max:
+            try:
+                evento = self.cola.get_nowait()
+            except queue.Empty:
+                break
+            if evento is None:
+                return lote, True
+            lote.append(evento)
+        # Ventana corta por si llega más, sin comerse el plazo del más antiguo
+        fin_ventana = time.perf_counter() + self.ventana
+        while len(lote) < self.lote_max:
+            ahora = time.perf_counter()
+            espera = min(fin_ventana, limite - self.coste_estimado(len(lote) + 1)) - ahora
+            if espera <= 0:
+                break
+            try:
+                evento = self.cola.get(timeout=espera)
+            except queue.Empty:
+                break
+            if evento is None:
+                fin = True
+                break
+            lote.append(evento)
+        return lote, fin
+
+    def _bucle(self):
+        fin = False
+        while not fin:
+            primero = self.cola.get()
+            if primero is None:
+                break
+            lote, fin = self._formar_lote(primero)
+            t0 = time.perf_counter()
+            try:
+                traducciones = self.traducir([e.texto for e in lote])
+            except Exception as e:
+                self.log(f"[VIVO] Falló la traducción de un lote de {len(lote)} ({e}); se emite el original")
+                traducciones = [e.texto for e in lote]
+            self._registrar_lote(len(lote), time.perf_counter() - t0)
+            for evento, traduccion in zip(lote, traducciones):
+                self._emitir(evento, traduccion)
+            self.num_lotes += 1
+            if time.perf_counter() - self._ultimo_informe >= self.intervalo_informe:
+                self._ultimo_informe = time.perf_counter()
+                self.log(self.resumen())
+
+    def _emitir(self, evento: Evento, traduccion: str):
+        latencia = time.perf_counter() - evento.llegada
+        if evento.responder is not None:
+            try:
+                evento.responder(evento.a_texto(traduccion, latencia * 1000))
+            except (OSError, ValueError) as e:
+                # Conexión cerrada por el cliente: el resto de conexiones sigue
+                self.log(f"[VIVO] No se pudo emitir el subtítulo {evento.id}: {e}")
+        with self._lock:
+            self._latencias.append(latencia)
+            self.eventos += 1
+            if latencia > self.plazo:
+                self.fuera_plazo += 1
+
+    # --- Métricas ---
+
+    def percentiles(self) -> dict:
+        """Latencia en ms: p50, p95, p99 y máxima (vacío si aún no hay eventos)."""
+        with self._lock:
+            if not self._latencias:
+                return {}
+            ms = np.array(self._latencias, dtype=np.float64) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(ms.max())}
+
+    def resumen(self) -> str:
+        p = self.percentiles()
+        if not p:
+            return '[VIVO] Sin subtítulos traducidos'
+        return (f"[VIVO] {self.eventos} subtítulos en {self.num_lotes} lotes "
+                f"(media {self.eventos / max(1, self.num_lotes):.1f}) | latencia p50 {p['p50']:.0f} ms, "
+                f"p95 {p['p95']:.0f} ms, p99 {p['p99']:.0f} ms, máx {p['max']:.0f} ms | "
+                f"fuera de plazo ({self.plazo * 1000:.0f} ms): {self.fuera_plazo}")
+
+
+# --- Fuentes de eventos ---
+
+def servir_flujo(entrada, escribir, traductor: TraductorVivo):
+    """Encola los eventos de entrada; escribir(texto) recibe cada traducción (serializado).
+
+    Al terminar la entrada, espera a que se hayan emitido todas sus traducciones.
+    """
+    hecho = threading.Condition()
+    pendientes = [0]
+
+    def responder(texto: str):
+        with hecho:
+            try:
+                escribir(texto)
+            finally:
+                pendientes[0] -= 1
+                hecho.notify_all()
+
+    for evento in leer_eventos(entrada, responder):
+        with hecho:
+            pendientes[0] += 1
+        traductor.enviar(evento)
+    with hecho:
+        hecho.wait_for(lambda: pendientes[0] <= 0)
+
+
+class _ManejadorVivo(socketserver.StreamRequestHandler):
+    def handle(self):
+        entrada = (linea.decode('utf-8', errors='replace') for linea in self.rfile)
+
+        def escribir(texto: str):
+            self.wfile.write(texto.encode('utf-8'))
+            self.wfile.flush()
+
+        servir_flujo(entrada, escribir, self.server.traductor)
+
+
+class ServidorVivoTCP(socketserver.ThreadingTCPServer):
+    """Servidor TCP local: cada conexión envía eventos y recibe sus traducciones."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, traductor: TraductorVivo, puerto: int, host: str = '127.0.0.1'):
+        super().__init__((host, puerto), _ManejadorVivo)
+        self.traductor = traductor
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class ServidorVivoUnix(socketserver.ThreadingUnixStreamServer):
+        """Como ServidorVivoTCP, sobre un socket Unix."""
+
+        daemon_threads = True
+
+        def __init__(self, traductor: TraductorVivo, ruta: str):
+            if os.path.exists(ruta):
+                os.unlink(ruta)
+            super().__init__(ruta, _ManejadorVivo)
+            self.traductor = traductor
+else:
+    ServidorVivoUnix = None
+
+
+def crear_servidor(traductor: TraductorVivo, direccion: str):
+    """'tcp:8766', 'tcp:0.0.0.0:8766' o 'unix:/ruta/al.sock' -> servidor sin arrancar."""
+    tipo, _, resto = direccion.partition(':')
+    if tipo == 'tcp':
+        host, _, puerto = resto.rpartition(':')
+        return ServidorVivoTCP(traductor, int(puerto), host or '127.0.0.1')
+    if tipo == 'unix':
+        if ServidorVivoUnix is None:
+            raise ValueError('los sockets Unix no están disponibles en este sistema')
+        return ServidorVivoUnix(traductor, resto)
+    raise ValueError(f"dirección no válida: {direccion} (use tcp:PUERTO o unix:RUTA)")
@@ -0,0 +1,222 @@
+"""
+Lista corta de vocabulario por idioma destino.
+
+M2M100 calcula en cada paso del decodificador los logits de ~128k tokens,
+aunque una salida en español solo use una fracción. Este módulo construye,
+para un idioma destino, el conjunto de IDs permitidos (a partir de un corpus
+en ese idioma y/o de salidas del propio modelo), recorta la proyección de
+salida (lm_head) y la tabla de embeddings del decodificador a ese conjunto y
+traduce los IDs de vuelta al vocabulario completo tras decodificar.
+
+Con búsqueda voraz la salida es idéntica a la del modelo completo siempre que
+la lista cubra los tokens elegidos; con búsqueda por haz la normalización de
+las puntuaciones cambia y puede haber diferencias puntuales.
+"""
+
+import copy
+import json
+import os
+import re
+import time
+
+import torch
+from torch import nn
+import torch.nn.functional as F
+
+from decodificacion import PERFIL_POR_DEFECTO, argumentos_generacion
+from precision import contexto_generacion
+
+DIRECTORIO_DATOS = os.path.join(os.path.expanduser('~'), '.subtitulador')
+
+
+def ruta_lista_corta(model_name: str, tgt_lang: str) -> str:
+    """Ruta por defecto de la lista corta para un modelo e idioma destino."""
+    nombre = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name or 'modelo')
+    return os.path.join(DIRECTORIO_DATOS, f"lista_corta_{nombre}_{tgt_lang}.json")
+
+
+def ids_especiales(tokenizer, tgt_lang: str) -> set:
+    """IDs que deben estar siempre: especiales del tokenizador y la etiqueta del idioma destino."""
+    ids = set(tokenizer.all_special_ids)
+    ids.add(tokenizer.get_lang_id(tgt_lang))
+    return ids
+
+
+def construir_lista_corta(tokenizer, tgt_lang: str, corpus: list = None, model=None,
+                          textos_fuente: list = None, src_lang: str = None, device=None,
+                          perfil: str = PERFIL_POR_DEFECTO, lote: int = 16) -> list:
+    """Construye la lista ordenada de IDs permitidos para tgt_lang.
+
+    corpus: textos en el idioma destino (se tokenizan y se añaden sus piezas).
+    model + textos_fuente + src_lang: se traducen con el perfil indicado y se
+    añaden los IDs generados tal cual (re-tokenizar el texto decodificado no
+    siempre da los mismos IDs).
+    """
+    ids = ids_especiales(tokenizer, tgt_lang)
+    if corpus:
+        tokenizer.src_lang = tgt_lang
+        for fila in tokenizer(list(corpus))['input_ids']:
+            ids.update(fila)
+    if model is not None and textos_fuente:
+        device = device if device is not None else next(model.parameters()).device
+        tokenizer.src_lang = src_lang
+        forced_bos = tokenizer.get_lang_id(tgt_lang)
+        textos = [t for t in textos_fuente if t and t.strip()]
+        for i in range(0, len(textos), lote):
+            entradas = tokenizer(textos[i:i + lote], return_tensors='pt', padding=True, truncation=True)
+            entradas = {k: v.to(device) for k, v in entradas.items()}
+            args = argumentos_generacion(perfil, entradas['input_ids'].shape[1])
+            with torch.no_grad(), contexto_generacion(model, device):
+                salida = model.generate(**entradas, forced_bos_token_id=forced_bos, **args)
+            ids.update(salida.flatten().tolist())
+    return sorted(ids)
+
+
+def guardar_lista_corta(ruta: str, ids: list, tgt_lang: str, model_name: str = ''):
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'modelo': model_name, 'idioma': tgt_lang, 'ids': list(map(int, ids))}, f)
+
+
+def cargar_lista_corta(ruta: str) -> list:
+    """Carga una lista corta guardada; None si no existe o no es válida."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return [int(i) for i in json.load(f)['ids']]
+    except Exception:
+        return None
+
+
+class _EmbeddingCorta(nn.Module):
+    """Embedding del decodificador restringido a la lista corta (con la misma escala)."""
+
+    def __init__(self, peso: torch.Tensor, escala: float, padding_idx: int):
+        super().__init__()
+        self.weight = nn.Parameter(peso, requires_grad=False)
+        self.embed_scale = escala
+        self.padding_idx = padding_idx
+
+    def forward(self, input_ids):
+        return F.embedding(input_ids, self.weight, self.padding_idx) * self.embed_scale
+
+
+def _vista_con(modelo, sustitutos: dict):
+    """Copia superficial de modelo que comparte todos sus pesos salvo los submódulos de sustitutos (ruta -> módulo).
+
+    Solo se copian los módulos del camino hasta cada sustituto; el modelo
+    original no se modifica.
+    """
+    def copiar(modulo):
+        copia = object.__new__(type(modulo))
+        copia.__dict__.update(modulo.__dict__)
+        copia._modules = dict(modulo._modules)
+        return copia
+
+    raiz = copiar(modelo)
+    for ruta, nuevo in sustitutos.items():
+        *camino, hoja = ruta.split('.')
+        padre = raiz
+        for nombre in camino:
+            padre._modules[nombre] = padre = copiar(padre._modules[nombre])
+        padre._modules[hoja] = nuevo
+    return raiz
+
+
+class ModeloListaCorta:
+    """Envuelve un M2M100 para generar solo sobre los tokens de la lista corta de tgt_lang.
+
+    Se usa como el modelo original (generate, to, eval, config...). Si se pide
+    otro idioma destino, la generación usa el vocabulario completo. La
+    generación con la lista corta va por una vista del modelo que comparte sus
+    pesos salvo el embedding del decodificador y lm_head: el modelo original no
+    se toca, así que otros hilos pueden seguir generando con él a la vez.
+    """
+
+    def __init__(self, model, ids: list, tgt_lang: str, tokenizer):
+        self.modelo = model
+        self.tgt_lang = tgt_lang
+        ids = sorted(set(int(i) for i in ids) | ids_especiales(tokenizer, tgt_lang))
+        decoder = model.get_decoder()
+        emb = decoder.embed_tokens
+        # Los especiales (<s>, <pad>, </s>, <unk>) son los IDs más bajos, así que
+        # conservan su posición y el cálculo de posiciones con padding_idx sigue valiendo
+        pad = emb.padding_idx if emb.padding_idx is not None else tokenizer.pad_token_id
+        assert ids[:pad + 1] == list(range(pad + 1)), 'los IDs especiales deben encabezar la lista'
+        indice = torch.tensor(ids, dtype=torch.long)
+        dispositivo = emb.weight.device
+        with torch.no_grad():
+            self._emb = _EmbeddingCorta(emb.weight[indice.to(dispositivo)].clone(),
+                                        getattr(emb, 'embed_scale', 1.0), pad)
+            cabeza = model.get_output_embeddings()
+            self._lm = nn.Linear(cabeza.weight.shape[1], len(ids), bias=False).to(cabeza.weight.dtype)
+            self._lm.weight.copy_(cabeza.weight[indice.to(cabeza.weight.device)])
+            self._lm.to(cabeza.weight.device)
+        self._ids = indice.to(dispositivo)
+        self._a_corto = {full: corto for corto, full in enumerate(ids)}
+        self.tamano = len(ids)
+        self._corto = self._vista()
+
+    def __getattr__(self, nombre):
+        # Todo lo que no se redefine aquí (config, parameters, generation_config...) es del modelo original
+        return getattr(self.modelo, nombre)
+
+    def to(self, *args, **kwargs):
+        self.modelo = self.modelo.to(*args, **kwargs)
+        self._emb.to(*args, **kwargs)
+        self._lm.to(*args, **kwargs)
+        self._ids = self._ids.to(self._emb.weight.device)
+        self._corto = self._vista()
+        return self
+
+    def eval(self):
+        self.modelo.eval()
+        return self
+
+    def _vista(self):
+        """El modelo con el embedding del decodificador y lm_head de la lista corta (y su vocab_size)."""
+        modelo = self.modelo
+        rutas = {id(m): n for n, m in modelo.named_modules()}
+        vista = _vista_con(modelo, {rutas[id(modelo.get_decoder())] + '.embed_tokens': self._emb,
+                                    rutas[id(modelo.get_output_embeddings())]: self._lm})
+        vista.config = copy.deepcopy(modelo.config)
+        vista.config.vocab_size = self.tamano
+        return vista
+
+    def generate(self, *args, forced_bos_token_id=None, **kwargs):
+        if forced_bos_token_id not in self._a_corto or 2 * kwargs.get('num_beams', 1) > self.tamano:
+            # Otro idioma destino (o lista demasiado pequeña para el haz): vocabulario completo
+            return self.modelo.generate(*args, forced_bos_token_id=forced_bos_token_id, **kwargs)
+        salida = self._corto.generate(*args, forced_bos_token_id=self._a_corto[forced_bos_token_id], **kwargs)
+        return self._ids[salida.to(self._ids.device)]
+
+
+def medir_ahorro(model, modelo_corto: ModeloListaCorta, tokenizer, textos: list, src_lang: str,
+                 tgt_lang: str, perfil: str = 'rapido', device=None) -> dict:
+    """Compara modelo completo y lista corta: ms por paso del decodificador y salidas idénticas."""
+    device = device if device is not None else next(model.parameters()).device
+    tokenizer.src_lang = src_lang
+    forced_bos = tokenizer.get_lang_id(tgt_lang)
+    resultados = {}
+    for nombre, m in (('completo', model), ('lista_corta', modelo_corto)):
+        salidas, pasos, t_total = [], 0, 0.0
+        for texto in textos:
+            entradas = tokenizer(texto, return_tensors='pt', truncation=True)
+            entradas = {k: v.to(device) for k, v in entradas.items()}
+            args = argumentos_generacion(perfil, entradas['input_ids'].shape[1])
+            t0 = time.perf_counter()
+            with torch.no_grad(), contexto_generacion(m, device):
+                out = m.generate(**entradas, forced_bos_token_id=forced_bos, **args)
+            t_total += time.perf_counter() - t0
+            pasos += out.shape[1] - 1
+            salidas.append(tokenizer.batch_decode(out, skip_special_tokens=True)[0])
+        resultados[nombre] = {'salidas': salidas, 'ms_por_paso': 1000 * t_total / max(pasos, 1)}
+    iguales = sum(a == b for a, b in zip(resultados['completo']['salidas'], resultados['lista_corta']['salidas']))
+    return {
+        'ms_por_paso_completo': resultados['completo']['ms_por_paso'],
+        'ms_por_paso_lista_corta': resultados['lista_corta']['ms_por_paso'],
+        'ahorro_ms_por_paso': resultados['completo']['ms_por_paso'] - resultados['lista_corta']['ms_por_paso'],
+        'identicas': iguales,
+        'total': len(textos),
+        'tamano_lista': modelo_corto.tamano,
+        'tamano_vocabulario': model.config.vocab_size,
+    }